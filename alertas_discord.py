@@ -11,11 +11,14 @@ Ejecuta:
     python alertas_discord_auto.py
 """
 
-import json, time, os
 from datetime import datetime, timezone
-import requests
 import paho.mqtt.client as mqtt
 
+from schemas import telemetry
+from scripts.alert_dispatcher import AlertDispatcher
+from scripts.rules import RuleEngine, load_rules
+from scripts.state_store import PackageStateStore
+
 # =======================
 # CONFIG (EDITA SOLO ESTO)
 # =======================
@@ -33,6 +36,29 @@ RECOVERY_DELTA = 0.5          # histeresis para recuperación (7.0 - 0.5 = 6.5)
 SEND_RECOVERY = False         # cambia a True si quieres mensaje de recuperación
 COOLDOWN_SECONDS = 60        # no repetir misma alerta del mismo paquete antes de 3 min
 
+# Reglas (mismo motor que scripts/processor.py; ALERT_RULES_FILE las sustituye)
+RULES = [
+    {
+        "name": "temp_alta",
+        "channel": "temp",
+        "label": "Temperatura",
+        "reason": "Temperatura alta",
+        "when": [{"field": "temperatura", "op": ">", "value": TEMP_THRESHOLD}],
+        "hysteresis": RECOVERY_DELTA,
+        "cooldown_s": COOLDOWN_SECONDS,
+        "notify_recovery": SEND_RECOVERY,
+    },
+    {
+        "name": "puerta_abierta",
+        "channel": "door",
+        "label": "Puerta",
+        "reason": "Puerta ABIERTA",
+        "when": [{"field": "puerta_abierta", "op": "==", "value": True}],
+        "cooldown_s": COOLDOWN_SECONDS,
+        "notify_recovery": SEND_RECOVERY,
+    },
+]
+
 # =======================
 
 def _now_iso():
@@ -42,30 +68,30 @@ def _gmaps(lat, lon):
     if lat is None or lon is None: return ""
     return f"https://maps.google.com/?q={lat},{lon}"
 
+# Envío asíncrono (cola por webhook, agrupación de alertas y rate limit de Discord)
+_dispatcher = AlertDispatcher()
+
 def _post_discord(hook, content):
-    try:
-        r = requests.post(hook, json={"content": content}, timeout=10)
-        if r.status_code >= 300:
-            print(f"[WARN] Discord {r.status_code}: {r.text[:200]}")
-        else:
-            print(f"[DISCORD] {content}")
-    except Exception as e:
-        print(f"[ERROR] Discord: {e}")
-
-class State:
-    def __init__(self):
-        self.temp_high = {}          # pkg_id -> bool
-        self.door_open = {}          # pkg_id -> bool
-        self.last_sent = {}          # (pkg_id, kind) -> ts
-
-    def can_send(self, pkg_id, kind):
-        now = time.time()
-        key = (pkg_id, kind)
-        last = self.last_sent.get(key, 0)
-        if now - last >= COOLDOWN_SECONDS:
-            self.last_sent[key] = now
-            return True
-        return False
+    if _dispatcher.submit(hook, {"content": content}):
+        print(f"[DISCORD] {content}")
+
+# Iconos de disparo / recuperación por canal
+_ICONS = {"temp": ("⚠️", "✅"), "door": ("🚪", "🔒")}
+
+def _format_event(event, pkg, data, ts):
+    """Texto del mensaje de Discord para un evento del motor de reglas (texto e icono de la regla)."""
+    lat, lon = data.get("latitud"), data.get("longitud")
+    link = _gmaps(lat, lon)
+    where = f"📍 {lat},{lon} {('(mapa: ' + link + ')') if link else ''}\n🕒 {ts}"
+    rule = event.rule
+    fire_icon, clear_icon = _ICONS.get(rule.channel, ("🚨", "✅"))
+    # Valor leído frente al umbral de cada condición numérica (p. ej. "temperatura = 9.3 (> 6.0)")
+    detail = ", ".join(f"{c.field} = {data.get(c.field)} ({c.op} {c.value})"
+                       for c in rule.conditions if c.op not in ("==", "!="))
+    detail = f": {detail}" if detail else ""
+    if event.kind == "fire":
+        return f"{fire_icon} **{event.reason}** en `{pkg}`{detail}\n{where}"
+    return f"{clear_icon} **{rule.label} normal** en `{pkg}`{detail}\n{where}"
 
 def main():
     # Validación mínima
@@ -74,76 +100,35 @@ def main():
         print("❌ Pon tus URLs de webhook en el bloque CONFIG (WEBHOOK_TEMP / WEBHOOK_DOOR).")
         return
 
-    st = State()
+    webhooks = {"temp": WEBHOOK_TEMP, "door": WEBHOOK_DOOR}
+    state = PackageStateStore()
+    engine = RuleEngine(load_rules(default=RULES), state)
 
     def on_message(client, userdata, msg):
         try:
-            data = json.loads(msg.payload.decode("utf-8", errors="ignore"))
-        except Exception as e:
-            print(f"[WARN] JSON inválido en {msg.topic}: {e}")
+            data = telemetry.decode_wire(msg.payload)  # JSON o binario compacto
+        except telemetry.InvalidTelemetry as e:
+            print(f"[WARN] Mensaje inválido en {msg.topic}: {e}")
             return
 
         pkg = data.get("id_paquete") or "DESCONOCIDO"
-        temp = data.get("temperatura")
-        door = data.get("puerta_abierta")
-        lat, lon = data.get("latitud"), data.get("longitud")
         ts = data.get("timestamp_utc") or _now_iso()
 
-        # --- Temperatura ---
-        if isinstance(temp, (int, float)):
-            high = temp > TEMP_THRESHOLD
-            prev = st.temp_high.get(pkg, False)
-
-            if high and not prev and st.can_send(pkg, "temp"):
-                link = _gmaps(lat, lon)
-                _post_discord(
-                    WEBHOOK_TEMP,
-                    f"⚠️ **Temperatura alta** en `{pkg}`: **{temp:.2f} °C** (> {TEMP_THRESHOLD:.1f})\n"
-                    f"📍 {lat},{lon} {('(mapa: ' + link + ')') if link else ''}\n"
-                    f"🕒 {ts}"
-                )
-                st.temp_high[pkg] = True
-
-            if SEND_RECOVERY and prev and (not high) and temp <= (TEMP_THRESHOLD - RECOVERY_DELTA) and st.can_send(pkg, "temp"):
-                link = _gmaps(lat, lon)
-                _post_discord(
-                    WEBHOOK_TEMP,
-                    f"✅ **Temperatura recuperada** en `{pkg}`: **{temp:.2f} °C** (≤ {TEMP_THRESHOLD-RECOVERY_DELTA:.1f})\n"
-                    f"📍 {lat},{lon} {('(mapa: ' + link + ')') if link else ''}\n"
-                    f"🕒 {ts}"
-                )
-                st.temp_high[pkg] = False
-
-        # --- Puerta ---
-        if isinstance(door, bool):
-            was_open = st.door_open.get(pkg, False)
-
-            if door and not was_open and st.can_send(pkg, "door"):
-                link = _gmaps(lat, lon)
-                _post_discord(
-                    WEBHOOK_DOOR,
-                    f"🚪 **Puerta ABIERTA** en `{pkg}`\n"
-                    f"📍 {lat},{lon} {('(mapa: ' + link + ')') if link else ''}\n"
-                    f"🕒 {ts}"
-                )
-                st.door_open[pkg] = True
-
-            if SEND_RECOVERY and (not door) and was_open and st.can_send(pkg, "door"):
-                link = _gmaps(lat, lon)
-                _post_discord(
-                    WEBHOOK_DOOR,
-                    f"🔒 **Puerta CERRADA** en `{pkg}`\n"
-                    f"📍 {lat},{lon} {('(mapa: ' + link + ')') if link else ''}\n"
-                    f"🕒 {ts}"
-                )
-                st.door_open[pkg] = False
+        # Todas las reglas (umbral, histéresis, cooldown) en una pasada sobre el estado del paquete
+        for event in engine.evaluate(data, state.touch(pkg)):
+            if event.kind == "fire" or (event.kind == "clear" and event.was_active and event.rule.notify_recovery):
+                hook = webhooks.get(event.rule.channel, WEBHOOK_TEMP)
+                _post_discord(hook, _format_event(event, pkg, data, ts))
 
     print(f"[INFO] Suscribiendo {TOPIC} en {BROKER}:{PORT} …")
     client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="discord-alerts-auto")
     client.on_message = on_message
     client.connect(BROKER, PORT, 30)
-    client.subscribe(TOPIC, qos=0)
-    client.loop_forever()
+    client.subscribe([(TOPIC, 0), (TOPIC + telemetry.BINARY_TOPIC_SUFFIX, 0)])
+    try:
+        client.loop_forever()
+    finally:
+        _dispatcher.close()
 
 if __name__ == "__main__":
     main()
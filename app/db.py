@@ -0,0 +1,441 @@
+"""
+Capa de persistencia asíncrona de la API de ingesta.
+
+- `postgres`: pool de conexiones asyncpg. Las lecturas sueltas usan una
+  sentencia preparada (asyncpg cachea el plan por conexión) y los lotes de
+  COPY_MIN_ROWS filas o más se escriben con COPY (`copy_records_to_table`).
+- `sqlite`: fichero SQLite local (WAL) para desarrollo sin PostgreSQL. Los
+  timestamps se guardan como texto UTC de ancho fijo; al abrir un fichero
+  anterior a ese formato se reescriben una vez (`PRAGMA user_version`).
+- `memory`: lista en memoria (pruebas y benchmarks).
+
+`scan_telemetry()` recorre la tabla en páginas por id (reconstrucción de los
+KPIs incrementales al arrancar). `read_range()` lee las lecturas de un
+paquete entre dos instantes por el índice (id_paquete, timestamp_utc, id),
+en páginas con paginación por clave, y `latest_readings()` la última lectura
+de cada paquete (carga de la caché de app/history.py).
+
+El backend se elige con DB_BACKEND (por defecto `postgres`) y se abre en el
+arranque de la app (`init_backend`) y se cierra al pararla (`close_backend`).
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from schemas.telemetry import AGGREGATE_FIELDS, FIELDS
+
+DB_BACKEND = os.getenv("DB_BACKEND", "postgres")
+DB_HOST = os.getenv("DB_HOST", "postgres")
+DB_PORT = int(os.getenv("DB_PORT", 5432))
+DB_USER = os.getenv("DB_USER", "postgres")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "")
+DB_NAME = os.getenv("DB_NAME", "postgres")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 2))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+DB_SQLITE_PATH = os.getenv("DB_SQLITE_PATH", "telemetry.db")
+COPY_MIN_ROWS = int(os.getenv("COPY_MIN_ROWS", 50))  # A partir de aquí un lote va por COPY
+SCAN_BATCH_ROWS = int(os.getenv("SCAN_BATCH_ROWS", 10000))  # Filas por página al recorrer la tabla entera
+HISTORY_PAGE_ROWS = int(os.getenv("HISTORY_PAGE_ROWS", 5000))  # Filas por página al leer un rango de un paquete
+
+TELEMETRY_COLUMNS = FIELDS  # Orden de columnas del esquema compartido (schemas/telemetry.py)
+AGGREGATE_COLUMNS = AGGREGATE_FIELDS
+
+CREATE_TELEMETRY_TABLE = """
+CREATE TABLE IF NOT EXISTS telemetry (
+    id BIGSERIAL PRIMARY KEY,
+    id_paquete TEXT NOT NULL,
+    timestamp_utc TIMESTAMPTZ NOT NULL,
+    temperatura DOUBLE PRECISION NOT NULL,
+    fuerza_g DOUBLE PRECISION NOT NULL,
+    puerta_abierta BOOLEAN NOT NULL,
+    latitud DOUBLE PRECISION,
+    longitud DOUBLE PRECISION,
+    recibido_utc TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+"""
+
+# Agregados por ventana de la etapa de downsampling del procesador
+CREATE_AGGREGATE_TABLE = """
+CREATE TABLE IF NOT EXISTS telemetry_agg (
+    id BIGSERIAL PRIMARY KEY,
+    id_paquete TEXT NOT NULL,
+    ventana_inicio TIMESTAMPTZ NOT NULL,
+    ventana_fin TIMESTAMPTZ NOT NULL,
+    lecturas INTEGER NOT NULL,
+    anomalias INTEGER NOT NULL,
+    temp_min DOUBLE PRECISION NOT NULL,
+    temp_max DOUBLE PRECISION NOT NULL,
+    temp_media DOUBLE PRECISION NOT NULL,
+    fuerza_g_max DOUBLE PRECISION NOT NULL,
+    puerta_abierta_s DOUBLE PRECISION NOT NULL,
+    latitud DOUBLE PRECISION,
+    longitud DOUBLE PRECISION,
+    recibido_utc TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+"""
+
+
+# Rangos de un paquete y su última lectura sin recorrer la tabla (mismo SQL en PostgreSQL y SQLite)
+CREATE_TELEMETRY_INDEX = """
+CREATE INDEX IF NOT EXISTS telemetry_paquete_ts ON telemetry (id_paquete, timestamp_utc, id)
+"""
+
+
+def _insert_sql(table, columns, placeholder):
+    values = ", ".join(placeholder(i) for i in range(1, len(columns) + 1))
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({values})"
+
+
+INSERT_TELEMETRY = _insert_sql("telemetry", TELEMETRY_COLUMNS, lambda i: f"${i}")
+INSERT_AGGREGATE = _insert_sql("telemetry_agg", AGGREGATE_COLUMNS, lambda i: f"${i}")
+
+
+def _scan_sql(placeholder):
+    # Paginación por clave (id > último visto): cada página usa el índice de la PK, sin OFFSET
+    return (f"SELECT id, {', '.join(TELEMETRY_COLUMNS)} FROM telemetry "
+            f"WHERE id > {placeholder(1)} ORDER BY id LIMIT {placeholder(2)}")
+
+
+SCAN_TELEMETRY = _scan_sql(lambda i: f"${i}")
+
+
+def _range_sql(placeholder):
+    # Una búsqueda en el índice por página: continúa tras la última (timestamp_utc, id) vista, sin OFFSET
+    p = placeholder
+    return (f"SELECT id, {', '.join(TELEMETRY_COLUMNS)} FROM telemetry "
+            f"WHERE id_paquete = {p(1)} AND (timestamp_utc, id) > ({p(2)}, {p(3)}) AND timestamp_utc <= {p(4)} "
+            f"ORDER BY timestamp_utc, id LIMIT {p(5)}")
+
+
+READ_RANGE = _range_sql(lambda i: f"${i}")
+
+
+def _latest_sql(placeholder):
+    # Recorrido "a saltos" del índice (id_paquete, timestamp_utc, id): una búsqueda para pasar al
+    # siguiente paquete y otra para su última fila, sin leer el resto de la tabla (ni DISTINCT ON
+    # en PostgreSQL ni GROUP BY en SQLite lo evitan)
+    return (f"WITH RECURSIVE paquetes(id_paquete) AS ("
+            f"SELECT MIN(id_paquete) FROM telemetry "
+            f"UNION ALL SELECT (SELECT MIN(t.id_paquete) FROM telemetry t WHERE t.id_paquete > p.id_paquete) "
+            f"FROM paquetes p WHERE p.id_paquete IS NOT NULL) "
+            f"SELECT t.id, {', '.join('t.' + c for c in TELEMETRY_COLUMNS)} FROM paquetes p "
+            f"JOIN telemetry t ON t.id = (SELECT u.id FROM telemetry u WHERE u.id_paquete = p.id_paquete "
+            f"ORDER BY u.timestamp_utc DESC, u.id DESC LIMIT 1) "
+            f"WHERE t.timestamp_utc >= {placeholder(1)}")
+
+
+LATEST_READINGS = _latest_sql(lambda i: f"${i}")
+
+CREATE_TELEMETRY_TABLE_SQLITE = """
+CREATE TABLE IF NOT EXISTS telemetry (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_paquete TEXT NOT NULL,
+    timestamp_utc TEXT NOT NULL,
+    temperatura REAL NOT NULL,
+    fuerza_g REAL NOT NULL,
+    puerta_abierta INTEGER NOT NULL,
+    latitud REAL,
+    longitud REAL,
+    recibido_utc TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+)
+"""
+
+CREATE_AGGREGATE_TABLE_SQLITE = """
+CREATE TABLE IF NOT EXISTS telemetry_agg (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_paquete TEXT NOT NULL,
+    ventana_inicio TEXT NOT NULL,
+    ventana_fin TEXT NOT NULL,
+    lecturas INTEGER NOT NULL,
+    anomalias INTEGER NOT NULL,
+    temp_min REAL NOT NULL,
+    temp_max REAL NOT NULL,
+    temp_media REAL NOT NULL,
+    fuerza_g_max REAL NOT NULL,
+    puerta_abierta_s REAL NOT NULL,
+    latitud REAL,
+    longitud REAL,
+    recibido_utc TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+)
+"""
+
+
+def utc(value):
+    """Instante consciente de zona en UTC (los que llegan sin zona se toman como UTC)."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _row(reading, columns=TELEMETRY_COLUMNS):
+    # Todos los backends guardan los instantes en UTC: comparables entre sí y con los límites de las consultas
+    return tuple(utc(v) if isinstance(v, datetime) else v for v in (getattr(reading, col) for col in columns))
+
+
+def _sqlite_ts(value):
+    """Timestamp en texto de ancho fijo y en UTC: en SQLite el orden de texto es el orden temporal."""
+    return utc(value).isoformat(timespec="microseconds")
+
+
+def _sqlite_row(reading, columns):
+    return tuple(_sqlite_ts(v) if isinstance(v, datetime) else int(v) if isinstance(v, bool) else v
+                 for v in _row(reading, columns))
+
+
+def _from_sqlite(row):
+    # (id, id_paquete, timestamp_utc, temperatura, fuerza_g, puerta_abierta, ...): timestamp y puerta
+    # vuelven a datetime y bool, como en PostgreSQL
+    return (row[0], row[1], datetime.fromisoformat(row[2]), *row[3:5], bool(row[5]), *row[6:8])
+
+
+SQLITE_SCHEMA_VERSION = 1  # 1: timestamps en UTC con microsegundos (`_sqlite_ts`)
+_SQLITE_TS_COLUMNS = {"telemetry": ("timestamp_utc",), "telemetry_agg": ("ventana_inicio", "ventana_fin")}
+
+
+def _migrate_sqlite(conn):
+    """Reescribe en el formato de `_sqlite_ts` los timestamps de ficheros creados antes de él.
+
+    Antes se guardaba `isoformat()` con la zona de origen y sin microsegundos fijos, y el orden de
+    texto (índice, rangos, última lectura) no era el temporal. Se hace una vez por fichero.
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SQLITE_SCHEMA_VERSION:
+        return
+    with conn:
+        for table, columns in _SQLITE_TS_COLUMNS.items():
+            for column in columns:
+                rows = conn.execute(
+                    f"SELECT id, {column} FROM {table} "
+                    f"WHERE length({column}) != 32 OR substr({column}, 27) != '+00:00'").fetchall()
+                conn.executemany(f"UPDATE {table} SET {column} = ? WHERE id = ?",
+                                 [(_sqlite_ts(datetime.fromisoformat(ts)), row_id) for row_id, ts in rows])
+        conn.execute(f"PRAGMA user_version = {SQLITE_SCHEMA_VERSION}")
+
+
+class MemoryBackend:
+    """Backend en memoria, útil para desarrollo y benchmarks."""
+
+    def __init__(self):
+        self.rows = []
+        self.aggregates = []
+
+    async def init(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def insert_many(self, readings):
+        rows = [_row(r) for r in readings]
+        self.rows.extend(rows)
+        return len(rows)
+
+    async def insert_aggregates(self, aggregates):
+        rows = [_row(a, AGGREGATE_COLUMNS) for a in aggregates]
+        self.aggregates.extend(rows)
+        return len(rows)
+
+    async def scan_telemetry(self, batch_size=SCAN_BATCH_ROWS):
+        for start in range(0, len(self.rows), batch_size):
+            yield self.rows[start:start + batch_size]
+
+    # Sin índice: recorre la lista (el id de una fila es su posición + 1)
+    async def read_range(self, package_id, after, end, batch_size=HISTORY_PAGE_ROWS):
+        after_ts, after_id = after
+        rows = sorted((row[1], i + 1, row) for i, row in enumerate(self.rows)
+                      if row[0] == package_id and (row[1], i + 1) > (after_ts, after_id) and row[1] <= end)
+        for start in range(0, len(rows), batch_size):
+            yield [(row_id, *row) for _, row_id, row in rows[start:start + batch_size]]
+
+    async def latest_readings(self, since):
+        latest = {}
+        for i, row in enumerate(self.rows):
+            current = latest.get(row[0])
+            if row[1] >= since and (current is None or (row[1], i + 1) >= (current[2], current[0])):
+                latest[row[0]] = (i + 1, *row)
+        return list(latest.values())
+
+
+class SQLiteBackend:
+    """Backend SQLite local. Las escrituras se serializan en un hilo aparte para no bloquear el event loop."""
+
+    def __init__(self, path=DB_SQLITE_PATH):
+        self.path = path
+        self.conn = None
+        self._lock = threading.Lock()
+
+    async def init(self):
+        def _open():
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(CREATE_TELEMETRY_TABLE_SQLITE)
+            conn.execute(CREATE_AGGREGATE_TABLE_SQLITE)
+            conn.execute(CREATE_TELEMETRY_INDEX)
+            conn.commit()
+            _migrate_sqlite(conn)
+            return conn
+        self.conn = await asyncio.to_thread(_open)
+
+    async def close(self):
+        if self.conn is not None:
+            await asyncio.to_thread(self.conn.close)
+            self.conn = None
+
+    async def insert_many(self, readings):
+        return await self._insert("telemetry", TELEMETRY_COLUMNS, readings)
+
+    async def insert_aggregates(self, aggregates):
+        return await self._insert("telemetry_agg", AGGREGATE_COLUMNS, aggregates)
+
+    async def scan_telemetry(self, batch_size=SCAN_BATCH_ROWS):
+        sql = _scan_sql(lambda i: "?")
+        last_id = 0
+        while True:
+            def _read():
+                with self._lock:
+                    return self.conn.execute(sql, (last_id, batch_size)).fetchall()
+            rows = await asyncio.to_thread(_read)
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [row[1:] for row in rows]
+
+    async def read_range(self, package_id, after, end, batch_size=HISTORY_PAGE_ROWS):
+        sql = _range_sql(lambda i: "?")
+        after_ts, after_id = _sqlite_ts(after[0]), after[1]
+        end = _sqlite_ts(end)
+        while True:
+            def _read():
+                with self._lock:
+                    return self.conn.execute(sql, (package_id, after_ts, after_id, end, batch_size)).fetchall()
+            rows = await asyncio.to_thread(_read)
+            if not rows:
+                return
+            after_ts, after_id = rows[-1][2], rows[-1][0]
+            yield [_from_sqlite(row) for row in rows]
+            if len(rows) < batch_size:
+                return
+
+    async def latest_readings(self, since):
+        def _read():
+            with self._lock:
+                return self.conn.execute(_latest_sql(lambda i: "?"), (_sqlite_ts(since),)).fetchall()
+        return [_from_sqlite(row) for row in await asyncio.to_thread(_read)]
+
+    async def _insert(self, table, columns, items):
+        rows = [_sqlite_row(item, columns) for item in items]
+        sql = _insert_sql(table, columns, lambda i: "?")
+
+        def _write():
+            with self._lock, self.conn:  # una transacción por lote
+                self.conn.executemany(sql, rows)
+        await asyncio.to_thread(_write)
+        return len(rows)
+
+
+class PostgresBackend:
+    """Backend PostgreSQL con pool asyncpg, sentencia preparada y COPY para lotes."""
+
+    def __init__(self):
+        self.pool = None
+
+    async def init(self):
+        import asyncpg
+
+        self.pool = await asyncpg.create_pool(
+            host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASSWORD,
+            database=DB_NAME, min_size=DB_POOL_MIN, max_size=DB_POOL_MAX,
+        )
+        async with self.pool.acquire() as conn:
+            await conn.execute(CREATE_TELEMETRY_TABLE)
+            await conn.execute(CREATE_AGGREGATE_TABLE)
+            await conn.execute(CREATE_TELEMETRY_INDEX)
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def insert_many(self, readings):
+        return await self._insert("telemetry", TELEMETRY_COLUMNS, INSERT_TELEMETRY, readings)
+
+    async def insert_aggregates(self, aggregates):
+        return await self._insert("telemetry_agg", AGGREGATE_COLUMNS, INSERT_AGGREGATE, aggregates)
+
+    async def scan_telemetry(self, batch_size=SCAN_BATCH_ROWS):
+        last_id = 0
+        while True:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(SCAN_TELEMETRY, last_id, batch_size)
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [tuple(row)[1:] for row in rows]
+
+    async def read_range(self, package_id, after, end, batch_size=HISTORY_PAGE_ROWS):
+        after_ts, after_id = after
+        while True:
+            # Una conexión del pool por página: un cliente lento no retiene la conexión entre páginas
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(READ_RANGE, package_id, after_ts, after_id, end, batch_size)
+            if not rows:
+                return
+            after_ts, after_id = rows[-1][2], rows[-1][0]
+            yield [tuple(row) for row in rows]
+            if len(rows) < batch_size:
+                return
+
+    async def latest_readings(self, since):
+        async with self.pool.acquire() as conn:
+            return [tuple(row) for row in await conn.fetch(LATEST_READINGS, since)]
+
+    async def _insert(self, table, columns, insert_sql, items):
+        rows = [_row(item, columns) for item in items]
+        if not rows:
+            return 0
+        async with self.pool.acquire() as conn:
+            if len(rows) >= COPY_MIN_ROWS:
+                await conn.copy_records_to_table(table, records=rows, columns=columns)
+            else:
+                # executemany reutiliza la sentencia preparada de la conexión
+                await conn.executemany(insert_sql, rows)
+        return len(rows)
+
+
+_BACKENDS = {
+    "memory": MemoryBackend,
+    "sqlite": SQLiteBackend,
+    "postgres": PostgresBackend,
+}
+
+_backend = None
+
+
+async def init_backend():
+    """Crea y abre el backend configurado (se llama en el arranque de la app)."""
+    global _backend
+    if _backend is None:
+        try:
+            backend = _BACKENDS[DB_BACKEND]()
+        except KeyError:
+            raise ValueError(f"DB_BACKEND desconocido: {DB_BACKEND}") from None
+        await backend.init()
+        _backend = backend
+    return _backend
+
+
+async def close_backend():
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
+
+
+def get_backend():
+    """Backend abierto en el arranque de la app."""
+    if _backend is None:
+        raise RuntimeError("La capa de BD no está inicializada (init_backend)")
+    return _backend
@@ -0,0 +1,153 @@
+"""
+Consultas históricas de telemetría y caché de la última lectura por paquete.
+
+- Lecturas de un paquete entre dos instantes: se sirven como NDJSON en
+  streaming, pidiendo a la BD páginas de HISTORY_PAGE_ROWS filas con
+  paginación por clave (timestamp_utc, id) sobre el índice
+  (id_paquete, timestamp_utc, id). La memoria de la API no depende del
+  tamaño del rango y cada página es una búsqueda en el índice, sin OFFSET.
+  Con `limit`, el cliente continúa donde lo dejó pasando como `cursor` el
+  `timestamp_utc,id` de la última línea recibida.
+- Última lectura conocida de cada paquete: `LastValueCache` en memoria,
+  actualizada al ingerir (O(1) por lectura) y cargada al arrancar con una
+  consulta por el mismo índice, así que "posición de todos los paquetes
+  activos" no toca la BD. Los paquetes sin lecturas en LATEST_RETENTION_S
+  se olvidan en una tarea de fondo (`prune_latest`), no al consultar.
+
+Todas las rutas /telemetry/* devuelven `timestamp_utc` en UTC con sufijo Z
+(RFC 3339), sea cual sea el backend o la zona con la que llegó la lectura.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import aclosing
+from datetime import datetime, timezone
+
+import msgspec
+
+from app.db import utc
+
+LATEST_ENABLED = os.getenv("LATEST_ENABLED", "1") == "1"
+LATEST_ACTIVE_S = float(os.getenv("LATEST_ACTIVE_S", 3600))  # Paquete activo: con lecturas en esta ventana
+LATEST_RETENTION_S = float(os.getenv("LATEST_RETENTION_S", 7 * 86400))  # Paquetes sin lecturas desde hace más se olvidan
+LATEST_PRUNE_INTERVAL_S = float(os.getenv("LATEST_PRUNE_INTERVAL_S", 60))  # Cada cuánto se olvidan esos paquetes
+HISTORY_MAX_ROWS = int(os.getenv("HISTORY_MAX_ROWS", 1_000_000))  # Tope de filas por respuesta (se sigue con cursor)
+
+NDJSON = "application/x-ndjson"
+LINES_PER_CHUNK = 5000  # Lecturas por trozo al volcar la caché en streaming
+
+
+class HistoryReading(msgspec.Struct):
+    """Línea NDJSON de un rango histórico: la fila de telemetry con su id (parte del cursor)."""
+    id: int
+    id_paquete: str
+    timestamp_utc: datetime
+    temperatura: float
+    fuerza_g: float
+    puerta_abierta: bool
+    latitud: float | None
+    longitud: float | None
+
+
+class LatestReading(msgspec.Struct):
+    id_paquete: str
+    timestamp_utc: datetime
+    temperatura: float
+    fuerza_g: float
+    puerta_abierta: bool
+    latitud: float | None
+    longitud: float | None
+
+
+_encoder = msgspec.json.Encoder()
+encode = _encoder.encode
+
+
+def parse_cursor(cursor):
+    """`timestamp_utc,id` de la última línea recibida -> (datetime, id)."""
+    ts, sep, row_id = cursor.rpartition(",")
+    if not sep:
+        raise ValueError("el cursor debe ser <timestamp_utc>,<id>")
+    return utc(datetime.fromisoformat(ts.strip().replace(" ", "+"))), int(row_id)
+
+
+async def stream_range(backend, package_id, after, end, limit):
+    """Trozos NDJSON con las lecturas de `package_id` tras `after` = (timestamp, id) y hasta `end`."""
+    sent = 0
+    async with aclosing(backend.read_range(package_id, after, end)) as pages:
+        async for page in pages:
+            page = page[:limit - sent]
+            yield _encoder.encode_lines([HistoryReading(row[0], row[1], utc(row[2]), *row[3:]) for row in page])
+            sent += len(page)
+            if sent >= limit:
+                return
+
+
+class LastValueCache:
+    """Última lectura de cada paquete: la de timestamp más reciente, no la última en llegar."""
+
+    def __init__(self):
+        self.readings = {}  # id_paquete -> (epoch, fila en el orden de TELEMETRY_COLUMNS)
+
+    def add_readings(self, readings):
+        """`Telemetry` validadas (ruta de ingesta)."""
+        latest = self.readings
+        for r in readings:
+            timestamp = utc(r.timestamp_utc)
+            ts = timestamp.timestamp()
+            current = latest.get(r.id_paquete)
+            if current is None or ts >= current[0]:
+                latest[r.id_paquete] = (ts, (r.id_paquete, timestamp, r.temperatura, r.fuerza_g,
+                                             r.puerta_abierta, r.latitud, r.longitud))
+
+    def add_rows(self, rows):
+        """Filas (id, id_paquete, timestamp_utc, ...) de `latest_readings()` (carga desde la BD)."""
+        latest = self.readings
+        for row in rows:
+            timestamp = utc(row[2])
+            ts = timestamp.timestamp()
+            current = latest.get(row[1])
+            if current is None or ts >= current[0]:
+                latest[row[1]] = (ts, (row[1], timestamp, *row[3:]))
+
+    def get(self, package_id):
+        entry = self.readings.get(package_id)
+        return None if entry is None else LatestReading(*entry[1])
+
+    def active(self, since):
+        """Última lectura de los paquetes con lecturas desde `since` (epoch s)."""
+        return [row for ts, row in self.readings.values() if ts >= since]
+
+    def prune(self, older_than):
+        """Olvida los paquetes sin lecturas desde `older_than` (epoch s). Devuelve cuántos."""
+        stale = [pid for pid, (ts, _) in self.readings.items() if ts < older_than]
+        for pid in stale:
+            del self.readings[pid]
+        return len(stale)
+
+    def __len__(self):
+        return len(self.readings)
+
+
+async def stream_latest(rows):
+    for start in range(0, len(rows), LINES_PER_CHUNK):
+        yield _encoder.encode_lines([LatestReading(*row) for row in rows[start:start + LINES_PER_CHUNK]])
+
+
+async def rebuild_latest(backend, cache, retention_s=LATEST_RETENTION_S):
+    """Carga la caché con la última lectura de cada paquete con datos en `retention_s`. Devuelve cuántos."""
+    since = datetime.fromtimestamp(time.time() - retention_s, timezone.utc)
+    cache.add_rows(await backend.latest_readings(since))
+    return len(cache)
+
+
+async def prune_latest(cache, retention_s=LATEST_RETENTION_S, interval_s=LATEST_PRUNE_INTERVAL_S):
+    """Tarea de fondo: olvida cada `interval_s` los paquetes sin lecturas en `retention_s`."""
+    while True:
+        await asyncio.sleep(interval_s)
+        cache.prune(time.time() - retention_s)
+
+
+# Estado del proceso de la API (lo carga el lifespan de la app)
+latest = LastValueCache()
@@ -0,0 +1,346 @@
+"""
+KPIs de negocio mantenidos de forma incremental al ingerir lecturas.
+
+En lugar de recorrer la tabla telemetry en cada refresco del dashboard, la
+API actualiza en memoria, lectura a lectura, los agregados que consulta la
+capa de BI:
+
+- Tiempo fuera de rango por envío: segundos entre lecturas consecutivas de un
+  paquete cuya lectura anterior estaba fuera de [KPI_TEMP_MIN, KPI_TEMP_MAX]
+  (huecos mayores que KPI_MAX_GAP_S no cuentan: el sensor estaba callado).
+- Incidencias por tramo de ruta: cada vez que un paquete entra en incidencia
+  (temperatura fuera de rango, fuerza G > KPI_G_MAX o puerta abierta) se
+  suma al tramo donde empezó: la celda de KPI_SEGMENT_DEG grados de su
+  posición. `ruta` no forma parte del tramo porque la tabla telemetry no la
+  guarda y la reconstrucción al arrancar daría otras claves.
+- Duración alerta → recuperación: desde la primera lectura en incidencia
+  hasta la primera lectura normal del mismo paquete.
+
+El estado está acotado como el `PackageStateStore` del procesador: un envío
+sin lecturas en KPI_SHIPMENT_TTL_S (según el timestamp de las lecturas, así la
+reconstrucción olvida los mismos) o el menos reciente al pasar de
+KPI_MAX_SHIPMENTS se olvida; sus cifras siguen en los agregados globales. Los
+tramos menos recientes por encima de KPI_MAX_SEGMENTS se suman al tramo
+OTHER_SEGMENTS, así que los totales no cambian.
+
+`TtlCache` guarda las respuestas ya serializadas durante KPI_CACHE_TTL
+segundos con su ETag, así que un refresco del dashboard cuesta un acceso a un
+dict sea cual sea el tamaño de la tabla.
+Al arrancar, el estado se reconstruye una vez recorriendo la tabla.
+"""
+
+import hashlib
+import heapq
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+import msgspec
+
+KPI_ENABLED = os.getenv("KPI_ENABLED", "1") == "1"
+KPI_TEMP_MIN = float(os.getenv("KPI_TEMP_MIN", "-inf"))   # Rango de temperatura admisible (°C)
+KPI_TEMP_MAX = float(os.getenv("KPI_TEMP_MAX", 8.0))
+KPI_G_MAX = float(os.getenv("KPI_G_MAX", 2.5))             # Fuerza G a partir de la cual hay impacto
+KPI_MAX_GAP_S = float(os.getenv("KPI_MAX_GAP_S", 300))     # Hueco máximo entre lecturas que se contabiliza
+KPI_SEGMENT_DEG = float(os.getenv("KPI_SEGMENT_DEG", 0.1))  # Tamaño de celda de un tramo (grados)
+KPI_SHIPMENT_TTL_S = float(os.getenv("KPI_SHIPMENT_TTL_S", 7 * 86400))  # Envío sin lecturas desde hace más: se olvida
+KPI_MAX_SHIPMENTS = int(os.getenv("KPI_MAX_SHIPMENTS", 200000))  # Tope duro: se olvida el menos reciente
+KPI_MAX_SEGMENTS = int(os.getenv("KPI_MAX_SEGMENTS", 50000))    # Tramos con detalle; el resto va a OTHER_SEGMENTS
+KPI_RECOVERY_SAMPLES = int(os.getenv("KPI_RECOVERY_SAMPLES", 10000))  # Duraciones recientes para percentiles
+KPI_CACHE_TTL = float(os.getenv("KPI_CACHE_TTL", 5.0))     # Segundos que se sirve una respuesta cacheada
+KPI_CACHE_ENTRIES = int(os.getenv("KPI_CACHE_ENTRIES", 4096))  # Tope de respuestas cacheadas
+
+INCIDENT_KINDS = ("temperatura", "impacto", "puerta")
+_TEMP, _IMPACT, _DOOR = 1, 2, 4
+NO_POSITION = "sin_posicion"
+OTHER_SEGMENTS = "otros"
+
+
+class _Shipment:
+    __slots__ = ("last_ts", "flags", "incident_start", "readings", "out_of_range_s",
+                 "incidents", "recovery_s", "temp_max", "last_segment")
+
+    def __init__(self):
+        self.last_ts = None
+        self.flags = 0              # condiciones de incidencia de la última lectura
+        self.incident_start = None  # timestamp de entrada en incidencia (None = normal)
+        self.readings = 0
+        self.out_of_range_s = 0.0
+        self.incidents = 0
+        self.recovery_s = 0.0       # suma de duraciones alerta → recuperación
+        self.temp_max = -math.inf
+        self.last_segment = NO_POSITION
+
+
+def _epoch(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+def segment_for(lat, lon, deg=KPI_SEGMENT_DEG):
+    """Tramo de ruta: celda de `deg` grados de la posición."""
+    if lat is None or lon is None:
+        return NO_POSITION
+    return f"{math.floor(lat / deg) * deg:.4g},{math.floor(lon / deg) * deg:.4g}"
+
+
+class KpiStore:
+    """Agregados de KPIs por envío, por tramo y globales, actualizados lectura a lectura."""
+
+    def __init__(self, temp_min=KPI_TEMP_MIN, temp_max=KPI_TEMP_MAX, g_max=KPI_G_MAX,
+                 max_gap_s=KPI_MAX_GAP_S, segment_deg=KPI_SEGMENT_DEG, recovery_samples=KPI_RECOVERY_SAMPLES,
+                 shipment_ttl_s=KPI_SHIPMENT_TTL_S, max_shipments=KPI_MAX_SHIPMENTS, max_segments=KPI_MAX_SEGMENTS):
+        self.temp_min = temp_min
+        self.temp_max = temp_max
+        self.g_max = g_max
+        self.max_gap_s = max_gap_s
+        self.segment_deg = segment_deg
+        self.shipment_ttl_s = shipment_ttl_s
+        self.max_shipments = max_shipments
+        self.max_segments = max_segments
+        self.shipments = OrderedDict()  # id_paquete -> _Shipment (del menos al más reciente)
+        self.segments = OrderedDict()   # tramo -> [temperatura, impacto, puerta] (ídem)
+        self.latest_ts = -math.inf      # timestamp más reciente visto: el "ahora" del TTL
+        self.evicted_shipments = 0
+        self.readings = 0
+        self.out_of_order = 0
+        self.incidents = 0
+        self.open_incidents = 0
+        self.out_of_range_s = 0.0
+        self.recoveries = 0
+        self.recovery_total_s = 0.0
+        self.recovery_max_s = 0.0
+        self.recent_recoveries = deque(maxlen=recovery_samples)
+
+    def update(self, package_id, ts, temperatura, fuerza_g, puerta_abierta, latitud=None, longitud=None):
+        """Aplica una lectura (`ts` en epoch s). Coste O(1) amortizado."""
+        if ts > self.latest_ts:
+            self.latest_ts = ts
+        shipments = self.shipments
+        s = shipments.get(package_id)
+        if s is None:
+            self._expire()
+            if len(shipments) >= self.max_shipments:
+                self._evict(next(iter(shipments)))
+            s = shipments[package_id] = _Shipment()
+        else:
+            shipments.move_to_end(package_id)
+        self.readings += 1
+        s.readings += 1
+        if temperatura > s.temp_max:
+            s.temp_max = temperatura
+
+        if s.last_ts is not None:
+            dt = ts - s.last_ts
+            if dt < 0:
+                # Llega tarde (reintento o spool): cuenta como lectura pero no altera los intervalos
+                self.out_of_order += 1
+                return
+            if s.flags & _TEMP and dt <= self.max_gap_s:
+                s.out_of_range_s += dt
+                self.out_of_range_s += dt
+
+        flags = 0
+        if not self.temp_min <= temperatura <= self.temp_max:
+            flags |= _TEMP
+        if fuerza_g > self.g_max:
+            flags |= _IMPACT
+        if puerta_abierta:
+            flags |= _DOOR
+
+        if flags:
+            new = flags & ~s.flags if s.incident_start is not None else flags
+            if s.incident_start is None:
+                s.incident_start = ts
+                s.incidents += 1
+                self.incidents += 1
+                self.open_incidents += 1
+                s.last_segment = segment = segment_for(latitud, longitud, self.segment_deg)
+            else:
+                segment = s.last_segment
+            if new:
+                counts = self._segment_counts(segment)
+                if new & _TEMP:
+                    counts[0] += 1
+                if new & _IMPACT:
+                    counts[1] += 1
+                if new & _DOOR:
+                    counts[2] += 1
+        elif s.incident_start is not None:
+            duration = ts - s.incident_start
+            s.incident_start = None
+            s.recovery_s += duration
+            self.open_incidents -= 1
+            self.recoveries += 1
+            self.recovery_total_s += duration
+            if duration > self.recovery_max_s:
+                self.recovery_max_s = duration
+            self.recent_recoveries.append(duration)
+
+        s.flags = flags
+        s.last_ts = ts
+
+    def _expire(self):
+        # En orden de uso: basta con mirar el principio
+        cutoff = self.latest_ts - self.shipment_ttl_s
+        shipments = self.shipments
+        while shipments:
+            package_id, s = next(iter(shipments.items()))
+            if s.last_ts is None or s.last_ts >= cutoff:
+                break
+            self._evict(package_id)
+
+    def _evict(self, package_id):
+        s = self.shipments.pop(package_id)
+        if s.incident_start is not None:
+            self.open_incidents -= 1  # no se cerrará: deja de contar como abierta
+        self.evicted_shipments += 1
+
+    def _segment_counts(self, segment):
+        segments = self.segments
+        counts = segments.get(segment)
+        if counts is not None:
+            segments.move_to_end(segment)
+            return counts
+        if len(segments) - (OTHER_SEGMENTS in segments) >= self.max_segments:
+            # El tramo menos reciente con detalle se suma a OTHER_SEGMENTS (que no se expulsa)
+            other = segments.pop(OTHER_SEGMENTS, None) or [0, 0, 0]
+            oldest, oldest_counts = segments.popitem(last=False)
+            segments[OTHER_SEGMENTS] = [a + b for a, b in zip(other, oldest_counts)]
+        counts = segments[segment] = [0, 0, 0]
+        return counts
+
+    def add_readings(self, readings):
+        """`Telemetry` validadas (ruta de ingesta)."""
+        update = self.update
+        for r in readings:
+            update(r.id_paquete, r.timestamp_utc.timestamp(), r.temperatura, r.fuerza_g, r.puerta_abierta,
+                   r.latitud, r.longitud)
+
+    def add_rows(self, rows):
+        """Filas en el orden de `TELEMETRY_COLUMNS` (reconstrucción desde la BD)."""
+        update = self.update
+        for pid, ts, temp, g, door, lat, lon in rows:
+            update(pid, _epoch(ts), temp, g, bool(door), lat, lon)
+
+    # --- Consultas ---
+
+    def summary(self):
+        recent = sorted(self.recent_recoveries)
+        return {
+            "envios": len(self.shipments),
+            "envios_olvidados": self.evicted_shipments,
+            "lecturas": self.readings,
+            "lecturas_fuera_de_orden": self.out_of_order,
+            "incidencias": self.incidents,
+            "incidencias_abiertas": self.open_incidents,
+            "tiempo_fuera_de_rango_s": round(self.out_of_range_s, 3),
+            "recuperaciones": self.recoveries,
+            "recuperacion_media_s": round(self.recovery_total_s / self.recoveries, 3) if self.recoveries else None,
+            "recuperacion_p50_s": _percentile(recent, 0.50),
+            "recuperacion_p95_s": _percentile(recent, 0.95),
+            "recuperacion_max_s": round(self.recovery_max_s, 3) if self.recoveries else None,
+        }
+
+    def shipment(self, package_id):
+        s = self.shipments.get(package_id)
+        return None if s is None else _shipment_dict(package_id, s)
+
+    def top_shipments(self, limit=50, order="tiempo_fuera_de_rango_s"):
+        key = _SHIPMENT_ORDER[order]
+        top = heapq.nlargest(limit, self.shipments.items(), key=lambda item: key(item[1]))
+        return [_shipment_dict(pid, s) for pid, s in top]
+
+    def top_segments(self, limit=50):
+        top = heapq.nlargest(limit, self.segments.items(), key=lambda item: sum(item[1]))
+        return [{"tramo": seg, "incidencias": sum(c), **dict(zip(INCIDENT_KINDS, c))} for seg, c in top]
+
+
+_SHIPMENT_ORDER = {
+    "tiempo_fuera_de_rango_s": lambda s: s.out_of_range_s,
+    "incidencias": lambda s: s.incidents,
+    "temp_max": lambda s: s.temp_max,
+}
+SHIPMENT_ORDERS = tuple(_SHIPMENT_ORDER)
+
+
+def _shipment_dict(package_id, s):
+    recovered = s.incidents - (1 if s.incident_start is not None else 0)
+    return {
+        "id_paquete": package_id,
+        "lecturas": s.readings,
+        "tiempo_fuera_de_rango_s": round(s.out_of_range_s, 3),
+        "incidencias": s.incidents,
+        "en_incidencia": s.incident_start is not None,
+        "recuperacion_media_s": round(s.recovery_s / recovered, 3) if recovered else None,
+        "temp_max": s.temp_max if s.readings else None,
+    }
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+
+
+class TtlCache:
+    """Respuestas JSON ya serializadas, con ETag, válidas durante `ttl` segundos."""
+
+    def __init__(self, ttl=KPI_CACHE_TTL, max_entries=KPI_CACHE_ENTRIES, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = {}  # clave -> (expira, etag, cuerpo)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        """(etag, cuerpo) de `key`; `compute()` solo se llama si la entrada ha caducado."""
+        now = self.clock()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[1], entry[2]
+        self.misses += 1
+        if entry is None and len(self._entries) >= self.max_entries:
+            self._prune(now)
+        body = msgspec.json.encode(compute())
+        # ETag del contenido: si los datos no han cambiado, el cliente sigue recibiendo 304 tras caducar
+        etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        self._entries[key] = (now + self.ttl, etag, body)
+        return etag, body
+
+    def clear(self):
+        self._entries.clear()
+
+    def _prune(self, now):
+        for key in [k for k, e in self._entries.items() if e[0] <= now]:
+            del self._entries[key]
+        if len(self._entries) >= self.max_entries:
+            self._entries.clear()
+
+
+def etag_matches(if_none_match, etag):
+    """Cabecera If-None-Match (puede traer varias etiquetas, débiles o `*`) frente al ETag actual."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+async def rebuild(backend, kpi_store):
+    """Recorre la tabla una sola vez (arranque) para recuperar el estado. Devuelve las filas leídas."""
+    rows = 0
+    async for page in backend.scan_telemetry():
+        kpi_store.add_rows(page)
+        rows += len(page)
+    return rows
+
+
+# Estado del proceso de la API (lo reconstruye el lifespan de la app)
+store = KpiStore()
+cache = TtlCache()
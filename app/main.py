@@ -1,7 +1,35 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from app.routers import health, predict
+from app import db, history, kpis
+from app.routers import health, predict, ingest, metrics, kpis as kpis_router, history as history_router
+from observability.logs import get_logger
+
+log = get_logger("api")
+
+# Abrir el pool de BD al arrancar (y recuperar los KPIs con una pasada por la tabla y
+# la última lectura de cada paquete por el índice) y cerrarlo al parar
+@asynccontextmanager
+async def lifespan(app):
+    backend = await db.init_backend()
+    if kpis.KPI_ENABLED:
+        rows = await kpis.rebuild(backend, kpis.store)
+        log.info("KPIs reconstruidos a partir de %d lecturas", rows)
+    pruner = None
+    if history.LATEST_ENABLED:
+        packages = await history.rebuild_latest(backend, history.latest)
+        log.info("Caché de últimas lecturas: %d paquetes", packages)
+        pruner = asyncio.create_task(history.prune_latest(history.latest))
+    yield
+    if pruner is not None:
+        pruner.cancel()
+    await db.close_backend()
+
+app = FastAPI(title="ML Prediction API", version="0.1.0", lifespan=lifespan)
 
-app = FastAPI(title="ML Prediction API", version="0.1.0")
+# Peticiones y latencia por ruta (expuestas en /metrics)
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Endpoint raíz
 @app.get("/")
@@ -11,3 +39,7 @@ def root():
 # Incluir routers
 app.include_router(health.router)
 app.include_router(predict.router)
+app.include_router(ingest.router)
+app.include_router(metrics.router)
+app.include_router(kpis_router.router)
+app.include_router(history_router.router)
@@ -0,0 +1,55 @@
+import time
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
+from app import history
+from app.db import get_backend
+from schemas.history_output import HistoryReading, LatestReading
+
+router = APIRouter()
+
+# Respuestas NDJSON (una lectura por línea) en streaming: documentadas con el modelo de cada línea
+_NDJSON_DOC = {200: {"content": {history.NDJSON: {}}}}
+
+def _require_latest():
+    if not history.LATEST_ENABLED:
+        raise HTTPException(status_code=503, detail="Caché de últimas lecturas desactivada (LATEST_ENABLED=0)")
+
+# Declarada antes que las rutas /telemetry/{id_paquete}/...
+@router.get("/telemetry/latest", response_model=LatestReading, responses=_NDJSON_DOC, tags=["historico"])
+async def latest_readings(activos_s: float = Query(history.LATEST_ACTIVE_S, gt=0)):
+    """Última lectura (posición incluida) de cada paquete con lecturas en los últimos `activos_s` segundos."""
+    _require_latest()
+    rows = history.latest.active(time.time() - activos_s)
+    return StreamingResponse(history.stream_latest(rows), media_type=history.NDJSON)
+
+@router.get("/telemetry/{id_paquete}/latest", response_model=LatestReading, tags=["historico"])
+async def latest_reading(id_paquete: str):
+    _require_latest()
+    reading = history.latest.get(id_paquete)
+    if reading is None:
+        raise HTTPException(status_code=404, detail=f"Paquete sin lecturas recientes: {id_paquete}")
+    return Response(history.encode(reading), media_type="application/json")
+
+@router.get("/telemetry/{id_paquete}/readings", response_model=HistoryReading, responses=_NDJSON_DOC,
+            tags=["historico"])
+async def package_readings(id_paquete: str, desde: datetime, hasta: datetime,
+                           limit: int = Query(history.HISTORY_MAX_ROWS, ge=1, le=history.HISTORY_MAX_ROWS),
+                           cursor: Optional[str] = None):
+    """Lecturas del paquete en [desde, hasta] en orden temporal, como NDJSON.
+
+    Para seguir tras `limit` filas, repetir la petición con `cursor` = `<timestamp_utc>,<id>` de la última línea.
+    """
+    desde, hasta = history.utc(desde), history.utc(hasta)
+    if desde > hasta:
+        raise HTTPException(status_code=422, detail="desde debe ser anterior a hasta")
+    after = (desde, 0)
+    if cursor:
+        try:
+            after = history.parse_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"Cursor inválido: {e}") from None
+    stream = history.stream_range(get_backend(), id_paquete, after, hasta, limit)
+    return StreamingResponse(stream, media_type=history.NDJSON)
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, HTTPException, Request
+from app import history, kpis
+from app.db import get_backend
+from app.routers.metrics import ROWS_INGESTED
+from schemas import telemetry
+from schemas.ingest_output import IngestOutput
+
+router = APIRouter()
+
+# Límite de filas por petición para no bloquear la API con lotes gigantes
+MAX_BATCH_ROWS = 5000
+
+# El cuerpo se decodifica y valida con el esquema compartido (msgspec) en vez de pydantic
+def _decode(decoder, body):
+    try:
+        return decoder(body)
+    except telemetry.InvalidTelemetry as e:
+        raise HTTPException(status_code=422, detail=f"Telemetría inválida: {e}") from None
+
+@router.post("/ingest", response_model=IngestOutput, tags=["ingest"])
+async def ingest(request: Request):
+    reading = _decode(telemetry.decode_reading, await request.body())
+    await get_backend().insert_many([reading])
+    ROWS_INGESTED.labels("telemetry").inc()
+    if kpis.KPI_ENABLED:
+        kpis.store.add_readings([reading])
+    if history.LATEST_ENABLED:
+        history.latest.add_readings([reading])
+    return IngestOutput(status="ok", inserted=1)
+
+@router.post("/ingest/batch", response_model=IngestOutput, tags=["ingest"])
+async def ingest_batch(request: Request):
+    batch = _decode(telemetry.decode_batch, await request.body())
+    if len(batch) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Lote demasiado grande (máx. {MAX_BATCH_ROWS} filas)")
+    # Todo el lote se inserta de una vez (COPY en PostgreSQL)
+    inserted = await get_backend().insert_many(batch)
+    ROWS_INGESTED.labels("telemetry").inc(inserted)
+    # KPIs incrementales: solo lo que ya está persistido
+    if kpis.KPI_ENABLED:
+        kpis.store.add_readings(batch)
+    if history.LATEST_ENABLED:
+        history.latest.add_readings(batch)
+    return IngestOutput(status="ok", inserted=inserted)
+
+@router.post("/ingest/aggregates", response_model=IngestOutput, tags=["ingest"])
+async def ingest_aggregates(request: Request):
+    # Agregados por ventana de la etapa de downsampling del procesador
+    aggregates = _decode(telemetry.decode_aggregates, await request.body())
+    if len(aggregates) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Lote demasiado grande (máx. {MAX_BATCH_ROWS} filas)")
+    inserted = await get_backend().insert_aggregates(aggregates)
+    ROWS_INGESTED.labels("telemetry_agg").inc(inserted)
+    return IngestOutput(status="ok", inserted=inserted)
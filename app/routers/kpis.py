@@ -0,0 +1,43 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response
+from app import kpis
+from schemas.kpi_output import KpiSummary, SegmentKpiList, ShipmentKpi, ShipmentKpiList
+
+router = APIRouter()
+
+MAX_LIMIT = 1000
+
+# Los endpoints son async a propósito: corren en el event loop, igual que las actualizaciones
+# de la ingesta, así que nunca leen el estado a medio actualizar.
+
+# Respuesta cacheada con ETag: 304 si el dashboard ya tiene esta versión
+def _cached(request, key, compute):
+    if not kpis.KPI_ENABLED:
+        raise HTTPException(status_code=503, detail="KPIs desactivados (KPI_ENABLED=0)")
+    etag, body = kpis.cache.get(key, compute)
+    headers = {"ETag": etag, "Cache-Control": f"max-age={kpis.KPI_CACHE_TTL:g}"}
+    if kpis.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+@router.get("/kpis/summary", response_model=KpiSummary, tags=["kpis"])
+async def kpi_summary(request: Request):
+    return _cached(request, ("summary",), kpis.store.summary)
+
+@router.get("/kpis/shipments", response_model=ShipmentKpiList, tags=["kpis"])
+async def kpi_shipments(request: Request, limit: int = Query(50, ge=1, le=MAX_LIMIT),
+                        order: str = "tiempo_fuera_de_rango_s"):
+    if order not in kpis.SHIPMENT_ORDERS:
+        raise HTTPException(status_code=422, detail=f"order debe ser uno de {list(kpis.SHIPMENT_ORDERS)}")
+    return _cached(request, ("shipments", limit, order),
+                   lambda: {"envios": kpis.store.top_shipments(limit, order)})
+
+@router.get("/kpis/shipments/{id_paquete}", response_model=ShipmentKpi, tags=["kpis"])
+async def kpi_shipment(request: Request, id_paquete: str):
+    if kpis.KPI_ENABLED and id_paquete not in kpis.store.shipments:
+        raise HTTPException(status_code=404, detail=f"Envío sin lecturas: {id_paquete}")
+    return _cached(request, ("shipment", id_paquete), lambda: kpis.store.shipment(id_paquete))
+
+@router.get("/kpis/segments", response_model=SegmentKpiList, tags=["kpis"])
+async def kpi_segments(request: Request, limit: int = Query(50, ge=1, le=MAX_LIMIT)):
+    return _cached(request, ("segments", limit), lambda: {"tramos": kpis.store.top_segments(limit)})
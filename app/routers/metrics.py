@@ -0,0 +1,38 @@
+import time
+
+from fastapi import APIRouter, Response
+from observability import metrics
+
+router = APIRouter()
+
+HTTP_REQUESTS = metrics.Counter("api_requests_total", "Peticiones HTTP atendidas", ["method", "route", "status"])
+HTTP_SECONDS = metrics.Histogram("api_request_seconds", "Duración de las peticiones HTTP", ["method", "route"])
+ROWS_INGESTED = metrics.Counter("api_rows_ingested_total", "Filas insertadas en la BD", ["table"])
+
+# Middleware ASGI puro (sin BaseHTTPMiddleware): no envuelve el cuerpo ni rompe las respuestas en streaming
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Plantilla de la ruta (/ingest/batch), no la URL: cardinalidad acotada
+            route = getattr(scope.get("route"), "path", "sin_ruta")
+            HTTP_SECONDS.labels(scope["method"], route).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(scope["method"], route, str(status[0])).inc()
+
+@router.get("/metrics", tags=["health"])
+def prometheus_metrics():
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,12 +1,178 @@
-from fastapi import APIRouter
+import json
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
 from schemas.input_data import InputData
 from schemas.prediction_output import PredictionOutput
+from schemas.batch_prediction_output import BatchPredictionOutput
 
 router = APIRouter()
 
+# Pesos del modelo de ejemplo (suma ponderada)
+WEIGHT_1 = 0.3
+WEIGHT_2 = 0.7
+FEATURES = ("feature_1", "feature_2")
+
+# Límite de filas de /predict/batch; para más, usar /predict/stream
+MAX_BATCH_ROWS = 200_000
+# Filas que /predict/stream acumula antes de puntuar un bloque
+STREAM_CHUNK_ROWS = 5000
+
+NDJSON = "application/x-ndjson"
+
+
+def score_many(f1, f2):
+    """Puntúa columnas completas en una sola pasada vectorizada."""
+    score = f1 * WEIGHT_1 + f2 * WEIGHT_2
+    label = np.where(score > 0, "Clase A", "Clase B")
+    return score, label, np.abs(score)
+
+
+def _columns_from_rows(rows):
+    try:
+        f1 = np.fromiter((r["feature_1"] for r in rows), dtype=np.float64, count=len(rows))
+        f2 = np.fromiter((r["feature_2"] for r in rows), dtype=np.float64, count=len(rows))
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Fila no válida: {e}") from None
+    return f1, f2
+
+
+def _columns_from_dict(body):
+    try:
+        f1 = np.asarray(body["feature_1"], dtype=np.float64)
+        f2 = np.asarray(body["feature_2"], dtype=np.float64)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Columnas no válidas: {e}") from None
+    if f1.ndim != 1 or f1.shape != f2.shape:
+        raise HTTPException(status_code=422, detail="feature_1 y feature_2 deben ser listas de la misma longitud")
+    return f1, f2
+
+
+def _parse_ndjson_lines(lines, rows=None):
+    # Añade a `rows` línea a línea: si una falla, las filas anteriores ya están en `rows`
+    rows = [] if rows is None else rows
+    try:
+        for line in lines:
+            if line.strip():
+                rows.append(json.loads(line))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"NDJSON no válido: {e}") from None
+    return rows
+
+
 @router.post("/predict", response_model=PredictionOutput, tags=["inference"])
 def make_prediction(data: InputData):
     # Ejemplo simple: suma ponderada simulando inferencia
-    score = (data.feature_1 * 0.3) + (data.feature_2 * 0.7)
+    score = (data.feature_1 * WEIGHT_1) + (data.feature_2 * WEIGHT_2)
     label = "Clase A" if score > 0 else "Clase B"
     return PredictionOutput(prediction=score, label=label, confidence=abs(score))
+
+
+@router.post("/predict/batch", response_model=BatchPredictionOutput, tags=["inference"])
+async def predict_batch(request: Request):
+    """
+    Puntúa muchas filas en una petición.
+
+    Acepta JSON columnar `{"feature_1": [...], "feature_2": [...]}` o, con
+    Content-Type application/x-ndjson, una fila `InputData` por línea.
+    Devuelve las columnas `prediction`, `label` y `confidence` en el mismo orden.
+    """
+    body = await request.body()
+    if request.headers.get("content-type", "").startswith(NDJSON):
+        f1, f2 = _columns_from_rows(_parse_ndjson_lines(body.splitlines()))
+    else:
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"JSON no válido: {e}") from None
+        if isinstance(payload, list):
+            f1, f2 = _columns_from_rows(payload)
+        elif isinstance(payload, dict):
+            f1, f2 = _columns_from_dict(payload)
+        else:
+            raise HTTPException(status_code=422, detail="Se esperaba un objeto columnar o una lista de filas")
+
+    if len(f1) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Lote demasiado grande (máx. {MAX_BATCH_ROWS} filas); usa /predict/stream")
+
+    score, label, confidence = score_many(f1, f2)
+    # Serialización directa: evita validar miles de valores de nuevo con pydantic
+    content = json.dumps({
+        "prediction": score.tolist(),
+        "label": label.tolist(),
+        "confidence": confidence.tolist(),
+    })
+    return Response(content=content, media_type="application/json")
+
+
+def _ndjson_chunk(rows):
+    score, label, confidence = score_many(*_columns_from_rows(rows))
+    return "".join(
+        json.dumps({"prediction": s, "label": l, "confidence": c}) + "\n"
+        for s, l, c in zip(score.tolist(), label.tolist(), confidence.tolist())
+    )
+
+
+def _ndjson_error_tail(rows, error):
+    """Final del stream tras un error: las filas leídas antes de la línea rota y la línea `{"error": ...}`."""
+    tail = json.dumps({"error": error.detail}) + "\n"
+    try:
+        return ((_ndjson_chunk(rows) if rows else "") + tail).encode()
+    except HTTPException:
+        # El bloque pendiente tiene una fila sin las features: no se puntúa nada de él
+        return tail.encode()
+
+
+class _NDJSONPredictStream(Response):
+    """
+    Respuesta que lee el cuerpo de la petición a la vez que escribe la salida.
+
+    StreamingResponse escucha desconexiones con `receive()` en paralelo y se
+    comería los trozos del cuerpo, así que aquí se usa el canal ASGI
+    directamente: cada bloque de STREAM_CHUNK_ROWS filas se puntúa y se envía
+    en cuanto está completo.
+    """
+
+    media_type = NDJSON
+
+    def __init__(self):
+        super().__init__(media_type=NDJSON)
+        del self.headers["content-length"]
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        buffer = b""
+        rows = []
+        more_body = True
+        try:
+            while more_body:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                buffer += message.get("body", b"")
+                more_body = message.get("more_body", False)
+                lines = buffer.split(b"\n")
+                buffer = lines.pop()
+                _parse_ndjson_lines(lines, rows)
+                if len(rows) >= STREAM_CHUNK_ROWS:
+                    await send({"type": "http.response.body", "body": _ndjson_chunk(rows).encode(), "more_body": True})
+                    rows = []
+            _parse_ndjson_lines([buffer], rows)
+            body = _ndjson_chunk(rows).encode() if rows else b""
+        except HTTPException as e:
+            # La respuesta ya empezó: el error va como última línea del stream
+            body = _ndjson_error_tail(rows, e)
+        await send({"type": "http.response.body", "body": body, "more_body": False})
+
+
+@router.post("/predict/stream", tags=["inference"])
+async def predict_stream():
+    """
+    Inferencia en streaming NDJSON: lee una fila `InputData` por línea según
+    llega el cuerpo, puntúa en bloques de STREAM_CHUNK_ROWS y devuelve una
+    `PredictionOutput` por línea, sin cargar la entrada completa en memoria.
+    Una línea no válida corta el stream: se puntúan las filas anteriores y
+    se termina con una línea `{"error": ...}`.
+    """
+    return _NDJSONPredictStream()
@@ -0,0 +1,89 @@
+"""
+Reducción del volumen de escritura con la etapa de agregación por ventanas.
+
+Genera una flota de paquetes (una lectura cada 2 s, con excursiones de
+temperatura ocasionales), la pasa por el motor de reglas del procesador y
+por `WindowAggregator`, y compara las filas que llegarían a la BD con las
+del camino sin agregación. Comprueba además que toda lectura que contribuyó
+a una alerta (racha o alerta activa) se persiste cruda.
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_aggregation --packages 500 --minutes 30
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.common import print_table, synthetic_readings
+from scripts.aggregation import WindowAggregator
+from scripts.processor import DEFAULT_RULES
+from scripts.rules import RuleEngine
+from scripts.state_store import PackageStateStore
+
+
+def fleet_stream(packages, minutes, excursion_prob, excursion_len, seed=7):
+    rnd = random.Random(seed)
+    n = int(minutes * 60 / 2) * packages
+    readings = synthetic_readings(n, num_packages=packages, start=datetime(2025, 1, 1, tzinfo=timezone.utc))
+    left = [0] * packages
+    for i, r in enumerate(readings):
+        p = i % packages
+        if left[p] == 0 and rnd.random() < excursion_prob:
+            left[p] = excursion_len
+        if left[p]:
+            r["temperatura"] = round(r["temperatura"] + 6.0, 2)
+            left[p] -= 1
+    return readings
+
+
+def run(readings, window_s, raw_context):
+    store = PackageStateStore()
+    engine = RuleEngine(DEFAULT_RULES, store)
+    windows, raw = [], []
+    agg = WindowAggregator(store, windows.append, raw.append, window_s=window_s, raw_context=raw_context)
+    contributing = []
+    t0 = time.perf_counter()
+    for data in readings:
+        slot = store.touch(data["id_paquete"])
+        engine.evaluate(data, slot)
+        anomalous = engine.in_alert(slot)
+        if anomalous:
+            contributing.append(data)
+        agg.add(data, slot, anomalous)
+    agg.flush_all()
+    elapsed = time.perf_counter() - t0
+    raw_ids = {id(d) for d in raw}
+    missing = sum(id(d) not in raw_ids for d in contributing)
+    return windows, raw, contributing, missing, elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Filas persistidas con y sin agregación por ventanas")
+    ap.add_argument("--packages", type=int, default=500)
+    ap.add_argument("--minutes", type=float, default=30)
+    ap.add_argument("--window", type=float, default=60)
+    ap.add_argument("--raw-context", type=int, default=3)
+    ap.add_argument("--excursion-prob", type=float, default=0.002)
+    ap.add_argument("--excursion-len", type=int, default=5)
+    args = ap.parse_args()
+
+    readings = fleet_stream(args.packages, args.minutes, args.excursion_prob, args.excursion_len)
+    windows, raw, contributing, missing, elapsed = run(readings, args.window, args.raw_context)
+    persisted = len(windows) + len(raw)
+    results = [
+        {"mode": "sin agregación", "rows": len(readings), "aggregates": 0, "raw": len(readings), "reduction": "x1.0"},
+        {"mode": f"ventanas de {args.window:.0f} s", "rows": persisted, "aggregates": len(windows),
+         "raw": len(raw), "reduction": f"x{len(readings) / persisted:.1f}"},
+    ]
+    print(f"\n{args.packages} paquetes, {args.minutes:.0f} min, {len(readings)} lecturas\n")
+    print_table(results, ["mode", "rows", "aggregates", "raw", "reduction"])
+    print(f"\nLecturas que contribuyeron a alertas: {len(contributing)}; no persistidas: {missing}")
+    print(f"Coste de la etapa (reglas + agregación): {elapsed / len(readings) * 1e6:.2f} us/lectura")
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Prueba de carga de ráfagas de alertas contra un webhook de Discord falso.
+
+Simula un incidente que afecta a muchos paquetes a la vez (p. ej. se abren
+las puertas de todo un almacén) y compara:
+- envío en línea, una petición por alerta e ignorando los 429 (comportamiento anterior)
+- AlertDispatcher: cola por webhook, agrupación en mensajes multi-embed y token bucket
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_alert_burst --alerts 300
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+from benchmarks.common import print_table
+from benchmarks.stub_servers import FakeDiscordWebhook
+from scripts import http_client
+from scripts.alert_dispatcher import AlertDispatcher
+
+
+def alert_payload(i):
+    return {
+        "content": "@here",
+        "embeds": [{
+            "title": f"🚪 ALERTA OPERACIONAL DE PUERTA: PKG-{i:05d}",
+            "description": "Razón: **Puerta Abierta por Manipulación**.\nRevisión inmediata requerida.",
+            "color": 16776960,
+        }],
+    }
+
+
+def run_inline(url, n):
+    t0 = time.perf_counter()
+    blocked = 0.0
+    delivered = 0
+    for i in range(n):
+        s = time.perf_counter()
+        r = http_client.post(url, json=alert_payload(i), timeout=10)
+        blocked += time.perf_counter() - s
+        if r.status_code < 300:
+            delivered += 1
+    return delivered, time.perf_counter() - t0, blocked
+
+
+def run_dispatcher(url, n, window):
+    dispatcher = AlertDispatcher(coalesce_window=window, queue_size=n)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        t0 = time.perf_counter()
+        for i in range(n):
+            dispatcher.submit(url, alert_payload(i))
+        blocked = time.perf_counter() - t0
+        dispatcher.close(timeout=600)
+        elapsed = time.perf_counter() - t0
+    return dispatcher.stats["alerts_sent"], elapsed, blocked
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Ráfaga de alertas contra un webhook de Discord falso")
+    ap.add_argument("--alerts", type=int, default=300)
+    ap.add_argument("--window", type=float, default=0.5, help="Ventana de agrupación del dispatcher (s)")
+    ap.add_argument("--limit", type=int, default=5, help="Peticiones permitidas por ventana en el webhook falso")
+    ap.add_argument("--limit-window", type=float, default=2.0)
+    args = ap.parse_args()
+
+    fake = FakeDiscordWebhook(limit=args.limit, window_s=args.limit_window).start()
+    url = f"{fake.url}/api/webhooks/1/token"
+    results = []
+
+    delivered, elapsed, blocked = run_inline(url, args.alerts)
+    results.append({"mode": "en línea (sin cola)", "alerts": args.alerts, "delivered": delivered,
+                    "http_messages": len(fake.messages), "http_429": fake.rejected,
+                    "seconds": round(elapsed, 2), "blocked_ms": blocked * 1000})
+
+    fake.reset()
+    delivered, elapsed, blocked = run_dispatcher(url, args.alerts, args.window)
+    results.append({"mode": "AlertDispatcher", "alerts": args.alerts, "delivered": delivered,
+                    "http_messages": len(fake.messages), "http_429": fake.rejected,
+                    "seconds": round(elapsed, 2), "blocked_ms": blocked * 1000})
+
+    print(f"\nRáfaga de {args.alerts} alertas; webhook limitado a {args.limit} peticiones / {args.limit_window} s\n")
+    print_table(results, ["mode", "alerts", "delivered", "http_messages", "http_429", "seconds", "blocked_ms"])
+    print("\nblocked_ms: tiempo que el camino de los mensajes (callback MQTT) pasa bloqueado enviando alertas.")
+
+    http_client.close_all()
+    fake.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
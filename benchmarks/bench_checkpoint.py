@@ -0,0 +1,131 @@
+"""
+Benchmark de los checkpoints del estado del procesador.
+
+Llena un `PackageStateStore` con las columnas reales (reglas por defecto del
+procesador + agregación por ventanas) para `--packages` paquetes y mide:
+
+- instantánea completa: tiempo bajo el lock (copia), escritura total y tamaño;
+- delta tras actualizar `--active` paquetes (lo habitual cada intervalo);
+- restauración en un almacén nuevo (instantánea + `--deltas` deltas) y que el
+  estado restaurado coincide con el original.
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_checkpoint --packages 10000,100000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from benchmarks.common import print_table
+from scripts.aggregation import AGG_COLUMNS
+from scripts.checkpoint import StateCheckpointer
+from scripts.rules import RuleEngine
+from scripts.state_store import PackageStateStore
+
+
+class TimedLock:
+    """Lock que acumula el tiempo que se mantiene cogido (lo que pagaría el hilo MQTT)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.held = 0.0
+
+    def __enter__(self):
+        self._lock.acquire()
+        self._t0 = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.held += time.perf_counter() - self._t0
+        self._lock.release()
+
+
+def make_store(clock):
+    from scripts.processor import DEFAULT_RULES
+
+    store = PackageStateStore(ttl_seconds=None, max_packages=10**7, columns=AGG_COLUMNS, clock=clock)
+    engine = RuleEngine(DEFAULT_RULES, store, clock=clock)
+    return store, engine
+
+
+def feed(store, engine, package_ids, rnd, now):
+    for pid in package_ids:
+        now[0] += 1e-4
+        slot = store.touch(pid)
+        temp = 9.0 if rnd.random() < 0.2 else 3.0
+        engine.evaluate({"id_paquete": pid, "temperatura": temp, "fuerza_g": 1.0,
+                         "puerta_abierta": rnd.random() < 0.05}, slot)
+
+
+def snapshot(store):
+    # repr: las columnas de posición de la agregación valen NaN por defecto
+    columns = [col for _, col in store.columns()]
+    return {pid: repr((store.last_seen[slot], [col[slot] for col in columns])) for pid, slot in store.items()}
+
+
+def run(num_packages, active, deltas, directory):
+    now = [1_700_000_000.0]
+    clock = lambda: now[0]
+    rnd = random.Random(7)
+    store, engine = make_store(clock)
+    ids = [f"PKG-{i:06d}" for i in range(num_packages)]
+    feed(store, engine, ids, rnd, now)
+    now[0] += 5
+
+    lock = TimedLock()
+    path = os.path.join(directory, f"state-{num_packages}.ckpt")
+    ckpt = StateCheckpointer(store, path, lock, fsync=True)
+    t0 = time.perf_counter()
+    ckpt.checkpoint(full=True)
+    full_s, full_lock = time.perf_counter() - t0, lock.held
+    full_bytes = os.path.getsize(path)
+
+    delta_s = delta_lock = 0.0
+    for _ in range(deltas):
+        now[0] += 5
+        feed(store, engine, rnd.sample(ids, active), rnd, now)
+        for pid in rnd.sample(ids, 10):
+            store.remove(pid)
+        lock.held = 0.0
+        t0 = time.perf_counter()
+        kind = ckpt.checkpoint()
+        assert kind == "delta"
+        delta_s += time.perf_counter() - t0
+        delta_lock += lock.held
+    total_bytes = os.path.getsize(path)
+
+    restored, _ = make_store(clock)
+    t0 = time.perf_counter()
+    count = StateCheckpointer(restored, path, threading.Lock()).restore()
+    restore_s = time.perf_counter() - t0
+    assert count == len(store) and snapshot(restored) == snapshot(store), "estado restaurado distinto"
+    assert [pid for pid, _ in restored.items()] == [pid for pid, _ in store.items()], "orden LRU distinto"
+
+    return {"packages": num_packages, "full_ms": full_s * 1000, "full_lock_ms": full_lock * 1000,
+            "full_kib": full_bytes / 1024, "delta_ms": delta_s / deltas * 1000,
+            "delta_lock_ms": delta_lock / deltas * 1000,
+            "delta_kib": (total_bytes - full_bytes) / deltas / 1024, "restore_ms": restore_s * 1000}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Checkpoint y restauración del estado del procesador")
+    ap.add_argument("--packages", default="10000,100000")
+    ap.add_argument("--active", type=int, default=2000, help="Paquetes con mensajes entre dos deltas")
+    ap.add_argument("--deltas", type=int, default=20)
+    args = ap.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in (int(p) for p in args.packages.split(",")):
+            results.append(run(n, min(args.active, n // 4), args.deltas, tmp))
+
+    print(f"\nColumnas: reglas por defecto + agregación; {args.deltas} deltas con fsync\n")
+    print_table(results, ["packages", "full_ms", "full_lock_ms", "full_kib", "delta_ms", "delta_lock_ms",
+                          "delta_kib", "restore_ms"])
+
+
+if __name__ == "__main__":
+    main()
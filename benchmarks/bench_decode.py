@@ -0,0 +1,101 @@
+"""
+Coste de decodificar y validar una lectura: camino anterior frente al
+esquema compartido de schemas/telemetry.py (msgspec).
+
+- procesador: json.loads + data.get(...) con valores por defecto (sin
+  validación real) frente a telemetry.decode_message (dict validado)
+- API: modelo pydantic TelemetryData (por lectura y en lote) frente a
+  telemetry.decode_reading / decode_batch
+- rechazo de un mensaje sin `temperatura`
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_decode --messages 100000
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from benchmarks.common import print_table, synthetic_readings
+from schemas import telemetry
+
+
+class TelemetryData(BaseModel):
+    """Modelo pydantic que usaba la API antes del esquema compartido."""
+    id_paquete: str
+    timestamp_utc: datetime
+    temperatura: float
+    fuerza_g: float
+    puerta_abierta: bool
+    latitud: Optional[float] = None
+    longitud: Optional[float] = None
+
+
+def old_processor_decode(payload):
+    data = json.loads(payload.decode("utf-8"))
+    data.get("temperatura", 99.9), data.get("fuerza_g", 0.0)
+    data.get("puerta_abierta", False), data.get("id_paquete", "N/A")
+    return data
+
+
+def timed(fn, items):
+    t0 = time.perf_counter()
+    for item in items:
+        fn(item)
+    return time.perf_counter() - t0
+
+
+def rejecting(fn, errors):
+    def wrapper(payload):
+        try:
+            fn(payload)
+        except errors:
+            pass
+    return wrapper
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Decodificación + validación de telemetría")
+    ap.add_argument("--messages", type=int, default=100000)
+    ap.add_argument("--batch-size", type=int, default=1000)
+    args = ap.parse_args()
+
+    readings = synthetic_readings(args.messages)
+    payloads = [json.dumps(r).encode() for r in readings]
+    batches = [json.dumps(readings[i:i + args.batch_size]).encode()
+               for i in range(0, len(readings), args.batch_size)]
+    broken = [json.dumps({k: v for k, v in r.items() if k != "temperatura"}).encode() for r in readings]
+    single_adapter = TypeAdapter(TelemetryData)
+    batch_adapter = TypeAdapter(List[TelemetryData])
+
+    cases = [
+        ("procesador", "json.loads + .get (anterior)", old_processor_decode, payloads),
+        ("procesador", "telemetry.decode_message", telemetry.decode_message, payloads),
+        ("API lectura", "pydantic TelemetryData (anterior)", single_adapter.validate_json, payloads),
+        ("API lectura", "telemetry.decode_reading", telemetry.decode_reading, payloads),
+        ("API lote", "pydantic List[TelemetryData] (anterior)", batch_adapter.validate_json, batches),
+        ("API lote", "telemetry.decode_batch", telemetry.decode_batch, batches),
+        ("rechazo", "pydantic TelemetryData (anterior)",
+         rejecting(single_adapter.validate_json, ValidationError), broken),
+        ("rechazo", "telemetry.decode_reading",
+         rejecting(telemetry.decode_reading, telemetry.InvalidTelemetry), broken),
+    ]
+    results = []
+    for path, mode, fn, items in cases:
+        elapsed = timed(fn, items)
+        results.append({"path": path, "mode": mode, "msgs_per_s": args.messages / elapsed,
+                        "ns_per_msg": elapsed / args.messages * 1e9})
+
+    print(f"\nDecodificación + validación, {args.messages} lecturas (lotes de {args.batch_size})\n")
+    print_table(results, ["path", "mode", "msgs_per_s", "ns_per_msg"])
+    print("\nNota: el camino anterior del procesador no valida nada (una temperatura ausente pasaba a 99.9).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Benchmark: evaluación vectorizada de la rejilla de umbrales frente a la regla
+fila a fila, sobre lecturas etiquetadas sintéticas.
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_evaluate_rules --rows 2000000
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.evaluate_rules import engine_predictions, grid_search, prepare, run_lengths
+
+
+def synthetic_labels(rows, packages, seed):
+    rng = np.random.default_rng(seed)
+    per_pkg = rows // packages
+    temp = 3.0 + rng.normal(0, 0.4, rows)
+    # Excursiones sostenidas (incidentes reales) y picos aislados
+    incident = np.zeros(rows, dtype=bool)
+    starts = rng.choice(rows, size=rows // 500, replace=False)
+    for s in starts:
+        incident[s:s + rng.integers(3, 30)] = True
+    temp[incident] += rng.uniform(4.0, 8.0, incident.sum())
+    spikes = rng.random(rows) < 0.03
+    temp[spikes] += rng.uniform(1.5, 6.0, spikes.sum())
+    return pd.DataFrame({
+        "id_paquete": np.repeat([f"PKG-{i:05d}" for i in range(packages)], per_pkg + 1)[:rows],
+        "timestamp_utc": pd.Timestamp("2025-01-01", tz="UTC") + pd.to_timedelta(np.tile(np.arange(per_pkg + 1) * 2, packages)[:rows], unit="s"),
+        "temperatura": temp.round(2),
+        "fuerza_g": (1.0 + rng.normal(0, 0.05, rows) + (rng.random(rows) < 0.001) * 2.0).round(3),
+        "label": incident.astype(int),
+    })
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark del evaluador de reglas vectorizado")
+    ap.add_argument("--rows", type=int, default=2_000_000)
+    ap.add_argument("--packages", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--stream-rows", type=int, default=200_000, help="Filas para medir la versión fila a fila")
+    args = ap.parse_args()
+
+    df = synthetic_labels(args.rows, args.packages, args.seed)
+    temps = [float(t) for t in np.arange(5.0, 10.01, 0.5)]
+    gforces = [1.5, 2.0, 2.5, 3.0]
+    ns = list(range(1, 11))
+
+    t0 = time.perf_counter()
+    data = prepare(df)
+    t1 = time.perf_counter()
+    res = grid_search(data, temps, gforces, ns)
+    t2 = time.perf_counter()
+    print(f"{args.rows:,} lecturas, {len(res)} combinaciones (T×G×N = {len(temps)}×{len(gforces)}×{len(ns)})")
+    print(f"  Preparación (factorize + orden): {t1 - t0:.2f} s")
+    print(f"  Rejilla completa vectorizada:    {t2 - t1:.2f} s  "
+          f"({args.rows * len(temps) * len(gforces) / (t2 - t1) / 1e6:,.1f} M lecturas×(T,G)/s)")
+
+    # Motor de reglas del procesador, fila a fila, sobre un subconjunto y para una sola combinación
+    sub = {k: v[:args.stream_rows] for k, v in data.items() if k != "dropped"}
+    t0 = time.perf_counter()
+    ref = engine_predictions(sub, 8.0, 2.5, 3)
+    t1 = time.perf_counter()
+    vec = run_lengths((sub["temp"] > 8.0) | (sub["g"] > 2.5), sub["group_start"]) >= 3
+    t2 = time.perf_counter()
+    assert np.array_equal(ref, vec)
+    print(f"  Una combinación, {args.stream_rows:,} filas: fila a fila {t1 - t0:.3f} s, "
+          f"vectorizado {t2 - t1:.4f} s ({(t1 - t0) / (t2 - t1):,.0f}×) — resultados idénticos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
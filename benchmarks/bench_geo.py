@@ -0,0 +1,139 @@
+"""
+Benchmark de la detección geoespacial: rejilla indexada frente a fuerza bruta.
+
+Genera una flota sintética sobre la Península (rutas como caminos aleatorios
+con `--vertices` waypoints, geocercas circulares y poligonales) y comprueba
+cada lectura contra su ruta y contra las zonas:
+
+- fuerza bruta: distancia a todos los tramos de la ruta + todas las zonas;
+- `SpatialIndex`: solo las piezas y zonas de la celda de la lectura.
+
+Verifica que ambos dan el mismo resultado (fuera del corredor / zonas).
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_geo --routes 100,2000 --zones 100,5000
+"""
+
+import argparse
+import math
+import random
+import time
+
+from benchmarks.common import print_table
+from scripts.geo import M_PER_DEG_LAT, M_PER_DEG_LON, Route, SpatialIndex, Zone
+
+
+def make_routes(n, vertices, rnd):
+    routes = []
+    for i in range(n):
+        lat, lon = rnd.uniform(37.5, 43.0), rnd.uniform(-8.5, -1.5)
+        heading = rnd.uniform(0, 2 * math.pi)
+        points = [(lat, lon)]
+        for _ in range(vertices - 1):
+            heading += rnd.uniform(-0.4, 0.4)
+            step = rnd.uniform(0.02, 0.08)
+            lat, lon = lat + step * math.sin(heading), lon + step * math.cos(heading)
+            points.append((lat, lon))
+        routes.append(Route(f"ruta-{i}", points, corridor_m=2000))
+    return routes
+
+
+def make_zones(n, rnd):
+    zones = []
+    for i in range(n):
+        lat, lon = rnd.uniform(37.5, 43.0), rnd.uniform(-8.5, -1.5)
+        if i % 2:
+            zones.append(Zone(f"zona-{i}", "depot", center=(lat, lon), radius_m=rnd.uniform(300, 3000)))
+        else:
+            d = rnd.uniform(0.005, 0.03)
+            zones.append(Zone(f"zona-{i}", "restricted",
+                              polygon=[(lat, lon), (lat, lon + d), (lat + d, lon + d * 1.5), (lat + d, lon)]))
+    return zones
+
+
+def make_readings(n, routes, rnd):
+    readings = []
+    for _ in range(n):
+        route_id = rnd.randrange(len(routes))
+        pts = routes[route_id].points
+        k = rnd.randrange(len(pts) - 1)
+        t = rnd.random()
+        lat = pts[k][0] + (pts[k + 1][0] - pts[k][0]) * t
+        lon = pts[k][1] + (pts[k + 1][1] - pts[k][1]) * t
+        jitter = 0.1 if rnd.random() < 0.05 else 0.01  # 5 % de desvíos claros
+        readings.append((route_id, lat + rnd.uniform(-jitter, jitter), lon + rnd.uniform(-jitter, jitter)))
+    return readings
+
+
+def brute_distance(route, lat, lon):
+    kx = M_PER_DEG_LON * math.cos(math.radians(lat))
+    best = math.inf
+    for (lat0, lon0), (lat1, lon1) in zip(route.points, route.points[1:]):
+        ax, ay = (lon0 - lon) * kx, (lat0 - lat) * M_PER_DEG_LAT
+        dx, dy = (lon1 - lon) * kx - ax, (lat1 - lat) * M_PER_DEG_LAT - ay
+        den = dx * dx + dy * dy
+        t = 0.0 if den == 0 else min(1.0, max(0.0, -(ax * dx + ay * dy) / den))
+        best = min(best, math.hypot(ax + t * dx, ay + t * dy))
+    return best
+
+
+def run_brute(routes, zones, readings):
+    out = []
+    t0 = time.perf_counter()
+    for route_id, lat, lon in readings:
+        route = routes[route_id]
+        off = brute_distance(route, lat, lon) > route.corridor_m
+        out.append((off, tuple(z for z, zone in enumerate(zones) if zone.contains(lat, lon))))
+    return time.perf_counter() - t0, out
+
+
+def run_indexed(index, readings):
+    out = []
+    t0 = time.perf_counter()
+    for route_id, lat, lon in readings:
+        d = index.route_distance(route_id, lat, lon)
+        out.append((d is None or d > index.routes[route_id].corridor_m, index.zones_at(lat, lon)))
+    return time.perf_counter() - t0, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Rejilla geoespacial frente a fuerza bruta")
+    ap.add_argument("--routes", default="100,2000")
+    ap.add_argument("--zones", default="100,5000")
+    ap.add_argument("--vertices", type=int, default=150)
+    ap.add_argument("--readings", type=int, default=20000)
+    ap.add_argument("--cell", type=float, default=0.05)
+    args = ap.parse_args()
+
+    results = []
+    for num_routes, num_zones in zip((int(r) for r in args.routes.split(",")),
+                                     (int(z) for z in args.zones.split(","))):
+        rnd = random.Random(7)
+        routes = make_routes(num_routes, args.vertices, rnd)
+        zones = make_zones(num_zones, rnd)
+        readings = make_readings(args.readings, routes, rnd)
+
+        t0 = time.perf_counter()
+        index = SpatialIndex(routes, zones, args.cell)
+        build = time.perf_counter() - t0
+
+        sample = readings[:max(1, len(readings) // 10)]  # la fuerza bruta es lenta: una muestra
+        brute_s, brute_out = run_brute(routes, zones, sample)
+        indexed_s, indexed_out = run_indexed(index, readings)
+        mismatches = sum(a != b for a, b in zip(brute_out, indexed_out))
+        off = sum(o for o, _ in indexed_out)
+
+        for mode, elapsed, n in (("fuerza bruta", brute_s, len(sample)), ("rejilla", indexed_s, len(readings))):
+            results.append({"mode": mode, "routes": num_routes, "zones": num_zones,
+                            "readings_per_s": n / elapsed, "us_per_reading": elapsed / n * 1e6,
+                            "build_s": build if mode == "rejilla" else None,
+                            "mismatches": mismatches if mode == "rejilla" else None,
+                            "off_route": off if mode == "rejilla" else None})
+
+    print(f"\n{args.vertices} waypoints por ruta, corredor 2 km, celda {args.cell}°\n")
+    print_table(results, ["mode", "routes", "zones", "readings_per_s", "us_per_reading",
+                          "build_s", "mismatches", "off_route"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Benchmark de las consultas históricas de telemetría (app/history.py).
+
+Llena una tabla telemetry en SQLite con trazas de `TraceGenerator` (o
+reutiliza la de `--db`) y mide:
+
+- rango de un paquete (ventana de `--window-s`) por el índice
+  (id_paquete, timestamp_utc, id): latencia p50/p95 de la primera página y
+  de la respuesta completa;
+- el mismo rango sin índice (`NOT INDEXED`, recorre la tabla; pocas muestras);
+- streaming NDJSON del histórico completo de varios paquetes (filas/s, MiB/s);
+- carga de la caché de últimas lecturas al arrancar (`latest_readings`) y
+  consulta servida desde la caché.
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_history --rows 1000000
+    python -m benchmarks.bench_history --rows 20000000 --packages 20000 --db /tmp/telemetry-20m.db
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from app import db, history
+from benchmarks.common import print_table
+from scripts.trace_generator import DEFAULT_START, TraceGenerator
+
+INTERVAL_S = 2.0
+
+
+def fill(path, num_rows, num_packages):
+    """Inserta las trazas en bloque y crea el índice al final (más rápido que mantenerlo fila a fila)."""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute(db.CREATE_TELEMETRY_TABLE_SQLITE)
+    sql = db._insert_sql("telemetry", db.TELEMETRY_COLUMNS, lambda i: "?")
+    gen = TraceGenerator(num_packages, num_rows // num_packages, interval_s=INTERVAL_S)
+    t0 = time.perf_counter()
+    for df in gen.chunks(max(1, 1_000_000 // num_packages)):
+        # Mismo texto que escribe SQLiteBackend: microsegundos y +00:00
+        df["timestamp_utc"] = df["timestamp_utc"].str.slice(0, -1) + "000+00:00"
+        df["puerta_abierta"] = df["puerta_abierta"].astype(int)
+        conn.executemany(sql, df[list(db.TELEMETRY_COLUMNS)].itertuples(index=False, name=None))
+        conn.commit()
+    insert_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    conn.execute(db.CREATE_TELEMETRY_INDEX)
+    conn.execute(f"PRAGMA user_version = {db.SQLITE_SCHEMA_VERSION}")  # ya en el formato actual: sin migración
+    conn.commit()
+    index_s = time.perf_counter() - t0
+    conn.close()
+    return gen.total_rows, insert_s, index_s
+
+
+def table_shape(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT MAX(id) FROM telemetry").fetchone()[0] or 0
+    packages = [pid for (pid,) in conn.execute("SELECT DISTINCT id_paquete FROM telemetry")]
+    conn.close()
+    return rows, packages
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def random_windows(packages, span_s, window_s, count, rnd):
+    start = datetime.fromisoformat(DEFAULT_START).replace(tzinfo=timezone.utc)
+    for _ in range(count):
+        begin = start + timedelta(seconds=rnd.uniform(0, max(0.0, span_s - window_s)))
+        yield rnd.choice(packages), begin, begin + timedelta(seconds=window_s)
+
+
+async def bench_ranges(backend, windows):
+    first_page, full, rows = [], [], 0
+    for package_id, begin, end in windows:
+        t0 = time.perf_counter()
+        pages = backend.read_range(package_id, (begin, 0), end)
+        page = await anext(pages, [])
+        first_page.append(time.perf_counter() - t0)
+        rows += len(page)
+        async for page in pages:
+            rows += len(page)
+        full.append(time.perf_counter() - t0)
+    return first_page, full, rows
+
+
+def bench_unindexed(path, windows):
+    # Mismo SQL que read_range, pero obligando a SQLite a no usar el índice
+    sql = db._range_sql(lambda i: "?").replace("FROM telemetry", "FROM telemetry NOT INDEXED")
+    conn = sqlite3.connect(path)
+    times = []
+    for package_id, begin, end in windows:
+        t0 = time.perf_counter()
+        conn.execute(sql, (package_id, db._sqlite_ts(begin), 0, db._sqlite_ts(end), db.HISTORY_PAGE_ROWS)).fetchall()
+        times.append(time.perf_counter() - t0)
+    conn.close()
+    return times
+
+
+async def bench_stream(backend, packages):
+    start = datetime.fromisoformat(DEFAULT_START).replace(tzinfo=timezone.utc)
+    end = datetime(9999, 1, 1, tzinfo=timezone.utc)
+    nbytes = rows = 0
+    t0 = time.perf_counter()
+    for package_id in packages:
+        async for chunk in history.stream_range(backend, package_id, (start, 0), end, history.HISTORY_MAX_ROWS):
+            nbytes += len(chunk)
+            rows += chunk.count(b"\n")
+    return rows, nbytes, time.perf_counter() - t0
+
+
+async def run(args, path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        total, insert_s, index_s = fill(path, args.rows, args.packages)
+        print(f"Tabla llena: {total:,} filas en {insert_s:.1f} s; índice en {index_s:.1f} s")
+    total, packages = table_shape(path)
+    span_s = total / len(packages) * INTERVAL_S
+    rnd = random.Random(11)
+    backend = db.SQLiteBackend(path)
+    await backend.init()
+
+    results = []
+    windows = list(random_windows(packages, span_s, args.window_s, args.queries, rnd))
+    first_page, full, rows = await bench_ranges(backend, windows)
+    results.append({"test": f"rango {args.window_s:.0f} s (índice)", "queries": len(windows),
+                    "p50_ms": statistics.median(full) * 1000, "p95_ms": percentile(full, 0.95) * 1000,
+                    "first_page_p50_ms": statistics.median(first_page) * 1000, "rows": rows / len(windows)})
+
+    scans = bench_unindexed(path, windows[:args.scan_queries])
+    results.append({"test": f"rango {args.window_s:.0f} s (sin índice)", "queries": len(scans),
+                    "p50_ms": statistics.median(scans) * 1000, "p95_ms": percentile(scans, 0.95) * 1000})
+
+    rows, nbytes, elapsed = await bench_stream(backend, rnd.sample(packages, min(args.stream_packages, len(packages))))
+    results.append({"test": f"streaming NDJSON ({args.stream_packages} paquetes)", "rows": rows,
+                    "rows_per_s": rows / elapsed, "mib_per_s": nbytes / elapsed / 2**20})
+
+    cache = history.LastValueCache()
+    since = datetime.fromisoformat(DEFAULT_START).replace(tzinfo=timezone.utc)
+    t0 = time.perf_counter()
+    cache.add_rows(await backend.latest_readings(since))
+    rebuild_s = time.perf_counter() - t0
+    results.append({"test": "carga caché últimas lecturas", "queries": 1, "p50_ms": rebuild_s * 1000,
+                    "rows": len(cache)})
+
+    t0 = time.perf_counter()
+    for package_id in packages:
+        history.encode(cache.get(package_id))
+    per_get = (time.perf_counter() - t0) / len(packages)
+    t0 = time.perf_counter()
+    served = sum([len(c) async for c in history.stream_latest(cache.active(0))])
+    elapsed = time.perf_counter() - t0
+    results.append({"test": "última lectura desde caché", "queries": len(packages), "us_per_query": per_get * 1e6})
+    results.append({"test": "todos los activos desde caché", "queries": 1, "p50_ms": elapsed * 1000,
+                    "rows": len(cache), "mib_per_s": served / 2**20 / elapsed})
+    await backend.close()
+
+    print(f"\n{total:,} filas, {len(packages):,} paquetes (SQLite {sqlite3.sqlite_version}); "
+          f"páginas de {db.HISTORY_PAGE_ROWS} filas\n")
+    print_table(results, ["test", "queries", "p50_ms", "p95_ms", "first_page_p50_ms", "us_per_query", "rows",
+                          "rows_per_s", "mib_per_s"])
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Consultas históricas de telemetría sobre SQLite")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--packages", type=int, default=2000)
+    ap.add_argument("--db", default="", help="Fichero SQLite a reutilizar (se llena si no existe)")
+    ap.add_argument("--window-s", type=float, default=600.0, help="Duración del rango consultado")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--scan-queries", type=int, default=5, help="Consultas sin índice (recorren la tabla)")
+    ap.add_argument("--stream-packages", type=int, default=20)
+    args = ap.parse_args()
+
+    if args.db:
+        asyncio.run(run(args, args.db))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(args, os.path.join(tmp, "telemetry.db")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Microbenchmark: latencia por petición con `requests.post` (conexión nueva
+cada vez) frente al cliente compartido `scripts.http_client` (keep-alive).
+
+Por defecto usa un servidor stub local; con --url se puede medir contra otro
+destino (por ejemplo un endpoint HTTPS, donde además se ahorra el handshake TLS).
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_http_pool --requests 2000
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+import requests
+
+from benchmarks.common import print_table
+from benchmarks.stub_servers import StubIngestServer
+from scripts import http_client
+
+PAYLOAD = {
+    "id_paquete": "PKG-BENCH",
+    "timestamp_utc": "2025-01-01T00:00:00+00:00",
+    "temperatura": 3.2,
+    "fuerza_g": 1.01,
+    "puerta_abierta": False,
+    "latitud": 42.0,
+    "longitud": -7.0,
+}
+
+
+def measure(name, post, url, n):
+    latencies = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        r = post(url, json=PAYLOAD, timeout=5)
+        r.raise_for_status()
+        latencies.append((time.perf_counter() - t0) * 1e6)
+    latencies.sort()
+    return {
+        "client": name,
+        "requests": n,
+        "mean_us": statistics.fmean(latencies),
+        "p50_us": latencies[len(latencies) // 2],
+        "p99_us": latencies[int(len(latencies) * 0.99) - 1],
+        "req_per_s": n / (sum(latencies) / 1e6),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Latencia por petición: requests.post vs. pool keep-alive")
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--url", default=None, help="Destino alternativo (por defecto, stub local)")
+    args = ap.parse_args()
+
+    stub = None
+    if args.url:
+        url = args.url
+    else:
+        stub = StubIngestServer().start()
+        url = f"{stub.url}/ingest"
+
+    # Calentamiento: resolución DNS y primera conexión del pool
+    http_client.post(url, json=PAYLOAD, timeout=5)
+
+    results = [
+        measure("requests.post (sin pool)", requests.post, url, args.requests),
+        measure("http_client (keep-alive)", http_client.post, url, args.requests),
+    ]
+    print(f"\n{args.requests} POST secuenciales a {url} (HTTP/2: {http_client.USE_HTTP2})\n")
+    print_table(results, ["client", "requests", "mean_us", "p50_us", "p99_us", "req_per_s"])
+    saving = results[0]["mean_us"] - results[1]["mean_us"]
+    print(f"\nAhorro medio por petición: {saving:,.0f} µs ({saving / results[0]['mean_us']:.0%})")
+
+    http_client.close_all()
+    if stub is not None:
+        stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Benchmark de carga de la API de ingesta (inserciones/s sostenidas).
+
+Arranca `uvicorn app.main:app` en un subproceso con el backend indicado y la
+bombardea durante `--duration` segundos con `--concurrency` clientes, para
+cada tamaño de lote (1 = POST /ingest, >1 = POST /ingest/batch).
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_ingest_api --backend sqlite --batch-sizes 1,100,1000
+    DB_HOST=localhost DB_USER=... python -m benchmarks.bench_ingest_api --backend postgres
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.common import print_table, synthetic_readings
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_healthy(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("La API no arrancó a tiempo")
+
+
+def load(url, batch_size, concurrency, duration, readings):
+    if batch_size == 1:
+        endpoint, bodies = f"{url}/ingest", [json.dumps(r) for r in readings[:1000]]
+    else:
+        endpoint = f"{url}/ingest/batch"
+        bodies = [json.dumps(readings[i:i + batch_size]) for i in range(0, len(readings) - batch_size + 1, batch_size)]
+    inserted = [0] * concurrency
+    errors = [0] * concurrency
+    stop_at = time.perf_counter() + duration
+
+    def client(k):
+        session = requests.Session()  # keep-alive por cliente
+        headers = {"Content-Type": "application/json"}
+        i = k
+        while time.perf_counter() < stop_at:
+            r = session.post(endpoint, data=bodies[i % len(bodies)], headers=headers, timeout=30)
+            if r.ok:
+                inserted[k] += r.json()["inserted"]
+            else:
+                errors[k] += 1
+            i += concurrency
+        session.close()
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    return {"batch_size": batch_size, "concurrency": concurrency, "rows": sum(inserted),
+            "errors": sum(errors), "seconds": round(elapsed, 1), "inserts_per_s": sum(inserted) / elapsed}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Carga sostenida sobre /ingest y /ingest/batch")
+    ap.add_argument("--backend", default="sqlite", choices=["sqlite", "memory", "postgres"])
+    ap.add_argument("--batch-sizes", default="1,100,1000")
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--workers", type=int, default=1, help="Procesos de uvicorn")
+    args = ap.parse_args()
+
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    tmpdir = tempfile.mkdtemp(prefix="bench-ingest-")
+    env = dict(os.environ, DB_BACKEND=args.backend, DB_SQLITE_PATH=os.path.join(tmpdir, "telemetry.db"))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        wait_healthy(url)
+        readings = synthetic_readings(20000)
+        results = [load(url, int(b), args.concurrency, args.duration, readings)
+                   for b in args.batch_sizes.split(",")]
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    print(f"\nAPI de ingesta, backend={args.backend}, {args.workers} proceso(s) uvicorn\n")
+    print_table(results, ["batch_size", "concurrency", "rows", "errors", "seconds", "inserts_per_s"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Benchmark: filas/s de ingesta individual frente a micro-lotes.
+
+Envía las mismas lecturas a través del IngestPipeline del procesador con
+distintos tamaños de lote. Por defecto usa una API de ingesta stub local que
+simula el coste de la BD; con --url se mide contra una API real.
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_ingest_batch --rows 20000 --batch-sizes 1,50,200,500
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+from benchmarks.common import print_table, synthetic_readings
+from benchmarks.stub_servers import StubIngestServer
+
+
+def run_case(processor, pipeline_cls, readings, workers, batch_size, batch_max_age):
+    pipeline = pipeline_cls(
+        processor.send_to_ingest_api,
+        workers=workers,
+        max_queue=len(readings),
+        batch_size=batch_size,
+        batch_max_age=batch_max_age,
+    )
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        t0 = time.perf_counter()
+        pipeline.start()
+        for r in readings:
+            pipeline.submit(r)
+        pipeline.join()
+        elapsed = time.perf_counter() - t0
+        pipeline.stop()
+    stats = pipeline.stats()
+    return {
+        "batch_size": batch_size,
+        "workers": workers,
+        "rows": stats["processed"],
+        "requests": stats["batches"] if batch_size > 1 else stats["processed"],
+        "seconds": round(elapsed, 3),
+        "rows_per_s": stats["processed"] / elapsed if elapsed else 0.0,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de ingesta individual vs. por lotes")
+    ap.add_argument("--rows", type=int, default=20000)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--batch-sizes", default="1,50,200,500")
+    ap.add_argument("--batch-max-age", type=float, default=0.05)
+    ap.add_argument("--url", default=None, help="URL base de una API real (ej. http://localhost:8000)")
+    ap.add_argument("--request-latency-ms", type=float, default=2.0, help="Coste simulado por petición (stub)")
+    ap.add_argument("--row-latency-us", type=float, default=20.0, help="Coste simulado por fila (stub)")
+    args = ap.parse_args()
+
+    stub = None
+    if args.url:
+        base = args.url.rstrip("/")
+    else:
+        stub = StubIngestServer(
+            request_latency_s=args.request_latency_ms / 1000.0,
+            row_latency_s=args.row_latency_us / 1e6,
+        ).start()
+        base = stub.url
+
+    # El procesador lee la URL de ingesta al importarse
+    os.environ["API_INGEST_URL"] = f"{base}/ingest"
+    from scripts import processor
+    from scripts.ingest_pipeline import IngestPipeline
+
+    readings = synthetic_readings(args.rows)
+    results = []
+    for size in (int(x) for x in args.batch_sizes.split(",")):
+        results.append(run_case(processor, IngestPipeline, readings, args.workers, size, args.batch_max_age))
+
+    print(f"\nIngesta de {args.rows} filas contra {base} ({args.workers} workers)\n")
+    print_table(results, ["batch_size", "workers", "rows", "requests", "seconds", "rows_per_s"])
+
+    if stub is not None:
+        stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
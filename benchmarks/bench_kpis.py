@@ -0,0 +1,102 @@
+"""
+Benchmark de los KPIs incrementales frente a recalcularlos recorriendo la tabla.
+
+Para varios tamaños de la tabla telemetry (SQLite) mide:
+- recálculo completo: leer toda la tabla y calcular los KPIs (lo que haría el
+  dashboard en cada refresco sin el subsistema de KPIs);
+- coste incremental por lectura ingerida (`KpiStore.add_readings`);
+- consulta con la caché caducada (resumen + top de envíos + top de tramos);
+- consulta servida desde la caché TTL.
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_kpis --rows 100000,1000000
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from app import db, kpis
+from benchmarks.common import print_table, synthetic_readings
+from schemas import telemetry
+
+
+def make_readings(n, num_packages):
+    readings = synthetic_readings(n, num_packages=num_packages)
+    for i, r in enumerate(readings):
+        if i % 37 < 3:        # rachas cortas de temperatura fuera de rango
+            r["temperatura"] = 9.0
+        if i % 501 == 0:
+            r["puerta_abierta"] = True
+    return telemetry.decode_batch(telemetry.encode(readings))
+
+
+async def fill(backend, readings, chunk=5000):
+    for start in range(0, len(readings), chunk):
+        await backend.insert_many(readings[start:start + chunk])
+
+
+def dashboard_queries(store):
+    return (store.summary(), store.top_shipments(50), store.top_segments(50))
+
+
+async def run(num_rows, num_packages, path):
+    readings = make_readings(num_rows, num_packages)
+    backend = db.SQLiteBackend(path)
+    await backend.init()
+    await fill(backend, readings)
+
+    t0 = time.perf_counter()
+    scanned = kpis.KpiStore()
+    await kpis.rebuild(backend, scanned)
+    dashboard_queries(scanned)
+    full_scan = time.perf_counter() - t0
+    await backend.close()
+
+    store = kpis.KpiStore()
+    t0 = time.perf_counter()
+    for start in range(0, len(readings), 1000):  # como llegan por /ingest/batch
+        store.add_readings(readings[start:start + 1000])
+    incremental = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    dashboard_queries(store)
+    miss = time.perf_counter() - t0
+
+    cache = kpis.TtlCache(ttl=60)
+    keys = (("summary",), ("shipments", 50), ("segments", 50))
+    computes = (store.summary, lambda: store.top_shipments(50), lambda: store.top_segments(50))
+    for key, compute in zip(keys, computes):
+        cache.get(key, compute)
+    reps = 10000
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        for key, compute in zip(keys, computes):
+            cache.get(key, compute)
+    hit = (time.perf_counter() - t0) / reps
+
+    assert scanned.summary() == store.summary()
+    return {"rows": num_rows, "packages": num_packages,
+            "full_scan_ms": full_scan * 1000, "update_us_per_row": incremental / num_rows * 1e6,
+            "cache_miss_ms": miss * 1000, "cache_hit_us": hit * 1e6}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="KPIs incrementales + caché frente a recorrer la tabla")
+    ap.add_argument("--rows", default="100000,1000000")
+    ap.add_argument("--packages", type=int, default=2000)
+    args = ap.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, n in enumerate(int(r) for r in args.rows.split(",")):
+            results.append(asyncio.run(run(n, args.packages, os.path.join(tmp, f"kpis-{i}.db"))))
+
+    print("\nConsulta del dashboard = resumen + top 50 envíos + top 50 tramos\n")
+    print_table(results, ["rows", "packages", "full_scan_ms", "update_us_per_row", "cache_miss_ms", "cache_hit_us"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark del coste de la observabilidad en el camino caliente del procesador.
+
+Compara, por mensaje: decodificación + reglas sin instrumentar, el
+`handle_payload` instrumentado (contadores e histogramas) con LOG_LEVEL=WARNING
+(los logs por mensaje no se formatean) y con LOG_LEVEL=DEBUG escribiendo a
+/dev/null, y el antiguo `print` por evento. Una de cada 7 lecturas supera el
+umbral de temperatura para que haya eventos de reglas que registrar.
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_observability --messages 200000
+"""
+
+import argparse
+import contextlib
+import logging
+import os
+import time
+
+os.environ.setdefault("INGEST_ENABLED", "0")       # solo detección: se mide el procesador, no la API
+os.environ.setdefault("PROCESSOR_METRICS_PORT", "0")
+
+from benchmarks.common import print_table, synthetic_readings  # noqa: E402
+from observability import logs  # noqa: E402
+from schemas import telemetry  # noqa: E402
+from scripts import processor  # noqa: E402
+
+
+def make_payloads(n, num_packages):
+    readings = synthetic_readings(n, num_packages=num_packages)
+    for i, r in enumerate(readings):
+        if i % 7 == 0:
+            r["temperatura"] = 9.5
+    return [telemetry.encode(r) for r in readings]
+
+
+def run_bare(payloads, use_print):
+    """Decodificación + reglas sin métricas; opcionalmente con un print por evento (versión anterior)."""
+    store, engine = processor.package_state, processor.rule_engine
+    t0 = time.perf_counter()
+    for payload in payloads:
+        data = telemetry.decode_wire(payload)
+        for event in engine.evaluate(data, store.touch(data["id_paquete"])):
+            if use_print and event.kind == "pending":
+                print(f"🌡️ Advertencia: Pico temporal ({event.reason}). Contador: {event.count}/{event.rule.sustain}")
+    return time.perf_counter() - t0
+
+
+def run_instrumented(payloads, level):
+    logs.configure(level=level)
+    t0 = time.perf_counter()
+    for payload in payloads:
+        processor.handle_payload(payload)
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Coste de métricas y logging en el procesador")
+    ap.add_argument("--messages", type=int, default=200000)
+    ap.add_argument("--packages", type=int, default=1000)
+    args = ap.parse_args()
+
+    payloads = make_payloads(args.messages, args.packages)
+    processor.send_discord_alert = lambda *a: None  # sin webhooks: solo el coste del procesador
+
+    results = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for mode, fn in (
+            ("sin instrumentar", lambda: run_bare(payloads, False)),
+            ("print por evento", lambda: run_bare(payloads, True)),
+            ("métricas + WARNING", lambda: run_instrumented(payloads, logging.WARNING)),
+            ("métricas + DEBUG", lambda: run_instrumented(payloads, logging.DEBUG)),
+        ):
+            elapsed = fn()
+            results.append({"mode": mode, "msgs_per_s": args.messages / elapsed,
+                            "us_per_msg": elapsed / args.messages * 1e6})
+
+    print(f"\n{args.messages} mensajes, {args.packages} paquetes (1/7 por encima del umbral)\n")
+    print_table(results, ["mode", "msgs_per_s", "us_per_msg"])
+
+
+if __name__ == "__main__":
+    main()
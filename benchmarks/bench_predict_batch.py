@@ -0,0 +1,102 @@
+"""
+Benchmark de inferencia: /predict fila a fila frente a /predict/batch
+(columnar y NDJSON) y /predict/stream.
+
+Arranca `uvicorn app.main:app` en un subproceso (backend de BD en memoria) y
+mide filas/s con `--concurrency` clientes durante `--duration` segundos.
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_predict_batch --batch-size 10000
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from benchmarks.bench_ingest_api import free_port, wait_healthy
+from benchmarks.common import print_table
+
+
+def make_bodies(batch_size, seed=42):
+    rnd = random.Random(seed)
+    rows = [{"feature_1": rnd.uniform(-5, 5), "feature_2": rnd.uniform(-5, 5)} for _ in range(batch_size)]
+    columnar = json.dumps({"feature_1": [r["feature_1"] for r in rows], "feature_2": [r["feature_2"] for r in rows]})
+    ndjson = "".join(json.dumps(r) + "\n" for r in rows)
+    return rows, columnar, ndjson
+
+
+def run(mode, url, concurrency, duration, rows, columnar, ndjson):
+    if mode == "single":
+        endpoint, bodies, ctype, per_request = f"{url}/predict", [json.dumps(r) for r in rows[:1000]], "application/json", 1
+    elif mode == "batch (columnar)":
+        endpoint, bodies, ctype, per_request = f"{url}/predict/batch", [columnar], "application/json", len(rows)
+    elif mode == "batch (ndjson)":
+        endpoint, bodies, ctype, per_request = f"{url}/predict/batch", [ndjson], "application/x-ndjson", len(rows)
+    else:
+        endpoint, bodies, ctype, per_request = f"{url}/predict/stream", [ndjson], "application/x-ndjson", len(rows)
+
+    scored = [0] * concurrency
+    stop_at = time.perf_counter() + duration
+
+    def client(k):
+        session = requests.Session()
+        headers = {"Content-Type": ctype}
+        i = k
+        while time.perf_counter() < stop_at:
+            r = session.post(endpoint, data=bodies[i % len(bodies)], headers=headers, timeout=60)
+            r.raise_for_status()
+            r.content  # consumir la respuesta completa
+            scored[k] += per_request
+            i += concurrency
+        session.close()
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    return {"mode": mode, "rows_per_request": per_request, "rows": sum(scored),
+            "seconds": round(elapsed, 1), "rows_per_s": sum(scored) / elapsed}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Filas/s de /predict frente a /predict/batch y /predict/stream")
+    ap.add_argument("--batch-size", type=int, default=10000)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--duration", type=float, default=5.0)
+    args = ap.parse_args()
+
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=dict(os.environ, DB_BACKEND="memory"),
+    )
+    try:
+        wait_healthy(url)
+        rows, columnar, ndjson = make_bodies(args.batch_size)
+        results = [run(mode, url, args.concurrency, args.duration, rows, columnar, ndjson)
+                   for mode in ("single", "batch (columnar)", "batch (ndjson)", "stream (ndjson)")]
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    base = results[0]["rows_per_s"]
+    for r in results:
+        r["speedup"] = f"x{r['rows_per_s'] / base:,.1f}"
+    print(f"\nInferencia, {args.concurrency} clientes, lotes de {args.batch_size} filas\n")
+    print_table(results, ["mode", "rows_per_request", "rows", "seconds", "rows_per_s", "speedup"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
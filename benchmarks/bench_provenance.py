@@ -0,0 +1,108 @@
+"""
+Benchmark de las huellas SHA-256 de scripts/provenance.py.
+
+Crea `--files` ficheros de `--mib` MiB y compara:
+
+- cuaderno: `f.read()` completo + sha256, fichero a fichero (TRABAJO_IA_HASH.ipynb);
+- por bloques y con mmap, en un hilo y en `--workers` hilos;
+- manifiesto con la caché caliente (ningún fichero cambiado) y verificación
+  con caché y completa.
+
+Los ficheros se acaban de escribir, así que están en la caché de páginas: se
+mide la CPU del resumen, no el disco. `peak_mib` es el pico de memoria
+reservada por Python (tracemalloc) durante cada prueba.
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_provenance --files 8 --mib 64 --workers 4
+"""
+
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import print_table
+from scripts import provenance
+
+
+def make_files(directory, count, mib):
+    block = os.urandom(1 << 20)
+    for i in range(count):
+        with open(os.path.join(directory, f"export-{i:03d}.bin"), "wb") as f:
+            for _ in range(mib):
+                f.write(block)
+    # Fuera de la ventana en la que provenance no confía en el mtime
+    old = time.time() - 3600
+    for name in os.listdir(directory):
+        os.utime(os.path.join(directory, name), (old, old))
+
+
+def notebook_hashes(paths):
+    digests = {}
+    for path in paths:
+        with open(path, "rb") as f:
+            contenido = f.read()
+        digests[path] = hashlib.sha256(contenido).hexdigest()
+    return digests
+
+
+def measure(name, total_bytes, fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    row = {"mode": name, "seconds": elapsed, "mib_per_s": total_bytes / 2**20 / elapsed, "peak_mib": peak / 2**20}
+    return row, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Huellas SHA-256: lectura completa frente a bloques, mmap, hilos y caché")
+    ap.add_argument("--files", type=int, default=8)
+    ap.add_argument("--mib", type=int, default=64, help="Tamaño de cada fichero")
+    ap.add_argument("--workers", type=int, default=provenance.DEFAULT_WORKERS)
+    args = ap.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        data = os.path.join(tmp, "export")
+        os.makedirs(data)
+        make_files(data, args.files, args.mib)
+        paths = [os.path.join(data, n) for n in sorted(os.listdir(data))]
+        total = args.files * args.mib * 2**20
+
+        row, expected = measure("cuaderno (read completo)", total, lambda: notebook_hashes(paths))
+        results.append(row)
+        for label, workers, use_mmap in (("bloques, 1 hilo", 1, False), ("mmap, 1 hilo", 1, True),
+                                         (f"bloques, {args.workers} hilos", args.workers, False),
+                                         (f"mmap, {args.workers} hilos", args.workers, True)):
+            row, (digests, _) = measure(label, total, lambda: provenance.hash_files(
+                paths, workers=workers, use_mmap=use_mmap))
+            assert {p: sha for p, (_, sha) in digests.items()} == expected, label
+            results.append(row)
+
+        cache = provenance.DigestCache(os.path.join(tmp, "cache.json"))
+        row, (manifest, _) = measure("manifiesto (caché fría)", total, lambda: provenance.build_manifest(
+            data, provenance.DigestCache(cache.path), args.workers))
+        results.append(row)
+        row, _ = measure("manifiesto (caché caliente)", total, lambda: provenance.build_manifest(
+            data, provenance.DigestCache(cache.path), args.workers))
+        results.append(row)
+        row, report = measure("verificar (caché)", total, lambda: provenance.verify_manifest(
+            manifest, data, provenance.DigestCache(cache.path), workers=args.workers))
+        assert report.passed and report.hashed_bytes == 0
+        results.append(row)
+        row, report = measure("verificar --completo", total, lambda: provenance.verify_manifest(
+            manifest, data, full=True, workers=args.workers))
+        assert report.passed and report.hashed_bytes == total
+        results.append(row)
+
+    print(f"\n{args.files} ficheros de {args.mib} MiB; {os.cpu_count()} CPUs\n")
+    print_table(results, ["mode", "seconds", "mib_per_s", "peak_mib"])
+
+
+if __name__ == "__main__":
+    main()
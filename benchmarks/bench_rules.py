@@ -0,0 +1,88 @@
+"""
+Benchmark del motor de reglas: reglas precompiladas (una pasada sobre las
+columnas del PackageStateStore) frente a una evaluación interpretada regla a
+regla con estado en dicts, variando el nº de reglas y de paquetes.
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_rules --messages 200000
+"""
+
+import argparse
+import sys
+import time
+
+from benchmarks.common import print_table, synthetic_readings
+from scripts.rules import RuleEngine, load_rules
+from scripts.state_store import PackageStateStore
+
+
+def make_rules(n):
+    """n reglas: puerta + temperatura/impacto sostenida + umbrales de temperatura escalonados."""
+    rules = [
+        {"name": "puerta", "when": [{"field": "puerta_abierta", "op": "==", "value": True}]},
+        {"name": "temp_g", "sustain": 3, "when": [
+            {"field": "temperatura", "op": ">", "value": 8.0},
+            {"field": "fuerza_g", "op": ">", "value": 2.5},
+        ]},
+    ]
+    for i in range(n - len(rules)):
+        rules.append({"name": f"temp_{i}", "sustain": 1 + i % 5, "hysteresis": 0.5, "cooldown_s": 60,
+                      "when": [{"field": "temperatura", "op": ">", "value": 2.0 + (i % 40) * 0.1}]})
+    return load_rules(rules[:n])
+
+
+def run_compiled(rules, readings, num_packages):
+    store = PackageStateStore(max_packages=num_packages * 2)
+    engine = RuleEngine(rules, store)
+    fired = 0
+    t0 = time.perf_counter()
+    for data in readings:
+        for event in engine.evaluate(data, store.touch(data["id_paquete"])):
+            fired += event.kind == "fire"
+    return time.perf_counter() - t0, fired
+
+
+def run_interpreted(rules, readings, num_packages):
+    state = {}
+    fired = 0
+    t0 = time.perf_counter()
+    for data in readings:
+        now = time.time()
+        pkg = state.setdefault(data["id_paquete"], {})
+        for rule in rules:
+            st = pkg.setdefault(rule.name, {"count": 0, "active": False, "fired": float("-inf")})
+            if rule.is_active(data):
+                st["count"] += 1
+                if st["count"] >= rule.sustain and not st["active"] and now - st["fired"] >= rule.cooldown_s:
+                    st["active"], st["fired"] = True, now
+                    fired += 1
+            else:
+                st["count"], st["active"] = 0, False
+    return time.perf_counter() - t0, fired
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Motor de reglas precompilado frente a evaluación interpretada")
+    ap.add_argument("--messages", type=int, default=200000)
+    ap.add_argument("--rules", default="2,10,50")
+    ap.add_argument("--packages", default="1000,100000")
+    args = ap.parse_args()
+
+    results = []
+    for num_packages in (int(p) for p in args.packages.split(",")):
+        readings = synthetic_readings(args.messages, num_packages=num_packages)
+        for num_rules in (int(r) for r in args.rules.split(",")):
+            rules = make_rules(num_rules)
+            for mode, fn in (("interpretado", run_interpreted), ("precompilado", run_compiled)):
+                elapsed, fired = fn(rules, readings, num_packages)
+                results.append({"mode": mode, "rules": num_rules, "packages": num_packages,
+                                "alerts": fired, "msgs_per_s": args.messages / elapsed,
+                                "us_per_msg": elapsed / args.messages * 1e6})
+
+    print(f"\nMotor de reglas, {args.messages} mensajes\n")
+    print_table(results, ["mode", "rules", "packages", "alerts", "msgs_per_s", "us_per_msg"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
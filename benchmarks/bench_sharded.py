@@ -0,0 +1,90 @@
+"""
+Benchmark: escalado del procesador multiproceso (ShardDispatcher).
+
+Reproduce un tráfico de flota sintético (bytes JSON como los de MQTT) a
+través del despachador con 1, 2, 4... workers y mide mensajes/s extremo a
+extremo (hasta que todos los workers han procesado todo). La ingesta se
+desactiva (INGEST_ENABLED=0) para medir solo decodificación + detección.
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_sharded --messages 400000 --workers 1,2,4
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from benchmarks.common import print_table, synthetic_readings
+
+
+def wait_for(predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError("Los workers no terminaron a tiempo")
+        time.sleep(0.005)
+
+
+def run_in_process(payloads):
+    from scripts import processor
+    t0 = time.perf_counter()
+    for p in payloads:
+        processor.handle_payload(p)
+    return time.perf_counter() - t0
+
+
+def run_sharded(payloads, workers, warmup):
+    from scripts.sharding import ShardDispatcher
+
+    dispatcher = ShardDispatcher(workers)
+    dispatcher.start()
+    try:
+        # Calentamiento: arranque de los procesos (spawn + imports)
+        for p in warmup:
+            dispatcher.dispatch(p)
+        dispatcher.flush()
+        wait_for(lambda: dispatcher.total_processed() >= len(warmup), 120)
+
+        base = dispatcher.total_processed()
+        t0 = time.perf_counter()
+        for p in payloads:
+            dispatcher.dispatch(p)
+        dispatcher.flush()
+        wait_for(lambda: dispatcher.total_processed() - base >= len(payloads), 600)
+        return time.perf_counter() - t0
+    finally:
+        dispatcher.stop()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Escalado del procesador por número de workers")
+    ap.add_argument("--messages", type=int, default=400000)
+    ap.add_argument("--packages", type=int, default=5000)
+    ap.add_argument("--workers", default="1,2,4")
+    args = ap.parse_args()
+
+    os.environ["INGEST_ENABLED"] = "0"  # Heredado por los workers (spawn)
+    readings = synthetic_readings(args.messages, num_packages=args.packages)
+    payloads = [json.dumps(r).encode("utf-8") for r in readings]
+    warmup = payloads[:args.packages]
+
+    elapsed = run_in_process(payloads)
+    results = [{"mode": "un proceso (sin despachador)", "workers": 1,
+                "msgs_per_s": args.messages / elapsed, "speedup": 1.0}]
+    baseline = args.messages / elapsed
+
+    for n in (int(x) for x in args.workers.split(",")):
+        elapsed = run_sharded(payloads, n, warmup)
+        rate = args.messages / elapsed
+        results.append({"mode": "despachador + shards", "workers": n,
+                        "msgs_per_s": rate, "speedup": rate / baseline})
+
+    print(f"\n{args.messages} mensajes de {args.packages} paquetes (CPUs: {os.cpu_count()})\n")
+    print_table(results, ["mode", "workers", "msgs_per_s", "speedup"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Benchmark: memoria por paquete y coste de acceso del PackageStateStore frente
+al dict de dicts original del procesador.
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_state_store --packages 100000
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import print_table
+from scripts.state_store import PackageStateStore
+
+
+def dict_of_dicts(ids):
+    state = {}
+    for pid in ids:
+        if pid not in state:
+            state[pid] = {'consecutive': 0, 'is_alerting_temp': False, 'is_alerting_door': False}
+        state[pid]['consecutive'] += 1
+    return state
+
+
+def column_store(ids):
+    # Las mismas tres columnas que el dict de dicts
+    store = PackageStateStore(ttl_seconds=None, max_packages=len(ids) + 1,
+                              columns=(("consecutive", "I", 0), ("is_alerting_temp", "b", 0),
+                                       ("is_alerting_door", "b", 0)))
+    consecutive = store.column("consecutive")
+    for pid in ids:
+        consecutive[store.touch(pid)] += 1
+    return store
+
+
+def measure(name, build, ids):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    obj = build(ids)
+    elapsed = time.perf_counter() - t0
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Las cadenas de id se crean fuera, así que no cuentan en ninguno de los dos casos
+    n = len(set(ids))
+    del obj
+    return {
+        "store": name,
+        "packages": n,
+        "bytes_per_package": current / n,
+        "ops_per_s": len(ids) / elapsed,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Memoria y velocidad del estado por paquete")
+    ap.add_argument("--packages", type=int, default=100000)
+    ap.add_argument("--messages-per-package", type=int, default=5)
+    args = ap.parse_args()
+
+    ids = [f"PKG-{i:07d}" for i in range(args.packages)] * args.messages_per_package
+    results = [
+        measure("dict de dicts (original)", dict_of_dicts, ids),
+        measure("PackageStateStore", column_store, ids),
+    ]
+    print()
+    print_table(results, ["store", "packages", "bytes_per_package", "ops_per_s"])
+
+    # Expulsión por TTL: la mitad de los paquetes queda inactiva
+    store = PackageStateStore(ttl_seconds=60, max_packages=args.packages * 2)
+    for pid in ids[:args.packages:2]:
+        store.touch(pid, now=0.0)
+    t0 = time.perf_counter()
+    for pid in ids[1:args.packages:2]:
+        store.touch(pid, now=100.0)  # Cada alta nueva expulsa de paso a los caducados
+    evicted = store.evicted
+    print(f"\nTTL: {evicted} paquetes expulsados durante {args.packages // 2} altas "
+          f"({(time.perf_counter() - t0) * 1000:.1f} ms en total); "
+          f"quedan {len(store)} ({store.memory_usage()['bytes_per_package']:.0f} B/paquete según memory_usage())")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
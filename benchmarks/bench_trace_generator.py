@@ -0,0 +1,84 @@
+"""
+Benchmark: generador vectorizado de trazas frente al simulador lectura a lectura.
+
+- simulador: el bucle del modo flota de sensores_envio.py (DoorEpisode +
+  RouteCursor + build_payload por lectura), sin publicar;
+- vectorizado: `TraceGenerator` por bloques paquetes × ticks;
+- escritura: filas/s de cada formato de salida (parquet solo si hay pyarrow).
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_trace_generator --packages 2000 --readings 1000
+"""
+
+import argparse
+import importlib.util
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import print_table
+from scripts.trace_generator import WRITERS, TraceGenerator, write_traces
+
+
+def run_simulator(num_packages, readings, interval_s):
+    import sensores_envio as sim
+
+    door = [sim.DoorEpisode() for _ in range(num_packages)]
+    route = [sim.RouteCursor(sim.WAYPOINTS) for _ in range(num_packages)]
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    step = timedelta(seconds=interval_s)
+    t0 = time.perf_counter()
+    for _ in range(readings):
+        for i in range(num_packages):
+            door[i].ensure_reset(now)
+            door[i].maybe_start(now, interval_s)
+            lat, lon = route[i].step(sim.ROUTE_PROGRESS_PER_TICK)
+            sim.build_payload(f"PKG-{i:05d}", lat, lon, door[i].is_open(now))
+        now += step
+    return time.perf_counter() - t0
+
+
+def run_vectorized(num_packages, readings, ticks_per_chunk):
+    gen = TraceGenerator(num_packages, readings)
+    t0 = time.perf_counter()
+    labelled = sum(int(df["label"].sum()) for df in gen.chunks(ticks_per_chunk))
+    return time.perf_counter() - t0, labelled
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generador de trazas vectorizado frente al simulador")
+    ap.add_argument("--packages", type=int, default=2000)
+    ap.add_argument("--readings", type=int, default=1000, help="Lecturas por paquete")
+    ap.add_argument("--sim-readings", type=int, default=20, help="Lecturas por paquete para el simulador (lento)")
+    ap.add_argument("--rows-per-file", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    results = []
+    sim_rows = args.packages * args.sim_readings
+    elapsed = run_simulator(args.packages, args.sim_readings, 2.0)
+    results.append({"mode": "simulador", "rows": sim_rows, "rows_per_s": sim_rows / elapsed, "seconds": elapsed})
+
+    rows = args.packages * args.readings
+    elapsed, labelled = run_vectorized(args.packages, args.readings, max(1, args.rows_per_file // args.packages))
+    results.append({"mode": "vectorizado", "rows": rows, "rows_per_s": rows / elapsed, "seconds": elapsed,
+                    "labelled_pct": labelled / rows * 100})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for formato in sorted(WRITERS):
+            if formato == "parquet" and importlib.util.find_spec("pyarrow") is None:
+                continue
+            out = os.path.join(tmp, formato)
+            t0 = time.perf_counter()
+            paths = write_traces(TraceGenerator(args.packages, args.readings), out, formato, args.rows_per_file)
+            elapsed = time.perf_counter() - t0
+            size = sum(os.path.getsize(p) for p in paths)
+            results.append({"mode": f"vectorizado + {formato}", "rows": rows, "rows_per_s": rows / elapsed,
+                            "seconds": elapsed, "files": len(paths), "bytes_per_row": size / rows})
+
+    print(f"\n{args.packages} paquetes; el simulador genera sin publicar en MQTT\n")
+    print_table(results, ["mode", "rows", "rows_per_s", "seconds", "files", "bytes_per_row", "labelled_pct"])
+
+
+if __name__ == "__main__":
+    main()
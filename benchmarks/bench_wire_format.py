@@ -0,0 +1,67 @@
+"""
+Tamaño en bytes y throughput de codificación/decodificación de cada formato
+de mensaje MQTT: JSON (json.dumps, como antes), JSON con msgspec y el
+formato binario compacto de schemas/telemetry.py. Si está instalado cbor2
+se añade CBOR como referencia.
+
+Ejecuta (desde la raíz del repo):
+    python -m benchmarks.bench_wire_format --messages 100000
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from benchmarks.common import print_table, synthetic_readings
+from schemas import telemetry
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+def throughput(fn, items):
+    t0 = time.perf_counter()
+    out = [fn(x) for x in items]
+    return len(items) / (time.perf_counter() - t0), out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Formatos de mensaje de telemetría: tamaño y throughput")
+    ap.add_argument("--messages", type=int, default=100000)
+    args = ap.parse_args()
+
+    # Ids y timestamps como los del simulador en modo flota
+    readings = synthetic_readings(args.messages)
+    for r in readings:
+        r["id_paquete"] = "PKG-ALERTA-001-" + r["id_paquete"][4:]
+
+    formats = [
+        ("json (json.dumps)", lambda r: json.dumps(r, ensure_ascii=False).encode("utf-8"),
+         lambda b: json.loads(b.decode("utf-8"))),
+        ("json (msgspec)", telemetry.encode, telemetry.decode_wire),
+        ("binario v1", telemetry.encode_binary, telemetry.decode_wire),
+    ]
+    if cbor2 is not None:
+        formats.append(("cbor (cbor2)", cbor2.dumps, cbor2.loads))
+
+    results = []
+    base_bytes = None
+    for name, encode, decode in formats:
+        enc_rate, encoded = throughput(encode, readings)
+        dec_rate, _ = throughput(decode, encoded)
+        avg = sum(len(b) for b in encoded) / len(encoded)
+        base_bytes = base_bytes or avg
+        results.append({"format": name, "bytes_per_msg": avg, "vs_json": f"{avg / base_bytes:.0%}",
+                        "encode_msgs_per_s": enc_rate, "decode_msgs_per_s": dec_rate})
+
+    print(f"\nFormatos de mensaje, {args.messages} lecturas\n")
+    print_table(results, ["format", "bytes_per_msg", "vs_json", "encode_msgs_per_s", "decode_msgs_per_s"])
+    print("\ndecode de los formatos msgspec/binario incluye la validación del esquema.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
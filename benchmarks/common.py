@@ -0,0 +1,41 @@
+"""
+Utilidades compartidas por los benchmarks (lecturas sintéticas y formato de resultados).
+"""
+
+import random
+from datetime import datetime, timezone, timedelta
+
+
+def synthetic_readings(n, num_packages=100, seed=42, start=None, interval_s=2.0):
+    """Genera `n` lecturas con el mismo formato que publica sensores_envio.py."""
+    rnd = random.Random(seed)
+    start = start or datetime.now(timezone.utc)
+    readings = []
+    for i in range(n):
+        pkg = i % num_packages
+        ts = start + timedelta(seconds=(i // num_packages) * interval_s)
+        readings.append({
+            "id_paquete": f"PKG-{pkg:05d}",
+            "timestamp_utc": ts.isoformat(),
+            "temperatura": round(rnd.uniform(1.5, 4.5), 2),
+            "fuerza_g": round(rnd.uniform(0.95, 1.05), 3),
+            "puerta_abierta": False,
+            "latitud": round(42.88 - rnd.random() * 2.4, 6),
+            "longitud": round(-8.54 + rnd.random() * 4.8, 6),
+        })
+    return readings
+
+
+def print_table(rows, columns):
+    """Imprime una lista de dicts como tabla de texto alineada."""
+    widths = {c: max(len(c), *(len(_fmt(r.get(c))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    print("  ".join("-" * widths[c] for c in columns))
+    for r in rows:
+        print("  ".join(_fmt(r.get(c)).ljust(widths[c]) for c in columns))
+
+
+def _fmt(value):
+    if isinstance(value, float):
+        return f"{value:,.1f}"
+    return "" if value is None else str(value)
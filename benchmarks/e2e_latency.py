@@ -0,0 +1,364 @@
+"""
+Benchmark extremo a extremo: sensor → broker MQTT → processor → ingesta / Discord.
+
+Subcomandos:
+
+    record   Graba la telemetría de un broker a JSONL (una línea por mensaje
+             con el desfase `t` en segundos, el topic y el payload).
+    synth    Genera una grabación sintética con la lógica del simulador
+             (sensores_envio.py) para N paquetes, con excursiones de
+             temperatura opcionales para provocar alertas.
+    run      Arranca una API de ingesta stub y un webhook de Discord falso,
+             lanza `python -m scripts.processor` contra un broker local y
+             reproduce la grabación a `--speed`× (o a `--rate` msgs/s).
+             Mide rendimiento y latencias p50/p95/p99 desde `timestamp_utc`
+             (reescrito al publicar) hasta la ingesta y hasta la alerta, y
+             guarda el resultado en JSON (benchmarks/results/).
+    compare  Compara dos resultados JSON (p. ej. entre versiones).
+
+Ejemplos (desde la raíz del repo, con un broker en localhost:1883):
+    python -m benchmarks.e2e_latency synth --packages 5000 --minutes 2 --out rec.jsonl
+    python -m benchmarks.e2e_latency run rec.jsonl --rate 5000
+    python -m benchmarks.e2e_latency compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone, timedelta
+
+import paho.mqtt.client as mqtt
+
+from benchmarks.stub_servers import FakeDiscordWebhook, StubIngestServer
+from schemas import telemetry
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+# --- Grabación ---
+
+def cmd_record(args):
+    out = open(args.out, "w", encoding="utf-8")
+    start = None
+    count = 0
+
+    def on_message(client, userdata, msg):
+        nonlocal start, count
+        now = time.monotonic()
+        start = now if start is None else start
+        try:
+            payload = telemetry.decode_wire(msg.payload)
+        except telemetry.InvalidTelemetry:
+            return
+        out.write(json.dumps({"t": round(now - start, 6), "topic": msg.topic, "payload": payload}, ensure_ascii=False) + "\n")
+        count += 1
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="e2e-recorder")
+    client.on_message = on_message
+    client.connect(args.broker, args.port, 30)
+    client.subscribe(args.topic, qos=0)
+    client.loop_start()
+    print(f"[INFO] Grabando {args.topic} en {args.out} durante {args.duration} s ...")
+    try:
+        time.sleep(args.duration)
+    except KeyboardInterrupt:
+        pass
+    client.loop_stop()
+    client.disconnect()
+    out.close()
+    print(f"[INFO] {count} mensajes grabados.")
+
+
+def cmd_synth(args):
+    import sensores_envio as sim
+
+    random.seed(args.seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    door = [sim.DoorEpisode() for _ in range(args.packages)]
+    route = [sim.RouteCursor(sim.WAYPOINTS, loop=True) for _ in range(args.packages)]
+    excursion_left = [0] * args.packages
+    ticks = int(args.minutes * 60 / args.interval)
+    spacing = args.interval / args.packages
+    with open(args.out, "w", encoding="utf-8") as f:
+        for tick in range(ticks):
+            now = start + timedelta(seconds=tick * args.interval)
+            for i in range(args.packages):
+                pid = f"{args.id_prefix}-{i:05d}"
+                door[i].ensure_reset(now)
+                door[i].maybe_start(now, args.interval)
+                lat, lon = route[i].step(sim.ROUTE_PROGRESS_PER_TICK)
+                payload = sim.build_payload(pid, lat, lon, door[i].is_open(now))
+                payload["timestamp_utc"] = now.isoformat()
+                if excursion_left[i] == 0 and random.random() < args.excursion_prob:
+                    excursion_left[i] = args.excursion_len
+                if excursion_left[i]:
+                    payload["temperatura"] = round(payload["temperatura"] + 6.0, 2)
+                    excursion_left[i] -= 1
+                line = {"t": round(tick * args.interval + i * spacing, 6),
+                        "topic": f"{args.topic_root}/{pid}", "payload": payload}
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    print(f"[INFO] {ticks * args.packages} mensajes sintéticos escritos en {args.out}")
+
+
+# --- Reproducción y medida ---
+
+def load_recording(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentiles(values, ps=(50, 95, 99)):
+    if not values:
+        return {f"p{p}": None for p in ps} | {"max": None, "count": 0}
+    values = sorted(values)
+    out = {f"p{p}": values[min(len(values) - 1, int(len(values) * p / 100))] for p in ps}
+    out["max"] = values[-1]
+    out["count"] = len(values)
+    return out
+
+
+def _parse_ts(value):
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def replay(records, broker, port, speed, rate, qos):
+    """Publica la grabación respetando los desfases (÷ speed) o a `rate` msgs/s."""
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="e2e-replayer")
+    client.connect(broker, port, 30)
+    client.loop_start()
+    start = time.perf_counter()
+    max_drift = 0.0
+    for k, rec in enumerate(records):
+        scheduled = start + (k / rate if rate else rec["t"] / speed)
+        now = time.perf_counter()
+        if scheduled - now > 0.001:
+            time.sleep(scheduled - now)
+        else:
+            max_drift = max(max_drift, now - scheduled)
+        payload = dict(rec["payload"])
+        # La latencia se mide desde la "lectura del sensor", que es este instante
+        payload["timestamp_utc"] = datetime.now(timezone.utc).isoformat()
+        client.publish(rec["topic"], json.dumps(payload, ensure_ascii=False), qos=qos)
+    elapsed = time.perf_counter() - start
+    client.loop_stop()
+    client.disconnect()
+    return elapsed, max_drift
+
+
+def cmd_run(args):
+    records = load_recording(args.recording)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print("[ERROR] Grabación vacía.")
+        return 1
+
+    ingest = StubIngestServer()
+    ingest.keep_rows = True
+    ingest.start()
+    discord = FakeDiscordWebhook(limit=args.webhook_limit, window_s=args.webhook_window).start()
+
+    topic_root = records[0]["topic"].rsplit("/", 1)[0]
+    env = dict(os.environ)
+    env.update({
+        "MQTT_HOST": args.broker,
+        "MQTT_PORT": str(args.port),
+        "MQTT_TOPIC": args.processor_topic or f"{topic_root}/#",
+        "API_INGEST_URL": f"{ingest.url}/ingest",
+        "DISCORD_WEBHOOK_TEMP": f"{discord.url}/webhooks/temp",
+        "DISCORD_WEBHOOK_DOOR": f"{discord.url}/webhooks/door",
+        "SPOOL_DIR": tempfile.mkdtemp(prefix="e2e-spool-"),
+        # Sin esto restauraría rachas y alertas de la ejecución anterior desde ./checkpoint
+        "CHECKPOINT_DIR": tempfile.mkdtemp(prefix="e2e-checkpoint-"),
+        "PYTHONUNBUFFERED": "1",
+    })
+    for kv in args.env or []:
+        k, _, v = kv.partition("=")
+        env[k] = v
+
+    log = open(args.processor_log, "w") if args.processor_log else subprocess.DEVNULL
+    proc = subprocess.Popen([sys.executable, "-m", "scripts.processor"], env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        time.sleep(args.startup_wait)
+        if proc.poll() is not None:
+            print(f"[ERROR] El processor terminó al arrancar (exitcode={proc.returncode}).")
+            return 1
+
+        print(f"[INFO] Reproduciendo {len(records)} mensajes "
+              f"({'%d msgs/s' % args.rate if args.rate else '%.1fx' % args.speed}) ...")
+        t_start = time.time()
+        publish_s, max_drift = replay(records, args.broker, args.port, args.speed, args.rate, args.qos)
+
+        # Esperar a que la ingesta reciba todo (o a que se agote el tiempo)
+        deadline = time.time() + args.drain_timeout
+        while ingest.rows < len(records) and time.time() < deadline:
+            time.sleep(0.05)
+        time.sleep(args.alert_grace)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        ingest.stop()
+        discord.stop()
+
+    ingest_lat, last_ingest = [], t_start
+    for received_at, _, rows in ingest.received:
+        last_ingest = max(last_ingest, received_at)
+        for row in rows:
+            ts = _parse_ts(row.get("timestamp_utc"))
+            if ts is not None:
+                ingest_lat.append((received_at - ts) * 1000)
+
+    alert_lat = []
+    for received_at, body in discord.messages:
+        for embed in body.get("embeds") or []:
+            for field in embed.get("fields") or []:
+                if field.get("name") == "Timestamp":
+                    ts = _parse_ts(field.get("value"))
+                    if ts is not None:
+                        alert_lat.append((received_at - ts) * 1000)
+
+    duration = max(last_ingest - t_start, 1e-9)
+    result = {
+        "created_utc": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "recording": os.path.basename(args.recording),
+        "params": {"messages": len(records), "speed": args.speed, "rate": args.rate, "qos": args.qos,
+                   "env": args.env or []},
+        "publish": {"seconds": publish_s, "msgs_per_s": len(records) / publish_s if publish_s else None,
+                    "max_drift_ms": max_drift * 1000},
+        "ingest": {"rows": ingest.rows, "lost": len(records) - ingest.rows, "requests": ingest.requests,
+                   "rows_per_s": ingest.rows / duration, "latency_ms": percentiles(ingest_lat)},
+        "alerts": {"messages": len(discord.messages), "alerts": len(alert_lat), "http_429": discord.rejected,
+                   "latency_ms": percentiles(alert_lat)},
+    }
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    name = args.name or datetime.now().strftime("e2e-%Y%m%d-%H%M%S")
+    out_path = os.path.join(args.results_dir, f"{name}.json")
+    with open(out_path, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print_result(result)
+    print(f"\n[INFO] Resultado guardado en {out_path}")
+    return 0
+
+
+def print_result(r):
+    il, al = r["ingest"]["latency_ms"], r["alerts"]["latency_ms"]
+    print(f"\nPublicado: {r['params']['messages']} msgs a {r['publish']['msgs_per_s']:,.0f} msgs/s "
+          f"(drift máx. {r['publish']['max_drift_ms']:,.1f} ms)")
+    print(f"Ingesta:   {r['ingest']['rows']} filas ({r['ingest']['lost']} perdidas), {r['ingest']['rows_per_s']:,.0f} filas/s")
+    print(f"           latencia p50={_ms(il['p50'])} p95={_ms(il['p95'])} p99={_ms(il['p99'])} max={_ms(il['max'])}")
+    print(f"Alertas:   {r['alerts']['alerts']} alertas en {r['alerts']['messages']} mensajes ({r['alerts']['http_429']} x 429)")
+    print(f"           latencia p50={_ms(al['p50'])} p95={_ms(al['p95'])} p99={_ms(al['p99'])} max={_ms(al['max'])}")
+
+
+def _ms(v):
+    return "-" if v is None else f"{v:,.1f} ms"
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def cmd_compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    metrics = [
+        ("ingest.rows_per_s", True), ("ingest.latency_ms.p50", False), ("ingest.latency_ms.p95", False),
+        ("ingest.latency_ms.p99", False), ("alerts.latency_ms.p50", False), ("alerts.latency_ms.p95", False),
+        ("alerts.latency_ms.p99", False), ("ingest.lost", False),
+    ]
+    print(f"{'métrica':<26}{'base (' + str(base.get('git_commit')) + ')':>20}{'nuevo (' + str(new.get('git_commit')) + ')':>20}{'cambio':>10}")
+    regressions = 0
+    for path, higher_is_better in metrics:
+        a, b = _get(base, path), _get(new, path)
+        if a is None or b is None:
+            print(f"{path:<26}{str(a):>20}{str(b):>20}{'':>10}")
+            continue
+        change = (b - a) / a if a else 0.0
+        worse = change < -args.tolerance if higher_is_better else change > args.tolerance
+        regressions += worse
+        print(f"{path:<26}{a:>20,.1f}{b:>20,.1f}{change:>+10.1%}{'  ⚠️' if worse else ''}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+def _get(d, path):
+    for key in path.split("."):
+        if not isinstance(d, dict):
+            return None
+        d = d.get(key)
+    return d
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark extremo a extremo con grabación/reproducción")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    rec = sub.add_parser("record", help="Grabar telemetría de un broker a JSONL")
+    rec.add_argument("--broker", default="localhost")
+    rec.add_argument("--port", type=int, default=1883)
+    rec.add_argument("--topic", default="greendelivery/#")
+    rec.add_argument("--duration", type=float, default=60.0)
+    rec.add_argument("--out", default="recording.jsonl")
+
+    syn = sub.add_parser("synth", help="Generar una grabación sintética con la lógica del simulador")
+    syn.add_argument("--packages", type=int, default=1000)
+    syn.add_argument("--minutes", type=float, default=1.0)
+    syn.add_argument("--interval", type=float, default=2.0)
+    syn.add_argument("--topic-root", default="greendelivery/rubia")
+    syn.add_argument("--id-prefix", default="PKG")
+    syn.add_argument("--excursion-prob", type=float, default=0.002, help="Prob. por lectura de iniciar una excursión de temperatura")
+    syn.add_argument("--excursion-len", type=int, default=5)
+    syn.add_argument("--seed", type=int, default=1)
+    syn.add_argument("--out", default="recording.jsonl")
+
+    run = sub.add_parser("run", help="Reproducir una grabación a través del processor y medir")
+    run.add_argument("recording")
+    run.add_argument("--broker", default="localhost")
+    run.add_argument("--port", type=int, default=1883)
+    run.add_argument("--speed", type=float, default=1.0, help="Multiplicador de velocidad sobre la grabación")
+    run.add_argument("--rate", type=float, default=None, help="Ritmo fijo en msgs/s (ignora los desfases grabados)")
+    run.add_argument("--qos", type=int, default=0, choices=[0, 1])
+    run.add_argument("--limit", type=int, default=None, help="Reproducir solo los primeros N mensajes")
+    run.add_argument("--processor-topic", default=None, help="MQTT_TOPIC del processor (por defecto <raíz>/#)")
+    run.add_argument("--env", action="append", help="Variables extra para el processor (CLAVE=valor)")
+    run.add_argument("--webhook-limit", type=int, default=50, help="Peticiones por ventana del webhook falso")
+    run.add_argument("--webhook-window", type=float, default=1.0)
+    run.add_argument("--startup-wait", type=float, default=3.0)
+    run.add_argument("--drain-timeout", type=float, default=60.0)
+    run.add_argument("--alert-grace", type=float, default=2.0, help="Espera extra para alertas pendientes")
+    run.add_argument("--processor-log", default=None, help="Fichero para la salida del processor")
+    run.add_argument("--results-dir", default=RESULTS_DIR)
+    run.add_argument("--name", default=None, help="Nombre del fichero de resultados (sin .json)")
+
+    cmp_ = sub.add_parser("compare", help="Comparar dos resultados JSON")
+    cmp_.add_argument("base")
+    cmp_.add_argument("new")
+    cmp_.add_argument("--tolerance", type=float, default=0.10, help="Cambio relativo tolerado antes de marcar regresión")
+    cmp_.add_argument("--fail-on-regression", action="store_true")
+
+    args = ap.parse_args()
+    handler = {"record": cmd_record, "synth": cmd_synth, "run": cmd_run, "compare": cmd_compare}[args.cmd]
+    return handler(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+"""
+Servidores HTTP locales (stub) para los benchmarks.
+
+- StubIngestServer: imita /ingest y /ingest/batch, cuenta filas recibidas y
+  puede simular la latencia de la BD (coste fijo por petición + coste por fila).
+- FakeDiscordWebhook: imita un webhook de Discord con su rate limit (cabeceras
+  X-RateLimit-* y respuestas 429 con retry_after) para pruebas de ráfagas offline.
+
+También se pueden lanzar sueltos para apuntar el procesador a ellos:
+    python -m benchmarks.stub_servers ingest --port 8000
+    python -m benchmarks.stub_servers discord --port 9100
+    (DISCORD_WEBHOOK_TEMP=http://127.0.0.1:9100/webhooks/temp)
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _IngestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # cabeceras y cuerpo van en escrituras separadas
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"null")
+        rows = body if isinstance(body, list) else [body]
+        self.server.record(self.path, rows)
+
+        out = json.dumps({"status": "ok", "inserted": len(rows)}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def do_GET(self):
+        out = b'{"status": "healthy"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubIngestServer(ThreadingHTTPServer):
+    """API de ingesta falsa en un hilo de fondo."""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, request_latency_s=0.0, row_latency_s=0.0):
+        super().__init__((host, port), _IngestHandler)
+        self.request_latency_s = request_latency_s
+        self.row_latency_s = row_latency_s
+        self.rows = 0
+        self.requests = 0
+        self.received = []  # (instante epoch, path, filas) si keep_rows=True
+        self.keep_rows = False
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, path, rows):
+        received_at = time.time()
+        # Simula el coste de la inserción fuera del lock
+        delay = self.request_latency_s + self.row_latency_s * len(rows)
+        if delay:
+            threading.Event().wait(delay)
+        with self._lock:
+            self.rows += len(rows)
+            self.requests += 1
+            if self.keep_rows:
+                self.received.append((received_at, path, rows))
+
+    def reset(self):
+        with self._lock:
+            self.rows = 0
+            self.requests = 0
+            self.received = []
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-ingest", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _DiscordHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        status, headers, out = self.server.handle_webhook(self.path, body)
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(out)))
+        if out:
+            self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeDiscordWebhook(ThreadingHTTPServer):
+    """Webhook de Discord falso con límite de `limit` peticiones por ventana de `window_s`."""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, limit=5, window_s=2.0):
+        super().__init__((host, port), _DiscordHandler)
+        self.limit = limit
+        self.window_s = window_s
+        self.messages = []   # (instante epoch, cuerpo JSON) de cada mensaje aceptado
+        self.rejected = 0    # respuestas 429
+        self._buckets = {}   # path -> (inicio ventana, usadas)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle_webhook(self, path, body):
+        now = time.monotonic()
+        with self._lock:
+            start, used = self._buckets.get(path, (now, 0))
+            if now - start >= self.window_s:
+                start, used = now, 0
+            reset_after = max(0.0, self.window_s - (now - start))
+            if used >= self.limit:
+                self.rejected += 1
+                out = json.dumps({"message": "You are being rate limited.",
+                                  "retry_after": round(reset_after, 3), "global": False}).encode()
+                return 429, {"Retry-After": str(max(1, round(reset_after))),
+                             "X-RateLimit-Limit": str(self.limit),
+                             "X-RateLimit-Remaining": "0",
+                             "X-RateLimit-Reset-After": f"{reset_after:.3f}"}, out
+            used += 1
+            self._buckets[path] = (start, used)
+            self.messages.append((time.time(), body))
+            return 204, {"X-RateLimit-Limit": str(self.limit),
+                         "X-RateLimit-Remaining": str(self.limit - used),
+                         "X-RateLimit-Reset-After": f"{reset_after:.3f}"}, b""
+
+    def reset(self):
+        with self._lock:
+            self.messages = []
+            self.rejected = 0
+            self._buckets = {}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-discord", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Servidores stub locales para pruebas de carga")
+    ap.add_argument("kind", choices=["ingest", "discord"])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=0)
+    args = ap.parse_args()
+
+    server = StubIngestServer(args.host, args.port) if args.kind == "ingest" else FakeDiscordWebhook(args.host, args.port)
+    print(f"[INFO] Stub {args.kind} escuchando en {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Logging estructurado y filtrado por nivel para el procesador y la API.
+
+Sustituye a los `print` del camino caliente: cada mensaje pasa por el módulo
+`logging`, así que con LOG_LEVEL=WARNING las líneas por mensaje (éxitos de
+ingesta, picos temporales...) ni siquiera se formatean. Con LOG_FORMAT=json
+cada línea es un objeto JSON con los campos pasados en `extra=fields(...)`:
+
+    log = get_logger("processor")
+    log.debug("Pico temporal (%s)", reason, extra=fields(paquete=pid, contador=n))
+
+Variables: LOG_LEVEL (DEBUG | INFO | WARNING | ERROR, por defecto INFO) y
+LOG_FORMAT (text | json, por defecto text).
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+_configured = False
+
+
+def fields(**kwargs):
+    """Campos estructurados para `extra=` de una llamada de logging."""
+    return {"fields": kwargs}
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro: ts, level, logger, msg y los campos extra."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        extra = getattr(record, "fields", None)
+        if extra:
+            entry.update(extra)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legible: hora, nivel, logger y mensaje (los campos extra van al final)."""
+
+    converter = time.gmtime
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s", "%H:%M:%S")
+
+    def format(self, record):
+        line = super().format(record)
+        extra = getattr(record, "fields", None)
+        if extra:
+            line += " " + " ".join(f"{k}={v}" for k, v in extra.items())
+        return line
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Escribe en el `sys.stdout` vigente (respeta `contextlib.redirect_stdout`, como `print`)."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+def configure(level=None, fmt=None, stream=None):
+    """Configura el logger raíz del proyecto (idempotente salvo que se pasen argumentos)."""
+    global _configured
+    if _configured and level is None and fmt is None and stream is None:
+        return
+    handler = logging.StreamHandler(stream) if stream is not None else _StdoutHandler()
+    handler.setFormatter(JsonFormatter() if (fmt or LOG_FORMAT) == "json" else TextFormatter())
+    root = logging.getLogger("greendelivery")
+    root.handlers[:] = [handler]
+    root.setLevel(level or LOG_LEVEL)
+    root.propagate = False
+    _configured = True
+
+
+def get_logger(name):
+    """Logger `greendelivery.<name>` (configura la salida la primera vez)."""
+    configure()
+    return logging.getLogger(f"greendelivery.{name}")
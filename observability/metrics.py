@@ -0,0 +1,336 @@
+"""
+Métricas en formato de texto de Prometheus, sin dependencias externas.
+
+Contadores, gauges e histogramas con etiquetas opcionales, registrados en un
+`Registry` que se expone con `render()`: la API lo sirve en su ruta `/metrics`
+y el procesador con `serve(port)` (un servidor HTTP mínimo en un hilo).
+
+    RECEIVED = Counter("processor_messages_received_total", "Mensajes MQTT recibidos")
+    DECODE = Histogram("processor_decode_seconds", "Tiempo de decodificación")
+    ALERTS = Counter("processor_alerts_total", "Alertas", ["rule"])
+
+    RECEIVED.inc()
+    DECODE.observe(0.000012)
+    ALERTS.labels("puerta_abierta").inc()
+
+Las operaciones del camino caliente son un incremento bajo un lock; con
+`threadsafe=False` ni eso, para métricas que solo se actualizan desde un hilo
+o bajo un lock que ya toma el llamante (el `state_lock` del procesador). Los
+valores caros de calcular (tamaño de colas, paquetes seguidos) se leen solo
+al hacer scrape con `Gauge.set_function`.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Segundos: de microsegundos (decodificación) a segundos (reintentos de la API)
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if value == float("-inf"):
+        return "-Inf"
+    if value != value:
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Registry:
+    """Conjunto de métricas que se exponen juntas."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrica duplicada: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """Todas las métricas en formato de texto de Prometheus (str)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY, threadsafe=True):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.threadsafe = threadsafe
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = child = self._new_child()
+            self._bind(child)
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values):
+        """Serie hija para unos valores de etiqueta (se crea la primera vez)."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: se esperaban las etiquetas {self.labelnames}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _bind(self, child):
+        """Sin etiquetas, los métodos del camino caliente son los del hijo (sin una llamada intermedia)."""
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name}: métrica con etiquetas, usa .labels(...)")
+        return self._children[()]
+
+    def samples(self):
+        with self._lock:
+            children = list(self._children.items())
+        lines = []
+        for values, child in children:
+            lines.extend(child.samples(self.name, self.labelnames, values))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, names, values):
+        return [f"{name}{_labels_text(names, values)} {_format_value(self.value)}"]
+
+
+class _UnlockedCounterChild(_CounterChild):
+    __slots__ = ()
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Counter(_Metric):
+    """Valor que solo crece (mensajes, reintentos, alertas...)."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild() if self.threadsafe else _UnlockedCounterChild()
+
+    def _bind(self, child):
+        self.inc = child.inc
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    @property
+    def value(self):
+        return self._default().value
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        """El valor se calcula al hacer scrape (p. ej. `queue.qsize`)."""
+        self.function = function
+
+    def get(self):
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception:
+                return float("nan")
+        return self.value
+
+    def samples(self, name, names, values):
+        return [f"{name}{_labels_text(names, values)} {_format_value(self.get())}"]
+
+
+class Gauge(_Metric):
+    """Valor que sube y baja (profundidad de cola, paquetes seguidos...)."""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set_function(self, function):
+        self._default().set_function(function)
+
+    @property
+    def value(self):
+        return self._default().get()
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def time(self):
+        """Context manager que observa la duración del bloque."""
+        return _Timer(self)
+
+    def samples(self, name, names, values):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = 'le="' + _format_value(bound) + '"'
+            lines.append(f"{name}_bucket{_labels_text(names, values, le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels_text(names, values)} {_format_value(total)}")
+        lines.append(f"{name}_count{_labels_text(names, values)} {cumulative}")
+        return lines
+
+
+class _UnlockedHistogramChild(_HistogramChild):
+    __slots__ = ()
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    """Distribución de latencias en buckets acumulados."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=REGISTRY,
+                 threadsafe=True):
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, documentation, labelnames, registry, threadsafe)
+
+    def _new_child(self):
+        cls = _HistogramChild if self.threadsafe else _UnlockedHistogramChild
+        return cls(self.buckets)
+
+    def _bind(self, child):
+        self.observe = child.observe
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+def serve(port, registry=REGISTRY, host="0.0.0.0"):
+    """Sirve `registry` en http://host:port/metrics desde un hilo demonio. Devuelve el servidor."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # un scrape cada pocos segundos no debe ensuciar los logs
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f"metrics-{port}", daemon=True).start()
+    return server
@@ -0,0 +1,8 @@
+from typing import List
+
+from pydantic import BaseModel
+
+class BatchPredictionOutput(BaseModel):
+    prediction: List[float]
+    label: List[str]
+    confidence: List[float]
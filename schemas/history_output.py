@@ -0,0 +1,15 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+class LatestReading(BaseModel):
+    id_paquete: str
+    timestamp_utc: str
+    temperatura: float
+    fuerza_g: float
+    puerta_abierta: bool
+    latitud: Optional[float]
+    longitud: Optional[float]
+
+class HistoryReading(LatestReading):
+    id: int
@@ -0,0 +1,5 @@
+from pydantic import BaseModel
+
+class IngestOutput(BaseModel):
+    status: str
+    inserted: int
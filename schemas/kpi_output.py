@@ -0,0 +1,39 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+class KpiSummary(BaseModel):
+    envios: int
+    envios_olvidados: int
+    lecturas: int
+    lecturas_fuera_de_orden: int
+    incidencias: int
+    incidencias_abiertas: int
+    tiempo_fuera_de_rango_s: float
+    recuperaciones: int
+    recuperacion_media_s: Optional[float]
+    recuperacion_p50_s: Optional[float]
+    recuperacion_p95_s: Optional[float]
+    recuperacion_max_s: Optional[float]
+
+class ShipmentKpi(BaseModel):
+    id_paquete: str
+    lecturas: int
+    tiempo_fuera_de_rango_s: float
+    incidencias: int
+    en_incidencia: bool
+    recuperacion_media_s: Optional[float]
+    temp_max: Optional[float]
+
+class SegmentKpi(BaseModel):
+    tramo: str
+    incidencias: int
+    temperatura: int
+    impacto: int
+    puerta: int
+
+class ShipmentKpiList(BaseModel):
+    envios: List[ShipmentKpi]
+
+class SegmentKpiList(BaseModel):
+    tramos: List[SegmentKpi]
@@ -0,0 +1,255 @@
+"""
+Esquema único de la telemetría de los paquetes y su (de)codificación rápida.
+
+Lo comparten el simulador (sensores_envio.py), el procesador
+(scripts/processor.py) y la API (app/routers/ingest.py). La decodificación
+usa msgspec: el JSON se parsea y se valida en una sola pasada en C, sin
+construir primero un dict intermedio, y un mensaje mal formado se rechaza
+con `InvalidTelemetry` en lugar de rellenar huecos con valores por defecto.
+
+- `Telemetry`: lectura con `timestamp_utc` como datetime (API y BD).
+- `TelemetryMessage`: la misma lectura como dict plano con el timestamp
+  en texto (camino caliente del procesador, que reenvía el dict tal cual).
+  El texto se valida con el mismo tipo `UtcDatetime` (RFC 3339, con zona
+  obligatoria) que usa la API: lo que acepta el procesador, lo acepta
+  `/ingest`, y nunca se guarda un instante sin zona junto a otros con ella.
+
+Formato binario compacto (opcional, para enlaces móviles y flotas grandes),
+little-endian, versionado por el primer byte:
+
+    B  versión (WIRE_VERSION)       B  flags (1 puerta, 2 posición, 4 ruta)
+    q  timestamp epoch ms           h  temperatura en centésimas de °C
+    H  fuerza_g en milésimas de G   i  latitud en millonésimas de grado
+    i  longitud en millonésimas     B  len + id_paquete (UTF-8)
+    [B len + ruta (UTF-8)]
+
+Un JSON nunca empieza por ese byte, así que `decode_wire` detecta el
+formato sin mirar el topic (los publicadores binarios añaden además
+BINARY_TOPIC_SUFFIX al topic).
+"""
+
+import struct
+from datetime import datetime, timezone
+from typing import Annotated, List, Optional, TypedDict
+
+import msgspec
+
+# Campos en el orden de la tabla telemetry
+FIELDS = (
+    "id_paquete", "timestamp_utc", "temperatura", "fuerza_g",
+    "puerta_abierta", "latitud", "longitud",
+)
+
+# Rangos físicamente plausibles: fuera de ellos la lectura es un error del sensor o del emisor
+PackageId = Annotated[str, msgspec.Meta(min_length=1, max_length=64)]
+Temperature = Annotated[float, msgspec.Meta(ge=-60.0, le=100.0)]
+GForce = Annotated[float, msgspec.Meta(ge=0.0, le=50.0)]
+Latitude = Annotated[float, msgspec.Meta(ge=-90.0, le=90.0)]
+Longitude = Annotated[float, msgspec.Meta(ge=-180.0, le=180.0)]
+Timestamp = Annotated[str, msgspec.Meta(min_length=10, max_length=40)]
+UtcDatetime = Annotated[datetime, msgspec.Meta(tz=True)]  # Sin zona sería hora local de quién sabe dónde
+
+InvalidTelemetry = msgspec.DecodeError  # También cubre msgspec.ValidationError
+
+
+class Telemetry(msgspec.Struct, omit_defaults=True):
+    id_paquete: PackageId
+    timestamp_utc: UtcDatetime
+    temperatura: Temperature
+    fuerza_g: GForce
+    puerta_abierta: bool
+    latitud: Optional[Latitude] = None
+    longitud: Optional[Longitude] = None
+    ruta: Optional[str] = None
+
+
+class _TelemetryRequired(TypedDict):
+    id_paquete: PackageId
+    timestamp_utc: Timestamp
+    temperatura: Temperature
+    fuerza_g: GForce
+    puerta_abierta: bool
+
+
+class TelemetryMessage(_TelemetryRequired, total=False):
+    latitud: Optional[Latitude]
+    longitud: Optional[Longitude]
+    ruta: Optional[str]
+
+
+# Agregado por ventana que persiste la etapa de downsampling del procesador
+AGGREGATE_FIELDS = (
+    "id_paquete", "ventana_inicio", "ventana_fin", "lecturas", "anomalias",
+    "temp_min", "temp_max", "temp_media", "fuerza_g_max", "puerta_abierta_s",
+    "latitud", "longitud",
+)
+
+
+class TelemetryAggregate(msgspec.Struct, omit_defaults=True):
+    id_paquete: PackageId
+    ventana_inicio: UtcDatetime
+    ventana_fin: UtcDatetime
+    lecturas: Annotated[int, msgspec.Meta(ge=1)]
+    anomalias: Annotated[int, msgspec.Meta(ge=0)]
+    temp_min: Temperature
+    temp_max: Temperature
+    temp_media: Temperature
+    fuerza_g_max: GForce
+    puerta_abierta_s: Annotated[float, msgspec.Meta(ge=0.0)]
+    latitud: Optional[Latitude] = None
+    longitud: Optional[Longitude] = None
+
+
+_message_decoder = msgspec.json.Decoder(TelemetryMessage)
+_reading_decoder = msgspec.json.Decoder(Telemetry)
+_batch_decoder = msgspec.json.Decoder(List[Telemetry])
+_aggregates_decoder = msgspec.json.Decoder(List[TelemetryAggregate])
+_encoder = msgspec.json.Encoder()
+
+
+def decode_message(payload):
+    """bytes/str JSON → dict validado (`TelemetryMessage`). Lanza InvalidTelemetry."""
+    data = _message_decoder.decode(payload)
+    # Mismo parser que `Telemetry.timestamp_utc` en la API; el dict conserva el texto original
+    try:
+        msgspec.convert(data["timestamp_utc"], UtcDatetime)
+    except msgspec.ValidationError as e:
+        raise InvalidTelemetry(f"timestamp_utc no es RFC 3339 con zona: {e}") from None
+    return data
+
+
+def decode_reading(payload):
+    """bytes/str JSON → `Telemetry`. Lanza InvalidTelemetry."""
+    return _reading_decoder.decode(payload)
+
+
+def decode_batch(payload):
+    """bytes/str con una lista JSON → lista de `Telemetry`. Lanza InvalidTelemetry."""
+    return _batch_decoder.decode(payload)
+
+
+def decode_aggregates(payload):
+    """bytes/str con una lista JSON → lista de `TelemetryAggregate`. Lanza InvalidTelemetry."""
+    return _aggregates_decoder.decode(payload)
+
+
+def encode(reading):
+    """dict o `Telemetry` → bytes JSON (UTF-8)."""
+    return _encoder.encode(reading)
+
+
+# --- Formato binario ---
+
+WIRE_VERSION = 1
+BINARY_TOPIC_SUFFIX = "/bin"
+
+_WIRE_PREFIX = bytes([WIRE_VERSION])
+_HEADER = struct.Struct("<BBqhHii")
+_FLAG_DOOR = 1
+_FLAG_POSITION = 2
+_FLAG_RUTA = 4
+
+
+_last_second = (None, "")  # (epoch s, "YYYY-MM-DDTHH:MM:SS") del último timestamp formateado
+
+
+def _iso_from_ms(ts_ms):
+    """Epoch ms → ISO 8601 UTC. En una flota muchos mensajes comparten segundo: se reutiliza el prefijo.
+
+    Lanza InvalidTelemetry si el instante no cabe en un `datetime`.
+    """
+    global _last_second
+    seconds, millis = divmod(ts_ms, 1000)
+    cached = _last_second  # tupla inmutable: lectura atómica aunque haya varios hilos
+    if cached[0] != seconds:
+        try:
+            prefix = datetime.fromtimestamp(seconds, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+        except (ValueError, OverflowError, OSError) as e:
+            raise InvalidTelemetry(f"Timestamp binario fuera de rango: {ts_ms}") from e
+        cached = _last_second = (seconds, prefix)
+    return f"{cached[1]}.{millis:03d}+00:00"
+
+
+def _epoch_ms(timestamp):
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return round(timestamp.timestamp() * 1000)
+
+
+def encode_binary(reading):
+    """dict (`TelemetryMessage`) o `Telemetry` → bytes en el formato binario. Lanza ValueError."""
+    if isinstance(reading, Telemetry):
+        reading = msgspec.structs.asdict(reading)
+    lat, lon = reading.get("latitud"), reading.get("longitud")
+    ruta = reading.get("ruta")
+    flags = (_FLAG_DOOR if reading["puerta_abierta"] else 0) | (_FLAG_RUTA if ruta else 0)
+    if lat is not None and lon is not None:
+        flags |= _FLAG_POSITION
+    else:
+        lat = lon = 0.0
+    try:
+        header = _HEADER.pack(
+            WIRE_VERSION, flags, _epoch_ms(reading["timestamp_utc"]),
+            round(reading["temperatura"] * 100), round(reading["fuerza_g"] * 1000),
+            round(lat * 1e6), round(lon * 1e6),
+        )
+    except struct.error as e:
+        raise ValueError(f"Lectura fuera del rango del formato binario: {e}") from None
+    pid = reading["id_paquete"].encode("utf-8")
+    parts = [header, bytes([len(pid)]), pid]
+    if ruta:
+        ruta = ruta.encode("utf-8")
+        parts += [bytes([len(ruta)]), ruta]
+    return b"".join(parts)
+
+
+def decode_binary(payload):
+    """bytes en formato binario → dict (`TelemetryMessage`). Lanza InvalidTelemetry."""
+    try:
+        version, flags, ts_ms, temp, g, lat, lon = _HEADER.unpack_from(payload)
+        if version != WIRE_VERSION:
+            raise InvalidTelemetry(f"Versión de formato binario no soportada: {version}")
+        end = _HEADER.size + 1 + payload[_HEADER.size]
+        pid = payload[_HEADER.size + 1:end].decode("utf-8")
+        ruta = None
+        if flags & _FLAG_RUTA:
+            ruta = payload[end + 1:end + 1 + payload[end]].decode("utf-8")
+            end += 1 + payload[end]
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise InvalidTelemetry(f"Mensaje binario truncado o corrupto: {e}") from None
+    if end != len(payload) or not pid:
+        raise InvalidTelemetry("Mensaje binario con longitud inesperada")
+    temperatura = temp / 100
+    if not -60.0 <= temperatura <= 100.0 or g > 50000:
+        raise InvalidTelemetry("Lectura binaria fuera de rango")
+    # Mismos límites que `Latitude`/`Longitude` en el camino JSON
+    if flags & _FLAG_POSITION and (abs(lat) > 90_000_000 or abs(lon) > 180_000_000):
+        raise InvalidTelemetry("Posición binaria fuera de rango")
+    data = {
+        "id_paquete": pid,
+        "timestamp_utc": _iso_from_ms(ts_ms),
+        "temperatura": temperatura,
+        "fuerza_g": g / 1000,
+        "puerta_abierta": bool(flags & _FLAG_DOOR),
+    }
+    if flags & _FLAG_POSITION:
+        data["latitud"] = lat / 1e6
+        data["longitud"] = lon / 1e6
+    if ruta is not None:
+        data["ruta"] = ruta
+    return data
+
+
+def decode_wire(payload):
+    """Mensaje MQTT en cualquiera de los dos formatos → dict validado. Lanza InvalidTelemetry."""
+    if payload and payload[0] < 0x09:  # byte de versión binaria (un JSON empieza por '{' o espacio)
+        return decode_binary(payload)
+    return decode_message(payload)
+
+
+def binary_package_id(payload):
+    """Bytes de `id_paquete` de un mensaje binario (sin decodificarlo), o None si no lo es."""
+    if payload[:1] != _WIRE_PREFIX or len(payload) <= _HEADER.size:
+        return None
+    n = payload[_HEADER.size]
+    return payload[_HEADER.size + 1:_HEADER.size + 1 + n]
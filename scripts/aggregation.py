@@ -0,0 +1,193 @@
+"""
+Agregación por ventanas (downsampling) antes de persistir.
+
+En lugar de reenviar cada lectura cruda de 2 s, el procesador puede acumular
+por paquete una ventana de `window_s` segundos (según el timestamp de las
+lecturas) y persistir un único agregado por ventana:
+
+    lecturas, temp_min / temp_max / temp_media, fuerza_g_max,
+    puerta_abierta_s (segundos con la puerta abierta), última posición
+
+Las lecturas crudas solo se persisten alrededor de las anomalías: toda
+lectura que forma parte de una racha o de una alerta activa del motor de
+reglas, las `raw_context` lecturas anteriores (se guardan en un búfer
+pequeño por paquete) y las `raw_context` posteriores. Así ninguna lectura que
+haya contribuido a una alerta se pierde.
+
+Una ventana se cierra cuando llega una lectura fuera de ella, cuando el
+paquete lleva `inactivity_s` segundos sin mensajes (`flush_idle`) o cuando el
+paquete sale del almacén de estado. El estado vive en columnas del
+`PackageStateStore` del procesador; las ventanas abiertas se siguen además en
+un índice en orden de uso, así que `flush_idle` solo mira las que pueden
+haber caducado y no todos los paquetes seguidos.
+"""
+
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+
+AGG_COLUMNS = (
+    ("agg:start", "d", 0.0),    # inicio de la ventana (epoch s del timestamp de la lectura)
+    ("agg:last", "d", 0.0),     # timestamp de la última lectura de la ventana
+    ("agg:count", "I", 0),
+    ("agg:anomalies", "I", 0),
+    ("agg:tsum", "d", 0.0),
+    ("agg:tmin", "d", 0.0),
+    ("agg:tmax", "d", 0.0),
+    ("agg:gmax", "d", 0.0),
+    ("agg:door_s", "d", 0.0),
+    ("agg:door", "b", 0),        # puerta abierta en la lectura anterior
+    ("agg:lat", "d", float("nan")),
+    ("agg:lon", "d", float("nan")),
+    ("agg:after", "I", 0),       # lecturas crudas pendientes tras una anomalía
+)
+
+
+def _epoch(timestamp):
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+def _iso(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+class WindowAggregator:
+    """Ventanas por paquete sobre las columnas de un `PackageStateStore`."""
+
+    def __init__(self, store, emit_window, emit_raw, window_s=60.0, inactivity_s=180.0, raw_context=3,
+                 clock=time.time):
+        self.store = store
+        self.emit_window = emit_window  # callback(agregado dict)
+        self.emit_raw = emit_raw        # callback(lectura dict)
+        self.window_s = window_s
+        self.inactivity_s = inactivity_s
+        self.raw_context = raw_context
+        self.clock = clock
+        self._context = {}  # id_paquete -> deque de lecturas recientes (antes de una anomalía)
+        self._open = OrderedDict()  # id_paquete -> slot con ventana abierta (del menos al más reciente)
+        self.stats = {"readings": 0, "raw": 0, "windows": 0}
+
+        for name, typecode, default in AGG_COLUMNS:
+            setattr(self, "_" + name.split(":")[1], store.add_column(name, typecode, default))
+
+    def add(self, data, slot, anomalous):
+        """Acumula una lectura validada y decide si además se persiste cruda."""
+        package_id = data["id_paquete"]
+        ts = _epoch(data["timestamp_utc"])
+        temp = data["temperatura"]
+        count = self._count[slot]
+
+        if count and (ts >= self._start[slot] + self.window_s or ts < self._start[slot]):
+            self._flush(package_id, slot)
+            count = 0
+
+        if count == 0:
+            self._start[slot] = ts
+            self._tsum[slot] = 0.0
+            self._tmin[slot] = self._tmax[slot] = temp
+            self._gmax[slot] = 0.0
+            self._door_s[slot] = 0.0
+            self._anomalies[slot] = 0
+        elif self._door[slot]:
+            # La puerta estaba abierta desde la lectura anterior
+            self._door_s[slot] += ts - self._last[slot]
+
+        self._count[slot] = count + 1
+        if package_id in self._open:
+            self._open.move_to_end(package_id)
+        else:
+            self._open[package_id] = slot
+        self._tsum[slot] += temp
+        if temp < self._tmin[slot]:
+            self._tmin[slot] = temp
+        elif temp > self._tmax[slot]:
+            self._tmax[slot] = temp
+        if data["fuerza_g"] > self._gmax[slot]:
+            self._gmax[slot] = data["fuerza_g"]
+        self._door[slot] = 1 if data["puerta_abierta"] else 0
+        self._last[slot] = ts
+        lat, lon = data.get("latitud"), data.get("longitud")
+        if lat is not None and lon is not None:
+            self._lat[slot], self._lon[slot] = lat, lon
+        self.stats["readings"] += 1
+
+        # Lecturas crudas: la anomalía, su contexto previo y las siguientes
+        if anomalous:
+            self._anomalies[slot] += 1
+            context = self._context.pop(package_id, None)
+            if context:
+                for previous in context:
+                    self._raw(previous)
+            self._raw(data)
+            self._after[slot] = self.raw_context
+        elif self._after[slot]:
+            self._after[slot] -= 1
+            self._raw(data)
+        elif self.raw_context:
+            context = self._context.get(package_id)
+            if context is None:
+                context = self._context[package_id] = deque(maxlen=self.raw_context)
+            context.append(data)
+
+    def flush_idle(self, now=None):
+        """Cierra las ventanas de los paquetes sin mensajes en `inactivity_s`. Devuelve cuántas.
+
+        Recorre solo el principio del índice de ventanas abiertas: O(nº de ventanas que se cierran).
+        """
+        cutoff = (self.clock() if now is None else now) - self.inactivity_s
+        last_seen = self.store.last_seen
+        flushed = 0
+        while self._open:
+            package_id, slot = next(iter(self._open.items()))
+            if last_seen[slot] >= cutoff:
+                break
+            self._flush(package_id, slot)
+            self._context.pop(package_id, None)  # el paquete ha dejado de emitir: fuera su búfer
+            flushed += 1
+        return flushed
+
+    def track_open(self):
+        """Reconstruye el índice de ventanas abiertas desde las columnas (tras restaurar un checkpoint)."""
+        self._open = OrderedDict((package_id, slot) for package_id, slot in self.store.items() if self._count[slot])
+
+    def flush_all(self):
+        """Cierra todas las ventanas abiertas (parada del servicio)."""
+        for package_id, slot in self.store.items():
+            if self._count[slot]:
+                self._flush(package_id, slot)
+
+    def on_evict(self, package_id, slot):
+        """Para `PackageStateStore.on_evict`: no perder la ventana de un paquete expulsado."""
+        if self._count[slot]:
+            self._flush(package_id, slot)
+        self._context.pop(package_id, None)
+
+    def _raw(self, data):
+        self.stats["raw"] += 1
+        self.emit_raw(data)
+
+    def _flush(self, package_id, slot):
+        count = self._count[slot]
+        lat, lon = self._lat[slot], self._lon[slot]
+        self._count[slot] = 0
+        self._open.pop(package_id, None)
+        # Cambio de estado sin mensaje nuevo: que el próximo checkpoint delta lo recoja
+        self.store.mark_changed(package_id)
+        self.stats["windows"] += 1
+        self.emit_window({
+            "id_paquete": package_id,
+            "ventana_inicio": _iso(self._start[slot]),
+            "ventana_fin": _iso(self._last[slot]),
+            "lecturas": count,
+            "anomalias": self._anomalies[slot],
+            "temp_min": self._tmin[slot],
+            "temp_max": self._tmax[slot],
+            "temp_media": round(self._tsum[slot] / count, 3),
+            "fuerza_g_max": self._gmax[slot],
+            "puerta_abierta_s": round(self._door_s[slot], 3),
+            "latitud": None if lat != lat else lat,  # NaN = sin posición
+            "longitud": None if lon != lon else lon,
+        })
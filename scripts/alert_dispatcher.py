@@ -0,0 +1,257 @@
+"""
+Despachador asíncrono de alertas a webhooks de Discord.
+
+`submit(webhook, payload)` nunca bloquea el camino de los mensajes: encola la
+alerta en la cola del webhook y vuelve. Cada webhook tiene su propia cola y
+un hilo de envío que:
+
+- Agrupa las alertas que llegan dentro de `coalesce_window` segundos en un
+  único mensaje con varios embeds (máx. 10 embeds / 2000 caracteres de
+  `content`, los límites de Discord).
+- Respeta los límites de Discord con un token bucket que se ajusta con las
+  cabeceras X-RateLimit-* de cada respuesta, y ante un 429 espera el
+  `retry_after` indicado antes de reintentar el mismo mensaje (como mucho
+  `max_rate_limited` veces seguidas: un webhook que responde siempre 429 no
+  puede retener el hilo para siempre).
+"""
+
+import os
+import queue
+import threading
+import time
+
+from observability.logs import get_logger
+from scripts import http_client
+from scripts.http_client import REQUEST_ERRORS
+
+ALERT_COALESCE_WINDOW = float(os.getenv("ALERT_COALESCE_WINDOW", 0.5))  # Segundos para agrupar alertas
+ALERT_QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", 1000))             # Alertas en cola por webhook
+ALERT_MAX_RETRIES = int(os.getenv("ALERT_MAX_RETRIES", 5))              # Reintentos ante errores (no 429)
+ALERT_MAX_RATE_LIMITED = int(os.getenv("ALERT_MAX_RATE_LIMITED", 20))    # 429 seguidos antes de descartar el mensaje
+
+DISCORD_MAX_EMBEDS = 10
+DISCORD_MAX_CONTENT = 2000
+# Límite por defecto de un webhook hasta que las cabeceras digan otra cosa (~5 peticiones / 2 s)
+DEFAULT_BUCKET_CAPACITY = 5
+DEFAULT_BUCKET_REFILL_PER_S = 2.5
+
+_STOP = object()
+
+log = get_logger("alerts")
+
+
+class TokenBucket:
+    """Token bucket que se recalibra con las cabeceras de rate limit del servidor."""
+
+    def __init__(self, capacity=DEFAULT_BUCKET_CAPACITY, refill_per_s=DEFAULT_BUCKET_REFILL_PER_S, clock=time.monotonic):
+        self.capacity = capacity
+        self.refill_per_s = refill_per_s
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.blocked_until = 0.0
+        self._last = clock()
+
+    def wait_time(self):
+        """Segundos hasta poder enviar (0 si se puede ya)."""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.refill_per_s)
+        self._last = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.refill_per_s
+
+    def acquire(self, sleep=time.sleep):
+        while True:
+            wait = self.wait_time()
+            if wait <= 0:
+                self.tokens -= 1.0
+                return
+            sleep(wait)
+
+    def update_from_headers(self, headers):
+        """Ajusta el bucket con X-RateLimit-Limit / -Remaining / -Reset-After."""
+        try:
+            limit = headers.get("X-RateLimit-Limit")
+            remaining = headers.get("X-RateLimit-Remaining")
+            reset_after = headers.get("X-RateLimit-Reset-After")
+            if limit is not None:
+                self.capacity = max(1, int(limit))
+            if remaining is not None:
+                self.tokens = min(self.tokens, float(remaining))
+                if int(remaining) == 0 and reset_after is not None:
+                    self.blocked_until = max(self.blocked_until, self.clock() + float(reset_after))
+        except (TypeError, ValueError):
+            pass
+
+    def penalize(self, retry_after):
+        """El servidor respondió 429: no enviar nada hasta `retry_after` segundos."""
+        self.tokens = 0.0
+        self.blocked_until = max(self.blocked_until, self.clock() + retry_after)
+
+
+def coalesce(payloads):
+    """Agrupa payloads de Discord en el menor nº de mensajes dentro de los límites."""
+    messages = []
+    current = None
+    for p in payloads:
+        content = p.get("content") or ""
+        embeds = p.get("embeds") or []
+        if current is not None:
+            merged_content = current["content"]
+            if content and content not in merged_content.split("\n\n"):
+                merged_content = f"{merged_content}\n\n{content}" if merged_content else content
+            if (len(current["embeds"]) + len(embeds) <= DISCORD_MAX_EMBEDS
+                    and len(merged_content) <= DISCORD_MAX_CONTENT):
+                current["content"] = merged_content
+                current["embeds"].extend(embeds)
+                current["_alerts"] += 1
+                continue
+            messages.append(current)
+        current = {"content": content, "embeds": list(embeds), "_alerts": 1}
+    if current is not None:
+        messages.append(current)
+    return messages
+
+
+class _WebhookChannel:
+    """Cola + hilo de envío de un webhook."""
+
+    def __init__(self, dispatcher, url):
+        self.dispatcher = dispatcher
+        self.url = url
+        self.bucket = TokenBucket()
+        self.queue = queue.Queue(maxsize=dispatcher.queue_size)
+        self.thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        d = self.dispatcher
+        while True:
+            first = self.queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            stop = False
+            deadline = time.monotonic() + d.coalesce_window
+            embeds = len(first.get("embeds") or [])
+            while embeds < DISCORD_MAX_EMBEDS:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+                embeds += len(item.get("embeds") or [])
+
+            for message in coalesce(batch):
+                self._send(message)
+            if stop:
+                return
+
+    def _send(self, message):
+        d = self.dispatcher
+        alerts = message.pop("_alerts")
+        payload = {k: v for k, v in message.items() if v}
+        errors = rate_limited = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                r = http_client.post(self.url, json=payload, timeout=10)
+            except REQUEST_ERRORS as e:
+                r = None
+                error = str(e)
+
+            if r is not None and r.status_code == 429:
+                retry_after = _retry_after(r)
+                self.bucket.penalize(retry_after)
+                d._count("rate_limited")
+                rate_limited += 1
+                if rate_limited > d.max_rate_limited:
+                    d._count("alerts_dropped", alerts)
+                    log.error("Discord responde 429 de forma continuada: %d alerta(s) descartadas.", alerts)
+                    return
+                continue
+            if r is not None and r.status_code < 300:
+                self.bucket.update_from_headers(r.headers)
+                d._count("messages_sent")
+                d._count("alerts_sent", alerts)
+                log.info("Notificación enviada a Discord (%d alerta(s) en 1 mensaje).", alerts)
+                return
+            if r is not None:
+                error = f"HTTP {r.status_code}: {r.text[:200]}"
+
+            errors += 1
+            if errors > d.max_retries:
+                d._count("alerts_dropped", alerts)
+                log.error("Error al enviar la alerta a Discord (%d alerta(s) descartadas): %s", alerts, error)
+                return
+            time.sleep(min(2 ** errors, 30))
+
+
+def _retry_after(response):
+    """Segundos de espera de un 429 (cuerpo JSON de Discord o cabecera Retry-After)."""
+    try:
+        return float(response.json().get("retry_after"))
+    except (ValueError, TypeError, AttributeError):
+        pass
+    try:
+        return float(response.headers.get("Retry-After", 1.0))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class AlertDispatcher:
+    """Colas de salida por webhook con agrupación de alertas y control de rate limit."""
+
+    def __init__(self, coalesce_window=ALERT_COALESCE_WINDOW, queue_size=ALERT_QUEUE_SIZE,
+                 max_retries=ALERT_MAX_RETRIES, max_rate_limited=ALERT_MAX_RATE_LIMITED):
+        self.coalesce_window = coalesce_window
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.max_rate_limited = max_rate_limited
+        self._channels = {}
+        self._lock = threading.Lock()
+        self.stats = {"alerts_submitted": 0, "alerts_sent": 0, "alerts_dropped": 0,
+                      "messages_sent": 0, "rate_limited": 0}
+
+    def submit(self, webhook_url, payload):
+        """Encola una alerta sin bloquear. Devuelve False si la cola del webhook está llena."""
+        channel = self._channels.get(webhook_url)
+        if channel is None:
+            with self._lock:
+                channel = self._channels.get(webhook_url)
+                if channel is None:
+                    channel = self._channels[webhook_url] = _WebhookChannel(self, webhook_url)
+        self._count("alerts_submitted")
+        try:
+            channel.queue.put_nowait(payload)
+            return True
+        except queue.Full:
+            self._count("alerts_dropped")
+            log.warning("Cola de alertas de Discord llena: alerta descartada.")
+            return False
+
+    def pending(self):
+        with self._lock:
+            channels = list(self._channels.values())
+        return sum(c.queue.qsize() for c in channels)
+
+    def close(self, timeout=10):
+        """Envía lo pendiente y detiene los hilos."""
+        with self._lock:
+            channels = list(self._channels.values())
+            self._channels = {}
+        for c in channels:
+            c.queue.put(_STOP)
+        deadline = time.monotonic() + timeout
+        for c in channels:
+            c.thread.join(max(0.0, deadline - time.monotonic()))
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
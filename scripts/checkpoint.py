@@ -0,0 +1,296 @@
+"""
+Checkpoints del estado de los detectores para sobrevivir a reinicios.
+
+Sin ellos, cada reinicio del procesador vacía `package_state`: los contadores
+de racha vuelven a 0 (una excursión en curso tarda otros N eventos en
+detectarse) y las alertas activas se olvidan (cada puerta abierta vuelve a
+alertar en Discord tras un despliegue).
+
+`StateCheckpointer` guarda las columnas del `PackageStateStore` en un
+fichero local desde un hilo propio:
+
+- cada `interval_s`, un *delta* con solo los paquetes con mensajes desde el
+  checkpoint anterior (el final del índice LRU) y los expulsados;
+- cada `full_every` deltas (o si el delta ya abarca media flota), una
+  instantánea completa en un fichero nuevo que sustituye al anterior con un
+  rename atómico, así que el fichero nunca crece sin límite.
+
+Bajo el lock del estado solo se copian los slots afectados (NumPy sobre las
+columnas `array`); la serialización, la escritura y el fsync van fuera.
+
+Cada registro es `[longitud: u32][crc32: u32][payload]`, como en el spool, y
+el payload `[longitud: u32][cabecera JSON][last_seen y columnas en binario]`.
+`restore()` aplica la última instantánea y sus deltas en orden (un registro
+truncado o corrupto al final, de una caída a mitad de escritura, se ignora)
+y carga las columnas en bloque. Los paquetes sin mensajes en los últimos
+`max_age_s` segundos se descartan: su racha ya no describe el envío.
+"""
+
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+
+import msgspec
+import numpy as np
+
+from observability.logs import fields, get_logger
+
+logger = get_logger("checkpoint")
+
+FULL = "full"
+DELTA = "delta"
+
+_HEADER = struct.Struct("<II")  # longitud, crc32
+_META_LEN = struct.Struct("<I")
+
+
+class CheckpointHeader(msgspec.Struct):
+    kind: str
+    written_at: float
+    columns: list                 # [[nombre, typecode], ...] en el orden de los bloques binarios
+    ids: list                     # del menos al más recientemente usado
+    removed: list = msgspec.field(default_factory=list)
+    meta: dict = msgspec.field(default_factory=dict)
+
+
+_decoder = msgspec.json.Decoder(CheckpointHeader)
+
+
+def _take(col, slots):
+    # La vista de NumPy es temporal: mientras existe, el array no puede crecer (BufferError)
+    return np.frombuffer(col, dtype=col.typecode)[slots]
+
+
+def _lru_order(ids_by_slot, blocks):
+    """Del volcado por slot al orden LRU: slots ocupados ordenados por last_seen (orden de uso)."""
+    used = np.fromiter((pid is not None for pid in ids_by_slot), dtype=bool, count=len(ids_by_slot))
+    slots = np.flatnonzero(used)
+    last_seen = np.frombuffer(blocks[0], dtype=np.float64)
+    order = slots[np.argsort(last_seen[slots], kind="stable")]
+    ids = [ids_by_slot[slot] for slot in order.tolist()]
+    return ids, [np.frombuffer(block, dtype=block.typecode)[order] for block in blocks]
+
+
+def encode_record(header, blocks):
+    meta = msgspec.json.encode(header)
+    payload = b"".join([_META_LEN.pack(len(meta)), meta, *(b.tobytes() for b in blocks)])
+    return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_records(path):
+    """Registros válidos del fichero en orden: (cabecera, last_seen, {nombre: bloque}).
+
+    Se detiene en el primer registro truncado o con CRC incorrecto.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    records = []
+    pos = 0
+    while pos + _HEADER.size <= len(data):
+        length, crc = _HEADER.unpack_from(data, pos)
+        start = pos + _HEADER.size
+        end = start + length
+        if end > len(data) or zlib.crc32(memoryview(data)[start:end]) != crc:
+            logger.warning("Checkpoint %s: registro incompleto o corrupto en el byte %d; se ignora el resto",
+                           path, pos)
+            break
+        (meta_len,) = _META_LEN.unpack_from(data, start)
+        offset = start + _META_LEN.size
+        header = _decoder.decode(memoryview(data)[offset:offset + meta_len])
+        offset += meta_len
+        n = len(header.ids)
+        blocks = {}
+        for name, typecode in [("", "d"), *header.columns]:
+            block = np.frombuffer(data, dtype=typecode, count=n, offset=offset)
+            offset += block.nbytes
+            blocks[name] = block
+        records.append((header, blocks.pop(""), blocks))
+        pos = end
+    return records
+
+
+class StateCheckpointer:
+    """Checkpoints periódicos (instantánea + deltas) de un `PackageStateStore`."""
+
+    def __init__(self, store, path, lock, interval_s=5.0, full_every=60, max_age_s=900.0,
+                 extras=None, fsync=True, on_write=None):
+        self.store = store
+        self.path = path
+        self.lock = lock                # el mismo lock que protege el estado en el procesador
+        self.interval_s = interval_s
+        self.full_every = full_every
+        self.max_age_s = max_age_s
+        self.extras = extras or {}      # nombre -> objeto con checkpoint_meta() / restore_meta(meta)
+        self.fsync = fsync
+        self.on_write = on_write        # callback(kind, segundos, bytes)
+
+        self._file = None
+        self._deltas = 0
+        self._since = float("-inf")
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {FULL: 0, DELTA: 0, "bytes": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        store.released = []
+        store.changed = set()
+
+    # --- Ciclo de vida ---
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="state-checkpointer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        """Para el hilo y deja una instantánea completa (parada ordenada)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        try:
+            self.checkpoint(full=True)
+        except OSError as e:
+            logger.error("No se pudo guardar el checkpoint final: %s", e)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.checkpoint()
+            except OSError as e:
+                logger.error("No se pudo guardar el checkpoint: %s", e)
+
+    # --- Escritura ---
+
+    def checkpoint(self, full=False):
+        """Guarda un delta (o una instantánea completa). Devuelve el tipo escrito."""
+        with self.lock:
+            header, blocks = self._capture(full or self._file is None or self._deltas >= self.full_every)
+        start = time.perf_counter()
+        if header.kind == FULL:
+            header.ids, blocks = _lru_order(header.ids, blocks)
+        record = encode_record(header, blocks)
+        if header.kind == FULL:
+            self._write_full(record)
+            self._deltas = 0
+        else:
+            self._file.write(record)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._deltas += 1
+        self.stats[header.kind] += 1
+        self.stats["bytes"] += len(record)
+        if self.on_write is not None:
+            self.on_write(header.kind, time.perf_counter() - start, len(record))
+        return header.kind
+
+    def _capture(self, full):
+        """Copia (bajo el lock) los paquetes a guardar: todos o los que cambiaron desde el anterior."""
+        store = self.store
+        now = store.clock()
+        if not full:
+            items = list(store.recent(self._since))
+            if store.changed:
+                # Paquetes modificados sin mensaje nuevo (ventanas cerradas por inactividad)
+                seen = {package_id for package_id, _ in items}
+                items += [(package_id, slot) for package_id in store.changed
+                          if package_id not in seen and (slot := store.get(package_id)) is not None]
+            full = 2 * len(items) >= len(store)  # casi todo ha cambiado: mejor compactar
+        columns = store.columns()
+        if full:
+            # Copias en bloque (memcpy) por slot; el orden LRU se reconstruye fuera del lock
+            ids = store.slot_ids()
+            blocks = [store.last_seen[:]] + [col[:] for _, col in columns]
+            removed = []
+        else:
+            items.reverse()
+            ids = [package_id for package_id, _ in items]
+            slots = np.fromiter((slot for _, slot in items), dtype=np.int64, count=len(items))
+            blocks = [_take(store.last_seen, slots)] + [_take(col, slots) for _, col in columns]
+            removed = store.released
+        store.released = []
+        store.changed = set()
+        self._since = now
+
+        header = CheckpointHeader(
+            kind=FULL if full else DELTA,
+            written_at=now,
+            columns=[[name, col.typecode] for name, col in columns],
+            ids=ids,
+            removed=removed,
+            meta={name: extra.checkpoint_meta() for name, extra in self.extras.items()},
+        )
+        return header, blocks
+
+    def _write_full(self, record):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(record)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "ab")
+
+    # --- Restauración ---
+
+    def restore(self, now=None):
+        """Carga el último checkpoint en el almacén (vacío). Devuelve los paquetes restaurados."""
+        if not os.path.exists(self.path):
+            return 0
+        start = time.perf_counter()
+        records = read_records(self.path)
+        fulls = [i for i, (header, _, _) in enumerate(records) if header.kind == FULL]
+        if not fulls:
+            logger.warning("Checkpoint %s sin instantánea completa válida; se empieza de cero", self.path)
+            return 0
+        records = records[fulls[-1]:]
+
+        # Posición final de cada paquete: los deltas lo mueven al final del orden LRU
+        order = {}
+        base = 0
+        for header, _, _ in records:
+            for package_id in header.removed:
+                order.pop(package_id, None)
+            for i, package_id in enumerate(header.ids):
+                order.pop(package_id, None)
+                order[package_id] = base + i
+            base += len(header.ids)
+
+        rows = np.fromiter(order.values(), dtype=np.int64, count=len(order))
+        last_seen = np.concatenate([ls for _, ls, _ in records])[rows]
+        now = self.store.clock() if now is None else now
+        keep = last_seen >= now - self.max_age_s
+        rows, last_seen = rows[keep], last_seen[keep]
+        ids = [package_id for package_id, kept in zip(order, keep.tolist()) if kept]
+        # Un delta puede traer paquetes modificados sin mensaje nuevo: el orden LRU es el de last_seen
+        lru = np.argsort(last_seen, kind="stable")
+        rows, last_seen = rows[lru], last_seen[lru]
+        ids = [ids[i] for i in lru.tolist()]
+
+        columns = {}
+        for name, typecode in records[-1][0].columns:
+            parts = [blocks.get(name) for _, _, blocks in records]
+            if all(p is not None and p.dtype == np.dtype(typecode) for p in parts):
+                columns[name] = array(typecode, np.concatenate(parts)[rows].tobytes())
+
+        self.store.restore(ids, array("d", last_seen.tobytes()), columns)
+        meta = records[-1][0].meta
+        for name, extra in self.extras.items():
+            if name in meta:
+                extra.restore_meta(meta[name])
+        self._since = now
+        logger.info("Estado restaurado: %d paquetes (%d descartados por antigüedad) en %.0f ms",
+                    len(ids), len(order) - len(ids), (time.perf_counter() - start) * 1000,
+                    extra=fields(checkpoint=self.path, registros=len(records)))
+        return len(ids)
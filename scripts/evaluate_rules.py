@@ -0,0 +1,229 @@
+"""
+Evaluación offline de la regla de N eventos consecutivos sobre labels.csv.
+
+Aplica la misma regla que `process_telemetry` (alerta si temperatura > T o
+fuerza_g > G durante N lecturas consecutivas del mismo id_paquete, ver
+`sustained_threshold_rule` en scripts/rules.py) y calcula
+matriz de confusión, recall, precisión y F1 para cada combinación de la
+rejilla TEMP_UMBRAL × G_FORCE_UMBRAL × CONSECUTIVE_EVENTS.
+
+En lugar de iterar fila a fila, las rachas de eventos por paquete se calculan
+con operaciones NumPy agrupadas (cumsum + maximum.accumulate). Para cada par
+(T, G) basta una pasada: con la longitud de racha de cada lectura, los
+resultados para todos los N salen de un histograma acumulado.
+
+Una lectura se predice como alerta si, tras procesarla, el contador
+`consecutive` del procesador es >= N. Las lecturas que el procesador
+rechaza al validar el esquema (sin temperatura o fuerza_g, o fuera de los
+rangos de schemas/telemetry.py) se descartan: no cuentan en la matriz de
+confusión ni cortan la racha de su paquete. `--verify` compara el resultado
+con el `RuleEngine` del procesador, lectura a lectura.
+
+Ejecuta:
+    python -m scripts.evaluate_rules labels.csv --temps 6:10:0.5 --gforces 1.5,2,2.5 --ns 1:6
+    python -m scripts.evaluate_rules labels.csv --verify
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from schemas.telemetry import GForce, Temperature
+from scripts.rules import RuleEngine, sustained_threshold_rule
+from scripts.state_store import PackageStateStore
+
+# Mismos valores por defecto que scripts/processor.py
+DEFAULT_TEMP_UMBRAL = 8.0
+DEFAULT_G_FORCE_UMBRAL = 2.5
+DEFAULT_CONSECUTIVE_EVENTS = 3
+
+
+# --- Carga y preparación ---
+
+def load_labels(path, label_col="label"):
+    """Lee el CSV etiquetado y lo ordena como llegaría al procesador (por paquete y tiempo)."""
+    df = pd.read_csv(path)
+    return prepare(df, label_col)
+
+
+def _schema_range(annotated):
+    meta = annotated.__metadata__[0]
+    return meta.ge, meta.le
+
+
+def prepare(df, label_col="label"):
+    """Devuelve arrays NumPy ordenados por (id_paquete, timestamp_utc), sin las lecturas que el
+    procesador rechazaría por faltar temperatura o fuerza_g o salir de los rangos del esquema
+    (`dropped` cuenta cuántas)."""
+    # Los NaN no están en ningún rango: también quedan fuera
+    valid = df["temperatura"].between(*_schema_range(Temperature)) & df["fuerza_g"].between(*_schema_range(GForce))
+    dropped = int((~valid).sum())
+    if dropped:
+        df = df[valid]
+    codes, _ = pd.factorize(df["id_paquete"])
+    if "timestamp_utc" in df.columns:
+        ts = pd.to_datetime(df["timestamp_utc"], utc=True, format="ISO8601").to_numpy(dtype="datetime64[ns]").view("i8")
+        order = np.lexsort((ts, codes))  # estable: empates conservan el orden del fichero
+    else:
+        order = np.argsort(codes, kind="stable")
+
+    codes = codes[order]
+    group_start = np.empty(len(codes), dtype=bool)
+    if len(codes):
+        group_start[0] = True
+        group_start[1:] = codes[1:] != codes[:-1]
+
+    return {
+        "temp": df["temperatura"].to_numpy(dtype=np.float64)[order],
+        "g": df["fuerza_g"].to_numpy(dtype=np.float64)[order],
+        "label": df[label_col].to_numpy().astype(bool)[order],
+        "group_start": group_start,
+        "package": codes,
+        "dropped": dropped,
+    }
+
+
+# --- Núcleo vectorizado ---
+
+def run_lengths(events, group_start):
+    """Contador `consecutive` tras cada lectura: longitud de la racha de eventos
+    que termina en ella, reiniciada en cada lectura sin evento y en cada paquete nuevo."""
+    c = np.cumsum(events, dtype=np.int64)
+    # Puntos de reinicio: lectura sin evento (base = c) o inicio de paquete con evento (base = c - 1)
+    reset = np.where(~events, c, np.where(group_start, c - 1, -1))
+    base = np.maximum.accumulate(reset)
+    return np.where(events, c - base, 0)
+
+
+def confusion_for_all_n(streak, labels, ns):
+    """Matriz de confusión para cada N a partir de un histograma de rachas."""
+    max_n = max(ns)
+    clipped = np.minimum(streak, max_n)
+    pos = np.bincount(clipped[labels], minlength=max_n + 1)
+    neg = np.bincount(clipped[~labels], minlength=max_n + 1)
+    # Nº de lecturas con racha >= N = suma de la cola del histograma
+    pos_ge = np.cumsum(pos[::-1])[::-1]
+    neg_ge = np.cumsum(neg[::-1])[::-1]
+    total_pos, total_neg = int(labels.sum()), int((~labels).sum())
+    out = []
+    for n in ns:
+        tp, fp = int(pos_ge[n]), int(neg_ge[n])
+        out.append((n, tp, fp, total_pos - tp, total_neg - fp))
+    return out
+
+
+def grid_search(data, temps, gforces, ns):
+    """Evalúa toda la rejilla y devuelve un DataFrame con una fila por combinación."""
+    rows = []
+    labels, group_start = data["label"], data["group_start"]
+    g_events = {g: data["g"] > g for g in gforces}
+    for t in temps:
+        temp_events = data["temp"] > t
+        for g in gforces:
+            streak = run_lengths(temp_events | g_events[g], group_start)
+            for n, tp, fp, fn, tn in confusion_for_all_n(streak, labels, ns):
+                rows.append((t, g, n, tp, fp, fn, tn))
+
+    res = pd.DataFrame(rows, columns=["temp_umbral", "g_force_umbral", "consecutive_events", "tp", "fp", "fn", "tn"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        res["recall"] = res.tp / (res.tp + res.fn)
+        res["precision"] = res.tp / (res.tp + res.fp)
+        res["f1"] = 2 * res.tp / (2 * res.tp + res.fp + res.fn)
+    return res.fillna(0.0)
+
+
+# --- Referencia: el motor de reglas del procesador (para verificar) ---
+
+def engine_predictions(data, temp_umbral, g_force_umbral, n):
+    """Contador de la regla en el `RuleEngine` del procesador >= N, lectura a lectura (lento)."""
+    rule = sustained_threshold_rule(temp_umbral, g_force_umbral, n)
+    store = PackageStateStore(ttl_seconds=None, max_packages=len(data["temp"]) + 1)
+    engine = RuleEngine([rule], store)
+    count = store.column(f"rule:{rule['name']}:count")
+    preds = np.zeros(len(data["temp"]), dtype=bool)
+    readings = zip(data["package"].tolist(), data["temp"].tolist(), data["g"].tolist())
+    for i, (package, temp, g) in enumerate(readings):
+        slot = store.touch(package, now=0.0)
+        engine.evaluate({"temperatura": temp, "fuerza_g": g}, slot, now=0.0)
+        preds[i] = count[slot] >= n
+    return preds
+
+
+def verify(data, temps, gforces, ns):
+    """Comprueba que el cálculo vectorizado coincide con el motor de reglas del procesador."""
+    for t in temps:
+        for g in gforces:
+            streak = run_lengths((data["temp"] > t) | (data["g"] > g), data["group_start"])
+            for n in ns:
+                if not np.array_equal(streak >= n, engine_predictions(data, t, g, n)):
+                    raise AssertionError(f"Discrepancia con el motor de reglas para T={t}, G={g}, N={n}")
+
+
+# --- CLI ---
+
+def parse_values(spec, cast=float):
+    """'6,7,8' o 'inicio:fin:paso' (fin incluido)."""
+    if ":" in spec:
+        parts = [float(x) for x in spec.split(":")]
+        start, stop = parts[0], parts[1]
+        step = parts[2] if len(parts) > 2 else 1.0
+        values = np.arange(start, stop + step / 2, step)
+        return [cast(round(v, 6)) for v in values]
+    return [cast(x) for x in spec.split(",")]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Evaluación vectorizada de la regla de N eventos sobre labels.csv")
+    ap.add_argument("labels", help="CSV con id_paquete, timestamp_utc, temperatura, fuerza_g y la etiqueta")
+    ap.add_argument("--label-col", default="label", help="Columna con la etiqueta real (0/1)")
+    ap.add_argument("--temps", default=str(DEFAULT_TEMP_UMBRAL), help="Umbrales de temperatura: '6,8' o '6:10:0.5'")
+    ap.add_argument("--gforces", default=str(DEFAULT_G_FORCE_UMBRAL), help="Umbrales de fuerza G")
+    ap.add_argument("--ns", default=str(DEFAULT_CONSECUTIVE_EVENTS), help="Valores de CONSECUTIVE_EVENTS: '3' o '1:6'")
+    ap.add_argument("--out", default=None, help="CSV de salida con todas las combinaciones")
+    ap.add_argument("--top", type=int, default=10, help="Combinaciones a mostrar (ordenadas por recall y F1)")
+    ap.add_argument("--verify", action="store_true", help="Comparar con el motor de reglas del procesador (lento)")
+    args = ap.parse_args()
+
+    temps = parse_values(args.temps)
+    gforces = parse_values(args.gforces)
+    ns = parse_values(args.ns, cast=int)
+
+    t0 = time.perf_counter()
+    data = load_labels(args.labels, args.label_col)
+    t1 = time.perf_counter()
+    res = grid_search(data, temps, gforces, ns)
+    t2 = time.perf_counter()
+
+    print(f"[INFO] {len(data['temp'])} lecturas cargadas en {t1 - t0:.2f} s; "
+          f"{len(res)} combinaciones evaluadas en {t2 - t1:.2f} s")
+    if data["dropped"]:
+        print(f"[INFO] {data['dropped']} lecturas sin temperatura o fuerza_g válidas descartadas (el procesador las rechaza)")
+
+    if args.verify:
+        verify(data, temps, gforces, ns)
+        print("[OK] Resultados idénticos al motor de reglas del procesador.")
+
+    best = res.sort_values(["recall", "f1"], ascending=False).head(args.top)
+    print(best.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+
+    current = res[(res.temp_umbral == DEFAULT_TEMP_UMBRAL) & (res.g_force_umbral == DEFAULT_G_FORCE_UMBRAL)
+                  & (res.consecutive_events == DEFAULT_CONSECUTIVE_EVENTS)]
+    if len(current):
+        r = current.iloc[0]
+        print(f"\nRegla actual del procesador (T>{DEFAULT_TEMP_UMBRAL}, G>{DEFAULT_G_FORCE_UMBRAL}, N={DEFAULT_CONSECUTIVE_EVENTS}):")
+        print("                 Pred. alerta  Pred. normal")
+        print(f"  Real incidente  {int(r.tp):>12}  {int(r.fn):>12}")
+        print(f"  Real normal     {int(r.fp):>12}  {int(r.tn):>12}")
+        print(f"  Recall={r.recall:.4f}  Precisión={r.precision:.4f}  F1={r.f1:.4f}")
+
+    if args.out:
+        res.to_csv(args.out, index=False)
+        print(f"\n[INFO] Resultados guardados en {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
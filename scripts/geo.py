@@ -0,0 +1,303 @@
+"""
+Detección geoespacial: desvíos de la ruta planificada y geocercas.
+
+Las rutas (polilíneas de waypoints con un corredor en metros) y las zonas
+(depósitos, zonas restringidas: círculos o polígonos) se cargan de un JSON
+(GEO_CONFIG_FILE, ver geo_config.example.json) y se indexan una sola vez en
+una rejilla uniforme de GEO_CELL_DEG grados:
+
+- Cada tramo de ruta se trocea en piezas no más largas que una celda y cada
+  pieza se registra en las celdas que cubre su caja ampliada con el corredor.
+  La clave de la celda incluye la ruta, así que una lectura solo se compara
+  con las piezas de SU ruta que están en SU celda (casi siempre 1-3), sea
+  cual sea el nº de rutas o su longitud. Si la celda no tiene piezas, el
+  camión está fuera del corredor sin calcular ninguna distancia.
+- Cada zona se registra en las celdas que cubre su caja; una lectura solo se
+  prueba contra las zonas de su celda.
+
+`GeoDetector` guarda el estado por paquete (fuera de ruta, racha, zonas
+actuales) en columnas del `PackageStateStore` del procesador y devuelve
+`GeoEvent`s al cambiar: desvío / vuelta a la ruta (con racha GEO_DEVIATION_SUSTAIN
+e histéresis) y entrada / salida de zonas.
+"""
+
+import json
+import math
+import os
+from array import array
+from collections import namedtuple
+
+GEO_CONFIG_FILE = os.getenv("GEO_CONFIG_FILE")                 # JSON con rutas y zonas (vacío = desactivado)
+GEO_ROUTE_FIELD = os.getenv("GEO_ROUTE_FIELD", "ruta")         # Campo del mensaje con la ruta asignada
+GEO_DEFAULT_ROUTE = os.getenv("GEO_DEFAULT_ROUTE")             # Ruta si el mensaje no trae ninguna
+GEO_CELL_DEG = float(os.getenv("GEO_CELL_DEG", 0.05))          # Tamaño de celda de la rejilla (~5 km)
+GEO_CORRIDOR_M = float(os.getenv("GEO_CORRIDOR_M", 2000))      # Corredor por defecto a cada lado de la ruta
+GEO_DEVIATION_SUSTAIN = int(os.getenv("GEO_DEVIATION_SUSTAIN", 2))  # Lecturas seguidas fuera para alertar
+GEO_HYSTERESIS = float(os.getenv("GEO_HYSTERESIS", 0.8))       # Vuelve a ruta por debajo de corredor * factor
+
+M_PER_DEG_LAT = 110_574.0
+M_PER_DEG_LON = 111_320.0  # en el ecuador; se multiplica por cos(latitud)
+
+# kind: deviation | back_on_route | enter | leave; alert = si merece notificación
+GeoEvent = namedtuple("GeoEvent", "kind target reason distance_m alert")
+
+ZONE_ALERTS = {"restricted": ("enter",)}  # Transiciones que alertan por tipo de zona (si la zona no dice otra cosa)
+
+
+class Route:
+    """Polilínea planificada con su corredor admisible."""
+
+    __slots__ = ("name", "points", "corridor_m")
+
+    def __init__(self, name, points, corridor_m=None):
+        if len(points) < 2:
+            raise ValueError(f"Ruta {name}: hacen falta al menos 2 puntos")
+        self.name = name
+        self.points = [(float(lat), float(lon)) for lat, lon in points]
+        self.corridor_m = float(corridor_m if corridor_m is not None else GEO_CORRIDOR_M)
+
+
+class Zone:
+    """Geocerca circular (`center` + `radius_m`) o poligonal (`polygon`, lista de [lat, lon])."""
+
+    __slots__ = ("name", "kind", "center", "radius_m", "polygon", "alert", "bbox")
+
+    def __init__(self, name, kind="zone", center=None, radius_m=None, polygon=None, alert=None):
+        if (center is None) == (polygon is None):
+            raise ValueError(f"Zona {name}: define `center` + `radius_m` o `polygon`")
+        self.name = name
+        self.kind = kind
+        self.alert = frozenset(alert if alert is not None else ZONE_ALERTS.get(kind, ()))
+        if not self.alert <= {"enter", "leave"}:
+            raise ValueError(f"Zona {name}: `alert` solo admite 'enter' y 'leave'")
+        if center is not None:
+            if not radius_m or radius_m <= 0:
+                raise ValueError(f"Zona {name}: radius_m debe ser > 0")
+            self.center = (float(center[0]), float(center[1]))
+            self.radius_m = float(radius_m)
+            self.polygon = None
+            dlat = self.radius_m / M_PER_DEG_LAT
+            dlon = self.radius_m / (M_PER_DEG_LON * math.cos(math.radians(min(89.0, abs(self.center[0]) + dlat))))
+            self.bbox = (self.center[0] - dlat, self.center[1] - dlon, self.center[0] + dlat, self.center[1] + dlon)
+        else:
+            if len(polygon) < 3:
+                raise ValueError(f"Zona {name}: el polígono necesita al menos 3 vértices")
+            self.center = self.radius_m = None
+            self.polygon = [(float(lat), float(lon)) for lat, lon in polygon]
+            lats = [p[0] for p in self.polygon]
+            lons = [p[1] for p in self.polygon]
+            self.bbox = (min(lats), min(lons), max(lats), max(lons))
+
+    def contains(self, lat, lon):
+        if self.polygon is None:
+            dy = (lat - self.center[0]) * M_PER_DEG_LAT
+            dx = (lon - self.center[1]) * M_PER_DEG_LON * math.cos(math.radians(lat))
+            return dx * dx + dy * dy <= self.radius_m * self.radius_m
+        # Ray casting (las zonas son pequeñas: basta con coordenadas en grados)
+        inside = False
+        pts = self.polygon
+        j = len(pts) - 1
+        for i in range(len(pts)):
+            yi, xi = pts[i]
+            yj, xj = pts[j]
+            if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+                inside = not inside
+            j = i
+        return inside
+
+
+def load_geo_config(source=None):
+    """(rutas, zonas) desde un dict, un fichero JSON o GEO_CONFIG_FILE."""
+    source = GEO_CONFIG_FILE if source is None else source
+    if isinstance(source, str):
+        with open(source, encoding="utf-8") as f:
+            source = json.load(f)
+    if not source:
+        raise ValueError("No hay configuración geoespacial")
+    routes = [r if isinstance(r, Route) else Route(**r) for r in source.get("routes", [])]
+    zones = [z if isinstance(z, Zone) else Zone(**z) for z in source.get("zones", [])]
+    for what, items in (("rutas", routes), ("zonas", zones)):
+        names = [item.name for item in items]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Nombres de {what} duplicados")
+    return routes, zones
+
+
+class SpatialIndex:
+    """Rejilla uniforme sobre piezas de ruta (por ruta) y zonas."""
+
+    def __init__(self, routes, zones, cell_deg=GEO_CELL_DEG):
+        if not 0.001 <= cell_deg <= 5:
+            raise ValueError("GEO_CELL_DEG debe estar entre 0.001 y 5 grados")
+        self.cell_deg = cell_deg
+        self.routes = list(routes)
+        self.zones = list(zones)
+        self.route_ids = {r.name: i for i, r in enumerate(self.routes)}
+        # Piezas de ruta: extremos en grados, en columnas contiguas
+        self._lat0, self._lon0 = array("d"), array("d")
+        self._lat1, self._lon1 = array("d"), array("d")
+        self._route_cells = {}  # clave(ruta, celda) -> [pieza, ...]
+        self._zone_cells = {}   # clave(celda) -> [zona, ...]
+
+        for route_id, route in enumerate(self.routes):
+            for (lat0, lon0), (lat1, lon1) in zip(route.points, route.points[1:]):
+                n = max(1, math.ceil(max(abs(lat1 - lat0), abs(lon1 - lon0)) / cell_deg))
+                for k in range(n):
+                    a, b = k / n, (k + 1) / n
+                    self._add_piece(route_id, route.corridor_m,
+                                    lat0 + (lat1 - lat0) * a, lon0 + (lon1 - lon0) * a,
+                                    lat0 + (lat1 - lat0) * b, lon0 + (lon1 - lon0) * b)
+        for zone_id, zone in enumerate(self.zones):
+            for key in self._cells(*zone.bbox):
+                self._zone_cells.setdefault(key, []).append(zone_id)
+
+    # Celdas: (fila, columna) de la rejilla empaquetadas en un int (claves de dict baratas);
+    # en las piezas de ruta, el id de la ruta va en los bits altos
+    def _cell(self, lat, lon):
+        return (math.floor((lat + 90.0) / self.cell_deg) << 20) | math.floor((lon + 180.0) / self.cell_deg)
+
+    def _cells(self, lat_min, lon_min, lat_max, lon_max):
+        r0, r1 = math.floor((lat_min + 90.0) / self.cell_deg), math.floor((lat_max + 90.0) / self.cell_deg)
+        c0, c1 = math.floor((lon_min + 180.0) / self.cell_deg), math.floor((lon_max + 180.0) / self.cell_deg)
+        return [(r << 20) | c for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+
+    def _add_piece(self, route_id, corridor_m, lat0, lon0, lat1, lon1):
+        piece = len(self._lat0)
+        self._lat0.append(lat0)
+        self._lon0.append(lon0)
+        self._lat1.append(lat1)
+        self._lon1.append(lon1)
+        dlat = corridor_m / M_PER_DEG_LAT
+        max_lat = min(89.0, max(abs(lat0), abs(lat1)) + dlat)
+        dlon = corridor_m / (M_PER_DEG_LON * math.cos(math.radians(max_lat)))
+        base = route_id << 40
+        for key in self._cells(min(lat0, lat1) - dlat, min(lon0, lon1) - dlon,
+                               max(lat0, lat1) + dlat, max(lon0, lon1) + dlon):
+            self._route_cells.setdefault(base | key, []).append(piece)
+
+    def route_distance(self, route_id, lat, lon):
+        """Distancia (m) a la ruta, o None si no hay ninguna pieza a menos de su corredor (celda vacía)."""
+        pieces = self._route_cells.get((route_id << 40) | self._cell(lat, lon))
+        if pieces is None:
+            return None
+        kx = M_PER_DEG_LON * math.cos(math.radians(lat))
+        lat0, lon0, lat1, lon1 = self._lat0, self._lon0, self._lat1, self._lon1
+        best = math.inf
+        for p in pieces:
+            # Proyección equirectangular local centrada en la lectura
+            ax = (lon0[p] - lon) * kx
+            ay = (lat0[p] - lat) * M_PER_DEG_LAT
+            dx = (lon1[p] - lon) * kx - ax
+            dy = (lat1[p] - lat) * M_PER_DEG_LAT - ay
+            den = dx * dx + dy * dy
+            t = 0.0 if den == 0 else min(1.0, max(0.0, -(ax * dx + ay * dy) / den))
+            cx, cy = ax + t * dx, ay + t * dy
+            d = cx * cx + cy * cy
+            if d < best:
+                best = d
+        return math.sqrt(best)
+
+    def zones_at(self, lat, lon):
+        """Índices (ordenados) de las zonas que contienen el punto."""
+        candidates = self._zone_cells.get(self._cell(lat, lon))
+        if candidates is None:
+            return ()
+        zones = self.zones
+        return tuple(z for z in candidates if zones[z].contains(lat, lon))
+
+    def stats(self):
+        return {"routes": len(self.routes), "zones": len(self.zones), "route_pieces": len(self._lat0),
+                "route_cells": len(self._route_cells), "zone_cells": len(self._zone_cells)}
+
+
+class GeoDetector:
+    """Desvíos de ruta y geocercas sobre el estado por paquete de un `PackageStateStore`."""
+
+    def __init__(self, config, store, route_field=GEO_ROUTE_FIELD, default_route=GEO_DEFAULT_ROUTE,
+                 sustain=GEO_DEVIATION_SUSTAIN, hysteresis=GEO_HYSTERESIS, cell_deg=GEO_CELL_DEG):
+        routes, zones = config if isinstance(config, tuple) else load_geo_config(config)
+        self.index = SpatialIndex(routes, zones, cell_deg)
+        self.route_field = route_field
+        self.default_route = default_route
+        self.sustain = max(1, int(sustain))
+        self.hysteresis = hysteresis
+        self._off = store.add_column("geo:off", "b", 0)
+        self._off_count = store.add_column("geo:off_count", "I", 0)
+        self._zone_set = store.add_column("geo:zones", "I", 0)
+        # Conjuntos de zonas internados: la columna guarda un id (0 = ninguna zona)
+        self._zone_sets = [()]
+        self._zone_set_ids = {(): 0}
+
+    def check(self, data, slot):
+        """Aplica la lectura. Devuelve la lista de `GeoEvent` (casi siempre vacía)."""
+        lat, lon = data.get("latitud"), data.get("longitud")
+        if lat is None or lon is None:
+            return []
+        events = []
+        index = self.index
+
+        route_id = index.route_ids.get(data.get(self.route_field) or self.default_route)
+        if route_id is not None:
+            route = index.routes[route_id]
+            distance = index.route_distance(route_id, lat, lon)
+            if self._off[slot]:
+                if distance is not None and distance <= route.corridor_m * self.hysteresis:
+                    self._off[slot] = 0
+                    self._off_count[slot] = 0
+                    events.append(GeoEvent("back_on_route", route.name, f"De vuelta en la ruta {route.name}",
+                                           round(distance), False))
+            elif distance is None or distance > route.corridor_m:
+                n = self._off_count[slot] + 1
+                self._off_count[slot] = n
+                if n >= self.sustain:
+                    self._off[slot] = 1
+                    events.append(GeoEvent("deviation", route.name, f"Desvío de la Ruta {route.name}",
+                                           None if distance is None else round(distance), True))
+            else:
+                self._off_count[slot] = 0
+
+        previous = self._zone_sets[self._zone_set[slot]]
+        current = index.zones_at(lat, lon) if index.zones else ()
+        if current != previous:
+            for z in previous:
+                if z not in current:
+                    zone = index.zones[z]
+                    events.append(GeoEvent("leave", zone.name, f"Salida de {zone.kind} {zone.name}", None,
+                                           "leave" in zone.alert))
+            for z in current:
+                if z not in previous:
+                    zone = index.zones[z]
+                    events.append(GeoEvent("enter", zone.name, f"Entrada en {zone.kind} {zone.name}", None,
+                                           "enter" in zone.alert))
+            self._zone_set[slot] = self._intern(current)
+        return events
+
+    def off_route(self, slot):
+        return bool(self._off[slot])
+
+    def describe(self):
+        s = self.index.stats()
+        return (f"{s['routes']} rutas ({s['route_pieces']} piezas, {s['route_cells']} celdas) y "
+                f"{s['zones']} zonas ({s['zone_cells']} celdas), celda {self.index.cell_deg}°")
+
+    # --- Checkpoints (ver scripts/checkpoint.py) ---
+
+    def checkpoint_meta(self):
+        """Tabla de conjuntos de zonas internados, por nombre: la columna geo:zones guarda índices a ella."""
+        zones = self.index.zones
+        return [[zones[z].name for z in zone_set] for zone_set in self._zone_sets]
+
+    def restore_meta(self, zone_sets):
+        """Reconstruye la tabla con los mismos índices que al guardarla (sin las zonas que ya no existen)."""
+        ids = {zone.name: z for z, zone in enumerate(self.index.zones)}
+        self._zone_sets = [tuple(sorted(ids[n] for n in names if n in ids)) for names in zone_sets] or [()]
+        self._zone_set_ids = {}
+        for set_id, zone_set in enumerate(self._zone_sets):
+            self._zone_set_ids.setdefault(zone_set, set_id)
+
+    def _intern(self, zones):
+        set_id = self._zone_set_ids.get(zones)
+        if set_id is None:
+            set_id = self._zone_set_ids[zones] = len(self._zone_sets)
+            self._zone_sets.append(zones)
+        return set_id
@@ -0,0 +1,112 @@
+"""
+Cliente HTTP compartido con pools de conexiones keep-alive por host.
+
+Sustituye a las llamadas sueltas `requests.post(...)`, que abren una conexión
+TCP (y un handshake TLS en el caso de Discord) en cada petición. Aquí se
+mantiene una sesión por host (esquema + host:puerto) cuyas conexiones se
+reutilizan entre hilos.
+
+Si HTTP_CLIENT_HTTP2=1 y está instalado `httpx[http2]`, se usa HTTP/2 (varias
+peticiones multiplexadas sobre una única conexión TLS). `requests`/urllib3 no
+soportan pipelining HTTP/1.1, así que sin HTTP/2 se usa keep-alive con un pool.
+
+Configuración (variables de entorno):
+- HTTP_POOL_MAXSIZE: conexiones keep-alive por host (por defecto 16)
+- HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT: timeouts por defecto (segundos)
+- HTTP_CLIENT_HTTP2: 1 para intentar HTTP/2
+"""
+
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 16))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 3.0))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 10.0))
+HTTP_CLIENT_HTTP2 = os.getenv("HTTP_CLIENT_HTTP2", "0") == "1"
+
+try:
+    import httpx
+    import h2  # noqa: F401  (necesario para http2=True)
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    httpx = None
+    _HTTP2_AVAILABLE = False
+
+USE_HTTP2 = HTTP_CLIENT_HTTP2 and _HTTP2_AVAILABLE
+
+# Excepciones de red/HTTP que deben capturar los llamadores
+if httpx is not None:
+    REQUEST_ERRORS = (requests.exceptions.RequestException, httpx.HTTPError)
+else:
+    REQUEST_ERRORS = (requests.exceptions.RequestException,)
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def _host_key(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _new_session():
+    if USE_HTTP2:
+        return httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=HTTP_POOL_MAXSIZE,
+                                max_keepalive_connections=HTTP_POOL_MAXSIZE),
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        )
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session(url):
+    """Sesión compartida (y su pool de conexiones) para el host de `url`."""
+    key = _host_key(url)
+    session = _sessions.get(key)
+    if session is None:
+        with _lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = _sessions[key] = _new_session()
+    return session
+
+
+def _timeout(timeout):
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    if USE_HTTP2 and isinstance(timeout, tuple):
+        return httpx.Timeout(timeout[1], connect=timeout[0])
+    return timeout
+
+
+def post(url, json=None, data=None, headers=None, timeout=None):
+    """POST reutilizando la conexión keep-alive del host."""
+    if USE_HTTP2:
+        return get_session(url).post(url, json=json, content=data, headers=headers, timeout=_timeout(timeout))
+    return get_session(url).post(url, json=json, data=data, headers=headers, timeout=_timeout(timeout))
+
+
+def get(url, headers=None, timeout=None):
+    """GET reutilizando la conexión keep-alive del host."""
+    return get_session(url).get(url, headers=headers, timeout=_timeout(timeout))
+
+
+def is_success(response):
+    return 200 <= response.status_code < 300
+
+
+def close_all():
+    """Cierra todas las sesiones (y sus conexiones) abiertas."""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
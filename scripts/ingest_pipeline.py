@@ -0,0 +1,217 @@
+"""
+Pipeline de ingesta no bloqueante para el procesador.
+
+El callback MQTT solo encola la lectura; un pool de hilos la envía a la API
+de ingesta (con sus reintentos y backoff) fuera del hilo de red de paho.
+La cola está acotada: cuando se llena se aplica una política explícita de
+contrapresión en lugar de crecer sin límite.
+
+Con `batch_size > 1` cada worker agrupa lecturas en micro-lotes y llama a
+`sender(lista)` cuando el lote alcanza `batch_size` elementos o cuando la
+lectura más antigua del lote supera `batch_max_age` segundos.
+"""
+
+import queue
+import threading
+import time
+
+from observability.logs import get_logger
+
+log = get_logger("ingest")
+
+# --- Políticas de contrapresión ---
+BACKPRESSURE_BLOCK = "block"              # Bloquea el callback hasta `put_timeout`; después descarta
+BACKPRESSURE_DROP_NEWEST = "drop_newest"  # Descarta la lectura entrante
+BACKPRESSURE_DROP_OLDEST = "drop_oldest"  # Descarta la lectura más antigua de la cola
+BACKPRESSURE_POLICIES = (BACKPRESSURE_BLOCK, BACKPRESSURE_DROP_NEWEST, BACKPRESSURE_DROP_OLDEST)
+
+_STOP = object()  # Centinela para detener a los workers
+
+
+class IngestPipeline:
+    """Cola acotada + pool de workers que llaman a `sender(item)`."""
+
+    def __init__(self, sender, workers=4, max_queue=10000,
+                 backpressure=BACKPRESSURE_BLOCK, put_timeout=5.0, on_drop=None,
+                 batch_size=1, batch_max_age=0.5):
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Política de contrapresión desconocida: {backpressure}")
+        if workers < 1:
+            raise ValueError("Se necesita al menos un worker de ingesta")
+        if batch_size < 1:
+            raise ValueError("batch_size debe ser >= 1")
+
+        self.sender = sender
+        self.num_workers = workers
+        self.backpressure = backpressure
+        self.put_timeout = put_timeout
+        self.on_drop = on_drop  # callback(item, motivo) al descartar una lectura
+        self.batch_size = batch_size
+        self.batch_max_age = batch_max_age
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+
+        # Contadores básicos
+        self.submitted = 0
+        self.dropped = 0
+        self.processed = 0
+        self.errors = 0
+        self.batches = 0
+
+    # --- Ciclo de vida ---
+
+    def start(self):
+        """Arranca los hilos de ingesta (idempotente)."""
+        if self._threads:
+            return
+        for i in range(self.num_workers):
+            t = threading.Thread(target=self._worker, name=f"ingest-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, drain=True, timeout=None):
+        """Detiene los workers. Con `drain=True` espera a vaciar la cola."""
+        if not self._threads:
+            return
+        if not drain:
+            self._clear()
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for t in self._threads:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            t.join(remaining)
+        self._threads = []
+
+    # --- Productor (hilo MQTT) ---
+
+    def submit(self, item):
+        """Encola una lectura. Devuelve False si se descartó por contrapresión."""
+        with self._lock:
+            self.submitted += 1
+
+        if self.backpressure == BACKPRESSURE_BLOCK:
+            try:
+                self._queue.put(item, timeout=self.put_timeout)
+                return True
+            except queue.Full:
+                self._drop(item, "cola llena (timeout)")
+                return False
+
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+
+        if self.backpressure == BACKPRESSURE_DROP_NEWEST:
+            self._drop(item, "cola llena")
+            return False
+
+        # drop_oldest: hacemos hueco sacando la lectura más antigua
+        try:
+            oldest = self._queue.get_nowait()
+            self._queue.task_done()
+            self._drop(oldest, "desplazada por una lectura más reciente")
+        except queue.Empty:
+            pass
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self._drop(item, "cola llena")
+            return False
+
+    # --- Consumidores ---
+
+    def _worker(self):
+        if self.batch_size > 1:
+            return self._batch_worker()
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self.sender(item)
+                with self._lock:
+                    self.processed += 1
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                log.exception("Error en worker de ingesta: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def _batch_worker(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                self._queue.task_done()
+                return
+
+            # El plazo del lote empieza con la primera lectura
+            batch = [first]
+            stop = False
+            deadline = time.monotonic() + self.batch_max_age
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            try:
+                self.sender(batch)
+                with self._lock:
+                    self.processed += len(batch)
+                    self.batches += 1
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                log.exception("Error en worker de ingesta (lote de %d): %s", len(batch), e)
+            finally:
+                for _ in range(len(batch) + (1 if stop else 0)):
+                    self._queue.task_done()
+            if stop:
+                return
+
+    # --- Utilidades ---
+
+    def join(self):
+        """Bloquea hasta que todas las lecturas encoladas se hayan procesado."""
+        self._queue.join()
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "batches": self.batches,
+                "queue_depth": self._queue.qsize(),
+                "workers": self.num_workers,
+            }
+
+    def _drop(self, item, reason):
+        with self._lock:
+            self.dropped += 1
+        if self.on_drop is not None:
+            self.on_drop(item, reason)
+
+    def _clear(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+                self._queue.task_done()
+            except queue.Empty:
+                return
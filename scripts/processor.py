@@ -1,40 +1,162 @@
-import requests
 import paho.mqtt.client as mqtt
-import json
 import time
 import os
+import sys
+import threading
+from urllib.parse import urlsplit
+from datetime import datetime
 from dotenv import load_dotenv
 
+from observability import metrics
+from observability.logs import fields, get_logger
+from schemas import telemetry
+from scripts import http_client
+from scripts.aggregation import WindowAggregator
+from scripts.alert_dispatcher import AlertDispatcher
+from scripts.checkpoint import StateCheckpointer
+from scripts.geo import GEO_CONFIG_FILE, GeoDetector
+from scripts.http_client import REQUEST_ERRORS
+from scripts.ingest_pipeline import IngestPipeline
+from scripts.rules import RuleEngine, load_rules, sustained_threshold_rule
+from scripts.spool import REJECTED, SegmentLog, SpoolReplayer
+from scripts.state_store import PackageStateStore
+
+# Con `python -m scripts.processor` este fichero se ejecuta como __main__ (y en cada
+# worker spawn como __mp_main__). Se registra también como scripts.processor para que
+# `from scripts import processor` (sharding.worker_main) reutilice este módulo en vez
+# de ejecutarlo otra vez y duplicar métricas, estado y pipelines.
+if __name__ in ("__main__", "__mp_main__"):
+    sys.modules.setdefault("scripts.processor", sys.modules[__name__])
+
 # Cargar variables de entorno
 load_dotenv()
 
+log = get_logger("processor")
+
 # --- CONFIGURACIÓN CRÍTICA ---
 MQTT_BROKER = os.getenv("MQTT_HOST", "mosquitto")
 MQTT_PORT = int(os.getenv("MQTT_PORT", 1883))
-MQTT_TOPIC = "greendelivery/rubia/telemetry"
+MQTT_TOPIC = os.getenv("MQTT_TOPIC", "greendelivery/rubia/telemetry")
+
+# --- Escalado horizontal: N procesos de detección repartidos por id_paquete ---
+PROCESSOR_WORKERS = int(os.getenv("PROCESSOR_WORKERS", 1))
 
 # --- CONFIGURACIÓN DE RESILIENCIA Y ACCIÓN (Cap. 5 & 4) ---
 API_INGEST_URL = os.getenv("API_INGEST_URL", "http://alonso-api:8000/ingest")
+API_INGEST_BATCH_URL = os.getenv("API_INGEST_BATCH_URL", API_INGEST_URL.rstrip("/") + "/batch")
 DISCORD_WEBHOOK_TEMP = os.getenv("DISCORD_WEBHOOK_TEMP") # Webhook para #sensor-temperatura
 DISCORD_WEBHOOK_DOOR = os.getenv("DISCORD_WEBHOOK_DOOR") # Webhook para #sensor-puerta
 MAX_RETRIES = 5
 
+# --- Pipeline de ingesta no bloqueante (cola acotada + workers) ---
+INGEST_ENABLED = os.getenv("INGEST_ENABLED", "1") == "1"  # 0 = solo detección (sin persistir)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 4))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 10000))
+INGEST_BACKPRESSURE = os.getenv("INGEST_BACKPRESSURE", "block")  # block | drop_newest | drop_oldest
+INGEST_PUT_TIMEOUT = float(os.getenv("INGEST_PUT_TIMEOUT", 5.0))  # Segundos que puede bloquearse el callback MQTT
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 1))  # 1 = una petición por lectura; >1 = micro-lotes
+INGEST_BATCH_MAX_AGE = float(os.getenv("INGEST_BATCH_MAX_AGE", 0.5))  # Segundos máximos que espera un lote incompleto
+
+# --- Spool en disco: las lecturas que agotan los reintentos no se pierden ---
+_ingest_url = urlsplit(API_INGEST_URL)
+API_HEALTH_URL = os.getenv("API_HEALTH_URL", f"{_ingest_url.scheme}://{_ingest_url.netloc}/health")
+SPOOL_ENABLED = os.getenv("SPOOL_ENABLED", "1") == "1"
+SPOOL_DIR = os.getenv("SPOOL_DIR", "spool")
+SPOOL_FSYNC = os.getenv("SPOOL_FSYNC", "interval")  # always | interval | never
+SPOOL_FSYNC_INTERVAL = float(os.getenv("SPOOL_FSYNC_INTERVAL", 1.0))
+SPOOL_SEGMENT_MB = int(os.getenv("SPOOL_SEGMENT_MB", 64))
+API_MAX_BATCH_ROWS = 5000  # MAX_BATCH_ROWS de app/routers/ingest.py: lotes mayores se rechazan con 413
+SPOOL_REPLAY_BATCH = min(int(os.getenv("SPOOL_REPLAY_BATCH", 2000)), API_MAX_BATCH_ROWS)
+
+# --- Agregación por ventanas: agregados + lecturas crudas solo alrededor de anomalías ---
+AGG_ENABLED = os.getenv("AGG_ENABLED", "0") == "1"
+API_AGG_URL = os.getenv("API_AGG_URL", API_INGEST_URL.rstrip("/") + "/aggregates")
+AGG_WINDOW_S = float(os.getenv("AGG_WINDOW_S", 60))           # Duración de cada ventana
+AGG_INACTIVITY_S = float(os.getenv("AGG_INACTIVITY_S", 180))  # Sin mensajes este tiempo: se cierra la ventana
+AGG_RAW_CONTEXT = int(os.getenv("AGG_RAW_CONTEXT", 3))        # Lecturas crudas antes/después de una anomalía
+AGG_FLUSH_INTERVAL = float(os.getenv("AGG_FLUSH_INTERVAL", 10))  # Cada cuánto se buscan paquetes inactivos
+AGG_BATCH_SIZE = int(os.getenv("AGG_BATCH_SIZE", 200))         # Agregados por petición a /ingest/aggregates
+
+# --- Observabilidad: métricas Prometheus en http://<host>:PROCESSOR_METRICS_PORT/metrics ---
+PROCESSOR_METRICS_PORT = int(os.getenv("PROCESSOR_METRICS_PORT", 9108))  # 0 = sin endpoint; cada shard usa puerto + 1 + shard
+
 # --- Umbrales del Negocio (Cap. 3) ---
 TEMP_UMBRAL = 8.0  # El enunciado original pide > 8.0°C
 G_FORCE_UMBRAL = float(os.getenv("G_FORCE_UMBRAL", 2.5)) # Añadido G-Force desde .env
 CONSECUTIVE_EVENTS = 3 # Lógica Stateful: Sostenida durante N eventos
 
-# Diccionario Global para mantener la memoria del estado de cada envío
-# Estado: {'consecutive': int, 'is_alerting_temp': bool, 'is_alerting_door': bool}
-package_state = {}
+# Reglas por defecto (ALERT_RULES_FILE las sustituye; ver alert_rules.example.json)
+DEFAULT_RULES = [
+    {
+        "name": "puerta_abierta",
+        "channel": "door",
+        "label": "PUERTA",
+        "when": [{"field": "puerta_abierta", "op": "==", "value": True}],
+        "reason": "Puerta Abierta por Manipulación",
+    },
+    sustained_threshold_rule(TEMP_UMBRAL, G_FORCE_UMBRAL, CONSECUTIVE_EVENTS),
+]
+
+# --- Estado por paquete: almacén compacto con expulsión por inactividad ---
+STATE_TTL_SECONDS = float(os.getenv("STATE_TTL_SECONDS", 6 * 3600))  # Paquetes inactivos (o ya entregados) se olvidan
+STATE_MAX_PACKAGES = int(os.getenv("STATE_MAX_PACKAGES", 200000))  # Tope duro: se expulsa el menos reciente
+STATE_REPORT_INTERVAL = float(os.getenv("STATE_REPORT_INTERVAL", 300))  # Segundos entre informes de memoria
+
+# --- Checkpoints del estado: rachas y alertas activas sobreviven a un reinicio ---
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "1") == "1"
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", "checkpoint")
+CHECKPOINT_INTERVAL_S = float(os.getenv("CHECKPOINT_INTERVAL_S", 5))  # Cada cuánto se guarda un delta
+CHECKPOINT_FULL_EVERY = int(os.getenv("CHECKPOINT_FULL_EVERY", 60))  # Deltas entre dos instantáneas completas
+CHECKPOINT_MAX_AGE_S = float(os.getenv("CHECKPOINT_MAX_AGE_S", 900))  # Paquetes sin mensajes desde hace más: se descartan
+
+# Memoria del estado de cada envío: el motor de reglas añade sus columnas (contador, alerta activa, último disparo)
+package_state = PackageStateStore(ttl_seconds=STATE_TTL_SECONDS, max_packages=STATE_MAX_PACKAGES)
+rule_engine = RuleEngine(load_rules(default=DEFAULT_RULES), package_state)
+# Desvíos de ruta y geocercas (solo si hay GEO_CONFIG_FILE; ver geo_config.example.json)
+geo_detector = GeoDetector(GEO_CONFIG_FILE, package_state) if GEO_CONFIG_FILE else None
+_last_state_report = time.monotonic()
+
+# --- MÉTRICAS ---
+# Las de cada mensaje se actualizan bajo state_lock (o solo desde el hilo MQTT): sin lock propio
+MESSAGES_RECEIVED = metrics.Counter("processor_messages_received_total", "Mensajes MQTT recibidos",
+                                    threadsafe=False)
+MESSAGES_PROCESSED = metrics.Counter("processor_messages_processed_total", "Mensajes validados y evaluados",
+                                     threadsafe=False)
+MESSAGES_INVALID = metrics.Counter("processor_messages_invalid_total", "Mensajes rechazados por el esquema",
+                                   threadsafe=False)
+MESSAGES_DROPPED = metrics.Counter("processor_messages_dropped_total",
+                                   "Registros descartados por contrapresión en la cola de ingesta")
+INGEST_RETRIES = metrics.Counter("processor_ingest_retries_total", "Reintentos de peticiones a la API de ingesta")
+INGEST_SPOOLED = metrics.Counter("processor_ingest_spooled_total", "Registros enviados al spool tras agotar reintentos")
+INGEST_LOST = metrics.Counter("processor_ingest_lost_total", "Registros perdidos (sin spool) tras agotar reintentos")
+ALERTS_FIRED = metrics.Counter("processor_alerts_total", "Eventos de las reglas de alerta", ["rule", "kind"],
+                               threadsafe=False)
+GEO_EVENTS = metrics.Counter("processor_geo_events_total", "Desvíos de ruta y entradas/salidas de geocercas",
+                             ["kind"], threadsafe=False)
+
+DECODE_SECONDS = metrics.Histogram("processor_decode_seconds", "Decodificación y validación de un mensaje",
+                                   threadsafe=False)
+RULES_SECONDS = metrics.Histogram("processor_rule_eval_seconds", "Evaluación de todas las reglas para un mensaje",
+                                  threadsafe=False)
+INGEST_SECONDS = metrics.Histogram("processor_ingest_request_seconds", "Envío a la API de ingesta (con reintentos)",
+                                   ["endpoint"])
+E2E_SECONDS = metrics.Histogram("processor_end_to_end_seconds",
+                                "Desde el timestamp del sensor hasta el fin del procesamiento", threadsafe=False)
+
+CHECKPOINT_SECONDS = metrics.Histogram("processor_checkpoint_seconds", "Serialización y escritura de un checkpoint",
+                                       ["kind"])
+SPOOL_PENDING_BYTES = metrics.Gauge("processor_spool_pending_bytes", "Bytes del spool pendientes de reenvío", ["spool"])
+metrics.Gauge("processor_tracked_packages", "Paquetes con estado en memoria").set_function(lambda: len(package_state))
 
 
 # --- FUNCIONES DE ACCIÓN (Discord Webhooks) ---
 
+alert_dispatcher = AlertDispatcher()
+
 def send_discord_alert(data, reason, webhook_url):
     """Envía un mensaje de alerta a Discord usando el Webhook específico."""
     if not webhook_url:
-        print(f"❌ ERROR: URL de Discord para {reason} no configurada. Alerta no enviada.")
+        log.error("URL de Discord para %s no configurada. Alerta no enviada.", reason)
         return
 
     # Definir propiedades visuales según la razón
@@ -44,6 +166,9 @@ def send_discord_alert(data, reason, webhook_url):
     elif "Puerta Abierta" in reason:
         color_code = 16776960  # Amarillo
         alert_title = "🚪 ALERTA OPERACIONAL DE PUERTA"
+    elif reason.startswith(("Desvío", "Entrada", "Salida")):
+        color_code = 16753920  # Naranja
+        alert_title = "🗺️ ALERTA DE RUTA / GEOCERCA"
     else:
         color_code = 65535 # Azul
         alert_title = "🚨 ALERTA GENERAL"
@@ -64,115 +189,330 @@ def send_discord_alert(data, reason, webhook_url):
         }]
     }
 
-    try:
-        response = requests.post(webhook_url, json=payload)
-        response.raise_for_status()
-        print(f"✅ Notificación enviada a Discord ({reason}).")
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error al enviar la alerta a Discord: {e}")
+    # Envío asíncrono: cola por webhook, agrupación de alertas y respeto del rate limit de Discord
+    alert_dispatcher.submit(webhook_url, payload)
 
 
 # --- FUNCIÓN DE RESILIENCIA (Cap. 5) ---
 
-def send_to_ingest_api(data, max_retries=MAX_RETRIES):
-    """Implementa la Resiliencia: Envía datos a la API con reintentos y backoff."""
+def post_with_retries(url, data, label, spool_log, max_retries=MAX_RETRIES):
+    """Implementa la Resiliencia: Envía datos a la API con reintentos y backoff.
+
+    Si se agotan los reintentos, los registros van al spool `spool_log` (si existe).
+    """
     retries = 0
-    while retries < max_retries:
+    count = len(data) if isinstance(data, list) else 1
+    with INGEST_SECONDS.labels(urlsplit(url).path).time():
+        while retries < max_retries:
+            try:
+                # Petición POST a la API de Alonso
+                response = http_client.post(url, json=data, timeout=5)
+                response.raise_for_status()
+                log.debug("Éxito: %s insertado correctamente.", label)
+                return
+
+            except REQUEST_ERRORS as e:
+                retries += 1
+
+                if retries < max_retries:
+                    # Retardo Exponencial (Backoff)
+                    wait_time = 2 ** retries
+                    INGEST_RETRIES.inc()
+                    log.warning("Fallo de API/Red (intento %d/%d): %s. Reintentando en %d s.",
+                                retries, max_retries, e, wait_time, extra=fields(url=url, registros=count))
+                    time.sleep(wait_time)
+                else:
+                    if spool_log is not None:
+                        spool_log.append_many(data if isinstance(data, list) else [data])
+                        INGEST_SPOOLED.inc(count)
+                        log.warning("Se agotaron los reintentos (%s). %s guardado en el spool para reenvío.",
+                                    e, label, extra=fields(url=url, registros=count))
+                    else:
+                        INGEST_LOST.inc(count)
+                        log.error("FALLO CRÍTICO: se agotaron los reintentos (%s). %s perdido.",
+                                  e, label, extra=fields(url=url, registros=count))
+                    return
+
+
+def send_to_ingest_api(data, max_retries=MAX_RETRIES):
+    """`data` puede ser una lectura (dict) o un micro-lote (lista de lecturas);
+    los lotes van a la ruta `/ingest/batch` y se reintentan como una unidad.
+    """
+    if isinstance(data, list):
+        post_with_retries(API_INGEST_BATCH_URL, data, f"Lote de {len(data)} lecturas", spool, max_retries)
+    else:
+        post_with_retries(API_INGEST_URL, data, f"Dato {data.get('id_paquete')}", spool, max_retries)
+
+
+def send_aggregates_to_api(data, max_retries=MAX_RETRIES):
+    """Agregados por ventana (uno o un lote) hacia `/ingest/aggregates`."""
+    batch = data if isinstance(data, list) else [data]
+    post_with_retries(API_AGG_URL, batch, f"Lote de {len(batch)} agregados", aggregate_spool, max_retries)
+
+
+def is_rejection(error):
+    """4xx de la API (salvo 408/429): el mismo envío volvería a fallar, no tiene sentido reintentarlo."""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status is not None and 400 <= status < 500 and status not in (408, 429)
+
+
+def spool_sender(url, what):
+    """Reenvío de un lote del spool (array JSON ya serializado). Sin reintentos: el replayer gestiona el
+    backoff y, si la API rechaza el lote (REJECTED), lo parte para aislar los registros inválidos."""
+    def send(body, count):
         try:
-            # Petición POST a la API de Alonso
-            response = requests.post(API_INGEST_URL, json=data, timeout=5)
+            response = http_client.post(url, data=body, headers={"Content-Type": "application/json"}, timeout=30)
             response.raise_for_status()
-            print(f"🟢 Éxito: Dato {data.get('id_paquete')} insertado correctamente.")
-            return
-
-        except requests.exceptions.RequestException as e:
-            retries += 1
-            print(f"❌ Fallo de API/Red (Intento {retries}/{max_retries}): {e}")
-
-            if retries < max_retries:
-                # Retardo Exponencial (Backoff)
-                wait_time = 2 ** retries
-                print(f"⏳ Reintentando en {wait_time} segundos...")
-                time.sleep(wait_time)
-            else:
-                print(f"❌❌ FALLO CRÍTICO: Se agotaron los reintentos. Dato {data.get('id_paquete')} perdido.")
-                return 
+            return True
+        except REQUEST_ERRORS as e:
+            if is_rejection(e):
+                log.warning("La API rechazó %d %s del spool: %s", count, what, e)
+                return REJECTED
+            log.warning("Fallo al reenviar %d %s del spool: %s", count, what, e)
+            return False
+    return send
+
+
+def api_is_healthy():
+    try:
+        return http_client.is_success(http_client.get(API_HEALTH_URL, timeout=2))
+    except REQUEST_ERRORS:
+        return False
+
+
+def on_ingest_drop(data, reason):
+    """Contrapresión: la cola de ingesta está saturada y la lectura se descarta."""
+    MESSAGES_DROPPED.inc()
+    log.warning("CONTRAPRESIÓN: dato %s descartado (%s).", data.get("id_paquete"), reason)
+
+
+# Spools y replayers se crean al arrancar el servicio (no al importar el módulo)
+spool = None
+spool_replayer = None
+aggregate_spool = None
+aggregate_spool_replayer = None
+
+
+def _open_spool(directory, url, what):
+    spool_log = SegmentLog(
+        directory,
+        segment_bytes=SPOOL_SEGMENT_MB * 1024 * 1024,
+        fsync=SPOOL_FSYNC,
+        fsync_interval=SPOOL_FSYNC_INTERVAL,
+    )
+    # Los registros que la API rechaza uno a uno quedan en cuarentena para revisarlos a mano
+    dead_letter = SegmentLog(os.path.join(directory, "dead-letter"), fsync=SPOOL_FSYNC,
+                             fsync_interval=SPOOL_FSYNC_INTERVAL)
+    replayer = SpoolReplayer(spool_log, spool_sender(url, what), api_is_healthy, batch_size=SPOOL_REPLAY_BATCH,
+                             dead_letter=dead_letter)
+    replayer.start()
+    pending = spool_log.pending_bytes()
+    if pending:
+        log.info("Spool: %d bytes pendientes de reenvío en %s/", pending, directory)
+    SPOOL_PENDING_BYTES.labels(what).set_function(spool_log.pending_bytes)
+    return spool_log, replayer
+
+
+def start_spool():
+    global spool, spool_replayer, aggregate_spool, aggregate_spool_replayer
+    spool, spool_replayer = _open_spool(SPOOL_DIR, API_INGEST_BATCH_URL, "lecturas")
+    if aggregator is not None:
+        aggregate_spool, aggregate_spool_replayer = _open_spool(
+            os.path.join(SPOOL_DIR, "agregados"), API_AGG_URL, "agregados")
+
+
+def stop_spool():
+    for replayer in (spool_replayer, aggregate_spool_replayer):
+        if replayer is not None:
+            replayer.stop(timeout=10)
+            replayer.dead_letter.close()
+    for seg_log in (spool, aggregate_spool):
+        if seg_log is not None:
+            seg_log.close()
+
+
+# Lo que se encola mientras se tiene state_lock (lecturas, crudas y agregados) espera aquí y se
+# encola al soltarlo: con INGEST_BACKPRESSURE=block, `submit` puede esperar hasta INGEST_PUT_TIMEOUT
+# y no debe parar el flusher de ventanas, el checkpointer ni la evaluación de otros mensajes
+_outbox = []
+
+
+def _defer(submit):
+    return lambda item: _outbox.append((submit, item))
+
+
+def _take_outbox():
+    """Vacía el outbox (llamar con state_lock cogido) y devuelve lo pendiente."""
+    global _outbox
+    pending, _outbox = _outbox, []
+    return pending
+
+
+def _send_outbox(pending):
+    """Encola lo pendiente (llamar sin state_lock)."""
+    for submit, item in pending:
+        submit(item)
+
+
+# Los workers ejecutan send_to_ingest_api (con su backoff) fuera del hilo de red MQTT
+ingest_pipeline = IngestPipeline(
+    send_to_ingest_api,
+    workers=INGEST_WORKERS,
+    max_queue=INGEST_QUEUE_SIZE,
+    backpressure=INGEST_BACKPRESSURE,
+    put_timeout=INGEST_PUT_TIMEOUT,
+    on_drop=on_ingest_drop,
+    batch_size=INGEST_BATCH_SIZE,
+    batch_max_age=INGEST_BATCH_MAX_AGE,
+)
+
+# Etapa de agregación opcional: las ventanas cerradas van a su propia cola hacia /ingest/aggregates
+aggregator = None
+aggregate_pipeline = None
+if AGG_ENABLED and INGEST_ENABLED:
+    aggregate_pipeline = IngestPipeline(
+        send_aggregates_to_api,
+        workers=1,
+        max_queue=INGEST_QUEUE_SIZE,
+        backpressure=INGEST_BACKPRESSURE,
+        put_timeout=INGEST_PUT_TIMEOUT,
+        on_drop=on_ingest_drop,
+        batch_size=AGG_BATCH_SIZE,
+        batch_max_age=AGG_FLUSH_INTERVAL,
+    )
+    aggregator = WindowAggregator(
+        package_state,
+        emit_window=_defer(aggregate_pipeline.submit),
+        emit_raw=_defer(ingest_pipeline.submit),
+        window_s=AGG_WINDOW_S,
+        inactivity_s=AGG_INACTIVITY_S,
+        raw_context=AGG_RAW_CONTEXT,
+    )
+    package_state.on_evict = aggregator.on_evict
+
+QUEUE_DEPTH = metrics.Gauge("processor_queue_depth", "Elementos pendientes en las colas internas", ["queue"])
+QUEUE_DEPTH.labels("ingesta").set_function(ingest_pipeline.qsize)
+QUEUE_DEPTH.labels("alertas").set_function(alert_dispatcher.pending)
+if aggregate_pipeline is not None:
+    QUEUE_DEPTH.labels("agregados").set_function(aggregate_pipeline.qsize)
+
+# El estado por paquete lo tocan el callback MQTT y el hilo que cierra ventanas inactivas
+state_lock = threading.Lock()
+_window_flusher_stop = threading.Event()
+_window_flusher = None
+
+
+# Checkpoints del estado: se restauran al arrancar el servicio, antes del primer mensaje
+checkpointer = None
+
+
+def start_checkpoints():
+    global checkpointer
+    checkpointer = StateCheckpointer(
+        package_state,
+        os.path.join(CHECKPOINT_DIR, "state.ckpt"),
+        state_lock,
+        interval_s=CHECKPOINT_INTERVAL_S,
+        full_every=CHECKPOINT_FULL_EVERY,
+        max_age_s=CHECKPOINT_MAX_AGE_S,
+        extras={"geo": geo_detector} if geo_detector is not None else None,
+        on_write=lambda kind, seconds, size: CHECKPOINT_SECONDS.labels(kind).observe(seconds),
+    )
+    with state_lock:
+        checkpointer.restore()
+        if aggregator is not None:
+            aggregator.track_open()
+    checkpointer.checkpoint(full=True)  # el fichero pasa a contener solo el estado de este proceso
+    checkpointer.start()
+
+
+def stop_checkpoints():
+    if checkpointer is not None:
+        checkpointer.stop()
+
+
+def _flush_idle_windows():
+    while not _window_flusher_stop.wait(AGG_FLUSH_INTERVAL):
+        with state_lock:
+            aggregator.flush_idle()
+            pending = _take_outbox()
+        _send_outbox(pending)
 
 
 # --- LÓGICA DEL CEREBRO (Cap. 3 - Detección Múltiple) ---
 
+def webhook_for(channel):
+    """Webhook de Discord de un canal de reglas: DISCORD_WEBHOOK_<CANAL>."""
+    return os.getenv(f"DISCORD_WEBHOOK_{channel.upper()}")
+
+
 def process_telemetry(data):
-    """Aplica la lógica de estado y umbrales a cada dato."""
-    global package_state
-    
-    # Adaptación a las claves del nuevo simulador
-    temp = data.get('temperatura', 99.9)
-    g_force = data.get('fuerza_g', 0.0) # Usando 'fuerza_g' del nuevo simulador
-    puerta_abierta = data.get('puerta_abierta', False) # Nuevo sensor
-    package_id = data.get('id_paquete', 'N/A')
-
-    # Inicializar/Actualizar estado del paquete
-    if package_id not in package_state:
-        package_state[package_id] = {'consecutive': 0, 'is_alerting_temp': False, 'is_alerting_door': False}
-
-    state = package_state[package_id]
-    
-    # ----------------------------------------------------
-    # Detección 1: Alerta de Puerta Abierta (INMEDIATA)
-    # ----------------------------------------------------
-    if puerta_abierta:
-        if not state['is_alerting_door']:
-            # Enviar alerta solo la primera vez que se detecta el estado
-            reason = "Puerta Abierta por Manipulación"
-            print(f"🚨 PUERTA: {package_id} - {reason}. Enviando a Discord.")
-            send_discord_alert(data, reason, DISCORD_WEBHOOK_DOOR)
-            state['is_alerting_door'] = True # Bloqueamos para throttling
-    else:
-        # Resetear el throttling si la puerta se cierra
-        if state['is_alerting_door']:
-            print(f"🟢 PUERTA: {package_id} - Puerta cerrada. Reseteando alerta.")
-        state['is_alerting_door'] = False
-        
-    # ----------------------------------------------------
-    # Detección 2: Alerta de Temperatura/Impacto (SOSTENIDA)
-    # ----------------------------------------------------
-    is_temp_alert = temp > TEMP_UMBRAL
-    is_g_force_alert = g_force > G_FORCE_UMBRAL # Detección de impacto
-    is_alert_event_sostenido = is_temp_alert or is_g_force_alert
-    
-    reason_sostenida = ""
-    if is_temp_alert and is_g_force_alert:
-        reason_sostenida = "Temperatura y Posible Impacto"
-    elif is_temp_alert:
-        reason_sostenida = "Temperatura Excedida"
-    elif is_g_force_alert:
-        reason_sostenida = "Posible Impacto Sostenido"
-
-
-    if is_alert_event_sostenido:
-        state['consecutive'] += 1
-
-        if state['consecutive'] >= CONSECUTIVE_EVENTS:
-            # Solo enviar alerta a Discord si no se ha alertado ya (throttling)
-            if not state['is_alerting_temp']:
-                print(f"🚨 TEMP/G-FORCE: {package_id} - {reason_sostenida} SOSTENIDA. Enviando a Discord.")
-                send_discord_alert(data, reason_sostenida, DISCORD_WEBHOOK_TEMP)
-                state['is_alerting_temp'] = True # Bloqueamos futuras alertas
-        
+    """Aplica las reglas de alerta (una sola pasada sobre el estado del paquete) a un dato ya validado.
+
+    Se llama con state_lock cogido; lo que haya que persistir queda en el outbox (ver `_take_outbox`).
+    """
+    package_id = data['id_paquete']
+
+    # Inicializar/Actualizar estado del paquete (slot en el almacén de estado)
+    slot = package_state.touch(package_id)
+
+    start = time.perf_counter()
+    events = rule_engine.evaluate(data, slot)
+    RULES_SECONDS.observe(time.perf_counter() - start)
+
+    for event in events:
+        rule = event.rule
+        ALERTS_FIRED.labels(rule.name, event.kind).inc()
+        if event.kind == "fire":
+            log.warning("%s: %s - %s. Enviando a Discord.", rule.label, package_id, event.reason,
+                        extra=fields(paquete=package_id, regla=rule.name, contador=event.count))
+            send_discord_alert(data, event.reason, webhook_for(rule.channel))
+        elif event.kind == "pending":
+            log.debug("Pico temporal (%s). Contador: %d/%d", event.reason, event.count, rule.sustain,
+                      extra=fields(paquete=package_id, regla=rule.name))
         else:
-            print(f"🌡️ Advertencia: Pico temporal ({reason_sostenida}). Contador: {state['consecutive']}/{CONSECUTIVE_EVENTS}")
-
-    else:
-        # Dato bueno, reseteamos el contador y el estado de alerta
-        if state['consecutive'] > 0:
-            print(f"🟢 TEMP/G-FORCE: {package_id} - Volvió a la normalidad. Reseteando contador.")
-        
-        state['consecutive'] = 0
-        state['is_alerting_temp'] = False # Permitimos que se dispare la alerta de nuevo
+            log.info("%s: %s - Volvió a la normalidad. Reseteando alerta.", rule.label, package_id,
+                     extra=fields(paquete=package_id, regla=rule.name))
+            if event.was_active and rule.notify_recovery:
+                send_discord_alert(data, f"Recuperación: {rule.name}", webhook_for(rule.channel))
+
+    if geo_detector is not None:
+        for event in geo_detector.check(data, slot):
+            GEO_EVENTS.labels(event.kind).inc()
+            if event.alert:
+                log.warning("GEO: %s - %s. Enviando a Discord.", package_id, event.reason,
+                            extra=fields(paquete=package_id, evento=event.kind, distancia_m=event.distance_m))
+                send_discord_alert(data, event.reason, webhook_for("geo"))
+            else:
+                log.info("GEO: %s - %s.", package_id, event.reason,
+                         extra=fields(paquete=package_id, evento=event.kind, distancia_m=event.distance_m))
+
+    # Persistencia asíncrona: se encola y los workers de ingesta hacen el envío resiliente.
+    # Con agregación, solo el agregado de la ventana y las lecturas alrededor de anomalías.
+    if aggregator is not None:
+        anomalous = rule_engine.in_alert(slot) or (geo_detector is not None and geo_detector.off_route(slot))
+        aggregator.add(data, slot, anomalous)
+    elif INGEST_ENABLED:
+        _outbox.append((ingest_pipeline.submit, data))
+
+    MESSAGES_PROCESSED.inc()
+    try:
+        E2E_SECONDS.observe(time.time() - datetime.fromisoformat(data["timestamp_utc"]).timestamp())
+    except ValueError:
+        pass
 
 
-    # ⬇️ TAREA: Llamar a la función de envío resiliente para persistir el dato
-    send_to_ingest_api(data)
+def report_state_memory(force=False):
+    """Informa periódicamente del tamaño del estado por paquete."""
+    global _last_state_report
+    now = time.monotonic()
+    if not force and now - _last_state_report < STATE_REPORT_INTERVAL:
+        return
+    _last_state_report = now
+    package_state.evict_expired()
+    mem = package_state.memory_usage()
+    log.info("Estado: %d paquetes seguidos, %.1f KiB (%.0f B/paquete), %d expulsados.",
+             mem["tracked_packages"], mem["total_bytes"] / 1024, mem["bytes_per_package"], package_state.evicted)
 
 
 # --- FUNCIONES MQTT y INICIO DEL SERVICIO ---
@@ -180,30 +520,156 @@ def process_telemetry(data):
 def on_connect(client, userdata, flags, rc):
     """Callback que se ejecuta al conectar con el Broker."""
     if rc == 0:
-        print("Conexión MQTT exitosa. Suscribiéndose...")
-        client.subscribe(MQTT_TOPIC)
+        # JSON en MQTT_TOPIC y formato binario en MQTT_TOPIC + BINARY_TOPIC_SUFFIX
+        # (un filtro que acaba en "#" ya cubre ambos y no admite sufijo)
+        topics = [MQTT_TOPIC]
+        if not MQTT_TOPIC.endswith("#"):
+            topics.append(MQTT_TOPIC + telemetry.BINARY_TOPIC_SUFFIX)
+        log.info("Conexión MQTT exitosa. Suscribiéndose a %s", ", ".join(topics))
+        client.subscribe([(topic, 0) for topic in topics])
     else:
-        print(f"Fallo en la conexión MQTT. Código: {rc}")
+        log.error("Fallo en la conexión MQTT. Código: %s", rc)
+
+def handle_payload(payload):
+    """Decodifica un mensaje MQTT (bytes) y lo pasa por la lógica de detección."""
+    start = time.perf_counter()
+    try:
+        # Parseo + validación contra el esquema compartido (JSON o binario, se detecta solo)
+        data = telemetry.decode_wire(payload)
+    except telemetry.InvalidTelemetry as e:
+        with state_lock:
+            MESSAGES_RECEIVED.inc()
+            MESSAGES_INVALID.inc()
+        log.warning("Mensaje de telemetría inválido: %s", e)
+        return
+    decoded = time.perf_counter()
+    try:
+        with state_lock:
+            MESSAGES_RECEIVED.inc()
+            DECODE_SECONDS.observe(decoded - start)
+            process_telemetry(data)
+            report_state_memory()
+            pending = _take_outbox()
+        _send_outbox(pending)
+    except Exception:
+        log.exception("Error al procesar mensaje")
 
 def on_message(client, userdata, msg):
     """Callback que se ejecuta al recibir un mensaje."""
+    handle_payload(msg.payload)
+
+
+def start_metrics_server(port=None):
+    """Endpoint /metrics del proceso (si el puerto es 0 o está ocupado, se sigue sin él)."""
+    if port is None:
+        port = PROCESSOR_METRICS_PORT
+    if not port:
+        return None
+    try:
+        server = metrics.serve(port)
+    except OSError as e:
+        log.error("No se pudo abrir el endpoint de métricas en el puerto %d: %s", port, e)
+        return None
+    log.info("Métricas Prometheus en :%d/metrics", port)
+    return server
+
+
+def start_services():
+    """Arranca métricas, spool y workers de ingesta (modo proceso único y cada shard)."""
+    start_metrics_server()
+    if CHECKPOINT_ENABLED:
+        start_checkpoints()
+    if SPOOL_ENABLED and INGEST_ENABLED:
+        start_spool()
+    if INGEST_ENABLED:
+        ingest_pipeline.start()
+        log.info("Procesador: %d workers de ingesta (cola máx. %d, política %s, lote %d)",
+                 INGEST_WORKERS, INGEST_QUEUE_SIZE, INGEST_BACKPRESSURE, INGEST_BATCH_SIZE)
+    if geo_detector is not None:
+        log.info("Procesador: detección geoespacial con %s", geo_detector.describe())
+    if aggregator is not None:
+        global _window_flusher
+        aggregate_pipeline.start()
+        _window_flusher_stop.clear()
+        _window_flusher = threading.Thread(target=_flush_idle_windows, name="agg-flusher", daemon=True)
+        _window_flusher.start()
+        log.info("Procesador: agregación en ventanas de %.0f s (crudas ±%d lecturas alrededor de anomalías)",
+                 AGG_WINDOW_S, AGG_RAW_CONTEXT)
+
+
+def stop_services():
+    if aggregator is not None:
+        # Cerrar las ventanas abiertas antes de vaciar las colas
+        _window_flusher_stop.set()
+        if _window_flusher is not None:
+            _window_flusher.join(timeout=5)
+        with state_lock:
+            aggregator.flush_all()
+            pending = _take_outbox()
+        _send_outbox(pending)
+        aggregate_pipeline.stop(drain=True, timeout=30)
+        log.info("Agregación: %d lecturas → %d agregados + %d crudas.",
+                 aggregator.stats["readings"], aggregator.stats["windows"], aggregator.stats["raw"])
+    stop_checkpoints()
+    # Vaciar la cola antes de salir para no perder lecturas ya aceptadas
+    ingest_pipeline.stop(drain=True, timeout=30)
+    stop_spool()
+    alert_dispatcher.close(timeout=10)
+    http_client.close_all()
+    report_state_memory(force=True)
+
+
+def run_single():
+    client = mqtt.Client()
+    client.on_connect = on_connect
+    client.on_message = on_message
+
+    start_services()
+
     try:
-        data = json.loads(msg.payload.decode('utf-8'))
-        process_telemetry(data)
-    except json.JSONDecodeError:
-        print("Error: Mensaje JSON inválido.")
+        log.info("Procesador: intentando conectar a %s:%d", MQTT_BROKER, MQTT_PORT)
+        client.connect(MQTT_BROKER, MQTT_PORT, 60)
+        client.loop_forever()
+    except KeyboardInterrupt:
+        log.info("Procesador detenido.")
     except Exception as e:
-        print(f"Error al procesar mensaje: {e}")
+        log.critical("Error fatal de conexión: %s", e)
+    finally:
+        stop_services()
 
 
-if __name__ == "__main__":
+def run_sharded():
+    """Modo multiproceso: este proceso solo recibe de MQTT y reparte por id_paquete."""
+    from scripts.sharding import ShardDispatcher
+
+    dispatcher = ShardDispatcher(PROCESSOR_WORKERS)
+
+    def on_message_sharded(client, userdata, msg):
+        MESSAGES_RECEIVED.inc()
+        dispatcher.dispatch(msg.payload)
+
     client = mqtt.Client()
     client.on_connect = on_connect
-    client.on_message = on_message
+    client.on_message = on_message_sharded
 
+    # Este proceso solo expone lo que recibe; la detección la mide cada shard en su puerto
+    start_metrics_server()
+    dispatcher.start()
     try:
-        print(f"Procesador: Intentando conectar a {MQTT_BROKER}:{MQTT_PORT}")
+        log.info("Procesador: %d workers de detección. Intentando conectar a %s:%d",
+                 PROCESSOR_WORKERS, MQTT_BROKER, MQTT_PORT)
         client.connect(MQTT_BROKER, MQTT_PORT, 60)
         client.loop_forever()
+    except KeyboardInterrupt:
+        log.info("Procesador detenido.")
     except Exception as e:
-        print(f"Error fatal de conexión: {e}")
+        log.critical("Error fatal de conexión: %s", e)
+    finally:
+        dispatcher.stop()
+
+
+if __name__ == "__main__":
+    if PROCESSOR_WORKERS > 1:
+        run_sharded()
+    else:
+        run_single()
@@ -0,0 +1,341 @@
+"""
+Trazabilidad de datasets y exportaciones: huellas SHA-256 y manifiestos.
+
+Generaliza el paso de trazabilidad de TRABAJO_IA_HASH.ipynb (un
+`f.read()` completo y un `registro_hash.json` por fichero) a exportaciones
+de varios GB:
+
+- cada fichero se lee en bloques de `chunk_size` (o se recorre con mmap), así
+  que la memoria no depende del tamaño del fichero;
+- los ficheros se reparten entre hilos: `hashlib` suelta el GIL al procesar
+  bloques grandes, así que varios ficheros se resumen en paralelo (uno solo
+  va a la velocidad de un núcleo: SHA-256 es secuencial);
+- `DigestCache` guarda la huella de cada ruta junto a su tamaño y mtime; si
+  no han cambiado, el fichero no se vuelve a leer;
+- un manifiesto JSON cubre un directorio entero (ruta relativa, bytes y
+  SHA-256 por fichero, más una huella del conjunto) y `verify_manifest()`
+  lo comprueba: primero tamaños (sin leer nada), luego huellas, usando la
+  caché salvo con `full=True`.
+
+Ejecuta:
+    python -m scripts.provenance manifiesto trazas/
+    python -m scripts.provenance verificar trazas/MANIFEST.sha256.json
+    python -m scripts.provenance verificar trazas/MANIFEST.sha256.json --completo
+    python -m scripts.provenance hash labels.csv modelo.pkl
+"""
+
+import argparse
+import hashlib
+import mmap
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import msgspec
+
+from observability.logs import get_logger
+
+logger = get_logger("provenance")
+
+ALGORITHM = "sha256"
+CHUNK_SIZE = 1 << 20                 # 1 MiB: bloques grandes para que hashlib suelte el GIL
+MANIFEST_NAME = "MANIFEST.sha256.json"
+MANIFEST_VERSION = 1
+DEFAULT_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "greendelivery", "sha256-cache.json")
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+# Un fichero modificado en los últimos segundos antes de leerlo podría cambiar sin que cambie su
+# mtime (resolución del sistema de ficheros): su huella no se guarda en la caché
+RACY_WINDOW_NS = 2_000_000_000
+
+
+class ManifestEntry(msgspec.Struct):
+    archivo: str        # ruta relativa al directorio, con '/'
+    bytes: int
+    sha256: str
+
+
+class Manifest(msgspec.Struct):
+    version: int
+    algoritmo: str
+    fecha: str
+    archivos: list[ManifestEntry]
+    total_bytes: int
+    sha256: str         # huella del conjunto (ver `listing_digest`)
+
+
+class VerifyReport(msgspec.Struct):
+    ok: int = 0
+    modified: list[str] = msgspec.field(default_factory=list)
+    missing: list[str] = msgspec.field(default_factory=list)
+    extra: list[str] = msgspec.field(default_factory=list)
+    hashed_bytes: int = 0
+
+    @property
+    def passed(self):
+        return not (self.modified or self.missing or self.extra)
+
+
+_manifest_decoder = msgspec.json.Decoder(Manifest)
+_cache_decoder = msgspec.json.Decoder(dict[str, tuple[int, int, str]])
+
+
+# --- Huellas ---
+
+def sha256_file(path, chunk_size=CHUNK_SIZE, use_mmap=False):
+    """SHA-256 en hexadecimal de `path`, leyendo por bloques (o por mmap) sin cargarlo entero."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if use_mmap and size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    for start in range(0, size, chunk_size):
+                        digest.update(view[start:start + chunk_size])
+        else:
+            buf = bytearray(chunk_size)
+            with memoryview(buf) as view:
+                while n := f.readinto(buf):
+                    digest.update(view[:n])
+    return digest.hexdigest()
+
+
+def listing_digest(entries):
+    """Huella del conjunto: SHA-256 del listado `sha256sum` (`<huella>  <ruta>` por línea, por ruta)."""
+    digest = hashlib.sha256()
+    for entry in sorted(entries, key=lambda e: e.archivo):
+        digest.update(f"{entry.sha256}  {entry.archivo}\n".encode())
+    return digest.hexdigest()
+
+
+class DigestCache:
+    """Huellas ya calculadas por ruta absoluta, válidas mientras no cambien tamaño ni mtime."""
+
+    def __init__(self, path=DEFAULT_CACHE):
+        self.path = path
+        self.entries = {}   # ruta absoluta -> (bytes, mtime_ns, sha256)
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    self.entries = _cache_decoder.decode(f.read())
+            except (OSError, msgspec.DecodeError) as e:
+                logger.warning("Caché de huellas %s ilegible (%s); se empieza de cero", path, e)
+
+    def get(self, path, st):
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        return None
+
+    def put(self, path, st, sha):
+        self.entries[path] = (st.st_size, st.st_mtime_ns, sha)
+        self._dirty = True
+
+    def save(self):
+        """Escribe la caché (fichero temporal + rename atómico) si ha cambiado."""
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(msgspec.json.encode(self.entries))
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+
+def _hash_one(path, cache, chunk_size, use_mmap):
+    """(bytes, sha256, leído) de un fichero, sirviéndolo de la caché si no ha cambiado."""
+    st = os.stat(path)
+    if cache is not None:
+        sha = cache.get(path, st)
+        if sha is not None:
+            return st.st_size, sha, False
+    started_ns = time.time_ns()
+    sha = sha256_file(path, chunk_size, use_mmap)
+    after = os.stat(path)
+    if (after.st_size, after.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+        logger.warning("%s ha cambiado mientras se leía; su huella no es fiable", path)
+    elif cache is not None and st.st_mtime_ns < started_ns - RACY_WINDOW_NS:
+        cache.put(path, st, sha)
+    return st.st_size, sha, True
+
+
+def hash_files(paths, cache=None, workers=DEFAULT_WORKERS, chunk_size=CHUNK_SIZE, use_mmap=False):
+    """{ruta: (bytes, sha256)} de `paths`, en paralelo en `workers` hilos. Devuelve también los bytes leídos."""
+    paths = [os.path.abspath(p) for p in paths]
+    # Los más grandes primero: el último fichero en terminar no es uno enorme empezado tarde
+    paths.sort(key=lambda p: os.stat(p).st_size, reverse=True)
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="sha256") as pool:
+        results = list(pool.map(lambda p: _hash_one(p, cache, chunk_size, use_mmap), paths))
+    hashed_bytes = sum(size for size, _, read in results if read)
+    if cache is not None:
+        cache.save()
+    return {path: (size, sha) for path, (size, sha, _) in zip(paths, results)}, hashed_bytes
+
+
+# --- Manifiestos ---
+
+def list_files(root, exclude=()):
+    """Ficheros regulares bajo `root` como rutas relativas con '/', en orden (sin seguir enlaces)."""
+    exclude = {os.path.abspath(p) for p in exclude}
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            if os.path.isfile(path) and not os.path.islink(path) and os.path.abspath(path) not in exclude:
+                found.append(os.path.relpath(path, root).replace(os.sep, "/"))
+    return found
+
+
+def build_manifest(root, cache=None, workers=DEFAULT_WORKERS, chunk_size=CHUNK_SIZE, use_mmap=False,
+                   exclude=()):
+    """Manifiesto de todos los ficheros de `root` (salvo `exclude`)."""
+    names = list_files(root, exclude)
+    digests, hashed_bytes = hash_files([os.path.join(root, n) for n in names], cache, workers, chunk_size,
+                                       use_mmap)
+    entries = []
+    for name in names:
+        size, sha = digests[os.path.abspath(os.path.join(root, name))]
+        entries.append(ManifestEntry(archivo=name, bytes=size, sha256=sha))
+    manifest = Manifest(
+        version=MANIFEST_VERSION,
+        algoritmo=ALGORITHM,
+        fecha=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        archivos=entries,
+        total_bytes=sum(e.bytes for e in entries),
+        sha256=listing_digest(entries),
+    )
+    return manifest, hashed_bytes
+
+
+def write_manifest(manifest, path):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(msgspec.json.format(msgspec.json.encode(manifest), indent=2))
+    os.replace(tmp, path)
+
+
+def read_manifest(path):
+    with open(path, "rb") as f:
+        manifest = _manifest_decoder.decode(f.read())
+    if manifest.algoritmo != ALGORITHM:
+        raise ValueError(f"algoritmo no soportado: {manifest.algoritmo}")
+    if listing_digest(manifest.archivos) != manifest.sha256:
+        raise ValueError("la huella del conjunto no coincide con el listado (manifiesto alterado)")
+    return manifest
+
+
+def verify_manifest(manifest, root, cache=None, full=False, workers=DEFAULT_WORKERS, chunk_size=CHUNK_SIZE,
+                    use_mmap=False, exclude=()):
+    """Comprueba `root` contra el manifiesto. Con `full` se releen todos los ficheros (sin caché)."""
+    report = VerifyReport()
+    expected = {e.archivo: e for e in manifest.archivos}
+    present = set(list_files(root, exclude))
+    report.missing = sorted(expected.keys() - present)
+    report.extra = sorted(present - expected.keys())
+
+    # Un tamaño distinto ya es una modificación: solo se resumen los ficheros con el tamaño esperado
+    to_hash = []
+    for name in sorted(expected.keys() & present):
+        if os.path.getsize(os.path.join(root, name)) != expected[name].bytes:
+            report.modified.append(name)
+        else:
+            to_hash.append(name)
+    digests, report.hashed_bytes = hash_files([os.path.join(root, n) for n in to_hash],
+                                              None if full else cache, workers, chunk_size, use_mmap)
+    for name in to_hash:
+        if digests[os.path.abspath(os.path.join(root, name))][1] == expected[name].sha256:
+            report.ok += 1
+        else:
+            report.modified.append(name)
+    report.modified.sort()
+    return report
+
+
+# --- CLI ---
+
+def _cache_from_args(args):
+    return None if args.sin_cache else DigestCache(args.cache)
+
+
+def cmd_manifest(args):
+    out = args.out or os.path.join(args.directorio, MANIFEST_NAME)
+    cache = _cache_from_args(args)
+    t0 = time.perf_counter()
+    manifest, hashed_bytes = build_manifest(args.directorio, cache, args.workers, args.chunk_kib * 1024,
+                                            args.mmap, exclude=[out, out + ".tmp"])
+    elapsed = time.perf_counter() - t0
+    write_manifest(manifest, out)
+    print(f"[INFO] {out}: {len(manifest.archivos)} ficheros, {manifest.total_bytes / 2**20:.1f} MiB "
+          f"({hashed_bytes / 2**20:.1f} MiB leídos, {cache.hits if cache else 0} en caché) en {elapsed:.2f} s")
+    print(f"[INFO] sha256 del conjunto: {manifest.sha256}")
+    return 0
+
+
+def cmd_verify(args):
+    try:
+        manifest = read_manifest(args.manifiesto)
+    except (OSError, ValueError, msgspec.DecodeError) as exc:
+        print(f"[ERROR] {args.manifiesto}: {exc}")
+        return 2
+    root = args.directorio or os.path.dirname(os.path.abspath(args.manifiesto))
+    t0 = time.perf_counter()
+    report = verify_manifest(manifest, root, _cache_from_args(args), args.completo, args.workers,
+                             args.chunk_kib * 1024, args.mmap, exclude=[args.manifiesto])
+    elapsed = time.perf_counter() - t0
+    for label, names in (("MODIFICADO", report.modified), ("FALTA", report.missing), ("SOBRA", report.extra)):
+        for name in names:
+            print(f"[{label}] {name}")
+    status = "OK" if report.passed else "FALLO"
+    print(f"[{status}] {report.ok}/{len(manifest.archivos)} ficheros correctos "
+          f"({report.hashed_bytes / 2**20:.1f} MiB leídos en {elapsed:.2f} s)")
+    return 0 if report.passed else 1
+
+
+def cmd_hash(args):
+    digests, _ = hash_files(args.ficheros, _cache_from_args(args), args.workers, args.chunk_kib * 1024,
+                            args.mmap)
+    # Mismo formato que sha256sum (comprobable con `sha256sum -c`)
+    for path in args.ficheros:
+        print(f"{digests[os.path.abspath(path)][1]}  {path}")
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Huellas SHA-256 y manifiestos de trazabilidad")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Ficheros resumidos en paralelo")
+    common.add_argument("--chunk-kib", type=int, default=CHUNK_SIZE // 1024, help="Tamaño de bloque de lectura")
+    common.add_argument("--mmap", action="store_true", help="Recorrer los ficheros con mmap en vez de read")
+    common.add_argument("--cache", default=DEFAULT_CACHE, help="Fichero de la caché de huellas")
+    common.add_argument("--sin-cache", action="store_true", help="Releer todos los ficheros")
+    sub = ap.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("manifiesto", parents=[common], help="Manifiesto de un directorio")
+    p.add_argument("directorio")
+    p.add_argument("--out", default="", help=f"Ruta del manifiesto (por defecto <directorio>/{MANIFEST_NAME})")
+    p.set_defaults(func=cmd_manifest)
+
+    p = sub.add_parser("verificar", parents=[common], help="Comprueba un directorio contra su manifiesto")
+    p.add_argument("manifiesto")
+    p.add_argument("--directorio", default="", help="Directorio a comprobar (por defecto el del manifiesto)")
+    p.add_argument("--completo", action="store_true", help="Releer todos los ficheros (ignora la caché)")
+    p.set_defaults(func=cmd_verify)
+
+    p = sub.add_parser("hash", parents=[common], help="Huella de ficheros sueltos (formato sha256sum)")
+    p.add_argument("ficheros", nargs="+")
+    p.set_defaults(func=cmd_hash)
+
+    args = ap.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
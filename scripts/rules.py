@@ -0,0 +1,317 @@
+"""
+Motor de reglas de alerta declarativo y precompilado.
+
+Las reglas se describen como datos (lista de dicts, o un fichero JSON en
+ALERT_RULES_FILE) y se compilan una sola vez en una función Python generada
+que evalúa TODAS las reglas de un mensaje en una única pasada:
+
+    {
+        "name": "temp_sostenida",
+        "channel": "temp",                     # webhook DISCORD_WEBHOOK_TEMP
+        "label": "TEMP/G-FORCE",               # prefijo de los logs
+        "when": [
+            {"field": "temperatura", "op": ">", "value": 8.0, "tag": "temp"},
+            {"field": "fuerza_g", "op": ">", "value": 2.5, "tag": "g"}
+        ],
+        "match": "any",                        # any | all
+        "sustain": 3,                          # N eventos consecutivos
+        "hysteresis": 0.0,                     # se rearma al bajar de umbral - histéresis
+        "cooldown_s": 0,                       # mínimo entre dos disparos del mismo paquete
+        "notify_recovery": false,
+        "reason": {"temp": "Temperatura Excedida", "g": "Posible Impacto Sostenido",
+                   "g+temp": "Temperatura y Posible Impacto"},
+        "overrides": {"ruta-sur": {"when": {"temperatura": 6.0}, "sustain": 5}}
+    }
+
+El estado (contador, alerta activa, último disparo) vive en columnas de un
+`PackageStateStore` compartido por todas las reglas, así que el coste por
+mensaje no depende del nº de paquetes. Las variantes por ruta (`overrides`,
+elegidas por el campo `ruta` del mensaje) se compilan también al cargar.
+"""
+
+import json
+import math
+import operator
+import os
+import time
+from collections import namedtuple
+
+ALERT_RULES_FILE = os.getenv("ALERT_RULES_FILE")   # JSON con la lista de reglas (opcional)
+ALERT_ROUTE_FIELD = os.getenv("ALERT_ROUTE_FIELD", "ruta")  # Campo del mensaje para los overrides por ruta
+
+OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le,
+             "==": operator.eq, "!=": operator.ne}
+_NUMERIC_OPS = {">", ">=", "<", "<="}
+
+# kind: fire (se dispara la alerta) | pending (evento dentro de la ventana N) | clear (vuelve a la normalidad)
+RuleEvent = namedtuple("RuleEvent", "kind rule reason count was_active")
+
+
+class Condition:
+    """Comparación de un campo del mensaje con un valor fijo."""
+
+    __slots__ = ("field", "op", "value", "tag")
+
+    def __init__(self, field, op, value, tag=None):
+        if op not in OPERATORS:
+            raise ValueError(f"Operador no soportado: {op}")
+        if not isinstance(value, (int, float, str, bool)):
+            raise ValueError(f"Valor no soportado en {field}: {value!r}")
+        if op in _NUMERIC_OPS and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            raise ValueError(f"{field} {op} necesita un valor numérico")
+        if isinstance(value, float) and math.isnan(value):
+            raise ValueError(f"{field} {op} NaN: ninguna lectura cumpliría ni saldría de la condición")
+        self.field = field
+        self.op = op
+        self.value = value
+        self.tag = tag or field
+
+    def matches(self, data):
+        """Evaluación interpretada (referencia para pruebas y benchmarks)."""
+        v = data.get(self.field)
+        if self.op in _NUMERIC_OPS and (isinstance(v, bool) or not isinstance(v, (int, float))):
+            return False
+        return OPERATORS[self.op](v, self.value)
+
+
+class Rule:
+    """Regla de alerta ya validada."""
+
+    __slots__ = ("name", "channel", "label", "conditions", "match", "sustain", "hysteresis",
+                 "cooldown_s", "notify_recovery", "reason", "overrides")
+
+    def __init__(self, name, when, channel=None, label=None, match="any", sustain=1, hysteresis=0.0,
+                 cooldown_s=0.0, notify_recovery=False, reason=None, overrides=None):
+        if match not in ("any", "all"):
+            raise ValueError(f"Regla {name}: match debe ser 'any' o 'all'")
+        if int(sustain) < 1:
+            raise ValueError(f"Regla {name}: sustain debe ser >= 1")
+        self.name = name
+        self.channel = channel or name
+        self.label = label or name
+        self.conditions = [c if isinstance(c, Condition) else Condition(**c) for c in when]
+        if not self.conditions:
+            raise ValueError(f"Regla {name}: sin condiciones")
+        self.match = match
+        self.sustain = int(sustain)
+        self.hysteresis = float(hysteresis)
+        self.cooldown_s = float(cooldown_s)
+        if not math.isfinite(self.hysteresis) or self.hysteresis < 0 or math.isnan(self.cooldown_s):
+            raise ValueError(f"Regla {name}: hysteresis debe ser finita y >= 0, y cooldown_s un número")
+        self.notify_recovery = bool(notify_recovery)
+        self.reason = reason or name
+        self.overrides = overrides or {}
+
+    @classmethod
+    def from_dict(cls, spec):
+        return cls(**spec)
+
+    def for_route(self, route):
+        """Copia de la regla con los overrides de `route` aplicados."""
+        override = self.overrides.get(route)
+        if not override:
+            return self
+        unknown = set(override) - {"when", "sustain", "hysteresis", "cooldown_s"}
+        if unknown:
+            raise ValueError(f"Regla {self.name}: override no soportado en {route}: {sorted(unknown)}")
+        thresholds = override.get("when", {})
+        conditions = [Condition(c.field, c.op, thresholds.get(c.tag, thresholds.get(c.field, c.value)), c.tag)
+                      for c in self.conditions]
+        return Rule(self.name, conditions, self.channel, self.label, self.match,
+                    override.get("sustain", self.sustain), override.get("hysteresis", self.hysteresis),
+                    override.get("cooldown_s", self.cooldown_s), self.notify_recovery, self.reason)
+
+    def reason_for(self, matched_tags):
+        """Texto de la alerta según qué condiciones se han cumplido."""
+        if isinstance(self.reason, str):
+            return self.reason
+        key = "+".join(sorted(matched_tags))
+        return self.reason.get(key) or self.reason.get("default") or self.name
+
+    def is_active(self, data):
+        """Evaluación interpretada de la condición de la regla."""
+        hits = [c.matches(data) for c in self.conditions]
+        return any(hits) if self.match == "any" else all(hits)
+
+
+def load_rules(source=None, default=None):
+    """Reglas desde una lista de dicts, un fichero JSON o ALERT_RULES_FILE (si no, `default`)."""
+    if source is None:
+        source = ALERT_RULES_FILE or default
+    if isinstance(source, str):
+        with open(source, encoding="utf-8") as f:
+            source = json.load(f)
+    if source is None:
+        raise ValueError("No hay reglas configuradas")
+    rules = [r if isinstance(r, Rule) else Rule.from_dict(r) for r in source]
+    names = [r.name for r in rules]
+    if len(set(names)) != len(names):
+        raise ValueError("Nombres de regla duplicados")
+    return rules
+
+
+def sustained_threshold_rule(temp_umbral, g_force_umbral, sustain, name="temp_impacto_sostenido"):
+    """Regla de N lecturas consecutivas con temperatura > T o fuerza_g > G.
+
+    Es la regla por defecto del procesador y la que evalúa offline scripts/evaluate_rules.py.
+    """
+    return {
+        "name": name,
+        "channel": "temp",
+        "label": "TEMP/G-FORCE",
+        "when": [
+            {"field": "temperatura", "op": ">", "value": temp_umbral, "tag": "temp"},
+            {"field": "fuerza_g", "op": ">", "value": g_force_umbral, "tag": "g"},
+        ],
+        "match": "any",
+        "sustain": sustain,
+        "reason": {
+            "temp": "Temperatura Excedida",
+            "g": "Posible Impacto Sostenido",
+            "g+temp": "Temperatura y Posible Impacto",
+        },
+    }
+
+
+def _literal(value):
+    """Valor como literal de Python para el código generado (repr(inf) sería un nombre: `inf`)."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return f"float({repr(value)!r})"
+    return repr(value)
+
+
+def _clear_expr(cond, var, ok, hysteresis):
+    """Expresión que indica que la condición está fuera de su zona de alerta (con histéresis).
+
+    Una lectura ausente no rearma la regla: hace falta un valor por debajo (o encima) del margen.
+    """
+    if cond.op in (">", ">="):
+        return f"({ok} and {var} <= {_literal(cond.value - hysteresis)})"
+    if cond.op in ("<", "<="):
+        return f"({ok} and {var} >= {_literal(cond.value + hysteresis)})"
+    return None
+
+
+def compile_rules(rules, columns):
+    """
+    Genera y compila la función `evaluate(data, slot, now)` para un conjunto de reglas.
+
+    `columns[i]` es la terna (count, active, last_fired) de columnas de la regla i.
+    Cada campo se lee del mensaje una sola vez aunque lo usen varias reglas.
+    """
+    fields = {}
+    for rule in rules:
+        for c in rule.conditions:
+            fields.setdefault(c.field, len(fields))
+
+    lines = ["def evaluate(data, slot, now):", "    events = []", "    get = data.get"]
+    numeric = {c.field for r in rules for c in r.conditions if c.op in _NUMERIC_OPS}
+    for field, i in fields.items():
+        lines.append(f"    v{i} = get({field!r})")
+        if field in numeric:
+            lines.append(f"    ok{i} = v{i}.__class__ is float or v{i}.__class__ is int")
+
+    namespace = {"RuleEvent": RuleEvent, "rules": rules}
+    for r, rule in enumerate(rules):
+        namespace[f"count{r}"], namespace[f"active{r}"], namespace[f"fired{r}"] = columns[r]
+        hits = []
+        for k, c in enumerate(rule.conditions):
+            i = fields[c.field]
+            expr = f"v{i} {c.op} {_literal(c.value)}"
+            if c.op in _NUMERIC_OPS:
+                expr = f"ok{i} and {expr}"
+            lines.append(f"    h{r}_{k} = {expr}")
+            hits.append(f"h{r}_{k}")
+        joiner = " or " if rule.match == "any" else " and "
+        tags = ", ".join(f"({h}, {c.tag!r})" for h, c in zip(hits, rule.conditions))
+        reason = f"rules[{r}].reason_for([t for h, t in ({tags},) if h])"
+
+        lines += [
+            f"    if {joiner.join(hits)}:",
+            f"        n = count{r}[slot] + 1",
+            f"        count{r}[slot] = n",
+            f"        if n >= {rule.sustain}:",
+            f"            if not active{r}[slot] and now - fired{r}[slot] >= {_literal(rule.cooldown_s)}:",
+            f"                active{r}[slot] = 1",
+            f"                fired{r}[slot] = now",
+            f"                events.append(RuleEvent('fire', rules[{r}], {reason}, n, False))",
+        ]
+        if rule.sustain > 1:
+            lines += [
+                f"        elif not active{r}[slot]:",
+                f"            events.append(RuleEvent('pending', rules[{r}], {reason}, n, False))",
+            ]
+        lines.append("    else:")
+        clears = [_clear_expr(c, f"v{fields[c.field]}", f"ok{fields[c.field]}", rule.hysteresis)
+                  for c in rule.conditions] if rule.hysteresis else []
+        if clears and all(clears):
+            # 'any': todas deben salir de su zona; 'all': basta con una
+            clear_joiner = " and " if rule.match == "any" else " or "
+            lines += [
+                f"        if {clear_joiner.join(clears)}:",
+                f"            if count{r}[slot] or active{r}[slot]:",
+                f"                events.append(RuleEvent('clear', rules[{r}], None, count{r}[slot], bool(active{r}[slot])))",
+                f"                active{r}[slot] = 0",
+                f"            count{r}[slot] = 0",
+                "        else:",
+                f"            count{r}[slot] = 0  # banda de histéresis: se corta la racha pero la alerta sigue activa",
+            ]
+        else:
+            lines += [
+                f"        if count{r}[slot] or active{r}[slot]:",
+                f"            events.append(RuleEvent('clear', rules[{r}], None, count{r}[slot], bool(active{r}[slot])))",
+                f"            count{r}[slot] = 0",
+                f"            active{r}[slot] = 0",
+            ]
+    lines.append("    return events")
+
+    source = "\n".join(lines)
+    exec(compile(source, "<alert-rules>", "exec"), namespace)
+    evaluate = namespace["evaluate"]
+    evaluate.source = source
+    return evaluate
+
+
+class RuleEngine:
+    """Evalúa un conjunto de reglas sobre el estado por paquete de un `PackageStateStore`."""
+
+    def __init__(self, rules, store, route_field=ALERT_ROUTE_FIELD, clock=time.time):
+        self.rules = load_rules(rules)
+        self.store = store
+        self.route_field = route_field
+        self.clock = clock
+
+        columns = []
+        for rule in self.rules:
+            prefix = f"rule:{rule.name}"
+            columns.append((
+                store.add_column(f"{prefix}:count", "I", 0),
+                store.add_column(f"{prefix}:active", "b", 0),
+                store.add_column(f"{prefix}:fired", "d", float("-inf")),
+            ))
+
+        self._columns = columns
+        self._default = compile_rules(self.rules, columns)
+        routes = {route for rule in self.rules for route in rule.overrides}
+        self._by_route = {
+            route: compile_rules([rule.for_route(route) for rule in self.rules], columns)
+            for route in routes
+        }
+
+    def evaluate(self, data, slot, now=None):
+        """Aplica todas las reglas a un mensaje. Devuelve la lista de `RuleEvent` (casi siempre vacía)."""
+        now = self.clock() if now is None else now
+        if self._by_route:
+            return self._by_route.get(data.get(self.route_field), self._default)(data, slot, now)
+        return self._default(data, slot, now)
+
+    def in_alert(self, slot):
+        """True si alguna regla tiene una racha en curso o una alerta activa para este slot."""
+        for count, active, _ in self._columns:
+            if count[slot] or active[slot]:
+                return True
+        return False
+
+    def describe(self):
+        return [f"{r.name} [{r.channel}] sustain={r.sustain} cooldown={r.cooldown_s}s "
+                f"hysteresis={r.hysteresis} overrides={sorted(r.overrides)}" for r in self.rules]
@@ -0,0 +1,207 @@
+"""
+Procesador multiproceso: reparte los paquetes entre N procesos de detección.
+
+Un único proceso despachador recibe de MQTT y envía cada mensaje (bytes sin
+decodificar) al worker `crc32(id_paquete) % N`. Todos los mensajes de un
+paquete van siempre al mismo worker y por la misma cola FIFO, así que el
+orden por paquete (y el contador CONSECUTIVE_EVENTS) se conserva; cada worker
+mantiene su propio estado, pipeline de ingesta y spool (`SPOOL_DIR/shard-<i>`).
+
+No se usan suscripciones compartidas de MQTT v5 ($share/...): el broker
+reparte esos mensajes por turnos y dos lecturas del mismo paquete podrían
+procesarse en workers distintos.
+
+Los mensajes se agrupan en lotes por shard antes de cruzar la cola entre
+procesos. Un hilo supervisor rearranca los workers que mueren; el worker
+nuevo recibe una cola nueva (la anterior puede haber quedado bloqueada si el
+proceso murió dentro de `get()`), así que los lotes que quedaban en ella se
+pierden.
+"""
+
+import json
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+import time
+import zlib
+
+from observability.logs import get_logger
+from schemas.telemetry import binary_package_id
+
+log = get_logger("sharding")
+
+SHARD_BATCH_SIZE = int(os.getenv("SHARD_BATCH_SIZE", 256))          # Mensajes por lote entre procesos
+SHARD_FLUSH_INTERVAL = float(os.getenv("SHARD_FLUSH_INTERVAL", 0.05))  # Segundos máximos de espera de un lote
+SHARD_QUEUE_BATCHES = int(os.getenv("SHARD_QUEUE_BATCHES", 1024))     # Lotes máximos en cola por worker
+
+_ID_KEY = b'"id_paquete"'
+
+
+def extract_package_id(payload):
+    """Extrae los bytes de `id_paquete` sin decodificar todo el JSON.
+
+    Si el mensaje no tiene la forma esperada se recurre a json.loads.
+    Los mensajes en formato binario llevan el id en una posición fija.
+    """
+    pid = binary_package_id(payload)
+    if pid is not None:
+        return pid
+    i = payload.find(_ID_KEY)
+    if i >= 0:
+        j = i + len(_ID_KEY)
+        # Saltar espacios y ':' hasta la comilla de apertura
+        while j < len(payload) and payload[j] in b" \t\r\n:":
+            j += 1
+        if j < len(payload) and payload[j] == 0x22:  # '"'
+            k = payload.find(b'"', j + 1)
+            if k > 0 and payload.find(b"\\", j + 1, k) < 0:
+                return payload[j + 1:k]
+    try:
+        pid = json.loads(payload).get("id_paquete")
+    except (ValueError, AttributeError):
+        return None
+    return None if pid is None else str(pid).encode("utf-8")
+
+
+def shard_for(package_id, num_shards):
+    """Shard estable (entre ejecuciones y procesos) para un id en bytes."""
+    if package_id is None:
+        return 0
+    return zlib.crc32(package_id) % num_shards
+
+
+def worker_main(shard, num_shards, inbox, processed):
+    """Bucle de un worker: procesa los lotes de su shard con la lógica del procesador."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # El despachador coordina la parada
+    from scripts import processor
+
+    # El módulo puede estar ya importado (spawn re-ejecuta `python -m scripts.processor`
+    # como __mp_main__), así que la configuración por shard se aplica sobre él y no
+    # en variables de entorno que ya se leyeron
+    processor.SPOOL_DIR = os.path.join(processor.SPOOL_DIR, f"shard-{shard}")
+    processor.CHECKPOINT_DIR = os.path.join(processor.CHECKPOINT_DIR, f"shard-{shard}")
+    if processor.PROCESSOR_METRICS_PORT:
+        processor.PROCESSOR_METRICS_PORT += 1 + shard
+
+    processor.start_services()
+    log.info("Worker %d/%d listo (pid %d).", shard, num_shards, os.getpid())
+    try:
+        while True:
+            batch = inbox.get()
+            if batch is None:
+                break
+            for payload in batch:
+                processor.handle_payload(payload)
+            with processed.get_lock():
+                processed.value += len(batch)
+    finally:
+        processor.stop_services()
+
+
+class ShardDispatcher:
+    """Reparte mensajes entre procesos worker y los supervisa."""
+
+    def __init__(self, num_workers, batch_size=SHARD_BATCH_SIZE,
+                 flush_interval=SHARD_FLUSH_INTERVAL, queue_batches=SHARD_QUEUE_BATCHES,
+                 worker_target=worker_main, supervise_interval=1.0):
+        self.num_workers = num_workers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.worker_target = worker_target
+        self.supervise_interval = supervise_interval
+
+        # spawn: no heredar hilos (paho, flusher) de un fork
+        self._ctx = mp.get_context("spawn")
+        self.queue_batches = queue_batches
+        self.queues = [self._ctx.Queue(maxsize=queue_batches) for _ in range(num_workers)]
+        self.processed = [self._ctx.Value("q", 0) for _ in range(num_workers)]
+        self.procs = [None] * num_workers
+        self.restarts = 0
+
+        self._buffers = [[] for _ in range(num_workers)]
+        self._locks = [threading.Lock() for _ in range(num_workers)]
+        self._stopping = threading.Event()
+        self._threads = []
+
+    # --- Ciclo de vida ---
+
+    def start(self):
+        for shard in range(self.num_workers):
+            self._spawn(shard)
+        for target, name in ((self._flush_loop, "shard-flusher"), (self._supervise_loop, "shard-supervisor")):
+            t = threading.Thread(target=target, name=name, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout=30):
+        """Vacía los búferes, pide a los workers que terminen y los espera."""
+        self._stopping.set()
+        for t in self._threads:
+            t.join(timeout)
+        self.flush()
+        for q in self.queues:
+            q.put(None)
+        deadline = time.monotonic() + timeout
+        for proc in self.procs:
+            if proc is not None:
+                proc.join(max(0.0, deadline - time.monotonic()))
+                if proc.is_alive():
+                    proc.terminate()
+
+    # --- Reparto (hilo MQTT) ---
+
+    def dispatch(self, payload):
+        shard = shard_for(extract_package_id(payload), self.num_workers)
+        with self._locks[shard]:
+            buf = self._buffers[shard]
+            buf.append(payload)
+            if len(buf) >= self.batch_size:
+                self._flush_shard_locked(shard)
+
+    def flush(self):
+        for shard in range(self.num_workers):
+            with self._locks[shard]:
+                self._flush_shard_locked(shard)
+
+    def total_processed(self):
+        return sum(v.value for v in self.processed)
+
+    # --- Internos ---
+
+    def _flush_shard_locked(self, shard):
+        buf = self._buffers[shard]
+        if buf:
+            self._buffers[shard] = []
+            # put() bajo el lock del shard: conserva el orden y bloquea (contrapresión) si la cola está llena.
+            # Se reintenta con timeout porque el supervisor puede sustituir la cola de un worker caído.
+            while True:
+                try:
+                    self.queues[shard].put(buf, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+    def _flush_loop(self):
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+
+    def _spawn(self, shard):
+        proc = self._ctx.Process(
+            target=self.worker_target,
+            args=(shard, self.num_workers, self.queues[shard], self.processed[shard]),
+            name=f"processor-shard-{shard}",
+            daemon=True,
+        )
+        proc.start()
+        self.procs[shard] = proc
+
+    def _supervise_loop(self):
+        while not self._stopping.wait(self.supervise_interval):
+            for shard, proc in enumerate(self.procs):
+                if proc is not None and not proc.is_alive() and not self._stopping.is_set():
+                    log.error("Worker %d caído (exitcode=%s). Reiniciando...", shard, proc.exitcode)
+                    self.restarts += 1
+                    self.queues[shard] = self._ctx.Queue(maxsize=self.queue_batches)
+                    self._spawn(shard)
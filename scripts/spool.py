@@ -0,0 +1,408 @@
+"""
+Spool en disco para lecturas que no se pudieron ingerir.
+
+Cuando la API de ingesta agota los reintentos, las lecturas se añaden a un
+log de solo-anexado formado por segmentos (`<id>.seg`). Cada registro es:
+
+    [longitud: u32][crc32: u32][payload JSON]
+
+El cursor (`cursor.json`) marca hasta dónde se ha reenviado con éxito. Un
+SpoolReplayer en segundo plano vacía el log hacia `/ingest/batch` en lotes
+grandes cuando la API vuelve a estar sana, y los segmentos ya consumidos se
+compactan (se borran).
+
+Si la API rechaza un lote (4xx: un registro inválido da 422 a todo el lote,
+uno demasiado grande 413), reintentarlo no sirve: el lote se parte en
+mitades hasta aislar los registros rechazados, que pasan a un log de
+cuarentena (`dead_letter`), y el cursor sigue avanzando.
+
+Política de fsync (`fsync`):
+- "always":   fsync tras cada escritura (máxima durabilidad, más lento)
+- "interval": como mucho un fsync cada `fsync_interval` segundos
+- "never":    solo flush al SO; el fsync lo decide el sistema operativo
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+
+from observability.logs import get_logger
+
+logger = get_logger("spool")
+
+FSYNC_ALWAYS = "always"
+FSYNC_INTERVAL = "interval"
+FSYNC_NEVER = "never"
+FSYNC_POLICIES = (FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER)
+
+_HEADER = struct.Struct("<II")  # longitud, crc32
+_SEGMENT_SUFFIX = ".seg"
+_CURSOR_FILE = "cursor.json"
+_READ_CHUNK = 4 * 1024 * 1024
+
+# Resultado de `send_batch` además de True/False: la API rechazó el lote (no reintentable)
+REJECTED = "rejected"
+
+
+def _segment_name(segment_id):
+    return f"{segment_id:012d}{_SEGMENT_SUFFIX}"
+
+
+class SegmentLog:
+    """Log de solo-anexado en segmentos con cursor de consumo persistente."""
+
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024,
+                 fsync=FSYNC_INTERVAL, fsync_interval=1.0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Política de fsync desconocida: {fsync}")
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.Lock()
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+
+        os.makedirs(directory, exist_ok=True)
+        self._segments = self._list_segments()
+        if not self._segments:
+            self._segments = [0]
+        self._active_id = self._segments[-1]
+        self._recover_tail(self._active_id)
+        self._active = open(self._path(self._active_id), "ab")
+        self._cursor = self._load_cursor()
+
+    # --- Escritura ---
+
+    def append(self, record):
+        """Añade una lectura (dict) al log."""
+        self.append_many([record])
+
+    def append_many(self, records):
+        """Añade varias lecturas con una sola escritura (y como mucho un fsync)."""
+        self.append_payloads(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                             for record in records)
+
+    def append_payloads(self, payloads):
+        """Añade payloads JSON ya serializados (bytes), p. ej. los leídos de otro log."""
+        buf = bytearray()
+        for payload in payloads:
+            buf += _HEADER.pack(len(payload), zlib.crc32(payload))
+            buf += payload
+        if not buf:
+            return
+        with self._lock:
+            self._active.write(buf)
+            self._active.flush()
+            self._dirty = True
+            self._maybe_fsync_locked(force=self.fsync == FSYNC_ALWAYS)
+            if self._active.tell() >= self.segment_bytes:
+                self._rotate_locked()
+
+    def sync(self):
+        """Fuerza un fsync del segmento activo."""
+        with self._lock:
+            self._maybe_fsync_locked(force=True)
+
+    def sync_if_due(self):
+        """Aplica la política `interval` aunque no lleguen escrituras nuevas."""
+        with self._lock:
+            self._maybe_fsync_locked(force=False)
+
+    # --- Lectura / consumo ---
+
+    def read(self, max_records, position=None, ends=None):
+        """Lee hasta `max_records` payloads (bytes JSON) desde `position`
+        (por defecto, el cursor confirmado). Devuelve (payloads, nueva_posición).
+        Si se pasa la lista `ends`, se le añade la posición tras cada payload.
+        """
+        with self._lock:
+            segment_id, offset = position or self._cursor
+            segments = list(self._segments)
+            # Lo escrito en el segmento activo ya está en el SO (flush en append)
+            active_size = self._active.tell()
+            active_id = self._active_id
+
+        payloads = []
+        while len(payloads) < max_records:
+            if segment_id not in segments:
+                later = [s for s in segments if s > segment_id]
+                if not later:
+                    break
+                segment_id, offset = later[0], 0
+            limit = active_size if segment_id == active_id else None
+            offset = self._read_segment(segment_id, offset, max_records - len(payloads), payloads, limit, ends)
+            if len(payloads) >= max_records:
+                break
+            later = [s for s in segments if s > segment_id]
+            if not later:
+                break
+            segment_id, offset = later[0], 0
+        return payloads, (segment_id, offset)
+
+    def commit(self, position):
+        """Confirma que todo lo anterior a `position` se reenvió correctamente."""
+        tmp = os.path.join(self.directory, _CURSOR_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"segment": position[0], "offset": position[1]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.directory, _CURSOR_FILE))
+        with self._lock:
+            self._cursor = tuple(position)
+
+    def pending_bytes(self):
+        """Bytes pendientes de reenviar (aproximado, incluye cabeceras)."""
+        with self._lock:
+            seg, off = self._cursor
+            total = 0
+            for s in self._segments:
+                if s < seg:
+                    continue
+                size = self._active.tell() if s == self._active_id else os.path.getsize(self._path(s))
+                total += size - (off if s == seg else 0)
+            return max(0, total)
+
+    def compact(self):
+        """Borra los segmentos ya consumidos. Si el log está vacío, rota el
+        segmento activo para poder borrarlo también. Devuelve segmentos borrados."""
+        with self._lock:
+            seg, off = self._cursor
+            if seg == self._active_id and off >= self._active.tell() > 0:
+                self._rotate_locked()
+                seg, off = self._active_id, 0
+                self._cursor = (seg, off)
+            removed = [s for s in self._segments if s < seg]
+            self._segments = [s for s in self._segments if s >= seg]
+        for s in removed:
+            try:
+                os.remove(self._path(s))
+            except FileNotFoundError:
+                pass
+        if removed:
+            self.commit((seg, off))
+        return len(removed)
+
+    def close(self):
+        with self._lock:
+            self._maybe_fsync_locked(force=True)
+            self._active.close()
+
+    # --- Internos ---
+
+    def _path(self, segment_id):
+        return os.path.join(self.directory, _segment_name(segment_id))
+
+    def _list_segments(self):
+        ids = []
+        for name in os.listdir(self.directory):
+            if name.endswith(_SEGMENT_SUFFIX):
+                try:
+                    ids.append(int(name[:-len(_SEGMENT_SUFFIX)]))
+                except ValueError:
+                    continue
+        return sorted(ids)
+
+    def _load_cursor(self):
+        try:
+            with open(os.path.join(self.directory, _CURSOR_FILE)) as f:
+                c = json.load(f)
+            position = (int(c["segment"]), int(c["offset"]))
+        except (FileNotFoundError, ValueError, KeyError):
+            return (self._segments[0], 0)
+        if position[0] not in self._segments:
+            # El segmento del cursor ya se compactó: empezamos en el siguiente
+            later = [s for s in self._segments if s > position[0]]
+            return (later[0], 0) if later else (self._active_id, 0)
+        return position
+
+    def _recover_tail(self, segment_id):
+        """Trunca un registro parcial al final del segmento (escritura interrumpida)."""
+        path = self._path(segment_id)
+        if not os.path.exists(path):
+            open(path, "ab").close()
+            return
+        valid = self._read_segment(segment_id, 0, float("inf"), None, None)
+        if valid < os.path.getsize(path):
+            with open(path, "r+b") as f:
+                f.truncate(valid)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _read_segment(self, segment_id, offset, max_records, out, limit, ends=None):
+        """Lee registros válidos desde `offset`; devuelve el offset tras el último leído."""
+        count = 0
+        with open(self._path(segment_id), "rb") as f:
+            f.seek(offset)
+            buf = b""
+            pos = 0
+            while count < max_records:
+                if limit is not None and offset + pos >= limit:
+                    break
+                if len(buf) - pos < _HEADER.size:
+                    buf = buf[pos:] + f.read(_READ_CHUNK)
+                    offset += pos
+                    pos = 0
+                    if len(buf) < _HEADER.size:
+                        break
+                length, crc = _HEADER.unpack_from(buf, pos)
+                end = pos + _HEADER.size + length
+                if end > len(buf):
+                    more = f.read(max(_READ_CHUNK, end - len(buf)))
+                    if not more:
+                        break
+                    buf = buf[pos:] + more
+                    offset += pos
+                    pos = 0
+                    continue
+                payload = buf[pos + _HEADER.size:end]
+                if zlib.crc32(payload) != crc:
+                    break  # Registro corrupto o truncado: fin de los datos válidos
+                if out is not None:
+                    out.append(payload)
+                pos = end
+                if ends is not None:
+                    ends.append((segment_id, offset + pos))
+                count += 1
+        return offset + pos
+
+    def _rotate_locked(self):
+        self._maybe_fsync_locked(force=True)
+        self._active.close()
+        self._active_id += 1
+        self._segments.append(self._active_id)
+        self._active = open(self._path(self._active_id), "ab")
+
+    def _maybe_fsync_locked(self, force):
+        if not self._dirty:
+            return
+        now = time.monotonic()
+        if force or (self.fsync == FSYNC_INTERVAL and now - self._last_fsync >= self.fsync_interval):
+            os.fsync(self._active.fileno())
+            self._last_fsync = now
+            self._dirty = False
+
+
+class SpoolReplayer:
+    """Hilo que reenvía el contenido del spool cuando la API está sana.
+
+    `send_batch(body_bytes, n)` recibe el lote ya serializado como array JSON
+    (los payloads se concatenan sin volver a decodificarlos) y devuelve True
+    si la API lo aceptó, False si hay que reintentarlo más tarde o REJECTED
+    si la API lo rechazó. `health_check()` devuelve True si la API responde.
+    Los registros rechazados uno a uno van a `dead_letter` (otro SegmentLog);
+    sin él, se descartan con un error en el log.
+    """
+
+    def __init__(self, log, send_batch, health_check, batch_size=1000,
+                 idle_interval=2.0, max_backoff=30.0, dead_letter=None):
+        self.log = log
+        self.dead_letter = dead_letter
+        self.send_batch = send_batch
+        self.health_check = health_check
+        self.batch_size = batch_size
+        self.idle_interval = idle_interval
+        self.max_backoff = max_backoff
+
+        self.replayed = 0
+        self.rejected = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="spool-replayer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def drain_once(self):
+        """Reenvía todo lo pendiente. Devuelve el nº de lecturas reenviadas, o
+        None si un lote falló (se reintentará más tarde)."""
+        sent = 0
+        while not self._stop.is_set():
+            ends = []
+            payloads, position = self.log.read(self.batch_size, ends=ends)
+            if not payloads:
+                break
+            result = self.send_batch(b"[" + b",".join(payloads) + b"]", len(payloads))
+            if result == REJECTED:
+                accepted = self._split_rejected(payloads, ends)
+                if accepted is None:
+                    return None
+                sent += accepted
+                continue
+            if not result:
+                return None
+            self.log.commit(position)
+            sent += len(payloads)
+            self.replayed += len(payloads)
+        if sent:
+            self.log.compact()
+        return sent
+
+    def _split_rejected(self, payloads, ends):
+        """Reenvía un lote rechazado por mitades, en orden, confirmando el cursor tras cada parte.
+
+        Los registros rechazados de uno en uno van a cuarentena. Devuelve las lecturas aceptadas,
+        o None si una parte falló por la red (se sigue más tarde desde la última parte confirmada).
+        """
+        accepted = 0
+        stack = [(0, len(payloads))]  # el siguiente rango a tratar es el último
+        rejected = True               # el lote completo ya se rechazó
+        while stack:
+            lo, hi = stack.pop()
+            if not rejected:
+                result = self.send_batch(b"[" + b",".join(payloads[lo:hi]) + b"]", hi - lo)
+                if not result:
+                    return None
+                if result != REJECTED:
+                    self.log.commit(ends[hi - 1])
+                    accepted += hi - lo
+                    self.replayed += hi - lo
+                    continue
+            rejected = False
+            if hi - lo == 1:
+                self._quarantine(payloads[lo])
+                self.log.commit(ends[lo])
+            else:
+                mid = (lo + hi) // 2
+                stack += [(mid, hi), (lo, mid)]
+        return accepted
+
+    def _quarantine(self, payload):
+        self.rejected += 1
+        if self.dead_letter is None:
+            logger.error("Spool: registro rechazado por la API y descartado: %s", payload[:200])
+            return
+        self.dead_letter.append_payloads([payload])
+        self.dead_letter.sync()
+        logger.warning("Spool: registro rechazado por la API; movido a %s", self.dead_letter.directory)
+
+    def _run(self):
+        backoff = self.idle_interval
+        while not self._stop.is_set():
+            self.log.sync_if_due()
+            if self.log.pending_bytes() == 0:
+                self._stop.wait(self.idle_interval)
+                continue
+            if not self.health_check():
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            sent = self.drain_once()
+            if sent is None:
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            else:
+                backoff = self.idle_interval
+                if sent:
+                    logger.info("Spool: %d registros reenviados a la API.", sent)
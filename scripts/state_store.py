@@ -0,0 +1,223 @@
+"""
+Almacén compacto y acotado del estado por paquete del procesador.
+
+En lugar de un dict de dicts por `id_paquete` (cientos de bytes por paquete
+y sin expulsión), cada paquete recibe un *slot* entero y su estado vive en
+columnas `array` contiguas indexadas por ese slot. Cada detector registra
+las suyas (el motor de reglas, la agregación, la detección geoespacial):
+
+    consecutive = store.add_column("consecutive", "I", 0)
+    slot = store.touch("PKG-A123")
+    consecutive[slot] += 1
+
+El índice id → slot es un OrderedDict en orden de uso (LRU), así que la
+expulsión por TTL solo mira el principio del índice y es O(1) amortizado.
+Los slots liberados se reutilizan. Un paquete entregado deja de emitir y
+sale por TTL; `remove()` permite expulsarlo explícitamente.
+"""
+
+import sys
+import time
+from array import array
+from collections import OrderedDict
+
+
+class PackageStateStore:
+    """Estado por paquete en columnas `array` con expulsión TTL/LRU."""
+
+    def __init__(self, ttl_seconds=6 * 3600, max_packages=200000, columns=(),
+                 clock=time.time, on_evict=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_packages = max_packages
+        self.clock = clock
+        self.on_evict = on_evict  # callback(id_paquete, slot) antes de liberar el slot
+
+        self._index = OrderedDict()  # id_paquete -> slot (del menos al más reciente)
+        self._ids = []               # slot -> id_paquete (None si está libre)
+        self._free = []              # slots libres para reutilizar
+        self._columns = {}
+        self._defaults = {}
+        self.last_seen = array("d")  # instante del último mensaje por slot
+        self.evicted = 0
+        self.released = None         # ids expulsados desde la última lectura (solo si se activa con [])
+        self.changed = None          # ids modificados sin touch() desde la última lectura (ídem con set())
+
+        for name, typecode, default in columns:
+            self.add_column(name, typecode, default)
+
+    # --- Columnas ---
+
+    def add_column(self, name, typecode, default=0):
+        """Registra una columna nueva (p. ej. para otros detectores)."""
+        if name in self._columns:
+            raise ValueError(f"La columna {name} ya existe")
+        self._columns[name] = array(typecode, [default] * len(self._ids))
+        self._defaults[name] = default
+        return self._columns[name]
+
+    def column(self, name):
+        """Columna `array` indexada por slot. La referencia es estable: se puede cachear."""
+        return self._columns[name]
+
+    def columns(self):
+        """Pares (nombre, columna) de todas las columnas registradas."""
+        return list(self._columns.items())
+
+    # --- Acceso por paquete ---
+
+    def touch(self, package_id, now=None):
+        """Devuelve el slot del paquete (creándolo si no existe) y lo marca como usado."""
+        now = self.clock() if now is None else now
+        slot = self._index.get(package_id)
+        if slot is not None:
+            self._index.move_to_end(package_id)
+        else:
+            self._expire(now)
+            if len(self._index) >= self.max_packages:
+                self._evict_oldest()
+            slot = self._allocate(package_id)
+        self.last_seen[slot] = now
+        return slot
+
+    def get(self, package_id):
+        """Slot del paquete o None, sin marcarlo como usado."""
+        return self._index.get(package_id)
+
+    def remove(self, package_id):
+        """Expulsa un paquete (p. ej. al confirmarse la entrega)."""
+        slot = self._index.pop(package_id, None)
+        if slot is not None:
+            self._release(package_id, slot)
+        return slot is not None
+
+    def mark_changed(self, package_id):
+        """Anota un cambio en las columnas de un paquete que no pasa por `touch()` (p. ej. cerrar su ventana)."""
+        if self.changed is not None:
+            self.changed.add(package_id)
+
+    def evict_expired(self, now=None):
+        """Expulsa los paquetes inactivos más de `ttl_seconds`. Devuelve cuántos."""
+        return self._expire(self.clock() if now is None else now)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, package_id):
+        return package_id in self._index
+
+    def idle(self, older_than):
+        """Pares (id_paquete, slot) sin mensajes desde antes de `older_than`, del más antiguo al más reciente.
+
+        Recorre solo el principio del índice LRU: O(nº de paquetes inactivos).
+        """
+        for package_id, slot in self._index.items():
+            if self.last_seen[slot] >= older_than:
+                break
+            yield package_id, slot
+
+    def recent(self, since):
+        """Pares (id_paquete, slot) con mensajes desde `since`, del más reciente al más antiguo.
+
+        Recorre solo el final del índice LRU: O(nº de paquetes activos).
+        """
+        index, last_seen = self._index, self.last_seen
+        for package_id in reversed(index):
+            slot = index[package_id]
+            if last_seen[slot] < since:
+                break
+            yield package_id, slot
+
+    def items(self):
+        """Pares (id_paquete, slot) del menos al más recientemente usado."""
+        return list(self._index.items())
+
+    def slot_ids(self):
+        """Copia de la tabla slot -> id_paquete (None = slot libre)."""
+        return list(self._ids)
+
+    # --- Restauración ---
+
+    def restore(self, ids, last_seen, columns):
+        """Carga en bloque un estado guardado en un almacén vacío.
+
+        `ids` va del menos al más recientemente usado y el paquete i ocupa el
+        slot i. `columns` es nombre -> `array`; las que falten (o con otro
+        typecode) toman su valor por defecto. Las columnas se rellenan en su
+        sitio: las referencias cacheadas por los detectores siguen valiendo.
+        """
+        if self._index:
+            raise ValueError("restore() necesita un almacén vacío")
+        n = len(ids)
+        self._ids = list(ids)
+        self._index = OrderedDict(zip(self._ids, range(n)))
+        self._free = []
+        self.last_seen[:] = last_seen
+        for name, col in self._columns.items():
+            saved = columns.get(name)
+            if saved is None or saved.typecode != col.typecode or len(saved) != n:
+                saved = array(col.typecode, [self._defaults[name]]) * n
+            col[:] = saved
+
+    # --- Memoria ---
+
+    def memory_usage(self):
+        """Bytes usados por el índice y las columnas, y media por paquete seguido."""
+        index_bytes = sys.getsizeof(self._index) + sys.getsizeof(self._ids) + sys.getsizeof(self._free)
+        index_bytes += sum(sys.getsizeof(pid) for pid in self._index)
+        column_bytes = sum(sys.getsizeof(col) for col in self._columns.values())
+        column_bytes += sys.getsizeof(self.last_seen)
+        total = index_bytes + column_bytes
+        tracked = len(self._index)
+        return {
+            "tracked_packages": tracked,
+            "slots": len(self._ids),
+            "index_bytes": index_bytes,
+            "column_bytes": column_bytes,
+            "total_bytes": total,
+            "bytes_per_package": total / tracked if tracked else 0.0,
+        }
+
+    # --- Internos ---
+
+    def _allocate(self, package_id):
+        if self._free:
+            slot = self._free.pop()
+            self._ids[slot] = package_id
+            for name, col in self._columns.items():
+                col[slot] = self._defaults[name]
+        else:
+            slot = len(self._ids)
+            self._ids.append(package_id)
+            for name, col in self._columns.items():
+                col.append(self._defaults[name])
+            self.last_seen.append(0.0)
+        self._index[package_id] = slot
+        return slot
+
+    def _release(self, package_id, slot):
+        if self.on_evict is not None:
+            self.on_evict(package_id, slot)
+        self._ids[slot] = None
+        self._free.append(slot)
+        self.evicted += 1
+        if self.released is not None:
+            self.released.append(package_id)
+
+    def _expire(self, now):
+        if self.ttl_seconds is None:
+            return 0
+        cutoff = now - self.ttl_seconds
+        removed = 0
+        # El índice está en orden de uso: basta con mirar el principio
+        while self._index:
+            package_id, slot = next(iter(self._index.items()))
+            if self.last_seen[slot] >= cutoff:
+                break
+            del self._index[package_id]
+            self._release(package_id, slot)
+            removed += 1
+        return removed
+
+    def _evict_oldest(self):
+        package_id, slot = self._index.popitem(last=False)
+        self._release(package_id, slot)
@@ -0,0 +1,282 @@
+"""
+Generador offline de trazas etiquetadas (flota completa con NumPy).
+
+Produce de golpe millones de lecturas de muchos paquetes con el mismo modelo
+que sensores_envio.py (ruta Galicia → Madrid interpolada, ruido de
+temperatura y fuerza G, picos aislados, episodios de puerta abierta), pero
+en lugar de simular lectura a lectura calcula cada bloque de ticks como
+matrices paquetes × ticks.
+
+Sobre esa base inyecta incidentes reales con su etiqueta de verdad:
+
+- `temperatura`: excursiones sostenidas de la cadena de frío (+4..+8 °C
+  durante varios ticks);
+- `impacto`: golpes de 1-3 ticks con fuerza G por encima del umbral.
+
+La columna `label` (0/1) marca las lecturas dentro de un incidente y
+`incidente` su tipo, así que la salida sirve directamente a
+scripts/evaluate_rules.py y a los benchmarks de replay. Los picos aislados y
+la puerta abierta son ruido normal: label 0.
+
+Las filas salen en orden de tiempo (todos los paquetes tick a tick) en
+ficheros troceados CSV, JSONL o Parquet (este último requiere pyarrow). Con
+la misma semilla y los mismos parámetros la salida es idéntica.
+
+Ejecuta:
+    python -m scripts.trace_generator --paquetes 2000 --lecturas 1000 --out trazas/ --formato csv
+    python -m scripts.evaluate_rules trazas/trazas-00000.csv
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+import msgspec
+import numpy as np
+import pandas as pd
+
+from sensores_envio import (
+    DOOR_EPISODE_DURATION_S, DOOR_EPISODE_START_PROB_PER_MIN, G_BASE, G_BUMP_MAG, G_BUMP_PROB, G_JITTER,
+    RANGO_TEMP, ROUTE_PROGRESS_PER_TICK, TEMP_MAX_DELTA_OPEN, TEMP_PROB_PICO, TEMP_VARIACION, WAYPOINTS,
+)
+
+COLUMNS = ("id_paquete", "timestamp_utc", "temperatura", "fuerza_g", "puerta_abierta",
+           "latitud", "longitud", "label", "incidente")
+INCIDENT_NAMES = np.array(["", "temperatura", "impacto"], dtype=object)
+_NONE, _TEMP, _IMPACT = 0, 1, 2
+
+# Incidentes inyectados (probabilidad de inicio por tick y duración en ticks)
+EXCURSION_PROB = 0.002
+EXCURSION_TICKS = (3, 30)
+EXCURSION_DELTA = (4.0, 8.0)   # °C sobre la temperatura normal
+IMPACT_PROB = 0.0005
+IMPACT_TICKS = (1, 3)
+IMPACT_G = (2.6, 5.0)
+
+DEFAULT_START = "2025-01-01T00:00:00"
+SERPENTINE = 0.0005
+
+
+def _episodes(starts, durations, carry, t0):
+    """Máscara de ticks dentro de algún episodio (paquetes × ticks).
+
+    `starts` marca el inicio de un episodio y `durations` su duración en
+    ticks; `carry` es, por paquete, el primer tick absoluto libre tras el
+    último episodio del bloque anterior. Un episodio que empieza mientras
+    otro sigue abierto lo alarga (el simulador lo ignoraría): con las
+    probabilidades por defecto la diferencia es despreciable y así se
+    calcula con un solo `maximum.accumulate`.
+    """
+    ticks = t0 + np.arange(starts.shape[1])
+    ends = np.where(starts, ticks + durations, -1)
+    ends[:, 0] = np.maximum(ends[:, 0], carry)
+    ends = np.maximum.accumulate(ends, axis=1)
+    return ticks < ends, ends[:, -1]
+
+
+class TraceGenerator:
+    """Flota sintética de `num_packages` paquetes con `readings` lecturas cada uno.
+
+    `chunks(ticks_per_chunk)` devuelve DataFrames consecutivos en el tiempo;
+    el estado que cruza de un bloque a otro (episodios de puerta e
+    incidentes abiertos) se arrastra por paquete.
+    """
+
+    def __init__(self, num_packages, readings, seed=7, interval_s=2.0, start=DEFAULT_START,
+                 prefix="PKG", loop_route=False, excursion_prob=EXCURSION_PROB, impact_prob=IMPACT_PROB):
+        self.num_packages = num_packages
+        self.readings = readings
+        self.interval_s = interval_s
+        self.loop_route = loop_route
+        self.excursion_prob = excursion_prob
+        self.impact_prob = impact_prob
+        self.rng = np.random.default_rng(seed)
+        self.ids = np.array([f"{prefix}-{i:05d}" for i in range(num_packages)], dtype=object)
+
+        start_ns = np.datetime64(start, "ns").astype(np.int64)
+        # Desfase de cada paquete dentro del intervalo: las lecturas no llegan todas a la vez
+        phase = self.rng.random(num_packages) * interval_s
+        self.order = np.argsort(phase, kind="stable")
+        self.phase_ns = start_ns + (phase * 1e9).astype(np.int64)
+        # Cada paquete empieza en un punto distinto de la ruta
+        legs = len(WAYPOINTS) - 1
+        self.offset = self.rng.random(num_packages) * (legs if loop_route else legs * 0.5)
+        self.waypoints = np.array(WAYPOINTS)
+
+        self.door_until = np.zeros(num_packages, dtype=np.int64)
+        self.excursion_until = np.zeros(num_packages, dtype=np.int64)
+        self.impact_until = np.zeros(num_packages, dtype=np.int64)
+        self.tick = 0
+
+    @property
+    def total_rows(self):
+        return self.num_packages * self.readings
+
+    def chunks(self, ticks_per_chunk):
+        while self.tick < self.readings:
+            yield self.next_chunk(min(ticks_per_chunk, self.readings - self.tick))
+
+    def next_chunk(self, ticks):
+        p, rng, t0 = self.num_packages, self.rng, self.tick
+        shape = (p, ticks)
+        tick_idx = t0 + np.arange(ticks)
+
+        # Ruta: interpolación lineal entre waypoints + serpenteo
+        legs = len(self.waypoints) - 1
+        progress = self.offset[:, None] + tick_idx * ROUTE_PROGRESS_PER_TICK
+        progress = np.mod(progress, legs) if self.loop_route else np.minimum(progress, legs)
+        leg = np.minimum(progress.astype(np.int64), legs - 1)
+        frac = (progress - leg)[..., None]
+        pos = self.waypoints[leg] + (self.waypoints[leg + 1] - self.waypoints[leg]) * frac
+        pos += rng.uniform(-SERPENTINE, SERPENTINE, shape + (2,))
+
+        # Puerta abierta: episodios de minutos
+        door_prob = DOOR_EPISODE_START_PROB_PER_MIN * (self.interval_s / 60.0)
+        door_ticks = np.ceil(rng.uniform(*DOOR_EPISODE_DURATION_S, shape) / self.interval_s).astype(np.int64)
+        door, self.door_until = _episodes(rng.random(shape) < door_prob, door_ticks, self.door_until, t0)
+
+        # Temperatura como el simulador: base ± variación, picos aislados, efecto puerta, recorte
+        lo, hi = RANGO_TEMP
+        temp = (lo + hi) / 2 + rng.uniform(-TEMP_VARIACION, TEMP_VARIACION, shape)
+        spikes = rng.random(shape) < TEMP_PROB_PICO
+        temp[spikes] += rng.uniform(1.5, 4.5, int(spikes.sum()))
+        temp[door] += rng.uniform(0.0, TEMP_MAX_DELTA_OPEN, int(door.sum()))
+        np.clip(temp, lo - 1.0, hi + 3.0, out=temp)
+
+        g = G_BASE + rng.uniform(-G_JITTER, G_JITTER, shape)
+        bumps = rng.random(shape) < G_BUMP_PROB
+        g[bumps] += rng.uniform(*G_BUMP_MAG, int(bumps.sum()))
+        np.clip(g, 0.6, 1.6, out=g)
+
+        # Incidentes reales (fuera del recorte del simulador)
+        excursion_ticks = rng.integers(EXCURSION_TICKS[0], EXCURSION_TICKS[1] + 1, shape)
+        excursion, self.excursion_until = _episodes(
+            rng.random(shape) < self.excursion_prob, excursion_ticks, self.excursion_until, t0)
+        temp[excursion] += rng.uniform(*EXCURSION_DELTA, int(excursion.sum()))
+        impact_ticks = rng.integers(IMPACT_TICKS[0], IMPACT_TICKS[1] + 1, shape)
+        impact, self.impact_until = _episodes(
+            rng.random(shape) < self.impact_prob, impact_ticks, self.impact_until, t0)
+        g[impact] = rng.uniform(*IMPACT_G, int(impact.sum()))
+
+        kind = np.where(excursion, _TEMP, np.where(impact, _IMPACT, _NONE))
+        ts = self.phase_ns[:, None] + (tick_idx * (self.interval_s * 1e9)).astype(np.int64)
+        self.tick += ticks
+
+        # Orden de llegada: tick a tick y, dentro del tick, por desfase
+        def flat(a):
+            return a[self.order].T.reshape(-1)
+
+        return pd.DataFrame({
+            "id_paquete": np.tile(self.ids[self.order], ticks),
+            "timestamp_utc": np.datetime_as_string(flat(ts).astype("datetime64[ns]"), unit="ms", timezone="UTC"),
+            "temperatura": flat(temp).round(2),
+            "fuerza_g": flat(g).round(3),
+            "puerta_abierta": flat(door),
+            "latitud": flat(pos[..., 0]).round(6),
+            "longitud": flat(pos[..., 1]).round(6),
+            "label": flat(kind != _NONE).astype(np.int8),
+            "incidente": INCIDENT_NAMES[flat(kind)],
+        }, columns=COLUMNS)
+
+
+# --- Escritura troceada ---
+
+class TraceRow(msgspec.Struct):
+    """Una lectura de la traza tal y como se escribe en JSONL."""
+    id_paquete: str
+    timestamp_utc: str
+    temperatura: float
+    fuerza_g: float
+    puerta_abierta: bool
+    latitud: float
+    longitud: float
+    label: int
+    incidente: str
+
+
+_encoder = msgspec.json.Encoder()
+WRITE_BATCH_ROWS = 100_000
+
+
+def _row_batches(df):
+    cols = [df[c].tolist() for c in COLUMNS]
+    for start in range(0, len(df), WRITE_BATCH_ROWS):
+        yield zip(*(c[start:start + WRITE_BATCH_ROWS] for c in cols))
+
+def _write_csv(df, path):
+    # Cada fila como array JSON sin corchetes ya es una línea CSV válida (cadenas entre
+    # comillas, booleanos true/false que pandas reconoce) y msgspec la serializa en C:
+    # varias veces más rápido que DataFrame.to_csv. Los ids no llevan comillas ni saltos.
+    with open(path, "wb") as f:
+        f.write(",".join(COLUMNS).encode() + b"\n")
+        for rows in _row_batches(df):
+            body = _encoder.encode_lines(list(rows))
+            f.write(body[1:-2].replace(b"]\n[", b"\n") + b"\n")
+
+def _write_jsonl(df, path):
+    with open(path, "wb") as f:
+        for rows in _row_batches(df):
+            f.write(_encoder.encode_lines([TraceRow(*r) for r in rows]))
+
+def _write_parquet(df, path):
+    df.to_parquet(path, index=False)
+
+WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl, "parquet": _write_parquet}
+
+
+def check_format(formato):
+    if formato == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise RuntimeError("El formato parquet requiere pyarrow (pip install pyarrow)")
+
+
+def write_traces(generator, out_dir, formato="csv", rows_per_file=1_000_000, prefix="trazas"):
+    """Escribe la traza en ficheros de ~`rows_per_file` filas. Devuelve las rutas escritas."""
+    check_format(formato)
+    os.makedirs(out_dir, exist_ok=True)
+    write = WRITERS[formato]
+    ticks_per_chunk = max(1, rows_per_file // generator.num_packages)
+    paths = []
+    for i, df in enumerate(generator.chunks(ticks_per_chunk)):
+        path = os.path.join(out_dir, f"{prefix}-{i:05d}.{formato}")
+        write(df, path)
+        paths.append(path)
+    return paths
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generador offline de trazas etiquetadas (NumPy)")
+    ap.add_argument("--paquetes", type=int, default=1000, help="Paquetes de la flota")
+    ap.add_argument("--lecturas", type=int, default=1000, help="Lecturas por paquete")
+    ap.add_argument("--seed", type=int, default=7, help="Semilla (misma semilla → misma traza)")
+    ap.add_argument("--interval", type=float, default=2.0, help="Segundos entre lecturas de un paquete")
+    ap.add_argument("--inicio", default=DEFAULT_START, help="Instante de la primera lectura (ISO 8601, UTC)")
+    ap.add_argument("--prefijo-id", default="PKG", help="Prefijo de id_paquete (<prefijo>-00000...)")
+    ap.add_argument("--loop-route", action="store_true", help="Al llegar a Madrid vuelve a empezar la ruta")
+    ap.add_argument("--prob-excursion", type=float, default=EXCURSION_PROB,
+                    help="Probabilidad por tick de iniciar una excursión de temperatura")
+    ap.add_argument("--prob-impacto", type=float, default=IMPACT_PROB,
+                    help="Probabilidad por tick de un impacto")
+    ap.add_argument("--out", default="trazas", help="Directorio de salida")
+    ap.add_argument("--formato", default="csv", choices=sorted(WRITERS))
+    ap.add_argument("--filas-por-fichero", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    try:
+        check_format(args.formato)
+    except RuntimeError as exc:
+        sys.exit(f"[ERROR] {exc}")
+
+    gen = TraceGenerator(args.paquetes, args.lecturas, seed=args.seed, interval_s=args.interval,
+                         start=args.inicio, prefix=args.prefijo_id, loop_route=args.loop_route,
+                         excursion_prob=args.prob_excursion, impact_prob=args.prob_impacto)
+    t0 = time.perf_counter()
+    paths = write_traces(gen, args.out, args.formato, args.filas_por_fichero)
+    elapsed = time.perf_counter() - t0
+    print(f"[INFO] {gen.total_rows:,} lecturas de {args.paquetes:,} paquetes en {len(paths)} fichero(s) "
+          f"{args.formato} en {args.out}/ ({elapsed:.1f} s, {gen.total_rows / elapsed:,.0f} lecturas/s)")
+
+
+if __name__ == "__main__":
+    main()
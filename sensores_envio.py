@@ -10,15 +10,25 @@ Publica un JSON por lectura con:
 - fuerza_g
 - puerta_abierta (episodios de minutos)
 - latitud, longitud (ruta simulada Galicia → Madrid)
+
+Modo flota (--num-paquetes N): un solo proceso simula N paquetes, cada uno
+con su DoorEpisode y su RouteCursor, y publica por una o pocas conexiones
+MQTT (--conexiones). Con --target-rate se fija el ritmo total en mensajes/s
+(el intervalo por paquete pasa a ser N / rate). Cada --report-every segundos
+informa del ritmo conseguido y del retraso (drift) respecto al calendario.
+
+Con --formato bin cada lectura se publica en el formato binario compacto de
+schemas/telemetry.py (~43 B frente a ~200 B de JSON) en <topic>/bin.
 """
 
-import json
 import time
 import random
 import argparse
 from datetime import datetime, timezone, timedelta
 import paho.mqtt.client as mqtt
 
+from schemas import telemetry
+
 # ---------------------------
 # Configuración de la simulación
 # ---------------------------
@@ -59,6 +69,13 @@ def ahora_iso_utc():
 def clamp(x, lo, hi):
     return lo if x < lo else hi if x > hi else x
 
+def entero_positivo(valor):
+    """Tipo de argparse: entero >= 1 (el modo flota divide entre paquetes y conexiones)."""
+    n = int(valor)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"debe ser >= 1 (recibido {valor})")
+    return n
+
 class DoorEpisode:
     def __init__(self):
         self.open_until = None
@@ -126,6 +143,7 @@ def sim_temperatura_like_original(puerta_abierta: bool, base=None, variacion=TEM
     return round(clamp(t, lo - 1.0, hi + 3.0), 2)
 
 def build_payload(id_paquete, lat, lon, puerta_abierta):
+    """Lectura con la forma de `schemas.telemetry.TelemetryMessage`."""
     return {
         "id_paquete": id_paquete,
         "timestamp_utc": ahora_iso_utc(),
@@ -136,6 +154,107 @@ def build_payload(id_paquete, lat, lon, puerta_abierta):
         "longitud": round(lon, 6),
     }
 
+# Formatos de mensaje: JSON legible o binario compacto (topic con sufijo /bin)
+ENCODERS = {"json": telemetry.encode, "bin": telemetry.encode_binary}
+
+def package_topic(args, id_paquete):
+    suffix = telemetry.BINARY_TOPIC_SUFFIX if args.formato == "bin" else ""
+    return f"{args.topic_root}/{id_paquete}{suffix}"
+
+def describe(msg, formato):
+    return msg.decode("utf-8") if formato == "json" else f"<{len(msg)} bytes, {telemetry.decode_binary(msg)}>"
+
+class FleetPackage:
+    """Estado de un paquete simulado dentro de la flota."""
+    __slots__ = ("id_paquete", "topic", "door", "route")
+
+    def __init__(self, id_paquete, topic, loop_route):
+        self.id_paquete = id_paquete
+        self.topic = topic
+        self.door = DoorEpisode()
+        self.route = RouteCursor(WAYPOINTS, loop=loop_route)
+
+def run_fleet(args):
+    n = args.num_paquetes
+    interval = n / args.target_rate if args.target_rate else args.interval  # segundos entre lecturas de un paquete
+    spacing = interval / n  # separación entre publicaciones consecutivas (ritmo uniforme)
+    encode = ENCODERS[args.formato]
+
+    clients = []
+    for c in range(args.conexiones):
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=f"fleet-{args.id_paquete}-{c}")
+        client.connect(args.broker, args.port, keepalive=30)
+        client.loop_start()
+        clients.append(client)
+
+    packages = [
+        FleetPackage(f"{args.id_paquete}-{i:05d}", package_topic(args, f"{args.id_paquete}-{i:05d}"), args.loop_route)
+        for i in range(n)
+    ]
+    print(f"[INFO] Flota: {n} paquetes, {len(clients)} conexión(es) a {args.broker}:{args.port}, "
+          f"objetivo {n / interval:,.0f} msgs/s (cada paquete cada {interval:.3f} s)")
+    print("[INFO] Ctrl+C para detener.\n")
+
+    start = time.perf_counter()
+    sent = errors = 0
+    window_sent, window_start = 0, start
+    max_drift = 0.0
+    next_report = start + args.report_every
+    now_dt = datetime.now(timezone.utc)
+
+    try:
+        k = 0
+        while True:
+            i = k % n
+            if i == 0:
+                now_dt = datetime.now(timezone.utc)  # un instante por vuelta para los episodios de puerta
+
+            # Calendario: la publicación k debería salir en start + k * spacing
+            scheduled = start + k * spacing
+            now = time.perf_counter()
+            if scheduled - now > 0.001:
+                time.sleep(scheduled - now)
+                now = time.perf_counter()
+            drift = now - scheduled
+            if drift > max_drift:
+                max_drift = drift
+
+            pkg = packages[i]
+            pkg.door.ensure_reset(now_dt)
+            pkg.door.maybe_start(now_dt, interval)
+            puerta_abierta = pkg.door.is_open(now_dt)
+            lat, lon = pkg.route.step(ROUTE_PROGRESS_PER_TICK)
+            msg = encode(build_payload(pkg.id_paquete, lat, lon, puerta_abierta))
+
+            r = clients[i % len(clients)].publish(pkg.topic, msg, qos=args.qos)
+            if r.rc != mqtt.MQTT_ERR_SUCCESS:
+                errors += 1
+            else:
+                sent += 1
+                window_sent += 1
+                if args.verbose:
+                    print(f"[PUBLISH] {pkg.topic} → {describe(msg, args.formato)}")
+            k += 1
+
+            if now >= next_report:
+                rate = window_sent / (now - window_start)
+                print(f"[FLOTA] {rate:,.0f} msgs/s (objetivo {n / interval:,.0f}) | "
+                      f"drift actual {drift * 1000:,.1f} ms, máx. {max_drift * 1000:,.1f} ms | "
+                      f"enviados {sent:,}, errores {errors}")
+                window_sent, window_start = 0, now
+                max_drift = 0.0
+                next_report = now + args.report_every
+
+    except KeyboardInterrupt:
+        elapsed = time.perf_counter() - start
+        print(f"\n[SALIDA] Simulación detenida: {sent:,} mensajes en {elapsed:,.1f} s "
+              f"({sent / elapsed if elapsed else 0:,.0f} msgs/s), {errors} errores.")
+    finally:
+        for client in clients:
+            client.loop_stop()
+            client.disconnect()
+        print("[INFO] Desconectado del broker MQTT.")
+
 def main():
     ap = argparse.ArgumentParser(description="Simulador de paquete (multi-sensor) → MQTT")
     ap.add_argument("--broker", default="test.mosquitto.org", help="Servidor MQTT (por defecto: test.mosquitto.org)")
@@ -146,9 +265,25 @@ def main():
     ap.add_argument("--interval", type=float, default=2.0, help="Intervalo entre lecturas en segundos (por defecto: 2)")
     ap.add_argument("--qos", type=int, default=0, choices=[0, 1], help="Calidad de servicio MQTT (0 o 1)")
     ap.add_argument("--loop-route", action="store_true", help="Al llegar a Madrid vuelve a empezar la ruta")
+    ap.add_argument("--num-paquetes", type=entero_positivo, default=1,
+                    help="Modo flota: nº de paquetes simulados en este proceso (ids <id-paquete>-00000...)")
+    ap.add_argument("--target-rate", type=float, default=None,
+                    help="Modo flota: mensajes/s totales (sustituye a --interval)")
+    ap.add_argument("--conexiones", type=entero_positivo, default=1, help="Modo flota: conexiones MQTT a repartir")
+    ap.add_argument("--report-every", type=float, default=10.0, help="Modo flota: segundos entre informes de ritmo")
+    ap.add_argument("--verbose", action="store_true", help="Modo flota: mostrar cada publicación")
+    ap.add_argument("--formato", default="json", choices=sorted(ENCODERS),
+                    help="json (por defecto) o bin: formato binario compacto, publicado en <topic>/bin")
     args = ap.parse_args()
+    if args.target_rate is not None and args.target_rate <= 0:
+        ap.error("--target-rate debe ser > 0")
+
+    if args.num_paquetes > 1 or args.target_rate:
+        run_fleet(args)
+        return
 
-    topic = f"{args.topic_root}/{args.id_paquete}"
+    topic = package_topic(args, args.id_paquete)
+    encode = ENCODERS[args.formato]
 
     client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=f"pkg-{args.id_paquete}")
     print(f"[INFO] Conectando a {args.broker}:{args.port} ...")
@@ -171,13 +306,13 @@ def main():
             lat, lon = route.step(ROUTE_PROGRESS_PER_TICK)
 
             payload = build_payload(args.id_paquete, lat, lon, puerta_abierta)
-            msg = json.dumps(payload, ensure_ascii=False)
+            msg = encode(payload)
 
             r = client.publish(topic, msg, qos=args.qos)
             if r.rc != mqtt.MQTT_ERR_SUCCESS:
                 print(f"[ERROR] No se pudo publicar (rc={r.rc})")
             else:
-                print(f"[PUBLISH] {topic} → {msg}")
+                print(f"[PUBLISH] {topic} → {describe(msg, args.formato)}")
 
             time.sleep(args.interval)
 
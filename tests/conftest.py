@@ -0,0 +1,17 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import db, history, kpis
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Cliente de la API con el backend en memoria y KPIs y caché de últimas lecturas vacíos."""
+    monkeypatch.setattr(db, "DB_BACKEND", "memory")
+    monkeypatch.setattr(kpis, "store", kpis.KpiStore())
+    monkeypatch.setattr(kpis, "cache", kpis.TtlCache())
+    monkeypatch.setattr(history, "latest", history.LastValueCache())
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,73 @@
+"""Agregación por ventanas (scripts/aggregation.py) y su checkpoint."""
+
+import threading
+
+from scripts.aggregation import WindowAggregator
+from scripts.checkpoint import StateCheckpointer
+from scripts.state_store import PackageStateStore
+
+
+class Clock:
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def reading(package_id, second):
+    return {"id_paquete": package_id, "timestamp_utc": f"2025-01-01T00:00:{second:02d}+00:00",
+            "temperatura": 4.0, "fuerza_g": 1.0, "puerta_abierta": False}
+
+
+def aggregator(clock, windows):
+    store = PackageStateStore(clock=clock)
+    agg = WindowAggregator(store, windows.append, lambda data: None, inactivity_s=180, clock=clock)
+    store.on_evict = agg.on_evict
+    return store, agg
+
+
+def feed(store, agg, package_id, second):
+    agg.add(reading(package_id, second), store.touch(package_id), anomalous=False)
+
+
+def test_flush_idle_only_visits_open_windows(monkeypatch):
+    clock, windows = Clock(), []
+    store, agg = aggregator(clock, windows)
+    for i in range(100):
+        feed(store, agg, f"PKG-{i}", 0)
+    clock.now += 200
+    feed(store, agg, "PKG-0", 1)  # sigue activo
+
+    # No recorre el almacén: solo el índice de ventanas abiertas
+    monkeypatch.setattr(store, "idle", lambda older_than: (_ for _ in ()).throw(AssertionError("idle()")))
+    assert agg.flush_idle() == 99
+    assert agg.flush_idle() == 0
+    assert len(windows) == 99
+    assert list(agg._open) == ["PKG-0"]
+
+
+def test_idle_flush_is_checkpointed_and_not_emitted_again_after_restart(tmp_path):
+    clock, windows = Clock(), []
+    store, agg = aggregator(clock, windows)
+    lock = threading.Lock()
+    path = str(tmp_path / "state.ckpt")
+    checkpointer = StateCheckpointer(store, path, lock, fsync=False)
+    for i in range(4):
+        feed(store, agg, f"PKG-{i}", 0)
+    for i in range(20):
+        store.touch(f"OTRO-{i}")  # sin cambios después: el siguiente checkpoint es un delta
+    clock.now += 1
+    checkpointer.checkpoint(full=True)
+
+    clock.now += 200
+    feed(store, agg, "PKG-9", 0)
+    assert agg.flush_idle() == 4
+    assert checkpointer.checkpoint() == "delta"
+
+    restored_windows = []
+    restored, restored_agg = aggregator(clock, restored_windows)
+    StateCheckpointer(restored, path, lock, fsync=False).restore()
+    restored_agg.track_open()
+    restored_agg.flush_all()
+    assert [w["id_paquete"] for w in restored_windows] == ["PKG-9"]
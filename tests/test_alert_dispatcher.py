@@ -0,0 +1,26 @@
+"""Pruebas del despachador de alertas a Discord."""
+
+import requests
+
+from scripts import alert_dispatcher
+from scripts.alert_dispatcher import AlertDispatcher
+
+
+def test_persistent_429_drops_the_message_instead_of_retrying_forever(monkeypatch):
+    calls = []
+
+    def always_429(url, json=None, **kwargs):
+        calls.append(url)
+        response = requests.Response()
+        response.status_code = 429
+        response.headers["Retry-After"] = "0"
+        return response
+
+    monkeypatch.setattr(alert_dispatcher.http_client, "post", always_429)
+    dispatcher = AlertDispatcher(coalesce_window=0.0, max_rate_limited=3)
+    dispatcher.submit("http://discord/webhook", {"content": "@here", "embeds": [{"title": "alerta"}]})
+    dispatcher.close(timeout=5)
+
+    assert len(calls) == 4
+    assert dispatcher.stats["alerts_dropped"] == 1
+    assert dispatcher.pending() == 0
@@ -0,0 +1,76 @@
+"""Prueba de humo del benchmark extremo a extremo (benchmarks/e2e_latency.py).
+
+Reproduce una grabación sintética pequeña a través del procesador real contra
+los stubs de ingesta y Discord, con un broker MQTT en proceso (amqtt).
+"""
+
+import asyncio
+import json
+import socket
+import sys
+import threading
+
+import pytest
+
+amqtt_broker = pytest.importorskip("amqtt.broker")
+
+from benchmarks import e2e_latency  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def broker_port():
+    """Broker MQTT local en un hilo con su propio event loop."""
+    port = free_port()
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    broker = amqtt_broker.Broker({"listeners": {"default": {"type": "tcp", "bind": f"127.0.0.1:{port}"}}},
+                                 loop=loop)
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(broker.start())
+        started.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=run, name="mqtt-broker", daemon=True)
+    thread.start()
+    assert started.wait(10)
+    yield port
+    asyncio.run_coroutine_threadsafe(broker.shutdown(), loop).result(10)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(10)
+
+
+def run_cli(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["e2e_latency.py", *argv])
+    return e2e_latency.main()
+
+
+def test_replay_small_recording_against_stub_servers(monkeypatch, tmp_path, broker_port):
+    recording = str(tmp_path / "rec.jsonl")
+    # 5 paquetes × 6 lecturas; con excursiones frecuentes para que salte alguna alerta
+    run_cli(monkeypatch, "synth", "--packages", "5", "--minutes", "0.1", "--interval", "1",
+            "--excursion-prob", "0.5", "--out", recording)
+    assert len(e2e_latency.load_recording(recording)) == 30
+
+    code = run_cli(monkeypatch, "run", recording, "--broker", "127.0.0.1", "--port", str(broker_port),
+                   "--rate", "200", "--startup-wait", "3", "--drain-timeout", "20", "--alert-grace", "1",
+                   "--env", "PROCESSOR_METRICS_PORT=0", "--results-dir", str(tmp_path), "--name", "smoke")
+    assert code == 0
+
+    with open(tmp_path / "smoke.json") as f:
+        result = json.load(f)
+    assert result["params"]["messages"] == 30
+    assert result["ingest"]["rows"] == 30 and result["ingest"]["lost"] == 0
+    assert result["ingest"]["latency_ms"]["count"] == 30
+    assert result["alerts"]["alerts"] >= 1
+
+    # Un resultado comparado consigo mismo no es una regresión
+    path = str(tmp_path / "smoke.json")
+    assert run_cli(monkeypatch, "compare", path, path, "--fail-on-regression") == 0
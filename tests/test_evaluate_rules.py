@@ -0,0 +1,68 @@
+"""Pruebas de la evaluación offline de la regla de N eventos."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts import evaluate_rules
+from scripts.evaluate_rules import grid_search, prepare
+
+
+def test_readings_without_temperature_are_dropped_like_the_processor():
+    # El procesador rechaza la lectura sin temperatura al validar: no cuenta ni corta la racha
+    df = pd.DataFrame({
+        "id_paquete": ["A"] * 4,
+        "timestamp_utc": [f"2025-01-01T00:00:0{i}Z" for i in range(4)],
+        "temperatura": [9.0, np.nan, 9.0, 9.0],
+        "fuerza_g": [1.0, 1.0, 1.0, 1.0],
+        "label": [1, 1, 1, 1],
+    })
+    data = prepare(df)
+    assert data["dropped"] == 1
+    assert len(data["temp"]) == 3
+    res = grid_search(data, [8.0], [2.5], [3]).iloc[0]
+    assert (res.tp, res.fn, res.fp, res.tn) == (1, 2, 0, 0)
+
+
+def test_readings_outside_schema_ranges_are_dropped():
+    df = pd.DataFrame({
+        "id_paquete": ["A"] * 4,
+        "timestamp_utc": [f"2025-01-01T00:00:0{i}Z" for i in range(4)],
+        "temperatura": [9.0, 150.0, 9.0, -80.0],
+        "fuerza_g": [1.0, 1.0, 60.0, 1.0],
+        "label": [1, 1, 1, 1],
+    })
+    data = prepare(df)
+    assert data["dropped"] == 3
+    assert data["temp"].tolist() == [9.0]
+
+
+def random_data(seed=3):
+    rng = np.random.default_rng(seed)
+    rows = 400
+    return prepare(pd.DataFrame({
+        "id_paquete": rng.choice(["A", "B", "C"], rows),
+        "timestamp_utc": pd.Timestamp("2025-01-01", tz="UTC") + pd.to_timedelta(np.arange(rows) * 2, unit="s"),
+        "temperatura": rng.choice([4.0, 8.0, 9.0], rows),
+        "fuerza_g": rng.choice([1.0, 2.5, 3.0], rows),
+        "label": rng.integers(0, 2, rows),
+    }))
+
+
+def test_verify_matches_the_processor_rule_engine():
+    evaluate_rules.verify(random_data(), [8.0], [2.5], [1, 2, 3])
+
+
+def test_verify_detects_drift_from_the_online_rule(monkeypatch):
+    # Si la regla del procesador cambiara (>= en vez de >), --verify debe notarlo
+    original = evaluate_rules.sustained_threshold_rule
+
+    def drifted(*args, **kwargs):
+        rule = original(*args, **kwargs)
+        for cond in rule["when"]:
+            cond["op"] = ">="
+        return rule
+
+    monkeypatch.setattr(evaluate_rules, "sustained_threshold_rule", drifted)
+    with pytest.raises(AssertionError, match="motor de reglas"):
+        evaluate_rules.verify(random_data(), [8.0], [2.5], [1, 2, 3])
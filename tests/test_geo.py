@@ -0,0 +1,102 @@
+"""Detección geoespacial (scripts/geo.py): rejilla, desvíos de ruta y geocercas."""
+
+import math
+import os
+import random
+
+import pytest
+
+from scripts.geo import M_PER_DEG_LAT, M_PER_DEG_LON, GeoDetector, SpatialIndex, load_geo_config
+from scripts.state_store import PackageStateStore
+
+CONFIG = os.path.join(os.path.dirname(__file__), os.pardir, "geo_config.example.json")
+
+
+def detector(route=None, **kwargs):
+    store = PackageStateStore(ttl_seconds=None)
+    geo = GeoDetector(CONFIG, store, default_route=route, **kwargs)
+    return geo, store.touch("PKG-1")
+
+
+def events(geo, slot, lat, lon):
+    return [(e.kind, e.target, e.alert) for e in geo.check({"latitud": lat, "longitud": lon}, slot)]
+
+
+def brute_distance(route, lat, lon):
+    """Distancia a la polilínea completa con la misma proyección local, sin índice."""
+    kx = M_PER_DEG_LON * math.cos(math.radians(lat))
+    best = math.inf
+    for (lat0, lon0), (lat1, lon1) in zip(route.points, route.points[1:]):
+        ax, ay = (lon0 - lon) * kx, (lat0 - lat) * M_PER_DEG_LAT
+        dx, dy = (lon1 - lon) * kx - ax, (lat1 - lat) * M_PER_DEG_LAT - ay
+        t = min(1.0, max(0.0, -(ax * dx + ay * dy) / (dx * dx + dy * dy)))
+        best = min(best, math.hypot(ax + t * dx, ay + t * dy))
+    return best
+
+
+def test_zone_transitions_emit_enter_and_leave_events():
+    geo, slot = detector()
+    # Sale del depósito de Santiago: la zona solo alerta al salir
+    assert events(geo, slot, 42.8806, -8.5456) == [("enter", "deposito-santiago", False)]
+    assert events(geo, slot, 42.8806, -8.5456) == []
+    assert events(geo, slot, 42.80, -8.45) == [("leave", "deposito-santiago", True)]
+    # Zona restringida (polígono): alerta al entrar, no al salir
+    assert events(geo, slot, 40.655, -4.70) == [("enter", "zona-restringida-avila", True)]
+    assert events(geo, slot, 40.63, -4.70) == [("leave", "zona-restringida-avila", False)]
+    assert events(geo, slot, 40.4167, -3.7038) == [("enter", "deposito-madrid", True)]
+
+
+def test_deviation_needs_a_sustained_streak_and_returns_with_hysteresis():
+    geo, slot = detector("galicia-madrid", sustain=2, hysteresis=0.8)
+    route = geo.index.routes[0]
+    on_route = ((42.3360 + 41.5033) / 2, (-7.8640 - 5.7440) / 2)  # Mitad del tramo Ourense-Zamora
+    off_route = (on_route[0] + 10_000 / M_PER_DEG_LAT, on_route[1])
+    edge = (on_route[0] + 3_000 / M_PER_DEG_LAT, on_route[1])
+    # Dentro del corredor (3 km) pero por encima del 80 %
+    assert 0.8 * route.corridor_m < brute_distance(route, *edge) < route.corridor_m
+
+    assert events(geo, slot, *off_route) == []      # una sola lectura fuera no basta
+    assert events(geo, slot, *on_route) == []       # y la racha se reinicia
+    assert events(geo, slot, *off_route) == []
+    assert events(geo, slot, *off_route) == [("deviation", "galicia-madrid", True)]
+    assert geo.off_route(slot)
+    assert events(geo, slot, *edge) == []           # histéresis: sigue fuera de ruta
+    assert events(geo, slot, *on_route) == [("back_on_route", "galicia-madrid", False)]
+    assert not geo.off_route(slot)
+
+
+@pytest.mark.parametrize("cell_deg", [0.01, 0.05, 0.5])
+def test_grid_distance_matches_brute_force_inside_the_corridor(cell_deg):
+    routes, zones = load_geo_config(CONFIG)
+    index = SpatialIndex(routes, zones, cell_deg)
+    route = routes[0]
+    rng = random.Random(7)
+    checked = 0
+    for _ in range(2000):
+        # Puntos alrededor de la ruta, a unos pocos km como mucho
+        (lat0, lon0), (lat1, lon1) = rng.choice(list(zip(route.points, route.points[1:])))
+        t = rng.random()
+        lat = lat0 + (lat1 - lat0) * t + rng.uniform(-0.04, 0.04)
+        lon = lon0 + (lon1 - lon0) * t + rng.uniform(-0.04, 0.04)
+        expected = brute_distance(route, lat, lon)
+        got = index.route_distance(0, lat, lon)
+        if expected <= route.corridor_m:
+            # Toda pieza a menos del corredor está en la celda de la lectura
+            assert got == pytest.approx(expected, abs=1e-6)
+            checked += 1
+        elif got is not None:
+            assert got > route.corridor_m
+    assert checked > 100
+
+
+def test_zone_sets_survive_a_checkpoint():
+    geo, slot = detector()
+    events(geo, slot, 40.4167, -3.7038)
+    meta = geo.checkpoint_meta()
+
+    restored, _ = detector()
+    restored._zone_set[slot] = geo._zone_set[slot]
+    restored.restore_meta(meta)
+    # Ya estaba dentro del depósito de Madrid: no vuelve a "entrar"
+    assert events(restored, slot, 40.4167, -3.7038) == []
+    assert events(restored, slot, 40.30, -3.70) == [("leave", "deposito-madrid", False)]
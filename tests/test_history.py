@@ -0,0 +1,109 @@
+"""Consultas históricas y caché de últimas lecturas (app/history.py, app/db.py)."""
+
+import asyncio
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+
+from app import db, history
+from app.routers import history as history_router
+from schemas.telemetry import Telemetry
+
+MADRID = timezone(timedelta(hours=2))
+
+
+def reading(ts, **overrides):
+    data = dict(id_paquete="PKG-1", timestamp_utc=ts, temperatura=4.0, fuerza_g=1.0, puerta_abierta=False,
+                latitud=42.0, longitud=-8.0)
+    data.update(overrides)
+    return Telemetry(**data)
+
+
+def test_sqlite_migrates_timestamps_written_in_the_old_format(tmp_path):
+    path = str(tmp_path / "telemetry.db")
+    conn = sqlite3.connect(path)
+    conn.execute(db.CREATE_TELEMETRY_TABLE_SQLITE)
+    # Formato anterior: isoformat() con la zona de origen. En texto, 01:30+02:00 (23:30 UTC) va después de 00:15Z
+    conn.executemany("INSERT INTO telemetry (id_paquete, timestamp_utc, temperatura, fuerza_g, puerta_abierta) "
+                     "VALUES ('PKG-1', ?, 4.0, 1.0, 0)", [("2025-01-02T00:15:00+00:00",), ("2025-01-02T01:30:00+02:00",)])
+    conn.commit()
+    conn.close()
+
+    async def read():
+        backend = db.SQLiteBackend(path)
+        await backend.init()
+        latest = await backend.latest_readings(datetime(2025, 1, 1, tzinfo=timezone.utc))
+        pages = [page async for page in backend.read_range(
+            "PKG-1", (datetime(2025, 1, 1, tzinfo=timezone.utc), 0), datetime(2025, 1, 3, tzinfo=timezone.utc))]
+        await backend.close()
+        return latest, pages
+
+    latest, pages = asyncio.run(read())
+    assert latest[0][2] == datetime(2025, 1, 2, 0, 15, tzinfo=timezone.utc)
+    assert [row[2] for row in pages[0]] == [datetime(2025, 1, 1, 23, 30, tzinfo=timezone.utc),
+                                            datetime(2025, 1, 2, 0, 15, tzinfo=timezone.utc)]
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == db.SQLITE_SCHEMA_VERSION
+    conn.close()
+
+
+def test_timestamps_use_one_format_across_endpoints(tmp_path):
+    ingested = reading(datetime(2025, 1, 1, 2, 0, tzinfo=MADRID))
+
+    async def run():
+        backend = db.SQLiteBackend(str(tmp_path / "telemetry.db"))
+        await backend.init()
+        await backend.insert_many([ingested])
+        rebuilt = history.LastValueCache()
+        await history.rebuild_latest(backend, rebuilt, retention_s=10 * 365 * 86400)
+        ranged = b"".join([chunk async for chunk in history.stream_range(
+            backend, "PKG-1", (datetime(2024, 1, 1, tzinfo=timezone.utc), 0),
+            datetime(2026, 1, 1, tzinfo=timezone.utc), 10)])
+        await backend.close()
+        return rebuilt, ranged
+
+    rebuilt, ranged = asyncio.run(run())
+    live = history.LastValueCache()
+    live.add_readings([ingested])
+    expected = b'"timestamp_utc":"2025-01-01T00:00:00Z"'
+    assert expected in history.encode(live.get("PKG-1"))
+    assert expected in history.encode(rebuilt.get("PKG-1"))
+    assert expected in ranged
+
+
+def test_latest_endpoint_does_not_prune_and_background_task_does(monkeypatch):
+    cache = history.LastValueCache()
+    cache.add_readings([reading(datetime(2020, 1, 1, tzinfo=timezone.utc), id_paquete="OLD"),
+                        reading(datetime.now(timezone.utc), id_paquete="NEW")])
+    monkeypatch.setattr(history, "latest", cache)
+    asyncio.run(history_router.latest_readings(activos_s=3600))
+    assert len(cache) == 2
+
+    async def prune_once():
+        task = asyncio.create_task(history.prune_latest(cache, retention_s=86400, interval_s=0))
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(prune_once())
+    assert cache.get("OLD") is None and cache.get("NEW") is not None
+
+
+def test_naive_and_aware_timestamps_mix_in_every_path(api, monkeypatch):
+    # Fuera de UTC, un instante sin zona leído como hora local se desplazaría dos horas
+    monkeypatch.setenv("TZ", "Europe/Madrid")
+    time.tzset()
+    try:
+        naive = reading(datetime(2025, 1, 1, 0, 0))
+        aware = reading(datetime(2025, 1, 1, 1, 0, tzinfo=MADRID))  # 23:00 UTC del día anterior
+        asyncio.run(db.get_backend().insert_many([naive, aware]))
+        history.latest.add_readings([naive, aware])
+
+        response = api.get("/telemetry/PKG-1/readings",
+                           params={"desde": "2024-12-31T00:00:00Z", "hasta": "2025-01-02T00:00:00Z"})
+        assert response.status_code == 200
+        assert [line.split('"timestamp_utc":"')[1][:20] for line in response.text.splitlines()] == [
+            "2024-12-31T23:00:00Z", "2025-01-01T00:00:00Z"]
+        assert history.latest.readings["PKG-1"][0] == datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp()
+    finally:
+        monkeypatch.delenv("TZ")
+        time.tzset()
@@ -0,0 +1,56 @@
+"""Cliente HTTP compartido (scripts/http_client.py): sesiones keep-alive por host y caída a HTTP/1.1."""
+
+import importlib
+import sys
+
+import requests
+
+from benchmarks.stub_servers import StubIngestServer
+from scripts import http_client
+
+
+class CountingServer(StubIngestServer):
+    """Stub de ingesta que cuenta las conexiones TCP aceptadas."""
+
+    connections = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+def test_requests_to_one_host_reuse_a_single_connection():
+    server = CountingServer().start()
+    try:
+        url = f"{server.url}/ingest"
+        for _ in range(5):
+            assert http_client.is_success(http_client.post(url, json={"id_paquete": "PKG-1"}, timeout=5))
+        assert http_client.get_session(url) is http_client.get_session(f"{server.url}/health")
+        assert server.requests == 5
+        assert server.connections == 1
+    finally:
+        http_client.close_all()
+        server.stop()
+
+
+def test_sessions_are_per_host():
+    a = http_client.get_session("http://api:8000/ingest")
+    b = http_client.get_session("https://discord.com/api/webhooks/1")
+    try:
+        assert a is not b
+        assert http_client.get_session("http://api:8000/ingest/batch") is a
+    finally:
+        http_client.close_all()
+
+
+def test_http2_falls_back_to_keep_alive_without_h2(monkeypatch):
+    monkeypatch.setenv("HTTP_CLIENT_HTTP2", "1")
+    monkeypatch.setitem(sys.modules, "h2", None)  # `import h2` falla como si no estuviera instalado
+    try:
+        module = importlib.reload(http_client)
+        assert module.HTTP_CLIENT_HTTP2 and not module.USE_HTTP2
+        assert isinstance(module.get_session("http://api:8000/ingest"), requests.Session)
+    finally:
+        http_client.close_all()
+        monkeypatch.undo()
+        importlib.reload(http_client)
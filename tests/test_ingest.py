@@ -0,0 +1,128 @@
+"""Ingesta: rutas /ingest*, backends de BD (memoria y SQLite) y micro-lotes del pipeline del procesador."""
+
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import db, history, kpis
+from app.main import app
+from app.routers import ingest
+from scripts.ingest_pipeline import IngestPipeline
+
+
+def reading(package_id="PKG-00001", **overrides):
+    data = {"id_paquete": package_id, "timestamp_utc": "2025-01-01T00:00:00+00:00",
+            "temperatura": 4.0, "fuerza_g": 1.0, "puerta_abierta": False}
+    data.update(overrides)
+    return data
+
+
+def test_batch_inserts_every_row(api):
+    batch = [reading(f"PKG-{i:05d}") for i in range(3)]
+    response = api.post("/ingest/batch", content=json.dumps(batch))
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok", "inserted": 3}
+    assert [row[0] for row in db.get_backend().rows] == ["PKG-00000", "PKG-00001", "PKG-00002"]
+    assert api.get("/telemetry/PKG-00002/latest").status_code == 200
+
+
+def test_batch_with_one_invalid_row_is_rejected_whole(api):
+    batch = [reading("PKG-00001"), reading("PKG-00002", temperatura="caliente"), reading("PKG-00003")]
+    response = api.post("/ingest/batch", content=json.dumps(batch))
+    assert response.status_code == 422
+    assert "Telemetría inválida" in response.json()["detail"]
+    # Nada del lote llega a la BD ni a los KPIs
+    assert db.get_backend().rows == []
+    assert api.get("/telemetry/PKG-00001/latest").status_code == 404
+
+
+def test_batch_over_the_row_limit_is_rejected(api, monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_BATCH_ROWS", 2)
+    response = api.post("/ingest/batch", content=json.dumps([reading()] * 3))
+    assert response.status_code == 413
+    assert db.get_backend().rows == []
+
+
+def test_pipeline_flushes_full_batches_and_the_remainder_on_stop():
+    batches = []
+    pipeline = IngestPipeline(batches.append, workers=1, batch_size=3, batch_max_age=60)
+    pipeline.start()
+    for i in range(7):
+        pipeline.submit(i)
+    pipeline.stop(timeout=5)
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+    assert pipeline.stats()["batches"] == 3
+    assert pipeline.stats()["processed"] == 7
+
+
+def test_pipeline_sends_an_incomplete_batch_after_max_age():
+    sent = threading.Event()
+    batches = []
+
+    def sender(batch):
+        batches.append(batch)
+        sent.set()
+
+    pipeline = IngestPipeline(sender, workers=1, batch_size=100, batch_max_age=0.05)
+    pipeline.start()
+    pipeline.submit("a")
+    pipeline.submit("b")
+    assert sent.wait(5)
+    assert batches == [["a", "b"]]
+    pipeline.stop(timeout=5)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend_api(request, monkeypatch, tmp_path):
+    """Fábrica de clientes de la API sobre cada backend; con SQLite los reinicios conservan la BD."""
+    monkeypatch.setattr(db, "DB_BACKEND", request.param)
+    monkeypatch.setitem(db._BACKENDS, "sqlite", lambda: db.SQLiteBackend(str(tmp_path / "telemetry.db")))
+
+    def start():
+        monkeypatch.setattr(kpis, "store", kpis.KpiStore())
+        monkeypatch.setattr(kpis, "cache", kpis.TtlCache())
+        monkeypatch.setattr(history, "latest", history.LastValueCache())
+        return TestClient(app)
+
+    return start
+
+
+def readings_of(client, package_id):
+    response = client.get(f"/telemetry/{package_id}/readings",
+                          params={"desde": "2025-01-01T00:00:00Z", "hasta": "2025-01-02T00:00:00Z"})
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_ingest_routes_write_through_each_backend(backend_api):
+    with backend_api() as client:
+        assert client.post("/ingest", content=json.dumps(reading(temperatura=3.0))).json()["inserted"] == 1
+        batch = [reading(timestamp_utc=f"2025-01-01T00:00:{s:02d}+00:00", temperatura=4.0 + s) for s in (1, 2)]
+        assert client.post("/ingest/batch", content=json.dumps(batch)).json()["inserted"] == 2
+        aggregate = {"id_paquete": "PKG-00001", "ventana_inicio": "2025-01-01T00:00:00+00:00",
+                     "ventana_fin": "2025-01-01T00:01:00+00:00", "lecturas": 3, "anomalias": 0,
+                     "temp_min": 3.0, "temp_max": 6.0, "temp_media": 4.7, "fuerza_g_max": 1.0,
+                     "puerta_abierta_s": 0.0}
+        assert client.post("/ingest/aggregates", content=json.dumps([aggregate])).json()["inserted"] == 1
+
+        assert [r["temperatura"] for r in readings_of(client, "PKG-00001")] == [3.0, 5.0, 6.0]
+        assert client.get("/kpis/summary").json()["lecturas"] == 3
+
+
+@pytest.mark.parametrize("backend_api", ["sqlite"], indirect=True)
+def test_kpis_and_history_survive_a_restart_with_sqlite(backend_api):
+    with backend_api() as client:
+        client.post("/ingest/batch", content=json.dumps([reading("PKG-00001"), reading("PKG-00002")]))
+
+    with backend_api() as client:
+        assert client.get("/kpis/summary").json()["envios"] == 2
+        assert len(readings_of(client, "PKG-00002")) == 1
+
+
+def test_unknown_backend_is_rejected(monkeypatch):
+    monkeypatch.setattr(db, "DB_BACKEND", "mongo")
+    with pytest.raises(ValueError, match="DB_BACKEND desconocido"):
+        with TestClient(app):
+            pass
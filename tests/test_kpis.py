@@ -0,0 +1,57 @@
+"""KPIs incrementales de la API (app/kpis.py)."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app import db, kpis
+from schemas.telemetry import Telemetry
+
+
+def test_segments_survive_rebuild_from_sqlite(tmp_path):
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    readings = [Telemetry(id_paquete="PKG-1", timestamp_utc=start + timedelta(seconds=10 * i),
+                          temperatura=12.0 if i % 2 else 4.0, fuerza_g=1.0, puerta_abierta=False,
+                          latitud=42.15, longitud=-8.05, ruta="r1") for i in range(6)]
+    live = kpis.KpiStore()
+    live.add_readings(readings)
+
+    async def restart():
+        backend = db.SQLiteBackend(str(tmp_path / "telemetry.db"))
+        await backend.init()
+        await backend.insert_many(readings)
+        rebuilt = kpis.KpiStore()
+        await kpis.rebuild(backend, rebuilt)
+        await backend.close()
+        return rebuilt
+
+    rebuilt = asyncio.run(restart())
+    assert live.top_segments() == rebuilt.top_segments()
+    assert live.top_segments()[0]["incidencias"] == 3
+
+
+def test_idle_shipments_are_forgotten_but_global_totals_remain():
+    store = kpis.KpiStore(shipment_ttl_s=3600, max_shipments=3)
+    store.update("A", 0.0, 12.0, 1.0, False)       # entra en incidencia y no vuelve
+    store.update("B", 10.0, 4.0, 1.0, False)
+    store.update("C", 7200.0, 4.0, 1.0, False)     # A y B llevan más de una hora sin lecturas
+    assert list(store.shipments) == ["C"]
+    assert store.incidents == 1 and store.open_incidents == 0
+    for pid in ("D", "E", "F"):
+        store.update(pid, 7201.0, 4.0, 1.0, False)
+    assert list(store.shipments) == ["D", "E", "F"]  # tope duro: fuera el menos reciente
+    assert store.summary()["envios_olvidados"] == 3
+
+
+def test_segments_beyond_the_cap_are_folded_into_other():
+    store = kpis.KpiStore(max_segments=3, segment_deg=1.0)
+    for i in range(5):
+        store.update(f"P{i}", 0.0, 4.0, 1.0, True, latitud=40.0 + i, longitud=-3.0)
+    assert list(store.segments) == ["42,-3", "43,-3", kpis.OTHER_SEGMENTS, "44,-3"]
+    assert store.segments[kpis.OTHER_SEGMENTS] == [0, 0, 2]
+    assert sum(seg["incidencias"] for seg in store.top_segments()) == 5
+
+
+def test_summary_endpoint_reports_forgotten_shipments(api):
+    response = api.get("/kpis/summary")
+    assert response.status_code == 200
+    assert response.json()["envios_olvidados"] == 0
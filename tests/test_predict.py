@@ -0,0 +1,82 @@
+"""Inferencia por lotes y en streaming (app/routers/predict.py)."""
+
+import json
+
+import pytest
+
+from app.routers import predict
+
+ROWS = [{"feature_1": 1.0, "feature_2": 2.0}, {"feature_1": -4.0, "feature_2": 0.5}, {"feature_1": 0.0, "feature_2": -1.0}]
+
+
+def single(api, row):
+    return api.post("/predict", json=row).json()
+
+
+def ndjson(rows):
+    return "".join(json.dumps(r) + "\n" for r in rows)
+
+
+@pytest.mark.parametrize("content, content_type", [
+    (json.dumps(ROWS), "application/json"),
+    (json.dumps({"feature_1": [r["feature_1"] for r in ROWS], "feature_2": [r["feature_2"] for r in ROWS]}),
+     "application/json"),
+    (ndjson(ROWS), predict.NDJSON),
+])
+def test_batch_matches_single_predictions(api, content, content_type):
+    response = api.post("/predict/batch", content=content, headers={"Content-Type": content_type})
+    assert response.status_code == 200
+    body = response.json()
+    expected = [single(api, r) for r in ROWS]
+    assert body["prediction"] == pytest.approx([e["prediction"] for e in expected])
+    assert body["label"] == [e["label"] for e in expected]
+    assert body["confidence"] == pytest.approx([e["confidence"] for e in expected])
+
+
+@pytest.mark.parametrize("content, content_type, detail", [
+    (json.dumps([ROWS[0], {"feature_1": 1.0}]), "application/json", "Fila no válida"),
+    (json.dumps([ROWS[0], {"feature_1": "x", "feature_2": 1.0}]), "application/json", "Fila no válida"),
+    (json.dumps({"feature_1": [1.0, 2.0], "feature_2": [1.0]}), "application/json", "misma longitud"),
+    (json.dumps(3), "application/json", "Se esperaba"),
+    ("{no es json", "application/json", "JSON no válido"),
+    (ndjson(ROWS[:1]) + "{roto\n", predict.NDJSON, "NDJSON no válido"),
+])
+def test_batch_rejects_invalid_rows(api, content, content_type, detail):
+    response = api.post("/predict/batch", content=content, headers={"Content-Type": content_type})
+    assert response.status_code == 422
+    assert detail in response.json()["detail"]
+
+
+def test_batch_over_the_row_limit_points_to_stream(api, monkeypatch):
+    monkeypatch.setattr(predict, "MAX_BATCH_ROWS", 2)
+    response = api.post("/predict/batch", content=json.dumps(ROWS))
+    assert response.status_code == 413
+    assert "/predict/stream" in response.json()["detail"]
+
+
+def test_stream_scores_rows_across_chunks(api, monkeypatch):
+    monkeypatch.setattr(predict, "STREAM_CHUNK_ROWS", 2)
+    response = api.post("/predict/stream", content=ndjson(ROWS * 3), headers={"Content-Type": predict.NDJSON})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(predict.NDJSON)
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["label"] for line in lines] == [single(api, r)["label"] for r in ROWS * 3]
+
+
+def test_stream_ends_with_an_error_line_on_invalid_ndjson(api):
+    # Las filas anteriores a la línea rota se puntúan aunque lleguen en el mismo trozo del cuerpo
+    content = ndjson(ROWS[:2]) + "{roto\n" + ndjson(ROWS)
+    response = api.post("/predict/stream", content=content, headers={"Content-Type": predict.NDJSON})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 3
+    assert [line["label"] for line in lines[:2]] == [single(api, r)["label"] for r in ROWS[:2]]
+    assert "NDJSON no válido" in lines[-1]["error"]
+
+
+def test_stream_row_without_features_ends_with_an_error_line(api):
+    content = ndjson(ROWS[:2]) + json.dumps({"feature_1": 1.0}) + "\n"
+    response = api.post("/predict/stream", content=content, headers={"Content-Type": predict.NDJSON})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 1
+    assert "Fila no válida" in lines[0]["error"]
@@ -0,0 +1,87 @@
+"""Pruebas del procesador: decodificación, reglas y envío a la cola de ingesta."""
+
+from datetime import datetime, timezone
+
+import requests
+
+from scripts import processor
+from scripts.spool import REJECTED
+
+
+def reading(**overrides):
+    data = {
+        "id_paquete": "PKG-00001",
+        "timestamp_utc": datetime.now(timezone.utc).isoformat(),
+        "temperatura": 4.0,
+        "fuerza_g": 1.0,
+        "puerta_abierta": False,
+        "latitud": 42.0,
+        "longitud": -8.0,
+    }
+    data.update(overrides)
+    return data
+
+
+def test_ingest_submit_runs_without_state_lock(monkeypatch):
+    # Con INGEST_BACKPRESSURE=block, submit puede esperar: no debe hacerlo con el estado bloqueado
+    held = []
+    monkeypatch.setattr(processor, "INGEST_ENABLED", True)
+    monkeypatch.setattr(processor.ingest_pipeline, "submit", lambda item: held.append(processor.state_lock.locked()))
+    processor.handle_payload(processor.telemetry.encode(reading()))
+    assert held == [False]
+
+
+def _response(status):
+    response = requests.Response()
+    response.status_code = status
+    response.url = "http://api/ingest/batch"
+    return response
+
+
+def test_spool_sender_treats_4xx_as_rejection(monkeypatch):
+    send = processor.spool_sender("http://api/ingest/batch", "lecturas")
+    for status, expected in ((200, True), (422, REJECTED), (413, REJECTED), (429, False), (503, False)):
+        monkeypatch.setattr(processor.http_client, "post", lambda *a, status=status, **k: _response(status))
+        assert send(b"[]", 0) == expected, status
+
+
+def test_micro_batches_go_to_the_batch_route(monkeypatch):
+    posted = []
+    monkeypatch.setattr(processor.http_client, "post",
+                        lambda url, json, **k: posted.append((url, json)) or _response(200))
+    processor.send_to_ingest_api([reading(), reading(id_paquete="PKG-00002")])
+    processor.send_to_ingest_api(reading())
+    assert [(url, len(body) if isinstance(body, list) else 1) for url, body in posted] == [
+        (processor.API_INGEST_BATCH_URL, 2), (processor.API_INGEST_URL, 1)]
+
+
+def test_reading_with_invalid_timestamp_never_reaches_ingest(monkeypatch):
+    submitted = []
+    monkeypatch.setattr(processor, "INGEST_ENABLED", True)
+    monkeypatch.setattr(processor.ingest_pipeline, "submit", submitted.append)
+    invalid = processor.MESSAGES_INVALID.value
+    processor.handle_payload(processor.telemetry.encode(reading(timestamp_utc="not-a-timestamp")))
+    assert submitted == []
+    assert processor.MESSAGES_INVALID.value == invalid + 1
+
+
+def test_on_connect_subscribes_to_json_and_binary_topics():
+    class Client:
+        def subscribe(self, topics):
+            self.topics = topics
+
+    client = Client()
+    processor.on_connect(client, None, None, 0)
+    assert [topic for topic, _ in client.topics] == [
+        processor.MQTT_TOPIC, processor.MQTT_TOPIC + processor.telemetry.BINARY_TOPIC_SUFFIX]
+
+
+def test_on_connect_keeps_wildcard_topic_valid(monkeypatch):
+    class Client:
+        def subscribe(self, topics):
+            self.topics = topics
+
+    client = Client()
+    monkeypatch.setattr(processor, "MQTT_TOPIC", "greendelivery/rubia/#")
+    processor.on_connect(client, None, None, 0)
+    assert client.topics == [("greendelivery/rubia/#", 0)]
@@ -0,0 +1,138 @@
+"""Huellas SHA-256 por bloques y manifiestos de trazabilidad (scripts/provenance.py)."""
+
+import hashlib
+import os
+import sys
+
+import msgspec
+import pytest
+
+from scripts import provenance
+from scripts.provenance import DigestCache, build_manifest, read_manifest, verify_manifest, write_manifest
+
+CHUNK = 4096
+OLD_NS = 1_600_000_000 * 10**9  # mtime antiguo: fuera de la ventana "racy" de la caché
+
+
+def write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    os.utime(path, ns=(OLD_NS, OLD_NS))
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    root = tmp_path / "trazas"
+    write(root / "trazas-00000.csv", os.urandom(5 * CHUNK + 123))
+    write(root / "trazas-00001.csv", os.urandom(3 * CHUNK))
+    write(root / "sub" / "labels.csv", b"id,label\nPKG-1,0\n")
+    write(root / "vacio.txt", b"")
+    return root
+
+
+def flip_byte(path, offset):
+    """Cambia un byte en mitad del fichero conservando su tamaño y su mtime."""
+    st = os.stat(path)
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+@pytest.mark.parametrize("chunk_size", [1, 1000, CHUNK, 1 << 20])
+def test_chunked_digest_matches_hashlib(dataset, use_mmap, chunk_size):
+    for name in ("trazas-00000.csv", "vacio.txt"):
+        path = dataset / name
+        expected = hashlib.sha256(path.read_bytes()).hexdigest()
+        assert provenance.sha256_file(path, chunk_size, use_mmap) == expected
+
+
+def test_manifest_roundtrip_passes(dataset, tmp_path):
+    manifest, hashed = build_manifest(str(dataset), workers=2, chunk_size=CHUNK)
+    assert sorted(e.archivo for e in manifest.archivos) == [
+        "sub/labels.csv", "trazas-00000.csv", "trazas-00001.csv", "vacio.txt"]
+    assert hashed == manifest.total_bytes
+    out = str(tmp_path / provenance.MANIFEST_NAME)
+    write_manifest(manifest, out)
+
+    report = verify_manifest(read_manifest(out), str(dataset), chunk_size=CHUNK)
+    assert report.passed and report.ok == 4
+
+
+def test_modified_chunk_missing_and_extra_files_are_flagged(dataset):
+    manifest, _ = build_manifest(str(dataset), chunk_size=CHUNK)
+    flip_byte(dataset / "trazas-00000.csv", 3 * CHUNK + 7)  # mismo tamaño: solo lo delata la huella
+    (dataset / "trazas-00001.csv").write_bytes(b"truncado")  # tamaño distinto: no hace falta leerlo
+    (dataset / "sub" / "labels.csv").unlink()
+    write(dataset / "nuevo.csv", b"x")
+
+    report = verify_manifest(manifest, str(dataset), chunk_size=CHUNK)
+    assert not report.passed
+    assert report.modified == ["trazas-00000.csv", "trazas-00001.csv"]
+    assert report.missing == ["sub/labels.csv"]
+    assert report.extra == ["nuevo.csv"]
+    assert report.ok == 1
+    # Solo se resumieron los ficheros con el tamaño esperado
+    assert report.hashed_bytes == 5 * CHUNK + 123
+
+
+def test_cache_skips_unchanged_files_and_full_rereads_them(dataset, tmp_path):
+    cache_path = str(tmp_path / "cache.json")
+    manifest, hashed = build_manifest(str(dataset), DigestCache(cache_path), chunk_size=CHUNK)
+    assert hashed == manifest.total_bytes
+
+    cache = DigestCache(cache_path)
+    again, hashed = build_manifest(str(dataset), cache, chunk_size=CHUNK)
+    assert hashed == 0 and cache.hits == 4
+    assert again.sha256 == manifest.sha256
+
+    # Un cambio que conserva tamaño y mtime pasa la verificación rápida; --completo lo detecta
+    flip_byte(dataset / "trazas-00001.csv", CHUNK + 1)
+    assert verify_manifest(manifest, str(dataset), DigestCache(cache_path), chunk_size=CHUNK).passed
+    report = verify_manifest(manifest, str(dataset), DigestCache(cache_path), full=True, chunk_size=CHUNK)
+    assert report.modified == ["trazas-00001.csv"]
+    assert report.hashed_bytes == manifest.total_bytes
+
+
+def test_recently_modified_files_are_not_cached(dataset, tmp_path):
+    (dataset / "vacio.txt").write_bytes(b"ahora")  # mtime actual: dentro de la ventana "racy"
+    cache = DigestCache(str(tmp_path / "cache.json"))
+    build_manifest(str(dataset), cache, chunk_size=CHUNK)
+    assert str(dataset / "vacio.txt") not in cache.entries
+    assert str(dataset / "trazas-00000.csv") in cache.entries
+
+
+def test_tampered_manifest_is_rejected(dataset, tmp_path):
+    manifest, _ = build_manifest(str(dataset), chunk_size=CHUNK)
+    manifest.archivos[1].sha256 = "0" * 64
+    out = str(tmp_path / provenance.MANIFEST_NAME)
+    write_manifest(manifest, out)
+    with pytest.raises(ValueError, match="manifiesto alterado"):
+        read_manifest(out)
+
+
+def test_unreadable_cache_starts_empty(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_bytes(b"{no es json")
+    assert DigestCache(str(path)).entries == {}
+
+
+def test_cli_verify_exit_codes(dataset, monkeypatch, capsys):
+    def run(*argv):
+        monkeypatch.setattr(sys, "argv", ["provenance.py", *argv])
+        with pytest.raises(SystemExit) as exc:
+            provenance.main()
+        return exc.value.code
+
+    manifest_path = str(dataset / provenance.MANIFEST_NAME)
+    assert run("manifiesto", str(dataset), "--sin-cache") == 0
+    # El propio manifiesto no cuenta como fichero de más
+    assert run("verificar", manifest_path, "--sin-cache") == 0
+    flip_byte(dataset / "trazas-00000.csv", 10)
+    assert run("verificar", manifest_path, "--sin-cache") == 1
+    assert "[MODIFICADO] trazas-00000.csv" in capsys.readouterr().out
+    (dataset / provenance.MANIFEST_NAME).write_bytes(msgspec.json.encode({"version": 1}))
+    assert run("verificar", manifest_path, "--sin-cache") == 2
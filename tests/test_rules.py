@@ -0,0 +1,26 @@
+"""Pruebas del motor de reglas compilado."""
+
+import pytest
+
+from scripts.rules import RuleEngine, load_rules
+from scripts.state_store import PackageStateStore
+
+
+def engine_for(rules):
+    return RuleEngine(rules, PackageStateStore(), clock=lambda: 1000.0)
+
+
+def test_infinite_thresholds_compile_and_evaluate():
+    engine = engine_for([
+        {"name": "congelacion", "when": [{"field": "temperatura", "op": "<", "value": float("-inf")}]},
+        {"name": "sin_tope", "when": [{"field": "fuerza_g", "op": "<", "value": float("inf")}],
+         "hysteresis": 0.5, "cooldown_s": float("inf")},
+    ])
+    slot = engine.store.touch("A")
+    events = engine.evaluate({"id_paquete": "A", "temperatura": -50.0, "fuerza_g": 1.0}, slot)
+    assert [(e.rule.name, e.kind) for e in events] == [("sin_tope", "fire")]
+
+
+def test_nan_threshold_is_rejected():
+    with pytest.raises(ValueError):
+        load_rules([{"name": "mal", "when": [{"field": "temperatura", "op": ">", "value": float("nan")}]}])
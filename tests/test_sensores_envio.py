@@ -0,0 +1,73 @@
+"""Validación de argumentos del simulador de sensores (sensores_envio.py)."""
+
+import sys
+
+import pytest
+
+import sensores_envio
+
+
+@pytest.mark.parametrize("argv", [
+    ["--num-paquetes", "0"],
+    ["--num-paquetes", "-3"],
+    ["--conexiones", "0"],
+    ["--num-paquetes", "10", "--target-rate", "0"],
+])
+def test_fleet_arguments_must_be_positive(monkeypatch, capsys, argv):
+    monkeypatch.setattr(sys, "argv", ["sensores_envio.py", *argv])
+    # argparse sale con código 2 antes de conectar con el broker
+    monkeypatch.setattr(sensores_envio, "run_fleet", lambda args: pytest.fail("no debería arrancar la flota"))
+    with pytest.raises(SystemExit) as exc:
+        sensores_envio.main()
+    assert exc.value.code == 2
+    assert "debe ser" in capsys.readouterr().err
+
+
+def test_entero_positivo_accepts_one():
+    assert sensores_envio.entero_positivo("1") == 1
+
+
+class FakeClient:
+    """Cliente MQTT falso: guarda lo publicado y corta la flota tras `limit` mensajes."""
+
+    published = []
+    limit = 0
+
+    def __init__(self, *args, client_id=None, **kwargs):
+        self.client_id = client_id
+
+    def connect(self, *args, **kwargs):
+        pass
+
+    def loop_start(self):
+        pass
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def publish(self, topic, payload, qos=0):
+        if len(FakeClient.published) >= FakeClient.limit:
+            raise KeyboardInterrupt
+        FakeClient.published.append((self.client_id, topic, payload))
+        return sensores_envio.mqtt.MQTTMessageInfo(0)
+
+
+@pytest.mark.parametrize("formato", ["json", "bin"])
+def test_fleet_publishes_valid_readings_round_robin(monkeypatch, capsys, formato):
+    monkeypatch.setattr(sensores_envio.mqtt, "Client", FakeClient)
+    monkeypatch.setattr(FakeClient, "published", [])
+    monkeypatch.setattr(FakeClient, "limit", 8)
+    monkeypatch.setattr(sys, "argv", ["sensores_envio.py", "--num-paquetes", "4", "--conexiones", "2",
+                                      "--target-rate", "100000", "--formato", formato])
+    sensores_envio.main()
+
+    # Cada mensaje pasa la misma validación que aplica el procesador
+    ids = [sensores_envio.telemetry.decode_wire(payload)["id_paquete"] for _, _, payload in FakeClient.published]
+    assert ids == [f"PKG-A123-{i:05d}" for i in range(4)] * 2
+    assert [client for client, _, _ in FakeClient.published[:2]] == ["fleet-PKG-A123-0", "fleet-PKG-A123-1"]
+    suffix = "/bin" if formato == "bin" else ""
+    assert FakeClient.published[0][1] == f"greendelivery/packages/PKG-A123-00000{suffix}"
+    assert "8 mensajes" in capsys.readouterr().out
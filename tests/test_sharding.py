@@ -0,0 +1,20 @@
+"""Arranque del procesador multiproceso tal y como lo lanza docker-compose."""
+
+import os
+import subprocess
+import sys
+
+
+def test_sharded_processor_starts_through_module_entry_point(tmp_path):
+    env = dict(os.environ, PROCESSOR_WORKERS="2", MQTT_HOST="127.0.0.1", MQTT_PORT="1",
+               PROCESSOR_METRICS_PORT="0", LOG_LEVEL="INFO", LOG_FORMAT="text",
+               SPOOL_DIR=str(tmp_path / "spool"), CHECKPOINT_DIR=str(tmp_path / "checkpoint"))
+    # Sin broker: el despachador no conecta y para a los workers, que ya deben haber arrancado
+    result = subprocess.run([sys.executable, "-m", "scripts.processor"], cwd=os.path.dirname(os.path.dirname(__file__)),
+                            env=env, capture_output=True, text=True, timeout=120)
+    output = result.stdout + result.stderr
+    assert "Traceback" not in output, output
+    for shard in range(2):
+        assert f"Worker {shard}/2 listo" in output, output
+        assert (tmp_path / "spool" / f"shard-{shard}").is_dir()
+        assert (tmp_path / "checkpoint" / f"shard-{shard}" / "state.ckpt").is_file()
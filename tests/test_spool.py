@@ -0,0 +1,62 @@
+"""Pruebas del spool en disco y de su reenvío."""
+
+import json
+
+from scripts.spool import REJECTED, SegmentLog, SpoolReplayer
+
+
+class FakeApi:
+    """Acepta lotes salvo que contengan un registro con "bad"; entonces responde como un 422."""
+
+    def __init__(self):
+        self.accepted = []
+        self.calls = 0
+
+    def send(self, body, count):
+        self.calls += 1
+        records = json.loads(body)
+        assert len(records) == count
+        if any(r.get("bad") for r in records):
+            return REJECTED
+        self.accepted.extend(r["n"] for r in records)
+        return True
+
+
+def read_all(log):
+    payloads, _ = log.read(10**6)
+    return [json.loads(p) for p in payloads]
+
+
+def test_rejected_batch_is_split_and_bad_records_quarantined(tmp_path):
+    log = SegmentLog(str(tmp_path / "spool"))
+    dead = SegmentLog(str(tmp_path / "spool" / "dead-letter"))
+    log.append_many([{"n": i, "bad": i in (3, 17)} for i in range(40)])
+    api = FakeApi()
+    replayer = SpoolReplayer(log, api.send, lambda: True, batch_size=25, dead_letter=dead)
+
+    assert replayer.drain_once() == 38
+    assert api.accepted == [i for i in range(40) if i not in (3, 17)]  # en orden, sin duplicados
+    assert [r["n"] for r in read_all(dead)] == [3, 17]
+    assert replayer.rejected == 2
+    assert log.pending_bytes() == 0
+    assert replayer.drain_once() == 0
+
+
+def test_network_failure_while_splitting_resumes_without_duplicates(tmp_path):
+    log = SegmentLog(str(tmp_path / "spool"))
+    log.append_many([{"n": i, "bad": i == 5} for i in range(16)])
+    api = FakeApi()
+    fail = {"after": 3}
+
+    def flaky(body, count):
+        fail["after"] -= 1
+        if fail["after"] < 0:
+            return False
+        return api.send(body, count)
+
+    replayer = SpoolReplayer(log, flaky, lambda: True, batch_size=16)
+    assert replayer.drain_once() is None
+    fail["after"] = 10**6
+    assert replayer.drain_once() is not None
+    assert api.accepted == [i for i in range(16) if i != 5]
+    assert log.pending_bytes() == 0
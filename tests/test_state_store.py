@@ -0,0 +1,77 @@
+"""Almacén de estado por paquete (scripts/state_store.py): expulsión TTL/LRU y reutilización de slots."""
+
+from scripts.state_store import PackageStateStore
+
+
+class Clock:
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_expires_idle_packages_and_reuses_their_slots():
+    clock = Clock()
+    store = PackageStateStore(ttl_seconds=60, clock=clock)
+    store.released = []
+    consecutive = store.add_column("consecutive", "I", 0)
+
+    consecutive[store.touch("PKG-A")] = 3
+    clock.now += 30
+    store.touch("PKG-B")
+    clock.now += 40  # PKG-A lleva 70 s inactivo, PKG-B 40 s
+
+    assert store.evict_expired() == 1
+    assert "PKG-A" not in store and "PKG-B" in store
+    assert store.released == ["PKG-A"]
+
+    # El slot liberado se reutiliza con las columnas a su valor por defecto
+    slot = store.touch("PKG-C")
+    assert slot == 0
+    assert consecutive[slot] == 0
+    assert store.slot_ids() == ["PKG-C", "PKG-B"]
+
+
+def test_max_packages_evicts_least_recently_used():
+    clock = Clock()
+    evicted = []
+    store = PackageStateStore(ttl_seconds=None, max_packages=2, clock=clock,
+                              on_evict=lambda package_id, slot: evicted.append(package_id))
+    store.released = []
+
+    store.touch("PKG-A")
+    store.touch("PKG-B")
+    store.touch("PKG-A")  # PKG-B pasa a ser el menos usado
+    store.touch("PKG-C")
+
+    assert evicted == ["PKG-B"]
+    assert store.released == ["PKG-B"]
+    assert [pid for pid, _ in store.items()] == ["PKG-A", "PKG-C"]
+    assert store.evicted == 1
+
+
+def test_released_and_changed_only_tracked_when_enabled():
+    store = PackageStateStore(max_packages=1)
+    store.touch("PKG-A")
+    store.touch("PKG-B")
+    store.mark_changed("PKG-B")
+    assert store.released is None and store.changed is None
+
+    store.released, store.changed = [], set()
+    assert store.remove("PKG-B")
+    assert not store.remove("PKG-B")
+    store.mark_changed("PKG-C")
+    assert store.released == ["PKG-B"]
+    assert store.changed == {"PKG-C"}
+
+
+def test_idle_and_recent_walk_the_lru_ends():
+    clock = Clock()
+    store = PackageStateStore(ttl_seconds=None, clock=clock)
+    for i, package_id in enumerate(["PKG-A", "PKG-B", "PKG-C"]):
+        clock.now = 1_000.0 + 10 * i
+        store.touch(package_id)
+
+    assert [pid for pid, _ in store.idle(1_015.0)] == ["PKG-A", "PKG-B"]
+    assert [pid for pid, _ in store.recent(1_010.0)] == ["PKG-C", "PKG-B"]
@@ -0,0 +1,89 @@
+"""Pruebas del esquema compartido de telemetría (procesador y API)."""
+
+import json
+import struct
+
+import pytest
+
+from schemas import telemetry
+
+
+def message(**overrides):
+    data = {"id_paquete": "PKG-00001", "timestamp_utc": "2025-01-01T00:00:00+00:00", "temperatura": 4.0,
+            "fuerza_g": 1.0, "puerta_abierta": False, "latitud": 42.0, "longitud": -8.0}
+    data.update(overrides)
+    return json.dumps(data).encode()
+
+
+def api_accepts(payload):
+    try:
+        telemetry.decode_reading(payload)
+        return True
+    except telemetry.InvalidTelemetry:
+        return False
+
+
+def processor_accepts(payload):
+    try:
+        telemetry.decode_wire(payload)
+        return True
+    except telemetry.InvalidTelemetry:
+        return False
+
+
+@pytest.mark.parametrize("timestamp", [
+    "2025-01-01T00:00:00+00:00",
+    "2025-01-01T00:00:00.123Z",
+    "2025-01-01 00:00:00Z",
+    "not-a-timestamp",
+    "2025-13-01T00:00:00Z",
+    "2025-01-01T25:00:00Z",
+    "1735689600",
+    "2025-01-01T00:00:00",
+])
+def test_processor_and_api_agree_on_timestamps(timestamp):
+    payload = message(timestamp_utc=timestamp)
+    assert processor_accepts(payload) == api_accepts(payload)
+
+
+def test_invalid_timestamp_is_rejected_at_decode():
+    with pytest.raises(telemetry.InvalidTelemetry):
+        telemetry.decode_message(message(timestamp_utc="not-a-timestamp"))
+    # El dict conserva el texto original, listo para reenviarse a la API
+    assert telemetry.decode_message(message())["timestamp_utc"] == "2025-01-01T00:00:00+00:00"
+
+
+def test_timestamp_without_timezone_is_rejected_everywhere(api):
+    naive = message(timestamp_utc="2025-01-01T00:00:00")
+    with pytest.raises(telemetry.InvalidTelemetry):
+        telemetry.decode_message(naive)
+    assert api.post("/ingest", content=naive).status_code == 422
+    assert api.post("/ingest/batch", content=b"[" + naive + b"]").status_code == 422
+    assert api.get("/telemetry/PKG-00001/latest").status_code == 404
+
+
+def binary(**overrides):
+    data = json.loads(message())
+    data.update(overrides)
+    return telemetry.encode_binary(data)
+
+
+@pytest.mark.parametrize("ts_ms", [2**62, -2**62])
+def test_binary_timestamp_out_of_range_is_invalid(ts_ms):
+    payload = bytearray(binary())
+    struct.pack_into("<q", payload, 2, ts_ms)  # tras versión y flags
+    with pytest.raises(telemetry.InvalidTelemetry):
+        telemetry.decode_wire(bytes(payload))
+
+
+@pytest.mark.parametrize("position", [{"latitud": 500.0}, {"longitud": -200.0}])
+def test_binary_position_uses_json_bounds(position):
+    payload = binary(**position)
+    assert not api_accepts(message(**position))
+    assert not processor_accepts(payload)
+
+
+def test_binary_roundtrip_matches_json():
+    decoded = telemetry.decode_wire(binary())
+    assert processor_accepts(binary())
+    assert (decoded["latitud"], decoded["longitud"]) == (42.0, -8.0)
@@ -0,0 +1,87 @@
+"""Generador de trazas etiquetadas (scripts/trace_generator.py): etiquetas, reglas y escritura."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from schemas import telemetry
+from scripts import evaluate_rules, trace_generator
+from scripts.trace_generator import EXCURSION_TICKS, IMPACT_G, TraceGenerator, write_traces
+from sensores_envio import RANGO_TEMP
+
+
+def generate(ticks_per_chunk=200, **kwargs):
+    params = dict(num_packages=50, readings=200, seed=11, excursion_prob=0.02, impact_prob=0.01)
+    params.update(kwargs)
+    gen = TraceGenerator(**params)
+    return pd.concat(gen.chunks(ticks_per_chunk), ignore_index=True)
+
+
+def test_labels_match_incident_kinds():
+    df = generate()
+    assert len(df) == 50 * 200
+    assert set(df["incidente"]) == {"", "temperatura", "impacto"}
+    assert (df["label"] == (df["incidente"] != "")).all()
+
+    normal = df[df["label"] == 0]
+    # Sin incidente, los valores se quedan en el recorte del simulador
+    assert normal["temperatura"].max() <= RANGO_TEMP[1] + 3.0
+    assert normal["fuerza_g"].max() <= 1.6
+    impacts = df[df["incidente"] == "impacto"]
+    assert impacts["fuerza_g"].between(*IMPACT_G).all()
+    assert (df.loc[df["incidente"] == "temperatura", "temperatura"] >= RANGO_TEMP[0] - 1.0 + 4.0).all()
+
+
+def test_impacts_are_exactly_what_the_default_g_rule_flags():
+    df = generate()
+    over = df["fuerza_g"] > evaluate_rules.DEFAULT_G_FORCE_UMBRAL
+    # Un impacto que coincide con una excursión se etiqueta como temperatura, pero sigue siendo incidente
+    assert (df.loc[over, "label"] == 1).all()
+    assert over[df["incidente"] == "impacto"].all()
+
+
+@pytest.mark.parametrize("ticks_per_chunk", [2, 7, 200])
+def test_excursions_last_their_minimum_across_chunk_boundaries(ticks_per_chunk):
+    df = generate(ticks_per_chunk)
+    readings = 200
+    for _, rows in df.groupby("id_paquete", sort=False):
+        excursion = (rows["incidente"] == "temperatura").to_numpy()
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], excursion.astype(np.int8), [0]))))
+        for start, end in zip(edges[::2], edges[1::2]):
+            if end < readings:  # las que siguen abiertas al final de la traza pueden ser más cortas
+                assert end - start >= EXCURSION_TICKS[0]
+
+
+def test_same_seed_same_trace_and_rows_arrive_in_time_order():
+    a, b = generate(), generate()
+    pd.testing.assert_frame_equal(a, b)
+    assert not a.equals(generate(seed=12))
+    ts = pd.to_datetime(a["timestamp_utc"], utc=True)
+    assert ts.is_monotonic_increasing
+
+
+@pytest.mark.parametrize("formato", ["csv", "jsonl"])
+def test_written_traces_load_for_rule_evaluation_and_ingest(tmp_path, formato):
+    gen = TraceGenerator(20, 50, seed=5, excursion_prob=0.05, impact_prob=0.02)
+    paths = write_traces(gen, str(tmp_path), formato, rows_per_file=400)
+    assert len(paths) == 3  # 20 ticks por fichero: 20 + 20 + 10
+
+    expected = generate(num_packages=20, readings=50, seed=5, excursion_prob=0.05, impact_prob=0.02,
+                        ticks_per_chunk=20)
+    df = (pd.concat(pd.read_csv(p) for p in paths) if formato == "csv"
+          else pd.concat(pd.read_json(p, lines=True, dtype=False) for p in paths))
+    data = evaluate_rules.prepare(df)
+    assert data["dropped"] == 0
+    assert int(data["label"].sum()) == int(expected["label"].sum())
+
+    if formato == "jsonl":
+        # Cada fila es una lectura válida para la API (los campos extra se ignoran)
+        with open(paths[0], "rb") as f:
+            for line in f:
+                telemetry.decode_reading(line)
+
+
+def test_parquet_without_pyarrow_fails_early(monkeypatch):
+    monkeypatch.setattr(trace_generator.importlib.util, "find_spec", lambda name: None)
+    with pytest.raises(RuntimeError, match="pyarrow"):
+        trace_generator.check_format("parquet")